@@ -454,8 +454,8 @@ ApplicationWindow {
                                 altitude: droneModel.isConnected && droneModel.telemetry.alt !== undefined ? droneModel.telemetry.alt : 0
                                 groundSpeed: droneModel.isConnected && droneModel.telemetry.groundspeed !== undefined ? droneModel.telemetry.groundspeed : 0
                                 yaw: droneModel.isConnected && droneModel.telemetry.yaw !== undefined ? droneModel.telemetry.yaw : 0
-                                vibration: droneModel.isConnected && droneModel.telemetry.vibration !== undefined ? droneModel.telemetry.vibration : 0
-                                efk: droneModel.isConnected && droneModel.telemetry.ekf !== undefined ? droneModel.telemetry.ekf : 0
+                                vibration: droneModel.isConnected ? vehicleOverview.vibration : 0
+                                efk: droneModel.isConnected ? vehicleOverview.ekf : 0
                             }
 
                             StatusBar {
@@ -168,6 +168,8 @@ Item {
             anchors.margins: 2
 
             property bool addMarkersMode: false
+            property string fenceDrawMode: ""       // "", "polygon", "circle" or "survey" (survey area)
+            property bool fenceExclusion: false     // new zones keep the vehicle out instead of in
             property string droneIcon: root.droneIconPath
 
             // Load Google Maps with satellite view and water removed
@@ -379,8 +381,14 @@ Item {
                                 document.getElementById('lat').textContent = lat.toFixed(6);
                                 document.getElementById('lon').textContent = lng.toFixed(6);
 
+                                if (fenceDrawMode) {
+                                    addFenceDraftPoint(lat, lng);
+                                    return;
+                                }
+
                                 if (addMarkersMode) {
-                                    addMarker(lat, lng);
+                                    // QML owns the marker store; it answers with a marker diff
+                                    console.log("MARKER_ADD:" + lat + "," + lng);
                                     addMarkersMode = false;
                                 }
                             });
@@ -577,7 +585,7 @@ Item {
                             };
 
                             markers.push(markerData);
-                            updateRoutePath();
+                            routePath.getPath().push(position);
 
                             marker.addListener('click', function() {
                                 showMarkerPopup(markerData);
@@ -586,21 +594,27 @@ Item {
                             return markerIndex;
                         }
 
+                        // Renumber markers from index onwards (everything before is unchanged)
+                        function relabelMarkers(fromIndex) {
+                            for (let i = fromIndex; i < markers.length; i++) {
+                                const markerData = markers[i];
+                                if (markerData.index === i) continue;
+                                markerData.index = i;
+                                markerData.marker.setTitle('Waypoint ' + (i + 1));
+                                markerData.marker.setLabel({
+                                    text: (i + 1).toString(),
+                                    color: 'white',
+                                    fontWeight: 'bold'
+                                });
+                            }
+                        }
+
                         function deleteMarker(index) {
                             if (index >= 0 && index < markers.length) {
                                 markers[index].marker.setMap(null);
                                 markers.splice(index, 1);
-                                
-                                markers.forEach((markerData, i) => {
-                                    markerData.index = i;
-                                    markerData.marker.setLabel({
-                                        text: (i + 1).toString(),
-                                        color: 'white',
-                                        fontWeight: 'bold'
-                                    });
-                                });
-                                
-                                updateRoutePath();
+                                routePath.getPath().removeAt(index);
+                                relabelMarkers(index);
                             }
                         }
 
@@ -609,6 +623,7 @@ Item {
                                 markerData.marker.setMap(null);
                             });
                             markers = [];
+                            markersById = {};
                             updateRoutePath();
                             console.log("All markers cleared");
                         }
@@ -618,6 +633,137 @@ Item {
                             routePath.setPath(path);
                         }
 
+                        // Apply a batch of marker ops from MapCommunicationBridge.
+                        // The polyline is edited in place and labels are only
+                        // renumbered once, from the first index a delete touched.
+                        let markersById = {};
+                        function applyMarkerDiff(ops) {
+                            let relabelFrom = markers.length;
+                            ops.forEach(function(op) {
+                                if (op.op === 'reset') {
+                                    clearAllMarkers();
+                                    op.markers.forEach(function(m) {
+                                        addMarker(m.lat, m.lng, m.altitude, m.speed);
+                                        markers[markers.length - 1].id = m.id;
+                                        markersById[m.id] = markers[markers.length - 1];
+                                    });
+                                    relabelFrom = markers.length;
+                                } else if (op.op === 'add') {
+                                    addMarker(op.lat, op.lng, op.altitude, op.speed);
+                                    markers[markers.length - 1].id = op.id;
+                                    markersById[op.id] = markers[markers.length - 1];
+                                } else if (op.op === 'move') {
+                                    const m = markersById[op.id];
+                                    if (!m) return;
+                                    const position = new google.maps.LatLng(op.lat, op.lng);
+                                    m.lat = op.lat;
+                                    m.lng = op.lng;
+                                    if (op.altitude !== undefined) m.altitude = op.altitude;
+                                    m.marker.setPosition(position);
+                                    routePath.getPath().setAt(markers.indexOf(m), position);
+                                } else if (op.op === 'delete') {
+                                    const m = markersById[op.id];
+                                    if (!m) return;
+                                    const index = markers.indexOf(m);
+                                    delete markersById[op.id];
+                                    m.marker.setMap(null);
+                                    markers.splice(index, 1);
+                                    routePath.getPath().removeAt(index);
+                                    relabelFrom = Math.min(relabelFrom, index);
+                                }
+                            });
+                            relabelMarkers(relabelFrom);
+                        }
+
+                        // Geofence zones from GeofenceManager: inclusion green, exclusion red
+                        let fenceOverlays = [];
+                        function setFenceZones(zones) {
+                            fenceOverlays.forEach(function(o) { o.setMap(null); });
+                            fenceOverlays = [];
+                            if (!map) return;
+                            zones.forEach(function(z) {
+                                const color = z.inclusion ? '#00c853' : '#ff1744';
+                                const style = {
+                                    map: map, strokeColor: color, strokeWeight: 2,
+                                    fillColor: color, fillOpacity: z.inclusion ? 0.05 : 0.2,
+                                    clickable: false
+                                };
+                                if (z.kind === 'circle') {
+                                    style.center = z.center;
+                                    style.radius = z.radius;
+                                    fenceOverlays.push(new google.maps.Circle(style));
+                                } else {
+                                    style.paths = z.vertices;
+                                    fenceOverlays.push(new google.maps.Polygon(style));
+                                }
+                            });
+                        }
+
+                        // Fence drawing: 'polygon' collects clicks until finishFenceDraft(),
+                        // 'circle' takes the centre and then a point on the edge. The result
+                        // is handed to QML, which adds it through GeofenceManager.
+                        let fenceDrawMode = '';
+                        let fenceDraft = [];
+                        let fenceDraftLine = null;
+                        function setFenceDrawMode(mode) {
+                            fenceDrawMode = mode;
+                            fenceDraft = [];
+                            if (fenceDraftLine) {
+                                fenceDraftLine.setMap(null);
+                                fenceDraftLine = null;
+                            }
+                            if (mode && map) {
+                                fenceDraftLine = new google.maps.Polyline({
+                                    map: map, path: [], strokeColor: '#ffab00',
+                                    strokeWeight: 2, clickable: false
+                                });
+                            }
+                        }
+
+                        function addFenceDraftPoint(lat, lng) {
+                            fenceDraft.push({ lat: lat, lng: lng });
+                            if (fenceDraftLine) fenceDraftLine.getPath().push(new google.maps.LatLng(lat, lng));
+                            if (fenceDrawMode === 'circle' && fenceDraft.length === 2) {
+                                const c = fenceDraft[0];
+                                console.log("FENCE_CIRCLE:" + c.lat + "," + c.lng + "," + distanceMeters(c.lat, c.lng, lat, lng));
+                                setFenceDrawMode('');
+                            }
+                        }
+
+                        function finishFenceDraft() {
+                            if (fenceDrawMode === 'polygon' && fenceDraft.length >= 3) {
+                                console.log("FENCE_POLYGON:" + JSON.stringify(fenceDraft));
+                            } else if (fenceDrawMode === 'survey' && fenceDraft.length >= 3) {
+                                console.log("SURVEY_POLYGON:" + JSON.stringify(fenceDraft));
+                            }
+                            setFenceDrawMode('');
+                        }
+
+                        // Generated survey sorties, one colour per sortie
+                        let surveyOverlays = [];
+                        function setSurveyPaths(sorties) {
+                            const colours = ['#76ff03', '#ff4081', '#40c4ff', '#ffd740'];
+                            surveyOverlays.forEach(function(o) { o.setMap(null); });
+                            surveyOverlays = [];
+                            sorties.forEach(function(sortie, i) {
+                                surveyOverlays.push(new google.maps.Polyline({
+                                    map: map, clickable: false, strokeWeight: 2,
+                                    strokeColor: colours[i % colours.length],
+                                    path: sortie.map(function(wp) { return { lat: wp.x, lng: wp.y }; })
+                                }));
+                            });
+                        }
+
+                        function distanceMeters(lat1, lng1, lat2, lng2) {
+                            const rad = Math.PI / 180;
+                            const dLat = (lat2 - lat1) * rad;
+                            const dLng = (lng2 - lng1) * rad;
+                            const a = Math.sin(dLat / 2) * Math.sin(dLat / 2) +
+                                      Math.cos(lat1 * rad) * Math.cos(lat2 * rad) *
+                                      Math.sin(dLng / 2) * Math.sin(dLng / 2);
+                            return 6371000 * 2 * Math.atan2(Math.sqrt(a), Math.sqrt(1 - a));
+                        }
+
                         function showMarkerPopup(markerData) {
                             console.log("Marker clicked:", markerData);
                         }
@@ -739,6 +885,40 @@ Item {
             onJavaScriptConsoleMessage: function(level, message, lineNumber, sourceId) {
                 console.log("WebEngine:", message);
                 
+                // Map click in add-markers mode: the marker store adds it and sends a diff back
+                if (message.indexOf("MARKER_ADD:") === 0) {
+                    var coords = message.substring(11).split(",");
+                    root.addMarker(parseFloat(coords[0]), parseFloat(coords[1]), 10, 5);
+                    return;
+                }
+
+                // Finished fence drawing: add the zone to GeofenceManager
+                if (message.indexOf("FENCE_CIRCLE:") === 0) {
+                    var circle = message.substring(13).split(",");
+                    fenceDrawMode = "";
+                    if (typeof geofenceManager !== 'undefined' && geofenceManager) {
+                        geofenceManager.addCircle(parseFloat(circle[0]), parseFloat(circle[1]),
+                                                  parseFloat(circle[2]), !fenceExclusion);
+                    }
+                    return;
+                }
+                if (message.indexOf("FENCE_POLYGON:") === 0) {
+                    fenceDrawMode = "";
+                    if (typeof geofenceManager !== 'undefined' && geofenceManager) {
+                        geofenceManager.addPolygon(JSON.parse(message.substring(14)), !fenceExclusion);
+                    }
+                    return;
+                }
+
+                // Finished survey area: ask for the grid settings
+                if (message.indexOf("SURVEY_POLYGON:") === 0) {
+                    fenceDrawMode = "";
+                    surveyPopup.polygon = JSON.parse(message.substring(15));
+                    surveyPopup.status = surveyPopup.polygon.length + " vertices";
+                    surveyPopup.open();
+                    return;
+                }
+                
                 // ADDED: Handle map initialization notification
                 if (message.includes("Map initialized successfully")) {
                     mapInitialized = true
@@ -760,6 +940,18 @@ Item {
                 addMarkersMode = enabled;
             }
 
+            function setFenceDrawModeJS(mode) {
+                if (mode && addMarkersMode)
+                    setAddMarkersModeJS(false);
+                runJavaScript(`setFenceDrawMode('${mode}');`);
+                fenceDrawMode = mode;
+            }
+
+            function finishFenceDraftJS() {
+                runJavaScript("finishFenceDraft();");
+                fenceDrawMode = "";
+            }
+
             function centerOnDroneJS() {
                 if (root.currentLat && root.currentLon && !isNaN(root.currentLat) && !isNaN(root.currentLon)) {
                     runJavaScript(`centerOnDrone(${root.currentLat}, ${root.currentLon});`);
@@ -958,6 +1150,226 @@ Item {
             }
         }
 
+        // Geofence drawing: polygon (click vertices, then ✓), circle (centre, then edge)
+        Rectangle {
+            id: fenceControls
+            anchors.top: mapControls.bottom
+            anchors.right: parent.right
+            anchors.topMargin: 10
+            anchors.rightMargin: 15
+            width: 50
+            height: fenceColumn.implicitHeight + 16
+            color: "#1a1a1a"
+            radius: 8
+            border.color: "#404040"
+            border.width: 1
+            opacity: 0.9
+            visible: typeof geofenceManager !== 'undefined' && geofenceManager !== null
+
+            Column {
+                id: fenceColumn
+                anchors.centerIn: parent
+                spacing: 8
+
+                Repeater {
+                    model: [
+                        { action: "polygon", tip: "Draw fence polygon (click vertices, then ✓)" },
+                        { action: "circle", tip: "Draw fence circle (centre, then edge)" },
+                        { action: "exclusion", tip: "New zones: inclusion (keep in) / exclusion (keep out)" },
+                        { action: "upload", tip: "Upload fence to vehicle" },
+                        { action: "clear", tip: "Remove all fence zones" }
+                    ]
+
+                    Button {
+                        id: fenceBtn
+                        width: 35
+                        height: 35
+                        text: modelData.action === "polygon" ? (mapWebView.fenceDrawMode === "polygon" ? "✓" : "⬠") :
+                              modelData.action === "circle" ? "◯" :
+                              modelData.action === "exclusion" ? (mapWebView.fenceExclusion ? "⛔" : "🟢") :
+                              modelData.action === "upload" ? "⬆" : "🗑"
+                        property bool active: (modelData.action === "polygon" || modelData.action === "circle") &&
+                                              mapWebView.fenceDrawMode === modelData.action
+
+                        background: Rectangle {
+                            color: fenceBtn.active ? "#ffab00" :
+                                   (fenceBtn.pressed ? "#404040" : (fenceBtn.hovered ? "#303030" : "#2d2d2d"))
+                            radius: 6
+                            border.color: "#ffab00"
+                            border.width: 1
+                            Behavior on color { ColorAnimation { duration: 150 } }
+                        }
+
+                        contentItem: Text {
+                            text: fenceBtn.text
+                            font.pixelSize: 14
+                            color: "#ffffff"
+                            horizontalAlignment: Text.AlignHCenter
+                            verticalAlignment: Text.AlignVCenter
+                        }
+
+                        ToolTip.visible: hovered
+                        ToolTip.text: modelData.tip
+                        ToolTip.delay: 1000
+
+                        onClicked: root.fenceAction(modelData.action)
+                    }
+                }
+            }
+        }
+
+        // Survey grid: draw the area like a fence polygon, then generate and upload sorties
+        Rectangle {
+            id: surveyControls
+            anchors.top: fenceControls.visible ? fenceControls.bottom : mapControls.bottom
+            anchors.right: parent.right
+            anchors.topMargin: 10
+            anchors.rightMargin: 15
+            width: 50
+            height: surveyBtn.height + 16
+            color: "#1a1a1a"
+            radius: 8
+            border.color: "#404040"
+            border.width: 1
+            opacity: 0.9
+            visible: typeof surveyPlanner !== 'undefined' && surveyPlanner !== null
+
+            Button {
+                id: surveyBtn
+                anchors.centerIn: parent
+                width: 35
+                height: 35
+                text: mapWebView.fenceDrawMode === "survey" ? "✓" : "▦"
+                property bool active: mapWebView.fenceDrawMode === "survey"
+
+                background: Rectangle {
+                    color: surveyBtn.active ? "#76ff03" :
+                           (surveyBtn.pressed ? "#404040" : (surveyBtn.hovered ? "#303030" : "#2d2d2d"))
+                    radius: 6
+                    border.color: "#76ff03"
+                    border.width: 1
+                    Behavior on color { ColorAnimation { duration: 150 } }
+                }
+
+                contentItem: Text {
+                    text: surveyBtn.text
+                    font.pixelSize: 14
+                    color: "#ffffff"
+                    horizontalAlignment: Text.AlignHCenter
+                    verticalAlignment: Text.AlignVCenter
+                }
+
+                ToolTip.visible: hovered
+                ToolTip.text: "Draw survey area (click vertices, then ✓)"
+                ToolTip.delay: 1000
+
+                onClicked: root.surveyAction()
+            }
+        }
+
+    }
+
+    // Survey grid settings, result and per-sortie upload
+    Popup {
+        id: surveyPopup
+        width: 300
+        height: surveyColumn.implicitHeight + 30
+        x: (parent.width - width) / 2
+        y: (parent.height - height) / 2
+        modal: true
+        focus: true
+        closePolicy: Popup.CloseOnEscape | Popup.CloseOnPressOutside
+
+        property var polygon: []
+        property var result: null
+        property string status: ""
+
+        background: Rectangle {
+            color: theme.cardBackground
+            border.color: theme.accent
+            border.width: 2
+            radius: theme.borderRadius
+        }
+
+        contentItem: Column {
+            id: surveyColumn
+            spacing: 8
+            padding: 15
+
+            Text {
+                text: "Survey Grid"
+                font.pixelSize: 16
+                font.bold: true
+                color: theme.textPrimary
+            }
+
+            Repeater {
+                id: surveyFields
+                model: [
+                    { key: "spacing", label: "Swath width (m)", value: "20" },
+                    { key: "overlap", label: "Side overlap (%)", value: "20" },
+                    { key: "heading", label: "Line heading (°)", value: "0" },
+                    { key: "altitude", label: "Altitude (m)", value: "30" },
+                    { key: "endurance", label: "Endurance (min, 0 = one sortie)", value: "0" }
+                ]
+
+                Row {
+                    spacing: 8
+                    property alias value: surveyField.text
+
+                    Text {
+                        width: 170
+                        anchors.verticalCenter: parent.verticalCenter
+                        text: modelData.label
+                        font.pixelSize: 12
+                        color: theme.textPrimary
+                    }
+                    TextField {
+                        id: surveyField
+                        width: 90
+                        height: 30
+                        text: modelData.value
+                        validator: DoubleValidator { bottom: 0 }
+                        font.pixelSize: 12
+                        horizontalAlignment: Text.AlignHCenter
+                        color: theme.textPrimary
+                        background: Rectangle {
+                            color: "#2d2d2d"
+                            radius: 4
+                            border.color: theme.accent
+                            border.width: 1
+                        }
+                    }
+                }
+            }
+
+            Button {
+                text: "Generate"
+                width: 260
+                onClicked: root.generateSurvey()
+            }
+
+            Text {
+                width: 260
+                text: surveyPopup.status
+                wrapMode: Text.Wrap
+                font.pixelSize: 12
+                color: theme.textPrimary
+            }
+
+            Repeater {
+                model: surveyPopup.result ? surveyPopup.result.sorties.length : 0
+
+                Button {
+                    width: 260
+                    text: "Upload sortie " + (index + 1) + " (" + surveyPopup.result.sorties[index].length + " waypoints)"
+                    onClicked: {
+                        if (surveyPlanner.uploadSortie(index))
+                            surveyPopup.status = "Uploading sortie " + (index + 1) + "...";
+                    }
+                }
+            }
+        }
     }
     
     // Marker Popup
@@ -1164,7 +1576,7 @@ Item {
                 background: Rectangle { color: theme.error; radius: 4 }
                 onClicked: {
                     if (markerPopup.markerIndex >= 0) {
-                        mapWebView.deleteMarkerJS(markerPopup.markerIndex);
+                        root.deleteMarker(markerPopup.markerIndex);
                         markerPopup.close();
                     }
                 }
@@ -1172,19 +1584,96 @@ Item {
         }
     }
 
+    // Marker edits go through mapBridge, which answers with batched diffs
+    Connections {
+        target: typeof mapBridge !== 'undefined' ? mapBridge : null
+        function onMarkerDiff(opsJson) {
+            mapWebView.runJavaScript("applyMarkerDiff(" + opsJson + ");");
+        }
+    }
+
+    Connections {
+        target: typeof surveyPlanner !== 'undefined' ? surveyPlanner : null
+        function onSurveyGenerated(result) {
+            surveyPopup.result = result;
+            surveyPopup.status = result.lines + " lines, " + (result.length / 1000).toFixed(2) + " km, " +
+                                 result.sorties.length + " sortie(s)";
+            mapWebView.runJavaScript("setSurveyPaths(" + JSON.stringify(result.sorties) + ");");
+        }
+        function onSurveyError(message) {
+            surveyPopup.result = null;
+            surveyPopup.status = message;
+            mapWebView.runJavaScript("setSurveyPaths([]);");
+        }
+    }
+
+    Connections {
+        target: typeof geofenceManager !== 'undefined' ? geofenceManager : null
+        function onZonesChanged() {
+            mapWebView.runJavaScript("setFenceZones(" + JSON.stringify(geofenceManager.zones()) + ");");
+        }
+    }
+
     // JavaScript functions for external access
     function addMarker(lat, lon, altitude, speed) {
-        mapWebView.addMarkerJS(lat, lon, altitude || 10, speed || 5);
+        if (typeof mapBridge !== 'undefined' && mapBridge) {
+            mapBridge.addMarker(lat, lon, altitude || 10, speed || 5);
+        } else {
+            mapWebView.addMarkerJS(lat, lon, altitude || 10, speed || 5);
+        }
     }
 
     function deleteMarker(index) {
-        mapWebView.deleteMarkerJS(index);
+        if (typeof mapBridge !== 'undefined' && mapBridge) {
+            mapBridge.deleteMarker(index);
+        } else {
+            mapWebView.deleteMarkerJS(index);
+        }
     }
 
     function setAddMarkersMode(enabled) {
         mapWebView.setAddMarkersModeJS(enabled);
     }
 
+    function surveyAction() {
+        if (mapWebView.fenceDrawMode === "survey")
+            mapWebView.finishFenceDraftJS();
+        else
+            mapWebView.setFenceDrawModeJS("survey");
+    }
+
+    function generateSurvey() {
+        var values = {};
+        for (var i = 0; i < surveyFields.count; i++)
+            values[surveyFields.model[i].key] = parseFloat(surveyFields.itemAt(i).value) || 0;
+        surveyPlanner.generate(surveyPopup.polygon, values.spacing, values.heading, values.overlap,
+                               values.altitude, { enduranceMinutes: values.endurance });
+    }
+
+    function fenceAction(action) {
+        switch (action) {
+        case "polygon":
+            if (mapWebView.fenceDrawMode === "polygon")
+                mapWebView.finishFenceDraftJS();
+            else
+                mapWebView.setFenceDrawModeJS("polygon");
+            break;
+        case "circle":
+            mapWebView.setFenceDrawModeJS(mapWebView.fenceDrawMode === "circle" ? "" : "circle");
+            break;
+        case "exclusion":
+            mapWebView.fenceExclusion = !mapWebView.fenceExclusion;
+            break;
+        case "upload":
+            geofenceManager.uploadFence();
+            break;
+        case "clear":
+            mapWebView.setFenceDrawModeJS("");
+            geofenceManager.clearZones();
+            break;
+        }
+    }
+
     function centerOnDrone() {
         mapWebView.centerOnDroneJS();
     }
@@ -1201,6 +1690,12 @@ Item {
     function receiveMarkersFromNavigation(markersData) {
         console.log("MapView: Received " + markersData.length + " markers from NavigationControls");
         
+        if (typeof mapBridge !== 'undefined' && mapBridge) {
+            // One reset diff instead of a clear plus one runJavaScript per marker
+            mapBridge.setMarkers(markersData || []);
+            return;
+        }
+        
         if (!markersData || markersData.length === 0) {
             clearAllMarkers();
             return;
@@ -1221,6 +1716,10 @@ Item {
     }
     
     function clearAllMarkers() {
-        mapWebView.runJavaScript("clearAllMarkers();");
+        if (typeof mapBridge !== 'undefined' && mapBridge) {
+            mapBridge.clearMarkers();
+        } else {
+            mapWebView.runJavaScript("clearAllMarkers();");
+        }
     }
 }
\ No newline at end of file
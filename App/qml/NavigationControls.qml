@@ -19,6 +19,8 @@ ApplicationWindow {
     property var waypoints: []
     property bool isDragging: false
     property var pendingWaypointData: ""  // ✅ Correct
+    property var pendingUpload: null  // waypoints shown once the mission upload completes
+    property var loadedFileMarkers: null  // markers parsed from the selected waypoints file
 
     QtObject {
         id: theme
@@ -84,13 +86,23 @@ FileDialog {
         console.log("📂 Selected file:", path);
         selectedFileText.text = path;
 
-        // Load file content immediately
-        var content = waypointsSaver.load_file(path);
-        if (content && content.length > 0) {
-            loadDataInput.text = content;  // show content in text box for confirmation
+        // Parse and validate in Python (QGC WPL 110 or our JSON export)
+        var result = waypointsSaver.load_waypoints(path);
+        if (result.ok && result.count > 0) {
+            // Typed markers from Python; "Load" adds them without going through JSON
+            loadedFileMarkers = result.markers;
+            loadDataInput.text = "";
+            selectedFileText.text = path + " (" + result.count + " waypoints)";
+            if (result.errors.length > 0) {
+                statusNotification.color = theme.error;
+                statusNotification.children[0].text = "⚠️ " + result.errors.length + " invalid rows skipped (" + result.errors[0] + ")";
+                mainWindow.statusNotification.opacity = 1;
+                statusNotificationTimer.restart();
+            }
         } else {
+            loadedFileMarkers = null;
             statusNotification.color = theme.error;
-            statusNotification.children[0].text = "⚠️ Failed to read file.";
+            statusNotification.children[0].text = "⚠️ Failed to read file." + (result.errors.length > 0 ? " " + result.errors[0] : "");
             mainWindow.statusNotification.opacity = 1;
 
             statusNotificationTimer.restart();
@@ -727,7 +739,7 @@ function addMarker(lat, lng, altitude = 10, speed = 5, commandType = 'waypoint',
     };
 
     markers.push(markerData);
-    updateRoutePath();
+    routePath.getPath().push(position);
     
     // This tells QML that a marker was added
     console.log("Marker added at: " + lat + ", " + lng);
@@ -742,7 +754,8 @@ function addMarker(lat, lng, altitude = 10, speed = 5, commandType = 'waypoint',
         const pos = marker.getPosition();
         markerData.lat = pos.lat();
         markerData.lng = pos.lng();
-        updateRoutePath();
+        // Move just this vertex instead of rebuilding the whole polyline
+        routePath.getPath().setAt(markerData.index, pos);
     });
 
     marker.addListener('dragend', function() {
@@ -752,8 +765,11 @@ function addMarker(lat, lng, altitude = 10, speed = 5, commandType = 'waypoint',
         markerData.lat = pos.lat();
         markerData.lng = pos.lng();
         
-        console.log('Waypoint ' + (markerIndex + 1) + ' moved to: ' + 
+        console.log('Waypoint ' + (markerData.index + 1) + ' moved to: ' + 
                   pos.lat().toFixed(6) + ', ' + pos.lng().toFixed(6));
+        // Parsed by onJavaScriptConsoleMessage to update the mission analytics
+        console.log('Marker moved: ' + markerData.index + ', ' + markerData.lat + ', ' +
+                  markerData.lng + ', ' + markerData.altitude);
     });
 
     marker.addListener('click', function() {
@@ -791,9 +807,11 @@ function deleteMarker(index) {
     if (index >= 0 && index < markers.length) {
         markers[index].marker.setMap(null);
         markers.splice(index, 1);
+        routePath.getPath().removeAt(index);
         
-        // Update all remaining markers with correct letters and indices
+        // Only markers after the deleted one change letters and indices
         markers.forEach((markerData, i) => {
+            if (i < index) return;
             markerData.index = i;
             
             // Determine new letter and title
@@ -833,8 +851,6 @@ function deleteMarker(index) {
             markerData.marker.setTitle(markerTitle);
         });
         
-        updateRoutePath();
-        
         // This tells QML that a marker was deleted
         console.log("Marker deleted at index: " + index);
     }
@@ -973,6 +989,18 @@ onJavaScriptConsoleMessage: function(level, message, lineNumber, sourceId) {
         });
     }
     
+    // Dragged marker: move it in place instead of re-sending every waypoint
+    if (message.startsWith("Marker moved:")) {
+        var moved = message.split(": ")[1].split(", ");
+        var movedIndex = parseInt(moved[0]);
+        var movedLat = parseFloat(moved[1]);
+        var movedLng = parseFloat(moved[2]);
+        var movedAlt = parseFloat(moved[3]) || 10;
+        if (typeof navigationAnalytics !== 'undefined' && navigationAnalytics) {
+            navigationAnalytics.moveWaypoint(movedIndex, movedLat, movedLng, movedAlt);
+        }
+    }
+
     // Listen for marker deletion from JavaScript
     if (message.startsWith("Marker deleted at index:") || message === "All markers cleared") {
         Qt.callLater(function() {
@@ -1238,12 +1266,17 @@ Popup {
                     verticalAlignment: Text.AlignVCenter
                 }
                 onClicked: {
-                    if (loadDataInput.text.trim() !== "") {
+                    if (loadedFileMarkers && loadDataInput.text.trim() === "") {
+                        addLoadedMarkers(loadedFileMarkers);
+                    } else if (loadDataInput.text.trim() !== "") {
                         loadWaypointsData(loadDataInput.text);
-                        loadWaypointsPopup.close();
-                        loadDataInput.text = "";
-                        selectedFileText.text = "No file selected";
+                    } else {
+                        return;
                     }
+                    loadWaypointsPopup.close();
+                    loadedFileMarkers = null;
+                    loadDataInput.text = "";
+                    selectedFileText.text = "No file selected";
                 }
             }
             
@@ -1265,6 +1298,7 @@ Popup {
                 }
                 onClicked: {
                     loadWaypointsPopup.close();
+                    loadedFileMarkers = null;
                     loadDataInput.text = "";
                     selectedFileText.text = "No file selected";
                 }
@@ -1711,6 +1745,64 @@ WeatherDashboard {
     z: 100
 }
 
+// Mission totals from the analytics model (distance, ETA, climb, energy)
+Rectangle {
+    id: missionTotalsPanel
+    property bool hasAnalytics: typeof navigationAnalytics !== 'undefined' && navigationAnalytics !== null
+    anchors.right: waypointDashboard.right
+    anchors.top: waypointDashboard.bottom
+    anchors.topMargin: 10
+    width: missionTotalsRow.implicitWidth + 24
+    height: 36
+    radius: theme.borderRadius
+    color: theme.cardBackground
+    border.color: theme.border
+    border.width: 1
+    visible: waypointDashboard.visible && hasAnalytics && navigationAnalytics.totalDistance > 0
+    z: 100
+
+    function formatDuration(seconds) {
+        var total = Math.round(seconds);
+        var minutes = Math.floor(total / 60);
+        var secs = total % 60;
+        return minutes + ":" + (secs < 10 ? "0" : "") + secs;
+    }
+
+    Row {
+        id: missionTotalsRow
+        anchors.centerIn: parent
+        spacing: 14
+
+        Text {
+            text: missionTotalsPanel.hasAnalytics ?
+                  (navigationAnalytics.totalDistance < 1000 ?
+                   "📏 " + navigationAnalytics.totalDistance.toFixed(0) + " m" :
+                   "📏 " + (navigationAnalytics.totalDistance / 1000).toFixed(2) + " km") : ""
+            color: theme.textPrimary
+            font.pixelSize: 12
+        }
+        Text {
+            text: missionTotalsPanel.hasAnalytics ?
+                  "⏱ " + missionTotalsPanel.formatDuration(navigationAnalytics.totalTime) : ""
+            color: theme.textPrimary
+            font.pixelSize: 12
+        }
+        Text {
+            text: missionTotalsPanel.hasAnalytics ?
+                  "⬆ " + navigationAnalytics.totalClimb.toFixed(0) + " m  ⬇ " +
+                  navigationAnalytics.totalDescent.toFixed(0) + " m" : ""
+            color: theme.textSecondary
+            font.pixelSize: 12
+        }
+        Text {
+            text: missionTotalsPanel.hasAnalytics ?
+                  "🔋 " + navigationAnalytics.energyWh.toFixed(1) + " Wh" : ""
+            color: theme.textSecondary
+            font.pixelSize: 12
+        }
+    }
+}
+
    // Updated Sidebar with language translations
 Drawer {
     id: sidebar
@@ -2397,6 +2489,9 @@ function updateWaypointDashboard() {
                     
                     // Force the dashboard to completely refresh by hiding and showing
                     waypointDashboard.updateWaypoints(markersData);
+                    if (typeof navigationAnalytics !== 'undefined' && navigationAnalytics) {
+                        navigationAnalytics.setWaypoints(markersData);
+                    }
                     
                     // Force a visual refresh by temporarily changing a property
                     var currentExpanded = waypointDashboard.expanded;
@@ -2543,30 +2638,22 @@ function sendMarkers() {
                 return;
             }
 
+            if (typeof navigationAnalytics !== 'undefined' && navigationAnalytics) {
+                navigationAnalytics.setWaypoints(markersData);
+            }
+
             try {
-                var uploadResult = droneCommander.uploadMission(waypoints);
+                // The transfer runs in the background; the popups are opened
+                // by onMissionUploadSuccess / onMissionUploadFailed below
+                pendingUpload = { waypoints: waypointsWithDistance, markers: markersData };
+                var uploadResult = droneCommander.updateMission(waypoints);
                 
                 if (uploadResult === false || uploadResult === null) {
+                    pendingUpload = null;
                     throw new Error("Mission upload returned false");
                 }
                 
-                // Populate the list model and show success popup
-                uploadWaypointListModel.clear();
-                missionUploadSuccessPopup.waypointsData = waypointsWithDistance;
-
-                for (var j = 0; j < waypointsWithDistance.length; j++) {
-                    uploadWaypointListModel.append(waypointsWithDistance[j]);
-                }
-                
-                missionUploadSuccessPopup.waypointCount = markersData.length;
-                missionUploadSuccessPopup.open();
-                
-                console.log("✅ Mission uploaded successfully: " + markersData.length + " waypoints");
-                
-                if (typeof mapViewInstance !== 'undefined' && mapViewInstance) {
-                    console.log("Sending markers to MapView...");
-                    mapViewInstance.receiveMarkersFromNavigation(markersData);
-                }
+                console.log("⏳ Mission upload started: " + markersData.length + " waypoints");
                 
             } catch (uploadError) {
                 console.log("❌ Upload failed:", uploadError);
@@ -2723,40 +2810,45 @@ function saveWaypointsData(filename) {
 // ===============================
 // LOAD WAYPOINTS DATA (Mission Planner style)
 // ===============================
+// Replace the map markers with a list of {lat, lng, altitude, speed, commandType, holdTime}
+function addLoadedMarkers(waypoints) {
+    // Clear and add markers to map
+    if (typeof mapWebView !== "undefined" && mapWebView.clearAllMarkersJS)
+        mapWebView.clearAllMarkersJS();
+
+    if (typeof mapWebView !== "undefined" && mapWebView.addMarkerJS) {
+        for (var i = 0; i < waypoints.length; i++) {
+            var wp = waypoints[i];
+            mapWebView.addMarkerJS(
+                wp.lat,
+                wp.lng,
+                wp.altitude || 10,
+                wp.speed || 5,
+                wp.commandType || "waypoint",
+                wp.holdTime || 0
+            );
+        }
+    }
+
+    // Optional: refresh map display
+    if (typeof mapWebView !== "undefined")
+        mapWebView.runJavaScript("refreshMap && refreshMap();");
+
+    console.log("✅ Loaded " + waypoints.length + " waypoints");
+    statusNotification.color = theme.success;
+    statusNotification.children[0].text = "✅ Loaded " + waypoints.length + " waypoints!";
+    mainWindow.statusNotification.opacity = 1;
+
+    statusNotificationTimer.restart();
+}
+
 function loadWaypointsData(jsonString) {
     try {
         var waypointsData = JSON.parse(jsonString);
         if (!waypointsData.waypoints || !Array.isArray(waypointsData.waypoints))
             throw new Error("Invalid format");
 
-        // Clear and add markers to map
-        if (typeof mapWebView !== "undefined" && mapWebView.clearAllMarkersJS)
-            mapWebView.clearAllMarkersJS();
-
-        if (typeof mapWebView !== "undefined" && mapWebView.addMarkerJS) {
-            for (var i = 0; i < waypointsData.waypoints.length; i++) {
-                var wp = waypointsData.waypoints[i];
-                mapWebView.addMarkerJS(
-                    wp.lat,
-                    wp.lng,
-                    wp.altitude || 10,
-                    wp.speed || 5,
-                    wp.commandType || "waypoint",
-                    wp.holdTime || 0
-                );
-            }
-        }
-
-        // Optional: refresh map display
-        if (typeof mapWebView !== "undefined")
-            mapWebView.runJavaScript("refreshMap && refreshMap();");
-
-        console.log("✅ Loaded " + waypointsData.waypoints.length + " waypoints");
-        statusNotification.color = theme.success;
-        statusNotification.children[0].text = "✅ Loaded " + waypointsData.waypoints.length + " waypoints!";
-        mainWindow.statusNotification.opacity = 1;
-
-        statusNotificationTimer.restart();
+        addLoadedMarkers(waypointsData.waypoints);
 
     } catch (err) {
         console.log("❌ Error loading waypoints:", err);
@@ -2877,13 +2969,38 @@ Connections {
     
     // If droneCommander emits missionUploadSuccess signal
     function onMissionUploadSuccess(waypointCount) {
-        uploadSuccessPopup.waypointCount = waypointCount;
-        uploadSuccessPopup.open();
+        var upload = pendingUpload;
+        pendingUpload = null;
+        if (!upload) {
+            uploadSuccessPopup.waypointCount = waypointCount;
+            uploadSuccessPopup.open();
+            return;
+        }
+
+        // Populate the list model and show success popup
+        uploadWaypointListModel.clear();
+        missionUploadSuccessPopup.waypointsData = upload.waypoints;
+
+        for (var j = 0; j < upload.waypoints.length; j++) {
+            uploadWaypointListModel.append(upload.waypoints[j]);
+        }
+
+        missionUploadSuccessPopup.waypointCount = upload.markers.length;
+        missionUploadSuccessPopup.open();
+
+        console.log("✅ Mission uploaded successfully: " + upload.markers.length + " waypoints");
+
+        if (typeof mapViewInstance !== 'undefined' && mapViewInstance) {
+            console.log("Sending markers to MapView...");
+            mapViewInstance.receiveMarkersFromNavigation(upload.markers);
+        }
     }
     
     // If droneCommander emits missionUploadFailed signal
     function onMissionUploadFailed(errorMsg) {
-        uploadErrorPopup.errorMessage = "Upload failed:\n" + errorMsg;
+        pendingUpload = null;
+        uploadErrorPopup.errorMessage = "Upload failed:\n" + errorMsg +
+            "\n\nPlease check:\n• Drone connection\n• Telemetry link\n• Flight controller status";
         uploadErrorPopup.open();
     }
 }
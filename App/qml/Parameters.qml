@@ -4,6 +4,7 @@ import QtQuick.Layouts 1.15
 import QtQuick.Window 2.15
 import QtQuick.Controls.Material 2.15
 import Qt.labs.qmlmodels 1.0
+import Qt.labs.platform 1.1 as Platform
 
 ApplicationWindow {
     id: parametersWindowRoot
@@ -64,6 +65,169 @@ ApplicationWindow {
         }
     }
 
+    Platform.FileDialog {
+        id: loadParamFileDialog
+        title: "Load Parameter File"
+        fileMode: Platform.FileDialog.OpenFile
+        nameFilters: ["Parameter Files (*.param *.params *.parm)", "All Files (*)"]
+        folder: Platform.StandardPaths.writableLocation(Platform.StandardPaths.DocumentsLocation)
+        onAccepted: {
+            var path = file.toString().replace("file://", "");
+            applyParameterFile(path);
+        }
+    }
+
+    Platform.MessageDialog {
+        id: applyParamFileDialog
+        property string path: ""
+        title: "Apply Parameter File"
+        buttons: Platform.MessageDialog.Ok | Platform.MessageDialog.Cancel
+        onOkClicked: startParameterFileWrite(path)
+    }
+
+    // Per-airframe preset library: save the vehicle's parameters, apply a stored version
+    property var presetVersionList: []
+
+    Popup {
+        id: presetPopup
+        modal: true
+        focus: true
+        width: 420
+        x: (parametersWindowRoot.width - width) / 2
+        y: (parametersWindowRoot.height - height) / 2
+        padding: 16
+
+        ColumnLayout {
+            anchors.fill: parent
+            spacing: 8
+
+            Label {
+                text: "Airframe Presets"
+                font.pixelSize: 14
+                font.bold: true
+            }
+
+            RowLayout {
+                spacing: 8
+                ComboBox {
+                    id: presetAirframeCombo
+                    Layout.fillWidth: true
+                    model: presetManager.airframes
+                    onActivated: refreshPresetVersions()
+                }
+                ComboBox {
+                    id: presetCubeCombo
+                    Layout.fillWidth: true
+                    model: ["CubeOrange", "CubeOrangePlus"]
+                    onActivated: refreshPresetVersions()
+                }
+            }
+
+            ComboBox {
+                id: presetVersionCombo
+                Layout.fillWidth: true
+                model: parametersWindowRoot.presetVersionList
+                textRole: "text"
+                enabled: count > 0
+                displayText: count > 0 ? currentText : "No saved versions"
+            }
+
+            RowLayout {
+                spacing: 8
+                TextField {
+                    id: presetLabelField
+                    Layout.fillWidth: true
+                    placeholderText: "Label for new version"
+                    font.pixelSize: 11
+                }
+                Button {
+                    text: "Save from Vehicle"
+                    font.pixelSize: 10
+                    enabled: parametersWindowRoot.isDroneConnected
+                    onClicked: {
+                        presetManager.savePresetFromVehicle(presetAirframeCombo.currentText,
+                                                            presetCubeCombo.currentText,
+                                                            presetLabelField.text);
+                        presetLabelField.text = "";
+                    }
+                }
+            }
+
+            RowLayout {
+                spacing: 8
+                Label {
+                    id: presetStatusLabel
+                    Layout.fillWidth: true
+                    font.pixelSize: 10
+                    color: "#666666"
+                    wrapMode: Text.WordWrap
+                }
+                Button {
+                    text: "Apply"
+                    font.pixelSize: 10
+                    enabled: parametersWindowRoot.isDroneConnected && presetVersionCombo.count > 0
+                    onClicked: previewPresetApply()
+                }
+                Button {
+                    text: "Close"
+                    font.pixelSize: 10
+                    onClicked: presetPopup.close()
+                }
+            }
+        }
+    }
+
+    Connections {
+        target: presetManager
+        function onPresetsChanged() {
+            refreshPresetVersions();
+        }
+        function onPresetStatus(message) {
+            presetStatusLabel.text = message;
+        }
+    }
+
+    Platform.MessageDialog {
+        id: applyPresetDialog
+        property int version: -1
+        title: "Apply Preset"
+        buttons: Platform.MessageDialog.Ok | Platform.MessageDialog.Cancel
+        onOkClicked: {
+            isUpdatingParameter = true;
+            if (!presetManager.applyPreset(presetAirframeCombo.currentText, presetCubeCombo.currentText, version)) {
+                isUpdatingParameter = false;
+                showNotification("Could not start preset write", false);
+            } else {
+                presetPopup.close();
+            }
+        }
+    }
+
+    Platform.FileDialog {
+        id: saveParamFileDialog
+        title: "Save Parameter File"
+        fileMode: Platform.FileDialog.SaveFile
+        nameFilters: ["Mission Planner (*.param)", "QGroundControl (*.params)"]
+        defaultSuffix: "param"
+        folder: Platform.StandardPaths.writableLocation(Platform.StandardPaths.DocumentsLocation)
+        onAccepted: {
+            var path = file.toString().replace("file://", "");
+            var fmt = path.endsWith(".params") ? "qgc" : "mission_planner";
+            var ok = droneCommander.exportParameterFile(path, fmt);
+            showNotification(ok ? "Parameters saved to " + path : "Error saving parameters!", ok);
+        }
+    }
+
+    Connections {
+        target: droneCommander
+        function onParameterBatchCompleted(success, message) {
+            isUpdatingParameter = false;
+            allParameters = droneCommander.parameters;
+            filterParameters();
+            showNotification(message, success);
+        }
+    }
+
     // Main layout
     ColumnLayout {
         anchors.fill: parent
@@ -534,6 +698,25 @@ ApplicationWindow {
                     }
                 }
 
+                Button {
+                    text: "Presets"
+                    Layout.preferredHeight: 25
+                    Layout.preferredWidth: 120
+                    font.pixelSize: 10
+                    enabled: !parametersWindowRoot.isUpdatingParameter
+                    onClicked: {
+                        refreshPresetVersions();
+                        presetPopup.open();
+                    }
+                    
+                    background: Rectangle {
+                        color: parent.enabled ? (parent.pressed ? "#e0e0e0" : (parent.hovered ? "#f0f0f0" : "#ffffff")) : "#f5f5f5"
+                        border.color: "#cccccc"
+                        border.width: 1
+                        radius: 2
+                    }
+                }
+
                 Item { Layout.fillWidth: true }
 
                 Label {
@@ -1100,20 +1283,32 @@ ApplicationWindow {
             updateModel(allParameters);
             return;
         }
+
+        // Ranked lookup from the Python search index once parameters are loaded
+        if (droneCommander.indexedParameterCount > 0) {
+            var names = droneCommander.searchParameters(searchText, 0);
+            var ranked = [];
+            for (var i = 0; i < names.length; i++) {
+                if (allParameters[names[i]]) {
+                    ranked.push(allParameters[names[i]]);
+                }
+            }
+            updateModel(ranked);
+            return;
+        }
+
         var parametersArray = Object.values(allParameters);
-        
+
         var filtered = parametersArray.filter(function(p) {
             return p.name && p.name.toLowerCase().includes(searchText);
         });
-        
+
         updateModel(filtered);
     }
 
     function updateParameterUI(paramName, newValue, modelIndex) {
-        console.log("UI Demo: Updating parameter " + paramName + " to " + newValue);
-        
-        isUpdatingParameter = true;
-        
+        console.log("Parameter edited: " + paramName + " -> " + newValue);
+
         var currentItem = paramModel.get(modelIndex);
         paramModel.set(modelIndex, {
             "name": currentItem.name,
@@ -1126,107 +1321,123 @@ ApplicationWindow {
             "range": currentItem.range
         });
 
-        var updateTimer = Qt.createQmlObject('import QtQuick 2.15; Timer {}', parametersWindowRoot);
-        updateTimer.interval = 1500;
-        updateTimer.repeat = false;
-        updateTimer.triggered.connect(function() {
-            isUpdatingParameter = false;
-            
-            var currentItem = paramModel.get(modelIndex);
-            paramModel.set(modelIndex, {
-                "name": currentItem.name,
-                "value": currentItem.value,
-                "type": currentItem.type,
-                "description": currentItem.description,
-                "synced": true,
-                "default": currentItem.default,
-                "units": currentItem.units,
-                "range": currentItem.range
-            });
-            
-            statusNotification.color = "#10B981";
-            statusNotification.children[0].text = "Parameter '" + paramName + "' updated successfully!";
-            statusNotification.opacity = 1;
-            hideNotificationTimer.restart();
-            
-            updateTimer.destroy();
-        });
-        updateTimer.start();
+        // Row stays unsynced until "Write Params" confirms it on the vehicle
+    }
+
+    function showNotification(text, success) {
+        statusNotification.color = success ? "#10B981" : "#EF4444";
+        statusNotification.children[0].text = text;
+        statusNotification.opacity = 1;
+        hideNotificationTimer.restart();
     }
 
     function sendAllParametersUI() {
-        console.log("UI Demo: Sending all parameters to drone...");
-        
+        // Only rows edited since the last sync; the backend skips values the vehicle already has
+        var pending = [];
+        for (let i = 0; i < paramModel.count; i++) {
+            let p = paramModel.get(i);
+            if (!p.synced) {
+                pending.push({ "name": p.name, "value": p.value });
+            }
+        }
+
+        if (pending.length === 0) {
+            showNotification("No modified parameters to write", true);
+            return;
+        }
+
         isUpdatingParameter = true;
-        
-        var sendTimer = Qt.createQmlObject('import QtQuick 2.15; Timer {}', parametersWindowRoot);
-        sendTimer.interval = 2000;
-        sendTimer.repeat = false;
-        sendTimer.triggered.connect(function() {
+        if (!droneCommander.writeParameters(pending)) {
             isUpdatingParameter = false;
-            
-            for (let i = 0; i < paramModel.count; i++) {
-                let currentItem = paramModel.get(i);
-                paramModel.set(i, {
-                    "name": currentItem.name,
-                    "value": currentItem.value,
-                    "type": currentItem.type,
-                    "description": currentItem.description,
-                    "synced": true,
-                    "default": currentItem.default,
-                    "units": currentItem.units,
-                    "range": currentItem.range
-                });
-            }
-            
-            statusNotification.color = "#10B981";
-            statusNotification.children[0].text = "All parameters sent to drone successfully!";
-            statusNotification.opacity = 1;
-            hideNotificationTimer.restart();
-            
-            sendTimer.destroy();
-        });
-        sendTimer.start();
+            showNotification("Could not start parameter write", false);
+        }
+    }
+
+    function applyParameterFile(path) {
+        var preview = droneCommander.previewParameterFile(path);
+        if (preview.errors.length > 0) {
+            console.log("Parameter file warnings:", JSON.stringify(preview.errors));
+        }
+        console.log("Parameter file diff: " + preview.changed.length + " changed, " +
+                    preview.unchanged + " unchanged, " + preview.missing.length + " unknown");
+
+        if (preview.changed.length === 0) {
+            showNotification("Vehicle already matches " + path, true);
+            return;
+        }
+
+        // Show what will change and wait for the user before writing anything
+        var lines = [];
+        for (var i = 0; i < preview.changed.length && i < 50; i++) {
+            var change = preview.changed[i];
+            lines.push(change.name + ": " + change.current + " -> " + change.value);
+        }
+        if (preview.changed.length > 50) {
+            lines.push("... and " + (preview.changed.length - 50) + " more");
+        }
+        applyParamFileDialog.path = path;
+        applyParamFileDialog.text = "Write " + preview.changed.length + " changed parameters to the vehicle?";
+        applyParamFileDialog.informativeText = preview.unchanged + " already match, " +
+                                               preview.missing.length + " not on this vehicle.";
+        applyParamFileDialog.detailedText = lines.join("\n");
+        applyParamFileDialog.open();
+    }
+
+    function startParameterFileWrite(path) {
+        isUpdatingParameter = true;
+        if (!droneCommander.applyParameterFile(path)) {
+            isUpdatingParameter = false;
+            showNotification("Could not start parameter write", false);
+        }
     }
 
     function saveParameters() {
-        console.log("UI Demo: Saving parameters to file...");
-        
-        var paramData = "";
-        var timestamp = new Date().toISOString().replace(/[:.]/g, '-').split('T')[0];
-        
-        paramData += "# Drone Parameters Configuration\n";
-        paramData += "# Generated on: " + new Date().toLocaleString() + "\n";
-        paramData += "# Total parameters: " + paramModel.count + "\n\n";
-        
-        for (let i = 0; i < paramModel.count; i++) {
-            let p = paramModel.get(i);
-            paramData += p.name + "," + p.value + "\n";
+        loadParamFileDialog.open();
+    }
+
+    function refreshPresetVersions() {
+        var versions = presetManager.presetVersions(presetAirframeCombo.currentText, presetCubeCombo.currentText);
+        var items = [];
+        // Newest first
+        for (var i = versions.length - 1; i >= 0; i--) {
+            var v = versions[i];
+            items.push({ "text": "v" + v.number + (v.label ? " " + v.label : "") + "  (" + v.created + ", " + v.count + " params)",
+                         "number": v.number });
         }
+        presetVersionList = items;
+    }
 
-        statusNotification.color = "#10B981";
-        statusNotification.children[0].text = "Parameters saved to file (UI Demo)";
-        statusNotification.opacity = 1;
-        hideNotificationTimer.restart();
-        
-        console.log("Parameters data:\n" + paramData);
+    function previewPresetApply() {
+        var selected = presetVersionList[presetVersionCombo.currentIndex];
+        var preview = presetManager.previewPreset(presetAirframeCombo.currentText, presetCubeCombo.currentText,
+                                                  selected ? selected.number : -1);
+        if (preview.error) {
+            presetStatusLabel.text = preview.error;
+            return;
+        }
+        if (preview.changed.length === 0) {
+            presetStatusLabel.text = "Vehicle already matches v" + preview.version;
+            return;
+        }
+        var lines = [];
+        for (var i = 0; i < preview.changed.length && i < 50; i++) {
+            var change = preview.changed[i];
+            lines.push(change.name + ": " + change.current + " -> " + change.value);
+        }
+        if (preview.changed.length > 50) {
+            lines.push("... and " + (preview.changed.length - 50) + " more");
+        }
+        applyPresetDialog.version = preview.version;
+        applyPresetDialog.text = "Write " + preview.changed.length + " parameters from " +
+                                 presetAirframeCombo.currentText + " v" + preview.version + "?";
+        applyPresetDialog.informativeText = preview.unchanged + " already match, " +
+                                            preview.missing.length + " not on this vehicle.";
+        applyPresetDialog.detailedText = lines.join("\n");
+        applyPresetDialog.open();
     }
 
     function exportParameters() {
-        console.log("UI Demo: Exporting parameters...");
-        
-        var data = {};
-        for (let i = 0; i < paramModel.count; i++) {
-            let p = paramModel.get(i);
-            data[p.name] = parseFloat(p.value);
-        }
-        
-        statusNotification.color = "#10B981";
-        statusNotification.children[0].text = "Parameters exported successfully (UI Demo)";
-        statusNotification.opacity = 1;
-        hideNotificationTimer.restart();
-        
-        console.log("Exported data:", JSON.stringify(data, null, 2));
+        saveParamFileDialog.open();
     }
 
     onClosing: {
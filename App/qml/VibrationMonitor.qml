@@ -15,6 +15,7 @@
 //
 
 import QtQuick 2.15
+import QtQuick.Controls 2.15
 
 
 Rectangle {
@@ -40,6 +41,7 @@ Rectangle {
     property color normalColor: "#32af4f"
     property color warnColor: "orange"
     property color failColor: "red"
+    property var vibration: typeof vibrationService !== "undefined" ? vibrationService : null
 
     Row {
         anchors.rightMargin: 10
@@ -130,6 +132,56 @@ Rectangle {
                 text: "Red = FAIL"
             }
         }
+
+        // RAW_IMU spectrum: start/stop capture, strongest peaks and the notch it suggests
+        Column {
+            width: 170
+            spacing: 4
+            anchors.verticalCenter: parent.verticalCenter
+            visible: root.vibration !== null
+
+            Text {
+                text: "<b>Spectrum</b>"
+            }
+
+            Button {
+                id: spectrumButton
+                width: 120
+                height: 28
+                text: root.vibration && root.vibration.spectrumActive ? "Stop" : "Start"
+                onClicked: {
+                    if (root.vibration.spectrumActive)
+                        root.vibration.stopSpectrum();
+                    else
+                        root.vibration.startSpectrum();
+                }
+            }
+
+            Repeater {
+                model: root.vibration && root.vibration.spectrum.peaks ? root.vibration.spectrum.peaks.slice(0, 3) : []
+
+                Text {
+                    text: modelData.frequency.toFixed(1) + " Hz  (" + modelData.axis + ")"
+                    font.pixelSize: 12
+                }
+            }
+
+            Text {
+                property var notch: root.vibration ? root.vibration.notchSuggestion : ({})
+                visible: notch.INS_HNTCH_FREQ !== undefined
+                text: "Notch: " + notch.INS_HNTCH_FREQ + " Hz, BW " + notch.INS_HNTCH_BW +
+                      ", HMNCS " + notch.INS_HNTCH_HMNCS
+                color: notch.aliased ? warnColor : normalColor
+                font.pixelSize: 12
+            }
+
+            Text {
+                visible: root.vibration !== null && root.vibration.spectrumActive &&
+                         !(root.vibration.spectrum.peaks && root.vibration.spectrum.peaks.length)
+                text: "Collecting samples..."
+                font.pixelSize: 12
+            }
+        }
     }
 
 
@@ -636,6 +636,63 @@ ApplicationWindow {
                         }
                     }
 
+                    // Sphere coverage of magnetometer 1 from the ground-side fit:
+                    // one cell per equal-area bin, bottom band first
+                    ColumnLayout {
+                        id: coverageMap
+                        property var magFit: compassCalibrationModel ? compassCalibrationModel.magFit : null
+                        property var orientationNames: ["Front down", "Back down", "Left side down",
+                                                        "Right side down", "Top down", "Bottom down"]
+                        visible: magFit !== null
+                        spacing: 6
+                        Layout.fillWidth: true
+
+                        RowLayout {
+                            Layout.fillWidth: true
+                            Text {
+                                text: "Sphere Coverage"
+                                color: textPrimary
+                                font.pixelSize: 13
+                                font.weight: Font.DemiBold
+                                Layout.fillWidth: true
+                            }
+                            Text {
+                                text: coverageMap.magFit ? Math.round(coverageMap.magFit.coverage) + "%" : ""
+                                color: textSecondary
+                                font.pixelSize: 12
+                            }
+                        }
+
+                        Grid {
+                            columns: coverageMap.magFit ? coverageMap.magFit.coverageColumns : 1
+                            spacing: 2
+                            Layout.fillWidth: true
+
+                            Repeater {
+                                model: coverageMap.magFit ? coverageMap.magFit.coverageRows * coverageMap.magFit.coverageColumns : 0
+                                Rectangle {
+                                    // Rows are drawn top band (z = +1) first
+                                    property int cols: coverageMap.magFit.coverageColumns
+                                    property int bin: (coverageMap.magFit.coverageRows - 1 - Math.floor(index / cols)) * cols + index % cols
+                                    width: 14
+                                    height: 10
+                                    radius: 2
+                                    color: coverageMap.magFit.coverageBitmap.charAt(bin) === "1" ? successColor : "#f3f4f6"
+                                    border.color: borderColor
+                                    border.width: 1
+                                }
+                            }
+                        }
+
+                        Text {
+                            visible: coverageMap.magFit !== null && coverageMap.magFit.active &&
+                                     coverageMap.magFit.suggestedOrientation >= 0
+                            text: visible ? "Next: " + coverageMap.orientationNames[coverageMap.magFit.suggestedOrientation] : ""
+                            color: warningColor
+                            font.pixelSize: 12
+                        }
+                    }
+
                     Rectangle {
                         Layout.fillWidth: true
                         height: 1
@@ -14,6 +14,7 @@ ApplicationWindow {
     property var droneModel: null
     property var droneCommander: null
     property var servoCalibrationModel: null
+    property var motorTest: typeof motorTestEngine !== "undefined" ? motorTestEngine : null
 
     // Connection status properties (internal monitoring only)
     property bool isConnected: servoCalibrationModel ? servoCalibrationModel.isDroneConnected : false
@@ -37,10 +38,11 @@ ApplicationWindow {
             console.log("[ServoCalibration] Status:", status);
         }
         
-        function onRealTimeServoUpdate(servoNum, value) {
-            console.log("[ServoCalibration] Real-time Servo", servoNum, "value:", value + "us");
-            // Update the corresponding row's position display
-            updateServoDisplay(servoNum, value);
+        function onServoFrameUpdate(updates) {
+            // One batched update per display frame, only outputs that changed
+            for (var i = 0; i < updates.length; i++) {
+                updateServoDisplay(updates[i].servo, updates[i].value);
+            }
         }
         
         function onServoConfigurationLoaded() {
@@ -56,6 +58,18 @@ ApplicationWindow {
         }
     }
 
+    // Motor test sweep results
+    Connections {
+        target: window.motorTest
+        function onTestFinished(success, message) {
+            console.log("[ServoCalibration] Motor test:", message);
+            if (!success) {
+                errorDialog.text = message;
+                errorDialog.open();
+            }
+        }
+    }
+
     // Function to refresh servo configuration from drone
     function refreshServoConfiguration() {
         for (var i = 0; i < listView.count; i++) {
@@ -93,6 +107,35 @@ ApplicationWindow {
         }
     }
 
+    // Props-off confirmation before any motor is spun
+    Dialog {
+        id: propsOffDialog
+        title: "Motor Test"
+        modal: true
+        anchors.centerIn: parent
+        standardButtons: Dialog.Ok | Dialog.Cancel
+
+        Text {
+            text: "Remove ALL propellers before running the motor test.\n\n" +
+                  "Each motor will spin on its own at increasing throttle.\n" +
+                  "Press OK only when the propellers are off."
+            color: "#ff6b6b"
+            wrapMode: Text.Wrap
+            width: 300
+        }
+
+        onAccepted: {
+            if (window.motorTest && !window.motorTest.startFullCheck()) {
+                errorDialog.text = "Motor test could not be started";
+                errorDialog.open();
+            }
+        }
+    }
+
+    function formatMotorValue(value, decimals) {
+        return (value === null || value === undefined) ? "-" : Number(value).toFixed(decimals);
+    }
+
     // Control buttons at top (simplified)
     Rectangle {
         id: controlBar
@@ -157,10 +200,129 @@ ApplicationWindow {
         }
     }
 
+    // Motor test: start/stop, progress and per-motor results
+    Rectangle {
+        id: motorTestBar
+        anchors.top: controlBar.bottom
+        width: parent.width
+        height: motorResults.count > 0 ? 105 : 45
+        color: "#353535"
+        border.color: "#555"
+        border.width: 1
+        visible: window.motorTest !== null
+
+        Row {
+            id: motorTestControls
+            anchors.left: parent.left
+            anchors.top: parent.top
+            anchors.topMargin: 5
+            anchors.leftMargin: 10
+            spacing: 10
+
+            Button {
+                id: motorTestBtn
+                text: window.motorTest && window.motorTest.running ? "Stop Motor Test" : "Motor Test"
+                width: 120
+                height: 35
+                enabled: window.isConnected
+
+                onClicked: {
+                    if (window.motorTest.running) {
+                        window.motorTest.stopTest();
+                    } else {
+                        propsOffDialog.open();
+                    }
+                }
+
+                background: Rectangle {
+                    color: motorTestBtn.enabled ? (motorTestBtn.pressed ? "#c0392b" : "#e74c3c") : "#666666"
+                    border.color: "#333"
+                    border.width: 1
+                    radius: 4
+                }
+
+                contentItem: Text {
+                    text: motorTestBtn.text
+                    color: motorTestBtn.enabled ? "white" : "#999"
+                    font.pixelSize: 11
+                    font.bold: true
+                    horizontalAlignment: Text.AlignHCenter
+                    verticalAlignment: Text.AlignVCenter
+                }
+            }
+
+            ProgressBar {
+                anchors.verticalCenter: parent.verticalCenter
+                width: 200
+                from: 0
+                to: 100
+                value: window.motorTest ? window.motorTest.progress : 0
+                visible: !!window.motorTest && window.motorTest.running
+            }
+
+            Text {
+                anchors.verticalCenter: parent.verticalCenter
+                text: window.motorTest && window.motorTest.running ?
+                      window.motorTest.progress + "%" : "Propellers OFF before testing"
+                color: "#ddd"
+                font.pixelSize: 11
+            }
+        }
+
+        Row {
+            anchors.top: motorTestControls.bottom
+            anchors.left: parent.left
+            anchors.topMargin: 5
+            anchors.leftMargin: 10
+            spacing: 6
+
+            Repeater {
+                id: motorResults
+                model: window.motorTest ? window.motorTest.results : []
+
+                Rectangle {
+                    width: 150
+                    height: 52
+                    radius: 4
+                    color: modelData.warnings.length > 0 ? "#5a2e2e" : "#2e4a36"
+                    border.color: "#555"
+
+                    Column {
+                        anchors.fill: parent
+                        anchors.margins: 4
+                        spacing: 1
+
+                        Text {
+                            text: "Motor " + modelData.label +
+                                  (modelData.esc !== null ? "  (ESC " + modelData.esc + ")" : "")
+                            color: "white"
+                            font.pixelSize: 11
+                            font.bold: true
+                        }
+                        Text {
+                            text: formatMotorValue(modelData.rpm, 0) + " rpm  " +
+                                  formatMotorValue(modelData.current, 1) + " A"
+                            color: "#ddd"
+                            font.pixelSize: 10
+                        }
+                        Text {
+                            text: "Vibe " + formatMotorValue(modelData.vibrationRms, 1) +
+                                  (modelData.warnings.length > 0 ? "  ⚠ " + modelData.warnings.join(", ") : "")
+                            color: modelData.warnings.length > 0 ? "#ff6b6b" : "#ddd"
+                            font.pixelSize: 10
+                            elide: Text.ElideRight
+                            width: parent.width
+                        }
+                    }
+                }
+            }
+        }
+    }
+
     // Header with better styling to match the image
     Rectangle {
         id: header
-        anchors.top: controlBar.bottom
+        anchors.top: motorTestBar.visible ? motorTestBar.bottom : controlBar.bottom
         width: parent.width
         height: 30
         color: "#3a3a3a"
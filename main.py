@@ -37,6 +37,11 @@ except ImportError as e:
 # Waypoints Saver/Loader
 # ============================================================
 class WaypointsSaver(QtCore.QObject):
+    def __init__(self, analytics=None):
+        super().__init__()
+        self.analytics = analytics
+        self.last_loaded = None
+
     @QtCore.pyqtSlot(str, str, result=bool)
     def save_file(self, path, data):
         """Save the data to the selected path"""
@@ -59,6 +64,34 @@ class WaypointsSaver(QtCore.QObject):
             print(f"❌ Error loading waypoints: {e}")
             return ""
 
+    @QtCore.pyqtSlot(str, result='QVariantMap')
+    def load_waypoints(self, file_path):
+        """
+        Parse and validate a QGC WPL 110 or JSON waypoints file.
+        Returns {ok, count, errors, cached, markers}; markers is a list of
+        {lat, lng, altitude, speed, commandType, holdTime} that
+        NavigationControls adds to the map as-is. The same columns go
+        straight into mission analytics.
+        """
+        from modules.waypoint_files import load_waypoint_file, to_markers, WaypointFileError
+        try:
+            array, errors, cached = load_waypoint_file(file_path)
+        except (OSError, ValueError, WaypointFileError) as e:
+            print(f"❌ Error loading waypoints: {e}")
+            return {'ok': False, 'count': 0, 'errors': [str(e)], 'cached': False, 'markers': []}
+
+        self.last_loaded = array
+        markers = to_markers(array)
+        if self.analytics and markers:
+            self.analytics.set_arrays([m['lat'] for m in markers], [m['lng'] for m in markers],
+                                      [m['altitude'] for m in markers])
+        for error in errors[:20]:
+            print(f"⚠️ {file_path}: {error}")
+        print(f"✅ Loaded {len(markers)} waypoints from {file_path}"
+              f"{' (cached)' if cached else ''}{f', {len(errors)} rows rejected' if errors else ''}")
+        return {'ok': True, 'count': len(markers), 'errors': errors[:100],
+                'cached': cached, 'markers': markers}
+
 # Global references for cleanup
 global_engines = []
 global_models = {}
@@ -212,6 +245,16 @@ try:
     from modules.radio_calibration import RadioCalibrationModel
     from modules.esc_calibration import ESCCalibrationModel
     from modules.servo_calibration import ServoCalibrationModel
+    from modules.motor_test import MotorTestEngine
+    from modules.esc_telemetry import EscTelemetryService
+    from modules.vehicle_overview import VehicleOverview
+    from modules.vibration import VibrationService
+    from modules.ekf_health import EkfHealthService
+    from modules.link_quality import LinkQualityService
+    from modules.parameter_presets import ParameterPresetManager
+    from modules.mission_analytics import MissionAnalyticsModel
+    from modules.survey_grid import SurveyPlanner
+    from modules.geofence import GeofenceManager
     from message_logger import MessageLogger
     print("✅ All drone modules imported successfully")
 except ImportError as e:
@@ -219,16 +262,68 @@ except ImportError as e:
     sys.exit(1)
 
 class MapCommunicationBridge(QObject):
-    """Enhanced bridge with better error handling"""
+    """
+    Enhanced bridge with better error handling.
+
+    Markers live in an indexed store: each gets a stable id on creation and
+    is kept in a dict by id, with a separate list of ids for mission order.
+    Deleting a marker no longer renumbers every other marker, and the web
+    view is sent batched diffs (reset/add/move/delete) through markerDiff
+    instead of rebuilding every marker and the route polyline.
+    """
     
     mapClicked = pyqtSignal(float, float)
     markerClicked = pyqtSignal(int, float, float, float, float)
+    markerDiff = pyqtSignal(str)  # JSON list of ops, coalesced per frame
+    
+    DIFF_FLUSH_MS = 16
     
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, analytics=None):
         super().__init__(parent)
-        self.markers = []
+        self._markers = {}          # id -> marker dict
+        self._order = []            # ids in mission order
+        self._next_id = 1
+        self._json_cache = None
+        self._pending_ops = []
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(self.DIFF_FLUSH_MS)
+        self._flush_timer.timeout.connect(self._flush_diff)
+        self.analytics = analytics
         self._destroyed = False
     
+    @property
+    def markers(self):
+        """Markers in mission order"""
+        return [self._markers[marker_id] for marker_id in self._order]
+    
+    def _queue_op(self, op):
+        self._json_cache = None
+        if op['op'] == 'reset':
+            self._pending_ops = [op]
+        elif op['op'] == 'move' and self._pending_ops and self._pending_ops[-1].get('op') == 'move' \
+                and self._pending_ops[-1]['id'] == op['id']:
+            # Drag events for the same marker collapse into the latest position
+            self._pending_ops[-1] = op
+        else:
+            self._pending_ops.append(op)
+        if not self._flush_timer.isActive():
+            self._flush_timer.start()
+    
+    def _flush_diff(self):
+        if self._destroyed or not self._pending_ops:
+            return
+        import json
+        ops, self._pending_ops = self._pending_ops, []
+        self.markerDiff.emit(json.dumps(ops))
+    
+    def _new_marker(self, lat, lng, altitude, speed):
+        marker_id = self._next_id
+        self._next_id += 1
+        marker = {'id': marker_id, 'lat': lat, 'lng': lng, 'altitude': altitude, 'speed': speed}
+        self._markers[marker_id] = marker
+        return marker
+    
     @pyqtSlot(str)
     def processWebMessage(self, message):
         """Process messages from WebEngine with error handling"""
@@ -260,24 +355,55 @@ class MapCommunicationBridge(QObject):
     
     @pyqtSlot(float, float, float, float, result=int)
     def addMarker(self, lat, lng, altitude, speed):
-        """Add a marker with bounds checking"""
+        """Append a marker; returns its index"""
         if self._destroyed:
             return -1
             
         try:
-            marker_data = {
-                'lat': lat,
-                'lng': lng,
-                'altitude': altitude,
-                'speed': speed,
-                'index': len(self.markers)
-            }
-            self.markers.append(marker_data)
-            return len(self.markers) - 1
+            marker = self._new_marker(lat, lng, altitude, speed)
+            self._order.append(marker['id'])
+            index = len(self._order) - 1
+            self._queue_op(dict(marker, op='add', index=index))
+            if self.analytics:
+                self.analytics.append(lat, lng, altitude, speed)
+            return index
         except Exception as e:
             print(f"Error adding marker: {e}")
             return -1
     
+    @pyqtSlot(int, result=int)
+    def markerId(self, index):
+        """Stable id of the marker currently at index, or -1"""
+        if 0 <= index < len(self._order):
+            return self._order[index]
+        return -1
+    
+    @pyqtSlot('QVariantList')
+    def setMarkers(self, markers):
+        """Replace every marker in one step (e.g. a loaded mission)"""
+        if self._destroyed:
+            return
+            
+        try:
+            self._markers.clear()
+            self._order = []
+            for m in markers:
+                marker = self._new_marker(float(m.get('lat', 0)), float(m.get('lng', 0)),
+                                          float(m.get('altitude', 10) or 10), float(m.get('speed', 5) or 5))
+                for key in ('commandType', 'holdTime'):
+                    if key in m:
+                        marker[key] = m[key]
+                self._order.append(marker['id'])
+            self._queue_op({'op': 'reset', 'markers': self.markers})
+            if self.analytics:
+                self.analytics.setWaypoints(self.markers)
+        except Exception as e:
+            print(f"Error setting markers: {e}")
+    
+    @pyqtSlot()
+    def clearMarkers(self):
+        self.setMarkers([])
+    
     @pyqtSlot(int)
     def deleteMarker(self, index):
         """Delete a marker with bounds checking"""
@@ -285,13 +411,39 @@ class MapCommunicationBridge(QObject):
             return
             
         try:
-            if 0 <= index < len(self.markers):
-                self.markers.pop(index)
-                for i, marker in enumerate(self.markers):
-                    marker['index'] = i
+            if 0 <= index < len(self._order):
+                marker_id = self._order.pop(index)
+                self._markers.pop(marker_id, None)
+                self._queue_op({'op': 'delete', 'id': marker_id})
+                if self.analytics:
+                    self.analytics.delete(index)
         except Exception as e:
             print(f"Error deleting marker: {e}")
     
+    @pyqtSlot(int)
+    def deleteMarkerById(self, marker_id):
+        if marker_id in self._markers:
+            self.deleteMarker(self._order.index(marker_id))
+
+    @pyqtSlot(int, float, float, float)
+    def moveMarker(self, index, lat, lng, altitude):
+        """Update a dragged marker in place"""
+        if self._destroyed:
+            return
+
+        try:
+            if 0 <= index < len(self._order):
+                marker = self._markers[self._order[index]]
+                marker['lat'] = lat
+                marker['lng'] = lng
+                marker['altitude'] = altitude
+                self._queue_op({'op': 'move', 'id': marker['id'],
+                                'lat': lat, 'lng': lng, 'altitude': altitude})
+                if self.analytics:
+                    self.analytics.moveWaypoint(index, lat, lng, altitude)
+        except Exception as e:
+            print(f"Error moving marker: {e}")
+    
     @pyqtSlot(result=str)
     def getMarkersJson(self):
         """Get all markers as JSON string with error handling"""
@@ -299,8 +451,11 @@ class MapCommunicationBridge(QObject):
             return "[]"
             
         try:
-            import json
-            return json.dumps(self.markers)
+            if self._json_cache is None:
+                import json
+                self._json_cache = json.dumps(
+                    [dict(marker, index=i) for i, marker in enumerate(self.markers)])
+            return self._json_cache
         except Exception as e:
             print(f"Error getting markers JSON: {e}")
             return "[]"
@@ -309,7 +464,10 @@ class MapCommunicationBridge(QObject):
         """Clean up the bridge"""
         print("  - Cleaning up MapCommunicationBridge...")
         self._destroyed = True
-        self.markers.clear()
+        self._flush_timer.stop()
+        self._pending_ops = []
+        self._markers.clear()
+        self._order = []
 
 def force_load_qt_modules():
     """Enhanced Qt module loading with error recovery"""
@@ -512,7 +670,13 @@ def main():
         
         # Initialize Map Communication Bridge
         print("🌐 Initializing Google Maps communication bridge...")
-        map_bridge = MapCommunicationBridge()
+        # Each map view edits its own waypoint list, so each gets its own analytics:
+        # MapView through the bridge's marker store, NavigationControls directly
+        mission_analytics = MissionAnalyticsModel()
+        app_manager.register_model('mission_analytics', mission_analytics)
+        navigation_analytics = MissionAnalyticsModel()
+        app_manager.register_model('navigation_analytics', navigation_analytics)
+        map_bridge = MapCommunicationBridge(analytics=mission_analytics)
         app_manager.register_model('map_bridge', map_bridge)
         
         # Initialize backend models with error handling
@@ -530,6 +694,16 @@ def main():
             drone_commander = DroneCommander(drone_model)
             app_manager.register_model('drone_commander', drone_commander)
             
+            preset_manager = ParameterPresetManager(drone_commander)
+            app_manager.register_model('preset_manager', preset_manager)
+            app_manager.register_model('mission_transfer', drone_commander.mission_transfer)
+            
+            survey_planner = SurveyPlanner(drone_commander)
+            app_manager.register_model('survey_planner', survey_planner)
+            
+            geofence_manager = GeofenceManager(drone_commander, message_logger)
+            app_manager.register_model('geofence', geofence_manager)
+            
             port_manager = PortManager()
             app_manager.register_model('port_manager', port_manager)
             
@@ -579,6 +753,24 @@ def main():
             servo_calibration_model = ServoCalibrationModel(drone_model)
             app_manager.register_model('servo_calibration_model', servo_calibration_model)
             
+            motor_test_engine = MotorTestEngine(drone_model, servo_calibration_model)
+            app_manager.register_model('motor_test', motor_test_engine)
+            
+            esc_telemetry = EscTelemetryService(message_logger)
+            app_manager.register_model('esc_telemetry', esc_telemetry)
+            
+            vehicle_overview = VehicleOverview()
+            app_manager.register_model('vehicle_overview', vehicle_overview)
+            
+            vibration_service = VibrationService(vehicle_overview, drone_model, message_logger)
+            app_manager.register_model('vibration', vibration_service)
+            
+            ekf_health = EkfHealthService(vehicle_overview, drone_model, message_logger)
+            app_manager.register_model('ekf_health', ekf_health)
+            
+            link_quality = LinkQualityService(drone_model, message_logger)
+            app_manager.register_model('link_quality', link_quality)
+            
             print("✅ All models initialized successfully")
             
         except Exception as e:
@@ -676,6 +868,10 @@ def main():
             
             engine.rootContext().setContextProperty("droneModel", drone_model)
             engine.rootContext().setContextProperty("droneCommander", drone_commander)
+            engine.rootContext().setContextProperty("presetManager", preset_manager)
+            engine.rootContext().setContextProperty("missionTransfer", drone_commander.mission_transfer)
+            engine.rootContext().setContextProperty("surveyPlanner", survey_planner)
+            engine.rootContext().setContextProperty("geofenceManager", geofence_manager)
             engine.rootContext().setContextProperty("portManager", port_manager)
             engine.rootContext().setContextProperty("commandExecutor", command_executor)
             
@@ -697,8 +893,17 @@ def main():
             engine.rootContext().setContextProperty("radioCalibrationModel", radio_calibration_model)
             engine.rootContext().setContextProperty("escCalibrationModel", esc_calibration_model)
             engine.rootContext().setContextProperty("servoCalibrationModel", servo_calibration_model)
+            engine.rootContext().setContextProperty("motorTestEngine", motor_test_engine)
+            engine.rootContext().setContextProperty("escTelemetry", esc_telemetry)
+            engine.rootContext().setContextProperty("vehicleOverview", vehicle_overview)
+            engine.rootContext().setContextProperty("vibrationService", vibration_service)
+            engine.rootContext().setContextProperty("ekfHealth", ekf_health)
+            engine.rootContext().setContextProperty("linkQuality", link_quality)
             engine.rootContext().setContextProperty("mapBridge", map_bridge)
-            waypoints_saver = WaypointsSaver()
+            engine.rootContext().setContextProperty("missionAnalytics", mission_analytics)
+            engine.rootContext().setContextProperty("navigationAnalytics", navigation_analytics)
+            # Loaded files are placed on the NavigationControls map
+            waypoints_saver = WaypointsSaver(analytics=navigation_analytics)
             engine.rootContext().setContextProperty("waypointsSaver", waypoints_saver)
             engine.rootContext().setContextProperty("googleMapsApiKey", google_api_key)
             
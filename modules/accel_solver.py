@@ -0,0 +1,112 @@
+"""
+Ground-side 6-position accelerometer calibration check.
+
+At each of the six calibration positions the averaged accelerometer
+vector is captured. In position i the sensor should read 1 g along the
+known "up" axis u_i (see orientation_classifier). An affine model
+
+    corrected = M @ raw + b
+
+is fitted to all six positions with one least-squares solve over the
+(6 x 4) design matrix. M carries the per-axis scale on its diagonal and
+cross-axis misalignment off it, and the offsets are -M^-1 b. Eighteen
+equations for twelve unknowns leave a residual, which measures how
+consistent the six captures are with one linear sensor model.
+
+The fit assumes each position was held exactly on-axis, so placement
+tilt ends up in the residual. The offsets from opposite position pairs,
+(up + down) / 2, only feel tilt to second order. If they disagree with
+the least-squares offsets, the placement was at fault, not the sensor.
+"""
+
+import math
+import numpy as np
+
+from modules.orientation_classifier import ORIENTATIONS, UP_VECTORS
+
+GRAVITY_MG = 1000.0
+
+# Quality limits on the fitted model
+MAGNITUDE_GOOD = 0.02           # max |corrected| error, fraction of g
+MAGNITUDE_POOR = 0.05
+TILT_GOOD = 5.0                 # max placement angle, degrees
+OFFSET_LIMIT_MG = 350.0         # ArduPilot rejects offsets beyond about 3.5 m/s/s
+OFFSET_DISAGREEMENT_MG = 25.0   # pair vs fitted offsets; a 10 degree tilt shifts them ~30 mG
+SCALE_LIMITS = (0.8, 1.2)
+
+# Opposite positions per axis (indices into ORIENTATIONS): (reads +1 g, reads -1 g)
+_PAIRS = ((4, 3), (1, 2), (5, 0))
+
+
+def solve_six_position(captures, gravity=GRAVITY_MG):
+    """
+    captures: six mean accelerometer vectors in ORIENTATIONS order (any
+    consistent unit; gravity is 1 g in that unit). Returns a dict of the
+    fit, or None if any position is missing.
+    """
+    if len(captures) != len(ORIENTATIONS) or any(c is None for c in captures):
+        return None
+    raw = np.asarray(captures, dtype=np.float64)
+    targets = UP_VECTORS * gravity
+
+    design = np.column_stack((raw, np.ones(len(raw))))
+    solution, _, rank, _ = np.linalg.lstsq(design, targets, rcond=None)
+    if rank < 4:
+        return None
+    M = solution[:3].T
+    b = solution[3]
+    offsets = -np.linalg.solve(M, b)
+
+    corrected = design @ solution
+    residual = np.linalg.norm(corrected - targets, axis=1)
+    magnitude_error = np.abs(np.linalg.norm(corrected, axis=1) - gravity) / gravity
+    cosines = np.einsum("ij,ij->i", corrected, targets) / (np.linalg.norm(corrected, axis=1) * gravity)
+    tilt = np.degrees(np.arccos(np.clip(cosines, -1.0, 1.0)))
+
+    pair_offsets = np.array([(raw[up, axis] + raw[down, axis]) / 2.0
+                             for axis, (up, down) in enumerate(_PAIRS)])
+    pair_scales = np.array([2.0 * gravity / (raw[up, axis] - raw[down, axis])
+                            for axis, (up, down) in enumerate(_PAIRS)])
+
+    scales = np.diag(M)
+    worst_magnitude = float(magnitude_error.max())
+    worst_tilt = float(tilt.max())
+    disagreement = float(np.abs(offsets - pair_offsets).max())
+    misplaced = disagreement > OFFSET_DISAGREEMENT_MG * gravity / GRAVITY_MG
+    problems = []
+    if np.any(np.abs(offsets) > OFFSET_LIMIT_MG * gravity / GRAVITY_MG):
+        problems.append("offsets out of range")
+    if np.any((scales < SCALE_LIMITS[0]) | (scales > SCALE_LIMITS[1])):
+        problems.append("scale out of range")
+    if worst_magnitude > MAGNITUDE_POOR:
+        problems.append("inconsistent positions")
+    if worst_tilt > TILT_GOOD:
+        problems.append(f"{ORIENTATIONS[int(np.argmax(tilt))]} placed {worst_tilt:.0f}° off axis")
+    # Placement tilt alone is marginal, unless it has pulled the fitted offsets off
+    poor = any("placed" not in p for p in problems)
+    if misplaced:
+        problems.append(f"positions not level ({disagreement * GRAVITY_MG / gravity:.0f} mG offset error)")
+        poor = True
+
+    if poor:
+        quality = "poor"
+    elif problems or worst_magnitude > MAGNITUDE_GOOD:
+        quality = "marginal"
+    else:
+        quality = "good"
+
+    return {
+        "offsets": [round(float(v), 2) for v in offsets],
+        "scale": [round(float(v), 4) for v in scales],
+        "matrix": [[round(float(v), 5) for v in row] for row in M],
+        "misalignment": round(float(np.abs(M - np.diag(scales)).max()), 5),
+        "pairOffsets": [round(float(v), 2) for v in pair_offsets],
+        "pairScale": [round(float(v), 4) for v in pair_scales],
+        "offsetDisagreement": round(disagreement, 2),
+        "residual": [round(float(v), 2) for v in residual],
+        "residualRms": round(float(math.sqrt((residual ** 2).mean())), 2),
+        "magnitudeError": round(worst_magnitude * 100.0, 2),     # percent of g
+        "tilt": [round(float(v), 1) for v in tilt],
+        "quality": quality,
+        "problems": problems,
+    }
@@ -0,0 +1,234 @@
+"""
+Vehicle clock alignment from TIMESYNC exchanges.
+
+Each TIMESYNC probe from the link quality estimator is an exchange: it
+leaves at GCS monotonic time t0, the vehicle stamps it with its own boot
+clock (tc1, ns), and the echo arrives at t1. The vehicle time
+corresponds to the GCS midpoint (t0 + t1) / 2, to within half the round
+trip.
+
+A link can queue a TIMESYNC reply behind telemetry, which delays it
+without the midpoint moving with it. The offset therefore uses only the
+faster half of the recent exchanges, weighted by 1 / rtt^2, and residual
+outliers beyond a few MADs are dropped and the offset refitted once.
+
+Crystal drift is tens of ppm, which a minute of exchanges cannot resolve
+against milliseconds of round-trip jitter. The fastest exchange of every
+ANCHOR_INTERVAL is kept as an anchor, and once the anchors cover
+DRIFT_SPAN seconds a line through them gives the drift. Until then the
+offset is treated as constant and drift_ppm is None. The published model
+is one tuple, swapped atomically, so the reader thread can stamp every
+message without taking a lock.
+
+stamp(msg, received) sets msg.gcs_time, the GCS monotonic time at which
+the vehicle produced the message. It is taken from time_boot_ms or
+time_usec when the message has one. Otherwise it is the receive time
+minus half the fastest round trip. msg.vehicle_time is the same moment
+on the vehicle's boot clock. Only messages from the target autopilot
+(set_target) are on that clock. Other components, and every message
+without a model, fall back to the receive time and None.
+"""
+
+import time
+import threading
+from collections import deque
+
+MAX_SAMPLES = 64
+MIN_SAMPLES = 3
+ANCHOR_INTERVAL = 30.0          # seconds per drift anchor (fastest exchange in it)
+MAX_ANCHORS = 40
+DRIFT_SPAN = 300.0              # seconds of anchors before drift is fitted
+MAX_DRIFT = 500e-6              # crystal tolerance; larger slopes are noise
+OUTLIER_MADS = 4.0
+MIN_RESIDUAL = 0.001
+REBOOT_JUMP = 1.0               # vehicle clock going back this far = reboot
+EPOCH_USEC = 1e15               # time_usec beyond this is UNIX time, not boot time
+
+
+class ClockSync:
+    """Offset/drift between the vehicle boot clock and time.monotonic()"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=MAX_SAMPLES)   # (gcs midpoint, vehicle, rtt)
+        self._anchors = deque(maxlen=MAX_ANCHORS)   # fastest sample per ANCHOR_INTERVAL
+        self._anchor_start = None
+        self._drift = None          # vehicle seconds per GCS second - 1, once DRIFT_SPAN is covered
+        self._target = None         # (sysid, compid) whose messages are on the vehicle clock
+        # (gcs reference, vehicle time at reference, vehicle seconds per GCS second, fastest rtt)
+        self._model = None
+        self._time_fields = {}
+        self._wall_offset = time.time() - time.monotonic()
+
+    @property
+    def synced(self):
+        return self._model is not None
+
+    @property
+    def offset(self):
+        """Vehicle boot time at GCS monotonic 0, seconds (None until synced)"""
+        model = self._model
+        if model is None:
+            return None
+        reference, vehicle, rate, _ = model
+        return vehicle - rate * reference
+
+    @property
+    def drift_ppm(self):
+        """Vehicle clock drift against the GCS, ppm (None until DRIFT_SPAN is covered)"""
+        drift = self._drift
+        return drift * 1e6 if drift is not None else None
+
+    @property
+    def uncertainty(self):
+        """Half the fastest round trip in the window, seconds"""
+        model = self._model
+        return model[3] / 2.0 if model else None
+
+    def set_target(self, sysid, compid):
+        """Component whose time fields stamp() converts; None for no target"""
+        self._target = (sysid, compid) if sysid else None
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._anchors.clear()
+            self._anchor_start = None
+            self._drift = None
+            self._model = None
+
+    # ------------------------------------------------------------------
+    # Exchanges (MAVLink reader thread)
+    # ------------------------------------------------------------------
+
+    def add_exchange(self, sent, received, vehicle_time):
+        """One TIMESYNC round trip: GCS monotonic send/receive times, vehicle seconds since boot"""
+        rtt = received - sent
+        if rtt < 0:
+            return
+        with self._lock:
+            if self._samples and vehicle_time < self._samples[-1][1] - REBOOT_JUMP:
+                print("[ClockSync] Vehicle clock went back, resynchronising")
+                self._samples.clear()
+                self._anchors.clear()
+                self._anchor_start = None
+                self._drift = None
+            sample = ((sent + received) / 2.0, vehicle_time, rtt)
+            self._samples.append(sample)
+            if self._anchor_start is not None and sample[0] - self._anchor_start < ANCHOR_INTERVAL:
+                if rtt < self._anchors[-1][2]:
+                    self._anchors[-1] = sample
+            else:
+                self._anchors.append(sample)
+                self._anchor_start = sample[0]
+            self._drift = self._fit_drift(list(self._anchors))
+            if len(self._samples) >= MIN_SAMPLES:
+                self._model = self._fit(list(self._samples), self._drift or 0.0)
+
+    @staticmethod
+    def _fit_drift(anchors):
+        """Slope of the offset through the anchors, or None while they span less than DRIFT_SPAN"""
+        if len(anchors) < MIN_SAMPLES or anchors[-1][0] - anchors[0][0] < DRIFT_SPAN:
+            return None
+        weights = [1.0 / (s[2] + 1e-3) ** 2 for s in anchors]
+        total = sum(weights)
+        mean_x = sum(w * s[0] for w, s in zip(weights, anchors)) / total
+        mean_y = sum(w * (s[1] - s[0]) for w, s in zip(weights, anchors)) / total
+        sxx = sum(w * (s[0] - mean_x) ** 2 for w, s in zip(weights, anchors))
+        sxy = sum(w * (s[0] - mean_x) * (s[1] - s[0] - mean_y) for w, s in zip(weights, anchors))
+        return min(MAX_DRIFT, max(-MAX_DRIFT, sxy / sxx)) if sxx > 0 else None
+
+    @staticmethod
+    def _fit(samples, slope):
+        samples.sort(key=lambda s: s[2])
+        fastest = samples[0][2]
+        used = samples[:max(MIN_SAMPLES, len(samples) // 2)]
+        reference = sum(s[0] for s in used) / len(used)
+
+        def solve(points):
+            # Offset (vehicle - gcs) at the reference, along the drift line
+            weights = [1.0 / (s[2] + 1e-3) ** 2 for s in points]
+            return sum(w * (s[1] - s[0] - slope * (s[0] - reference))
+                       for w, s in zip(weights, points)) / sum(weights)
+
+        intercept = solve(used)
+        residuals = [abs((s[1] - s[0]) - (intercept + slope * (s[0] - reference))) for s in used]
+        mad = sorted(residuals)[len(residuals) // 2]
+        limit = max(MIN_RESIDUAL, OUTLIER_MADS * mad)
+        kept = [s for s, r in zip(used, residuals) if r <= limit]
+        if MIN_SAMPLES <= len(kept) < len(used):
+            intercept = solve(kept)
+        return (reference, reference + intercept, 1.0 + slope, fastest)
+
+    # ------------------------------------------------------------------
+    # Conversions (any thread)
+    # ------------------------------------------------------------------
+
+    def vehicle_to_gcs(self, vehicle_time):
+        model = self._model
+        if model is None:
+            return None
+        reference, vehicle, rate, _ = model
+        return reference + (vehicle_time - vehicle) / rate
+
+    def gcs_to_vehicle(self, gcs_time):
+        model = self._model
+        if model is None:
+            return None
+        reference, vehicle, rate, _ = model
+        return vehicle + (gcs_time - reference) * rate
+
+    def to_wall(self, gcs_time):
+        """GCS monotonic time to time.time() seconds"""
+        return gcs_time + self._wall_offset
+
+    def _time_field(self, msg):
+        msg_type = msg.get_type()
+        field = self._time_fields.get(msg_type, False)
+        if field is False:
+            names = msg.get_fieldnames()
+            if 'time_boot_ms' in names:
+                field = ('time_boot_ms', 1e-3)
+            elif 'time_usec' in names:
+                field = ('time_usec', 1e-6)
+            else:
+                field = None
+            self._time_fields[msg_type] = field
+        return field
+
+    def stamp(self, msg, received):
+        """Set msg.gcs_time and msg.vehicle_time; received is time.monotonic() at read"""
+        model = self._model
+        if model is None or (msg.get_srcSystem(), msg.get_srcComponent()) != self._target:
+            msg.gcs_time, msg.vehicle_time = received, None
+            return received
+        reference, vehicle, rate, fastest = model
+
+        vehicle_time = None
+        field = self._time_field(msg)
+        if field is not None:
+            value = getattr(msg, field[0], 0)
+            if 0 < value and not (field[0] == 'time_usec' and value >= EPOCH_USEC):
+                vehicle_time = value * field[1]
+
+        if vehicle_time is not None:
+            # A message cannot have been produced after it arrived
+            gcs_time = min(received, reference + (vehicle_time - vehicle) / rate)
+        else:
+            gcs_time = received - fastest / 2.0
+            vehicle_time = vehicle + (gcs_time - reference) * rate
+        msg.gcs_time, msg.vehicle_time = gcs_time, vehicle_time
+        return gcs_time
+
+
+_clock = None
+_clock_lock = threading.Lock()
+
+
+def get_clock_sync():
+    """Shared vehicle clock model; fed by the link quality TIMESYNC probes"""
+    global _clock
+    with _clock_lock:
+        if _clock is None:
+            _clock = ClockSync()
+        return _clock
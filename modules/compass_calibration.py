@@ -9,6 +9,15 @@ import math
 from PyQt5.QtCore import QObject, pyqtSignal, pyqtProperty, pyqtSlot, QTimer, QMetaObject, Qt
 from pymavlink import mavutil
 
+from modules.mag_calibration import MagCalibrationEngine
+from modules.parameter_query import get_parameter_query
+from modules.clock_sync import get_clock_sync
+
+# Progress comes from ground-side sphere coverage while the autopilot sends no
+# COMPASS_CAL_PROGRESS; only the onboard result can take a bar to 100%
+ONBOARD_PROGRESS_TIMEOUT = 3.0
+COVERAGE_PROGRESS_CAP = 99.0
+
 
 class MissionPlannerCompassCalibration(QObject):
     """
@@ -69,11 +78,14 @@ class MissionPlannerCompassCalibration(QObject):
         self._progress_timeout = 30.0
         self._compass_count = 2  # Track number of compasses
         
-        # CRITICAL FIX: Add simulated progress for testing
-        self._use_simulated_progress = True  # Default to simulation for now
-        self._simulation_timer = QTimer()
-        self._simulation_timer.timeout.connect(self._simulate_progress_update)
-        self._simulation_progress = 0
+        # No MAVLink connection found yet (buzzer calls are only logged)
+        self._use_simulated_progress = True
+        self._last_onboard_progress_time = 0
+        
+        # Ground-side ellipsoid fit over the raw magnetometer stream, used to
+        # cross-check COMPASS_CAL_REPORT
+        self._mag_engine = MagCalibrationEngine(parent=self)
+        self._mag_engine.fitUpdated.connect(self._on_coverage_updated)
         
         # Mission Planner heartbeat timer
         self._heartbeat_timer = QTimer()
@@ -139,24 +151,15 @@ class MissionPlannerCompassCalibration(QObject):
             return 3  # Default assumption
     
         try:
-            # Request parameter list to check for compass parameters
-            self._mavlink_connection.mav.param_request_list_send(
-                self._pixhawk_target_system,
-                self._pixhawk_target_component
-            )
+            # One read per COMPASS_USE* (served from the parameter store when already known)
+            names = ['COMPASS_USE', 'COMPASS_USE2', 'COMPASS_USE3']
+            values = get_parameter_query().fetch(self._mavlink_connection, names).result(timeout=5.0)
             
-            # Look for COMPASS_USE, COMPASS_USE2, COMPASS_USE3 parameters
             compass_count = 0
-            timeout = time.time() + 5.0
-            
-            while time.time() < timeout:
-                msg = self._mavlink_connection.recv_match(type='PARAM_VALUE', blocking=False, timeout=0.1)
-                if msg:
-                    param_name = msg.param_id.decode('utf-8').strip('\x00')
-                    if param_name.startswith('COMPASS_USE'):
-                        if msg.param_value > 0:  # Compass is enabled
-                            compass_count += 1
-                            print(f"[Compass] Found active compass: {param_name} = {msg.param_value}")
+            for param_name in names:
+                if values.get(param_name, 0) > 0:  # Compass is enabled
+                    compass_count += 1
+                    print(f"[Compass] Found active compass: {param_name} = {values[param_name]}")
             
             # If we couldn't detect via parameters, check via COMPASS_CAL_PROGRESS messages
             if compass_count == 0:
@@ -412,7 +415,7 @@ class MissionPlannerCompassCalibration(QObject):
     @pyqtSlot()
     def startCalibration(self):
         """Start calibration with confirmation beep"""
-        if not self.isDroneConnected and not self._use_simulated_progress:
+        if not self.isDroneConnected or not self._mavlink_connection:
             self._set_status("Cannot start calibration - drone not connected")
             return
         
@@ -431,6 +434,7 @@ class MissionPlannerCompassCalibration(QObject):
         self._calibration_success = False
         self._retry_attempt = 0
         self._last_progress_time = time.time()
+        self._last_onboard_progress_time = 0
         
         # CRITICAL FIX: Reset completion tracking
         self._completion_sound_played = False
@@ -443,26 +447,17 @@ class MissionPlannerCompassCalibration(QObject):
         QMetaObject.invokeMethod(self, "_emit_progress_signals", Qt.QueuedConnection)
         
         # PLAY CONFIRMATION BEEP - Short beep when calibration starts
-        if self._mavlink_connection:
-            self._play_pixhawk_buzzer("startup", "Calibration start confirmation")
-        elif self._use_simulated_progress:
-            print("[Compass] Simulation: Start calibration beep played")
+        self._play_pixhawk_buzzer("startup", "Calibration start confirmation")
         
-        # Start appropriate monitoring based on connection
-        if self._use_simulated_progress:
-            # Use simulation for testing
-            self._simulation_progress = 0
-            self._simulation_timer.start(500)  # 500ms updates
-        else:
-            # REAL HARDWARE MODE
-            self._send_compass_calibration_start()
-            
-            # Start monitoring thread
-            self._calibration_thread = threading.Thread(target=self._mavlink_monitoring_worker, daemon=True)
-            self._calibration_thread.start()
-            
-            # Request calibration data streams
-            self._request_calibration_data_streams()
+        self._send_compass_calibration_start()
+        
+        # Start monitoring thread
+        self._calibration_thread = threading.Thread(target=self._mavlink_monitoring_worker, daemon=True)
+        self._calibration_thread.start()
+        
+        # Request calibration data streams; coverage progress comes from the mag samples
+        self._request_calibration_data_streams()
+        self._mag_engine.start()
         
         # Start heartbeat timer for periodic beeps
         self._heartbeat_timer.start(5000)  # Every 5 seconds
@@ -488,8 +483,8 @@ class MissionPlannerCompassCalibration(QObject):
         
         # Stop timers
         self._heartbeat_timer.stop()
-        self._simulation_timer.stop()
         self._completion_timer.stop()
+        self._mag_engine.stop()
         
         # Send MAVLink calibration cancel command
         if self._mavlink_connection:
@@ -589,7 +584,6 @@ class MissionPlannerCompassCalibration(QObject):
         self._calibration_started = False
         self._calibration_active = False
         self._heartbeat_timer.stop()
-        self._simulation_timer.stop()
         self._completion_timer.stop()
         
         # MANUAL REBOOT MESSAGE - No automatic reboot
@@ -598,54 +592,23 @@ class MissionPlannerCompassCalibration(QObject):
         self.calibrationComplete.emit()
         self.calibrationStartedChanged.emit()
     
-    def _simulate_progress_update(self):
-        """IMPROVED: More reliable simulation with completion sound"""
+    @pyqtSlot()
+    def _on_coverage_updated(self):
+        """Drive progress bars and the orientation prompt from sphere coverage"""
         if not self._calibration_active:
-            self._simulation_timer.stop()
             return
         
-        # Increment progress more aggressively
-        self._simulation_progress += 5  # Faster updates
-        
-        # Different rates for realism
-        progress1 = min(100, self._simulation_progress)
-        progress2 = min(100, max(0, self._simulation_progress - 10))
-        progress3 = min(100, max(0, self._simulation_progress - 20))
-        
-        # Direct update using the safe method
-        self._update_progress_safe(0, progress1)
-        self._update_progress_safe(1, progress2)
-        
-        print(f"[Compass] Simulation: {progress1}%, {progress2}%, {progress3}%")
-        
-        # Check orientation milestones
-        self._check_orientation_milestone(progress1)
-        
-        # Complete at 100%
-        if progress1 >= 100:
-            self._simulation_timer.stop()
-            # CRITICAL FIX: Force completion check
-            self._force_completion_check()
-    
-    def _check_orientation_milestone_simulated(self, progress):
-        """Check orientation milestones for simulation"""
-        milestone_points = [15, 30, 45, 60, 75, 90]  # Progress points for each orientation
-        
-        for i, milestone in enumerate(milestone_points):
-            if progress >= milestone and not self._orientations_completed[i]:
-                self._orientations_completed[i] = True
-                self._current_orientation = i + 1
-                
-                print(f"[Compass] Simulated orientation {i + 1}/6 completed at {progress}%")
-                
-                if i < 5:  # Not the last orientation
-                    next_text = self._orientations[i + 1] if i + 1 < len(self._orientations) else "Final orientation"
-                    self._set_status(f"Orientation {i + 2}/6: {next_text}")
-                else:
-                    self._set_status("All orientations complete! Computing calibration...")
-                
-                QMetaObject.invokeMethod(self, "orientationChanged", Qt.QueuedConnection)
-                break
+        results = self._mag_engine.results
+        if time.time() - self._last_onboard_progress_time > ONBOARD_PROGRESS_TIMEOUT:
+            for compass_id in range(2):
+                if results[compass_id]["totalSamples"]:
+                    self._update_progress_safe(compass_id, min(results[compass_id]["coverage"], COVERAGE_PROGRESS_CAP))
+        
+        suggestion = self._mag_engine.suggestedOrientation
+        if suggestion >= 0 and suggestion != self._current_orientation:
+            self._current_orientation = suggestion
+            self.orientationChanged.emit()
+            self._set_status(f"Coverage {self._mag_engine.coverage:.0f}% - {self._orientations[suggestion]}")
     
     def _heartbeat_beep(self):
         """Mission Planner heartbeat beep - periodic tick while calibrating"""
@@ -783,6 +746,7 @@ class MissionPlannerCompassCalibration(QObject):
             
             # Request general data streams that include calibration info
             streams_to_request = [
+                mavutil.mavlink.MAV_DATA_STREAM_RAW_SENSORS,
                 mavutil.mavlink.MAV_DATA_STREAM_EXTENDED_STATUS,
                 mavutil.mavlink.MAV_DATA_STREAM_EXTRA1,
                 mavutil.mavlink.MAV_DATA_STREAM_EXTRA2,
@@ -868,10 +832,6 @@ class MissionPlannerCompassCalibration(QObject):
         last_status_time = time.time()
         no_message_count = 0
         
-        # CRITICAL FIX: Add fallback progress simulation if no real messages
-        fallback_progress = 0
-        last_fallback_time = time.time()
-        
         while not self._stop_calibration and self._calibration_active:
             try:
                 message_received = False
@@ -882,6 +842,7 @@ class MissionPlannerCompassCalibration(QObject):
                         msg = self._mavlink_connection.recv_match(blocking=False, timeout=0.01)
                         
                         if msg:
+                            get_clock_sync().stamp(msg, time.monotonic())
                             msg_type = msg.get_type()
                             message_received = True
                             
@@ -915,36 +876,10 @@ class MissionPlannerCompassCalibration(QObject):
                         else:
                             break  # No more messages
                 
-                # CRITICAL FIX: If no real messages, simulate realistic progress
+                # Without onboard progress, _on_coverage_updated drives the bars
                 current_time = time.time()
                 if not message_received:
                     no_message_count += 1
-                    
-                    # After 5 seconds with no messages, start fallback simulation
-                    if no_message_count > 100 and current_time - last_fallback_time > 1.0:
-                        print("[Compass] AUTO: No MAVLink progress messages - using fallback simulation")
-                        
-                        # Simulate realistic progress rates
-                        fallback_progress += 2  # 2% every second
-                        progress1 = min(100, fallback_progress)
-                        progress2 = min(100, max(0, fallback_progress - 5))
-                        progress3 = min(100, max(0, fallback_progress - 10))
-                        
-                        self._update_progress_safe(0, progress1)
-                        self._update_progress_safe(1, progress2)
-                        self._update_progress_safe(2, progress3)
-                        
-                        print(f"[Compass] AUTO: Fallback progress - M1:{progress1}% M2:{progress2}% M3:{progress3}%")
-                        
-                        # Check for orientation milestones
-                        self._check_orientation_milestone(progress1)
-                        
-                        last_fallback_time = current_time
-                        
-                        # Complete at 100%
-                        if progress1 >= 100:
-                            # CRITICAL FIX: Force completion check
-                            self._force_completion_check()
                 else:
                     no_message_count = 0  # Reset counter when we get messages
                 
@@ -1036,6 +971,7 @@ class MissionPlannerCompassCalibration(QObject):
             # Apply the progress update
             success = False
             if progress_value >= 0:
+                self._last_onboard_progress_time = get_clock_sync().to_wall(getattr(msg, 'gcs_time', time.monotonic()))
                 if compass_id >= 0:
                     # Update specific compass
                     success = self._update_progress_safe(compass_id, progress_value)
@@ -1141,8 +1077,6 @@ class MissionPlannerCompassCalibration(QObject):
             
             # Stop timers
             self._heartbeat_timer.stop()
-            if self._simulation_timer.isActive():
-                self._simulation_timer.stop()
             if self._completion_timer.isActive():
                 self._completion_timer.stop()
     
@@ -1193,6 +1127,8 @@ class MissionPlannerCompassCalibration(QObject):
         print(f"[Compass] === CALIBRATION REPORT ===")
         print(f"[Compass] Cal status: {cal_status}")
         
+        self._cross_check_report(msg)
+        
         if cal_status == 0:  # SUCCESS
             # CRITICAL FIX: Force completion check when we get success report
             self._force_completion_check()
@@ -1230,6 +1166,29 @@ class MissionPlannerCompassCalibration(QObject):
                     self._play_pixhawk_buzzer("failure", "Calibration failed permanently")
                 self.stopCalibration()
     
+    def _cross_check_report(self, msg):
+        """Compare the onboard fit in COMPASS_CAL_REPORT with the ground-side fit"""
+        compass_id = getattr(msg, 'compass_id', 0)
+        if not 0 <= compass_id < 3:
+            return
+        comparison = self._mag_engine.compare_report(
+            compass_id,
+            (msg.ofs_x, msg.ofs_y, msg.ofs_z),
+            (msg.diag_x, msg.diag_y, msg.diag_z),
+            (msg.offdiag_x, msg.offdiag_y, msg.offdiag_z),
+            msg.fitness)
+        if comparison is None:
+            print(f"[Compass] No ground-side fit for compass {compass_id + 1} to cross-check")
+            return
+        print(f"[Compass] Compass {compass_id + 1} cross-check: offsets differ by "
+              f"{comparison['offsetError']:.1f} mGauss, scale by {comparison['diagonalError']:.3f}; "
+              f"fitness onboard {comparison['onboardFitness']:.1f} / ground {comparison['groundFitness']:.1f}")
+    
+    @pyqtProperty(QObject, constant=True)
+    def magFit(self):
+        """Live ground-side fit (MagCalibrationEngine) for QML"""
+        return self._mag_engine
+    
     def _handle_status_message(self, msg):
         """Handle STATUSTEXT messages"""
         try:
@@ -1315,8 +1274,8 @@ class MissionPlannerCompassCalibration(QObject):
             self.stopCalibration()
         
         self._heartbeat_timer.stop()
-        self._simulation_timer.stop()
         self._completion_timer.stop()
+        self._mag_engine.cleanup()
         
         if self._calibration_thread and self._calibration_thread.is_alive():
             self._stop_calibration = True
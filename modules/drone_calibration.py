@@ -3,6 +3,18 @@ from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot, pyqtProperty, QTimer
 from pymavlink import mavutil
 import time
 import math
+import threading
+from collections import deque
+
+from modules.mavlink_thread import MAVLinkThread
+from modules.orientation_classifier import OrientationClassifier
+from modules.accel_solver import solve_six_position
+
+# Rate cap for applying pushed telemetry to the UI
+TELEMETRY_UPDATE_INTERVAL_MS = 100
+CALIBRATION_TELEMETRY = ('ATTITUDE', 'GPS_RAW_INT', 'GLOBAL_POSITION_INT', 'STATUSTEXT')
+IMU_MESSAGES = ('RAW_IMU', 'SCALED_IMU')
+RAW_SENSORS_RATE_HZ = 10
 
 class CalibrationModel(QObject):
     # Signals for QML
@@ -13,6 +25,7 @@ class CalibrationModel(QObject):
     positionCheckChanged = pyqtSignal()
     altitudeDataChanged = pyqtSignal()  # New signal for altitude updates
     gpsDataChanged = pyqtSignal()       # New signal for GPS updates
+    accelFitChanged = pyqtSignal()      # Ground-side accel calibration check
     
     def __init__(self, drone_model):
         super().__init__()
@@ -40,11 +53,21 @@ class CalibrationModel(QObject):
         self._current_roll = 0.0
         self._current_pitch = 0.0
         self._current_yaw = 0.0
-        self._position_tolerance = 15.0  # degrees tolerance for position checking
+        # Calibration positions are classified from the raw accelerometer,
+        # not from EKF attitude (which depends on the calibration in progress)
+        self._orientation = OrientationClassifier()
+        self._imu_source = None
         self._is_position_correct = False
         self._position_check_message = ""
         self._position_check_active = False
         
+        # Ground-side check of the accelerometer calibration: the averaged
+        # accelerometer vector at each confirmed position, solved after the sixth
+        self._accel_captures = [None] * 6
+        self._accel_fit = {}
+        self._autopilot_accel_result = ""
+        self._autopilot_accel_success = False
+        
         # GPS and Altitude properties
         self._current_altitude = 0.0
         self._correct_altitude = 0.0  # Target/reference altitude
@@ -87,15 +110,19 @@ class CalibrationModel(QObject):
         self._feedback_timer.setSingleShot(True)
         self._feedback_timer.timeout.connect(self._clear_feedback)
         
+        # Telemetry is pushed by the MAVLink reader thread; only the newest
+        # message of each type is kept and the position timer drains it at
+        # TELEMETRY_UPDATE_INTERVAL_MS, so the GUI thread never reads the link
+        self._telemetry_lock = threading.Lock()
+        self._pending_telemetry = {}
+        self._pending_statustext = deque(maxlen=50)
+        for msg_type in CALIBRATION_TELEMETRY + IMU_MESSAGES:
+            MAVLinkThread.add_message_listener(msg_type, self._on_telemetry_message)
+        
         # Position monitoring timer
         self._position_timer = QTimer()
         self._position_timer.timeout.connect(self._update_telemetry_data)
-        self._position_timer.start(100)  # Update telemetry every 100ms
-        
-        # Position check timer for stability
-        self._position_stability_timer = QTimer()
-        self._position_stability_timer.setSingleShot(True)
-        self._position_stability_timer.timeout.connect(self._on_position_stable)
+        self._position_timer.start(TELEMETRY_UPDATE_INTERVAL_MS)
         
         # Enhanced auto-reconnection timer
         self._reconnect_timer = QTimer()
@@ -205,23 +232,42 @@ class CalibrationModel(QObject):
     def servoCalibrationComplete(self):
         return self._servo_calibration_complete
     
+    def _on_telemetry_message(self, msg):
+        """MAVLink reader thread: keep the newest message of each type"""
+        msg_type = msg.get_type()
+        if msg_type in IMU_MESSAGES:
+            # Every sample goes into the classifier's window; stick to the
+            # first IMU message seen so units are never mixed
+            if self._imu_source is None:
+                self._imu_source = msg_type
+            if msg_type == self._imu_source:
+                self._orientation.add_sample(msg.xacc, msg.yacc, msg.zacc)
+            return
+        with self._telemetry_lock:
+            if msg_type == 'STATUSTEXT':
+                self._pending_statustext.append(msg.text)
+            else:
+                self._pending_telemetry[msg_type] = msg
+
     @pyqtSlot()
     def _update_telemetry_data(self):
-     """Update current drone telemetry data including attitude, GPS, altitude, and calibration progress"""
+     """Apply the telemetry pushed since the last tick: attitude, GPS, altitude and calibration progress"""
+     with self._telemetry_lock:
+        pending = self._pending_telemetry
+        self._pending_telemetry = {}
+        status_texts = list(self._pending_statustext)
+        self._pending_statustext.clear()
+
      if not self.isDroneConnected or not self._drone_model.drone_connection:
         return
         
      try:
-        # Listen for calibration progress messages FIRST (if calibrating)
+        # Calibration progress messages FIRST (if calibrating)
         if self._level_calibration_active or self._accel_calibration_active:
-            self._listen_for_calibration_progress()
-        
-        # ALWAYS read and update attitude data - use blocking with short timeout
-        # This ensures we get the latest attitude regardless of calibration state
-        attitude_msg = self._drone_model.drone_connection.recv_match(
-            type='ATTITUDE', blocking=True, timeout=0.05
-        )
+            for text in status_texts:
+                self._handle_calibration_status(text)
         
+        attitude_msg = pending.get('ATTITUDE')
         if attitude_msg:
             # Convert from radians to degrees
             self._current_roll = math.degrees(attitude_msg.roll)
@@ -230,16 +276,12 @@ class CalibrationModel(QObject):
             
             # ALWAYS emit signal so UI updates
             self.positionCheckChanged.emit()
-            
-            # Update position check if active
-            if self._position_check_active:
-                self._check_current_position()
         
-        # Get GPS data (non-blocking to avoid delays)
-        gps_msg = self._drone_model.drone_connection.recv_match(
-            type='GPS_RAW_INT', blocking=False, timeout=0
-        )
+        # Re-classify the accelerometer window and update the position check
+        if self._orientation.update() and self._position_check_active:
+            self._check_current_position()
         
+        gps_msg = pending.get('GPS_RAW_INT')
         if gps_msg:
             self._gps_latitude = gps_msg.lat / 1e7  # Convert from 1e7 degrees
             self._gps_longitude = gps_msg.lon / 1e7
@@ -249,11 +291,7 @@ class CalibrationModel(QObject):
             self._vdop = gps_msg.epv / 100.0 if gps_msg.epv != 65535 else 99.99
             self.gpsDataChanged.emit()
         
-        # Get altitude data (non-blocking)
-        global_pos_msg = self._drone_model.drone_connection.recv_match(
-            type='GLOBAL_POSITION_INT', blocking=False, timeout=0
-        )
-        
+        global_pos_msg = pending.get('GLOBAL_POSITION_INT')
         if global_pos_msg:
             self._current_altitude = global_pos_msg.relative_alt / 1000.0  # Convert from mm to m
             
@@ -266,10 +304,7 @@ class CalibrationModel(QObject):
             self.altitudeDataChanged.emit()
             
      except Exception as e:
-        # Only log errors that aren't related to empty buffers
-        error_str = str(e)
-        if "readiness to read but returned no data" not in error_str:
-            print(f"[CalibrationModel] Error reading telemetry: {e}")
+        print(f"[CalibrationModel] Error applying telemetry: {e}")
 
     @pyqtSlot()
     def debugCalibrationStatus(self):
@@ -328,92 +363,26 @@ class CalibrationModel(QObject):
             self._position_check_message = message
             self.positionCheckChanged.emit()
             
-            # If position becomes correct, start stability timer
+            # The classifier only reports a position once the vehicle is still
             if is_correct:
-                self._position_stability_timer.start(2000)  # Wait 2 seconds for stability
-            else:
-                self._position_stability_timer.stop()
+                self._on_position_stable()
     
     def _is_in_required_position(self, position_name):
-     """Check if drone is in the specified position with GPS-corrected nose directions"""
-     tolerance = self._position_tolerance
-    
-    # Get GPS heading correction if available
-     has_gps_lock = self._gps_fix_type >= 3
-     gps_heading = self._current_yaw if has_gps_lock else 0.0
-    
-     if position_name == "Level":
-        # Level: Roll and Pitch should be close to 0
-        roll_ok = abs(self._current_roll) <= tolerance
-        pitch_ok = abs(self._current_pitch) <= tolerance
-        
-        if roll_ok and pitch_ok:
-            return True, f"✅ Drone is level (Roll: {self._current_roll:.1f}°, Pitch: {self._current_pitch:.1f}°)"
-        else:
-            return False, f"⚠️ Place drone level - Current: Roll {self._current_roll:.1f}°, Pitch {self._current_pitch:.1f}°"
-            
-     elif position_name == "Left":
-        # Left side: Roll should be around -90°, pitch near 0
-        roll_target = -90
-        roll_ok = abs(self._current_roll - roll_target) <= tolerance
-        pitch_ok = abs(self._current_pitch) <= tolerance
-        
-        if roll_ok and pitch_ok:
-            return True, f"✅ Drone is on left side (Roll: {self._current_roll:.1f}°)"
-        else:
-            return False, f"⚠️ Place drone on LEFT side - Current: Roll {self._current_roll:.1f}° (need ~-90°), Pitch {self._current_pitch:.1f}°"
-            
-     elif position_name == "Right":
-        # Right side: Roll should be around +90°, pitch near 0
-        roll_target = 90
-        roll_ok = abs(self._current_roll - roll_target) <= tolerance
-        pitch_ok = abs(self._current_pitch) <= tolerance
-        
-        if roll_ok and pitch_ok:
-            return True, f"✅ Drone is on right side (Roll: {self._current_roll:.1f}°)"
-        else:
-            return False, f"⚠️ Place drone on RIGHT side - Current: Roll {self._current_roll:.1f}° (need ~+90°), Pitch {self._current_pitch:.1f}°"
-            
-     elif position_name == "Nose Down":
-        # Nose down: Pitch should be around +90° (nose pointing down towards ground)
-        # Roll should be near 0
-        pitch_target = 90
-        pitch_ok = abs(self._current_pitch - pitch_target) <= tolerance
-        roll_ok = abs(self._current_roll) <= tolerance
-        
-        gps_info = f", GPS heading: {gps_heading:.1f}°" if has_gps_lock else " (No GPS lock)"
-        
-        if pitch_ok and roll_ok:
-            return True, f"✅ Drone nose is down (Pitch: {self._current_pitch:.1f}°{gps_info})"
-        else:
-            return False, f"⚠️ Place drone NOSE DOWN (vertical, nose to ground) - Current: Pitch {self._current_pitch:.1f}° (need ~+90°), Roll {self._current_roll:.1f}°{gps_info}"
-            
-     elif position_name == "Nose Up":
-        # Nose up: Pitch should be around -90° (nose pointing up, tail down)
-        # Roll should be near 0
-        pitch_target = -90
-        pitch_ok = abs(self._current_pitch - pitch_target) <= tolerance
-        roll_ok = abs(self._current_roll) <= tolerance
-        
-        gps_info = f", GPS heading: {gps_heading:.1f}°" if has_gps_lock else " (No GPS lock)"
-        
-        if pitch_ok and roll_ok:
-            return True, f"✅ Drone nose is up (Pitch: {self._current_pitch:.1f}°{gps_info})"
-        else:
-            return False, f"⚠️ Place drone NOSE UP (vertical, tail to ground) - Current: Pitch {self._current_pitch:.1f}° (need ~-90°), Roll {self._current_roll:.1f}°{gps_info}"
-            
-     elif position_name == "Back":
-        # Upside down: Roll should be around ±180°, pitch near 0
-        # Accept either +180 or -180
-        roll_ok = (abs(abs(self._current_roll) - 180) <= tolerance)
-        pitch_ok = abs(self._current_pitch) <= tolerance
-        
-        if roll_ok and pitch_ok:
-            return True, f"✅ Drone is upside down (Roll: {self._current_roll:.1f}°)"
-        else:
-            return False, f"⚠️ Place drone UPSIDE DOWN - Current: Roll {self._current_roll:.1f}° (need ~±180°), Pitch {self._current_pitch:.1f}°"
-    
-     return False, f"Unknown position: {position_name}"
+     """Check if the raw accelerometer shows the vehicle steady in the specified position"""
+     orientation = self._orientation
+     
+     if position_name not in self._position_names:
+        return False, f"Unknown position: {position_name}"
+     
+     if orientation.is_confirmed(position_name):
+        return True, f"✅ Drone is steady in position: {position_name} ({orientation.angle:.1f}° off)"
+     
+     detected = orientation.orientation_name
+     if detected is None:
+        return False, f"⚠️ Place drone {position_name.upper()} - no clear orientation ({orientation.angle:.0f}° from nearest)"
+     if detected != position_name:
+        return False, f"⚠️ Place drone {position_name.upper()} - currently {detected}"
+     return False, f"⚠️ {position_name} detected - hold the drone still"
     
     # Additional calibration methods
     @pyqtSlot()
@@ -626,17 +595,33 @@ class CalibrationModel(QObject):
         self._position_check_active = True
         self._is_position_correct = False
         self._position_check_message = "Checking drone position..."
+        self._request_raw_sensors()
         self.positionCheckChanged.emit()
         self._set_feedback("📍 Position checking active - Move drone to required position")
         return True
     
+    def _request_raw_sensors(self):
+        """Ask for RAW_IMU/SCALED_IMU so the orientation classifier has samples"""
+        connection = self._drone_model.drone_connection if self._drone_model else None
+        if not connection:
+            return
+        try:
+            connection.mav.request_data_stream_send(
+                connection.target_system,
+                connection.target_component,
+                mavutil.mavlink.MAV_DATA_STREAM_RAW_SENSORS,
+                RAW_SENSORS_RATE_HZ,
+                1   # start streaming
+            )
+        except Exception as e:
+            print(f"[CalibrationModel] Error requesting raw sensors: {e}")
+    
     @pyqtSlot()
     def stopPositionCheck(self):
         """Stop checking drone position"""
         self._position_check_active = False
         self._is_position_correct = False
         self._position_check_message = ""
-        self._position_stability_timer.stop()
         self.positionCheckChanged.emit()
     
     @pyqtSlot()
@@ -678,6 +663,9 @@ class CalibrationModel(QObject):
             # Reset reconnection attempts
             self._reconnection_attempts = 0
             
+            # Keep the accelerometer stream up for orientation checks
+            self._request_raw_sensors()
+            
             # If drone reconnects after reboot, reset reboot flag
             if self._is_rebooting:
                 self._is_rebooting = False
@@ -724,6 +712,11 @@ class CalibrationModel(QObject):
     @pyqtProperty(bool, notify=accelCalibrationProgressChanged)
     def allPositionsCompleted(self):
         return self._all_positions_completed
+    
+    @pyqtProperty('QVariantMap', notify=accelFitChanged)
+    def accelFit(self):
+        """Ground-side 6-position fit (see accel_solver) next to the autopilot's own result"""
+        return self._accel_fit
 
     # General Properties
     @pyqtProperty(str, notify=feedbackMessageChanged)
@@ -837,6 +830,7 @@ class CalibrationModel(QObject):
      self._current_step = 0
      self._completed_steps = [False] * 6
      self._all_positions_completed = False
+     self._reset_accel_check()
      self._update_all_calibrations_status()
     
     # Start position checking for first position
@@ -907,8 +901,9 @@ class CalibrationModel(QObject):
         self._set_feedback(f"❌ {message} - Cannot proceed until drone is in correct position!")
         return
         
-    # Mark current position as completed
+    # Mark current position as completed and keep its averaged accelerometer vector
      self._completed_steps[self._current_step] = True
+     self._accel_captures[self._current_step] = self._orientation.mean.copy()
     
     # Send MAVLink ACK for this position to ArduPilot
      if self._drone_model and self._drone_model.drone_connection:
@@ -942,38 +937,73 @@ class CalibrationModel(QObject):
      else:
         self._all_positions_completed = True
         self.stopPositionCheck()
-        self._set_feedback("🎉 All positions completed and verified! Click 'Done' to finish.")
+        fit = self._solve_accel_check()
+        if not fit or fit["verdict"] != "suspect":
+            quality = f" Ground check: {fit['quality']}." if fit else ""
+            self._set_feedback(f"🎉 All positions completed and verified!{quality} Click 'Done' to finish.")
     
      self.accelCalibrationProgressChanged.emit()
 
-    def _listen_for_calibration_progress(self):
-     """Listen for STATUSTEXT messages from ArduPilot during calibration"""
-     if not self._drone_model or not self._drone_model.drone_connection:
-        return
-        
-     try:
-        # Check for STATUSTEXT messages (non-blocking)
-        status_msg = self._drone_model.drone_connection.recv_match(
-            type='STATUSTEXT', blocking=False, timeout=0
-        )
-        
-        if status_msg:
-            text = status_msg.text
-            print(f"[CalibrationModel] ArduPilot: {text}")
-            
-            # Parse calibration messages
-            if "Place" in text or "position" in text.lower():
-                self._set_feedback(f"📍 ArduPilot: {text}")
-            elif "Calibration" in text:
-                if "successful" in text.lower() or "complete" in text.lower():
-                    self._set_feedback(f"✅ {text}")
-                elif "failed" in text.lower() or "error" in text.lower():
-                    self._set_feedback(f"❌ {text}")
-                else:
-                    self._set_feedback(f"ℹ️ {text}")
-                    
-     except Exception as e:
-        pass  # Ignore read errors
+    def _handle_calibration_status(self, text):
+     """Parse a STATUSTEXT from ArduPilot received during calibration"""
+     print(f"[CalibrationModel] ArduPilot: {text}")
+     
+     if "Place" in text or "position" in text.lower():
+        self._set_feedback(f"📍 ArduPilot: {text}")
+     elif "Calibration" in text:
+        if "successful" in text.lower() or "complete" in text.lower():
+            self._set_feedback(f"✅ {text}")
+            if self._accel_calibration_active:
+                self._record_autopilot_accel_result(text, True)
+        elif "failed" in text.lower() or "error" in text.lower():
+            self._set_feedback(f"❌ {text}")
+            if self._accel_calibration_active:
+                self._record_autopilot_accel_result(text, False)
+        else:
+            self._set_feedback(f"ℹ️ {text}")
+    
+    def _reset_accel_check(self):
+        self._accel_captures = [None] * 6
+        self._accel_fit = {}
+        self._autopilot_accel_result = ""
+        self._autopilot_accel_success = False
+        self.accelFitChanged.emit()
+    
+    def _solve_accel_check(self):
+        """Solve the six captured positions on the ground side"""
+        fit = solve_six_position(self._accel_captures)
+        if fit is None:
+            print("[CalibrationModel] Ground accel check skipped: not all positions captured")
+            return None
+        fit["source"] = self._imu_source or ""
+        fit["autopilot"] = self._autopilot_accel_result
+        self._accel_fit = fit
+        print(f"[CalibrationModel] Ground accel check: {fit['quality']}, offsets {fit['offsets']} mG, "
+              f"scale {fit['scale']}, residual {fit['residualRms']} mG")
+        self._update_accel_verdict()
+        return fit
+    
+    def _record_autopilot_accel_result(self, text, success):
+        self._autopilot_accel_result = text
+        self._autopilot_accel_success = success
+        if self._accel_fit:
+            self._accel_fit["autopilot"] = text
+            self._update_accel_verdict()
+    
+    def _update_accel_verdict(self):
+        """Compare the ground-side fit with what the autopilot reported"""
+        fit = self._accel_fit
+        if not self._autopilot_accel_result:
+            fit["verdict"] = "pending"
+        elif not self._autopilot_accel_success:
+            fit["verdict"] = "failed"
+        elif fit["quality"] == "poor":
+            fit["verdict"] = "suspect"
+            self._set_feedback("⚠️ Autopilot accepted the calibration but the ground check disagrees ("
+                               + ", ".join(fit["problems"]) + ") - recalibrate before flight")
+        else:
+            fit["verdict"] = "confirmed"
+        self.accelFitChanged.emit()
     
     @pyqtSlot()
     def completeAccelCalibration(self):
@@ -1274,6 +1304,9 @@ class CalibrationModel(QObject):
         
         self._auto_reconnect_enabled = False
         
+        for msg_type in CALIBRATION_TELEMETRY + IMU_MESSAGES:
+            MAVLinkThread.remove_message_listener(msg_type, self._on_telemetry_message)
+        
         if self._drone_model:
             try:
                 self._drone_model.droneConnectedChanged.disconnect(self._on_drone_connection_changed)
@@ -1282,8 +1315,7 @@ class CalibrationModel(QObject):
         
         # Stop all timers
         timers = [self._level_timer, self._feedback_timer, self._reconnect_timer, 
-                 self._heartbeat_timer, self._stability_timer, self._position_timer,
-                 self._position_stability_timer]
+                 self._heartbeat_timer, self._stability_timer, self._position_timer]
         for timer in timers:
             if timer.isActive():
                 timer.stop()
@@ -7,12 +7,32 @@ from pymavlink import mavutil
 from pymavlink.dialects.v20 import ardupilotmega as mavlink_dialect
 from pymavlink.dialects.v20 import common as mavlink_common
 from pymavlink.dialects.v20 import ardupilotmega as mavutil_ardupilot
+from modules.parameter_search import ParameterSearchIndex
+from modules.parameter_metadata import get_parameter_metadata
+from modules.mavlink_thread import MAVLinkThread
+from modules import parameter_files
+from modules.parameter_journal import (
+    get_parameter_journal, vehicle_key, board_key, set_board_identity, has_board_identity,
+    clear_board_identities
+)
+from modules.link_quality import get_link_quality
+from modules.parameter_query import get_parameter_query
+from modules.mission_transfer import (
+    MissionTransferEngine, MISSION_TYPE_MISSION, MISSION_TYPE_FENCE, MISSION_TYPE_RALLY
+)
+
+IDENTITY_RETRY = 5.0  # seconds between AUTOPILOT_VERSION requests until the board answers
+
 
 class DroneCommander(QObject):
     commandFeedback = pyqtSignal(str)
     armDisarmCompleted = pyqtSignal(bool, str)
     parametersUpdated = pyqtSignal()  # FIXED: No arguments, QML will read property
     parameterReceived = pyqtSignal(str, float)  # Individual parameter updates
+    parameterBatchProgress = pyqtSignal(int, int)  # written, total
+    parameterBatchCompleted = pyqtSignal(bool, str)
+    missionUploadSuccess = pyqtSignal(int)  # waypoint count
+    missionUploadFailed = pyqtSignal(str)
 
    # Add to __init__
     def __init__(self, drone_model):
@@ -23,6 +43,29 @@ class DroneCommander(QObject):
      self._fetching_params = False
      self._param_queue = queue.Queue()
      self._param_request_active = False
+     self._param_index = ParameterSearchIndex()
+     self._param_metadata = get_parameter_metadata()
+    
+    # Batched parameter writes (acknowledged via PARAM_VALUE echo)
+     self._pending_param_writes = {}
+     self._pending_write_lock = threading.Lock()
+     self._batch_write_active = False
+     MAVLinkThread.add_message_listener('PARAM_VALUE', self._on_param_value)
+    
+    # Parameter change journal (history, snapshots, rollback)
+     self._journal = get_parameter_journal()
+     MAVLinkThread.add_message_listener('HEARTBEAT', self._on_heartbeat_for_journal)
+     MAVLinkThread.add_message_listener('AUTOPILOT_VERSION', self._on_autopilot_version)
+     self._identity_requested = {}  # sysid -> time AUTOPILOT_VERSION was last requested
+     get_link_quality().add_reset_listener(self._forget_board_identities)
+    
+    # Shared parameter store for targeted reads; created here so it sees the full download
+     self._param_query = get_parameter_query()
+    
+    # Mission/fence/rally transfers (event-driven, RTT-bounded)
+     self.mission_transfer = MissionTransferEngine(drone_model)
+     self.mission_transfer.transferCompleted.connect(self._on_mission_transfer_completed)
+     self._mission_upload = None  # waypoints and kind of the mission upload in progress
     
     # Mode change protection
      self._mode_change_in_progress = False
@@ -858,25 +901,10 @@ class DroneCommander(QObject):
         return -1
     
      try:
-        # Request specific parameter
-        self._drone.mav.param_request_read_send(
-            self._drone.target_system,
-            self._drone.target_component,
-            b'FLTMODE_CH',
-            -1  # param_index: -1 means use param_id
-        )
-        
-        # Wait for response
-        start_time = time.time()
-        timeout = 3
-        while time.time() - start_time < timeout:
-            msg = self._drone.recv_match(type='PARAM_VALUE', blocking=True, timeout=0.1)
-            if msg:
-                param_name = msg.param_id.decode('utf-8').strip('\x00')
-                if param_name == 'FLTMODE_CH':
-                    print(f"[DroneCommander] FLTMODE_CH current value: {msg.param_value}")
-                    return int(msg.param_value)
-            QThread.msleep(10)
+        values = self._param_query.fetch(self._drone, ['FLTMODE_CH']).result(timeout=3)
+        if 'FLTMODE_CH' in values:
+            print(f"[DroneCommander] FLTMODE_CH current value: {values['FLTMODE_CH']}")
+            return int(values['FLTMODE_CH'])
         
         print("[DroneCommander] Timeout reading FLTMODE_CH")
         return -1
@@ -887,6 +915,10 @@ class DroneCommander(QObject):
      
     @pyqtSlot('QVariantList', result=bool)
     def uploadMission(self, waypoints):
+        """
+        Start a full mission upload. Returns once the transfer has started;
+        the outcome arrives as missionUploadSuccess or missionUploadFailed.
+        """
         if not self._is_drone_ready(): 
             self._speak("Error. Drone not connected.")
             return False
@@ -900,170 +932,21 @@ class DroneCommander(QObject):
         self._speak(f"Uploading mission with {len(waypoints)} waypoints.")
 
         try:
-            print("\n=== MISSION UPLOAD DIAGNOSTICS ===")
-            print(f"Connection object: {type(self._drone)}")
-            print(f"Target system: {self._drone.target_system}")
-            print(f"Target component: {self._drone.target_component}")
-            print(f"Source system: {getattr(self._drone, 'source_system', 'Unknown')}")
-            print(f"Source component: {getattr(self._drone, 'source_component', 'Unknown')}")
-            print(f"Connection port: {getattr(self._drone, 'port', 'Unknown')}")
-            print("=====================================\n")
-            
-            print("[DroneCommander] Testing basic communication...")
-            
-            self._drone.mav.heartbeat_send(
-                mavutil.mavlink.MAV_TYPE_GCS,
-                mavutil.mavlink.MAV_AUTOPILOT_INVALID,
-                0, 0, 0
-            )
-            
-            print("[DroneCommander] Listening for ANY messages from drone...")
-            message_count = 0
-            start_time = time.time()
-            
-            while time.time() - start_time < 3:
-                msg = self._drone.recv_match(blocking=False, timeout=0.1)
-                if msg:
-                    message_count += 1
-                    print(f"[DroneCommander] Received: {msg.get_type()} from system {msg.get_srcSystem()}")
-                    
-                    if msg.get_type() == 'HEARTBEAT':
-                        print(f"  - Heartbeat details: type={msg.type}, autopilot={msg.autopilot}")
-                    elif msg.get_type() == 'MISSION_ACK':
-                        print(f"  - Mission ACK: type={msg.type}")
-                    elif msg.get_type() == 'MISSION_REQUEST':
-                        print(f"  - Mission Request: seq={msg.seq}")
-                        
-                if message_count > 0 and message_count % 10 == 0:
-                    print(f"[DroneCommander] Received {message_count} messages so far...")
-            
-            print(f"[DroneCommander] Total messages received in 3s: {message_count}")
-            
-            if message_count == 0:
-                self.commandFeedback.emit("ERROR: No messages received from drone - connection may be broken")
-                self._speak("Error. No messages received from drone.")
-                print("[DroneCommander ERROR] No communication with drone detected")
+            mission_waypoints = self._build_mission_items(waypoints)
+            print(f"[DroneCommander] Prepared {len(mission_waypoints)} waypoints")
+
+            # Each step is bounded by the engine's own retry budget, so the
+            # transfer always ends in transferCompleted
+            self._mission_upload = {'waypoints': list(waypoints), 'partial': False}
+            if not self.mission_transfer.upload(MISSION_TYPE_MISSION, mission_waypoints):
+                self._mission_upload = None
+                self.commandFeedback.emit("Error: Mission transfer already in progress.")
+                self._speak("Error. Mission transfer already in progress.")
                 return False
-            
-            if self._drone.target_system == 0:
-                self._drone.target_system = 1
-                print("[DroneCommander] Set target_system to 1")
-            
-            if self._drone.target_component == 0:
-                self._drone.target_component = 1
-                print("[DroneCommander] Set target_component to 1")
-            
-            print("[DroneCommander] Testing mission protocol - requesting current mission...")
-            self._drone.mav.mission_request_list_send(
-                self._drone.target_system,
-                self._drone.target_component
-            )
-            
-            mission_protocol_works = False
-            start_time = time.time()
-            while time.time() - start_time < 8:
-                msg = self._drone.recv_match(type=['MISSION_COUNT', 'MISSION_ACK'], blocking=False, timeout=0.5)
-                if msg:
-                    print(f"[DroneCommander] Mission protocol test result: {msg.get_type()}")
-                    if msg.get_type() == 'MISSION_COUNT':
-                        print(f"  - Current mission has {msg.count} waypoints")
-                        mission_protocol_works = True
-                        break
-                    elif msg.get_type() == 'MISSION_ACK':
-                        print(f"  - Mission ACK: {msg.type}")
-                        if msg.type == mavutil.mavlink.MAV_MISSION_ACCEPTED or msg.type == mavutil.mavlink.MAV_MISSION_NO_SPACE:
-                            mission_protocol_works = True
-                            break
-            
-            if not mission_protocol_works:
-                print("[DroneCommander] Mission protocol test failed, but continuing anyway...")
-                print("[DroneCommander] This is common with some SITL configurations")
-            else:
-                print("[DroneCommander] Mission protocol is working, proceeding with upload...")
-            
-            print("[DroneCommander] Clearing existing mission...")
-            self._drone.mav.mission_clear_all_send(
-                self._drone.target_system,
-                self._drone.target_component
-            )
-            
-            clear_ack = self._drone.recv_match(type='MISSION_ACK', blocking=True, timeout=3)
-            if clear_ack:
-                print(f"[DroneCommander] Mission clear result: {clear_ack.type}")
-            else:
-                print("[DroneCommander] No clear acknowledgment received, continuing...")
-            
-            time.sleep(0.5)
-            
-            mission_waypoints = []
-            
-            current_lat = self.drone_model.telemetry.get('lat', 0.0)
-            current_lon = self.drone_model.telemetry.get('lon', 0.0)
-            takeoff_alt = waypoints[0].get('z', 10.0) if waypoints else 10.0
-            
-            print(f"[DroneCommander] Current position: {current_lat:.6f}, {current_lon:.6f}")
-            
-            takeoff_waypoint = {
-                'seq': 0,
-                'frame': mavutil.mavlink.MAV_FRAME_GLOBAL_RELATIVE_ALT_INT,
-                'command': mavutil.mavlink.MAV_CMD_NAV_TAKEOFF,
-                'current': 1,
-                'autocontinue': 1,
-                'param1': 0, 'param2': 0, 'param3': 0, 'param4': 0,
-                'x': current_lat, 'y': current_lon, 'z': takeoff_alt
-            }
-            mission_waypoints.append(takeoff_waypoint)
-            
-            for i, wp in enumerate(waypoints):
-                waypoint = {
-                    'seq': i + 1,
-                    'frame': mavutil.mavlink.MAV_FRAME_GLOBAL_RELATIVE_ALT_INT,
-                    'command': mavutil.mavlink.MAV_CMD_NAV_WAYPOINT,
-                    'current': 0,
-                    'autocontinue': 1,
-                    'param1': 0, 'param2': 0, 'param3': 0, 'param4': 0,
-                    'x': wp.get('x', 0), 'y': wp.get('y', 0), 'z': wp.get('z', 10)
-                }
-                mission_waypoints.append(waypoint)
-            
-            total_waypoints = len(mission_waypoints)
-            print(f"[DroneCommander] Prepared {total_waypoints} waypoints")
-            
-            print(f"[DroneCommander] Sending MISSION_COUNT: {total_waypoints}")
-            self._drone.mav.mission_count_send(
-                self._drone.target_system,
-                self._drone.target_component,
-                total_waypoints
-            )
-            
-            print("[DroneCommander] Monitoring for mission response...")
-            start_time = time.time()
-            timeout = 10
-            
-            while time.time() - start_time < timeout:
-                msg = self._drone.recv_match(blocking=False, timeout=0.1)
-                if msg:
-                    msg_type = msg.get_type()
-                    print(f"[DroneCommander] Received during mission upload: {msg_type}")
-                    
-                    if msg_type == 'MISSION_REQUEST':
-                        print(f"[DroneCommander] SUCCESS: Mission request for seq {msg.seq}")
-                        if msg.seq == 0:
-                            return self._send_waypoints_inline(mission_waypoints)
-                        
-                    elif msg_type == 'MISSION_ACK':
-                        print(f"[DroneCommander] Mission ACK during upload: {msg.type}")
-                        if msg.type != mavutil.mavlink.MAV_MISSION_ACCEPTED:
-                            self.commandFeedback.emit(f"Mission rejected: {msg.type}")
-                            self._speak("Mission rejected.")
-                            return False
-            
-            self.commandFeedback.emit("ERROR: No mission request received - drone not accepting missions")
-            self._speak("Error. No mission request received.")
-            print("[DroneCommander ERROR] No mission request received after mission count")
-            return False
-             
+            return True
+
         except Exception as e:
+            self._mission_upload = None
             self.commandFeedback.emit(f"Mission upload error: {str(e)}")
             self._speak("Mission upload error.")
             print(f"[DroneCommander ERROR] Exception: {e}")
@@ -1071,97 +954,117 @@ class DroneCommander(QObject):
             traceback.print_exc()
             return False
 
-    def _send_waypoints_inline(self, waypoints):
-        """Send all waypoints in response to mission requests - inline implementation"""
-        try:
-            total_waypoints = len(waypoints)
-            waypoints_sent = 0
-            
-            wp = waypoints[0]
-            x_int = int(wp['x'] * 1e7)
-            y_int = int(wp['y'] * 1e7)
-            z_float = float(wp['z'])
-            
-            self._drone.mav.mission_item_int_send(
-                self._drone.target_system, self._drone.target_component,
-                wp['seq'], wp['frame'], wp['command'], wp['current'], wp['autocontinue'],
-                wp['param1'], wp['param2'], wp['param3'], wp['param4'],
-                x_int, y_int, z_float
-            )
-            print(f"[DroneCommander] Sent waypoint 0: cmd={wp['command']}, lat={wp['x']:.6f}, lon={wp['y']:.6f}, alt={wp['z']}")
-            waypoints_sent = 1
-            
-            while waypoints_sent < total_waypoints:
-                print(f"[DroneCommander] Waiting for mission request {waypoints_sent}...")
-                
-                start_time = time.time()
-                request_received = False
-                expected_seq = waypoints_sent
-                
-                while time.time() - start_time < 15:
-                    msg = self._drone.recv_match(type=['MISSION_REQUEST', 'MISSION_ACK'], blocking=False, timeout=0.5)
-                    
-                    if msg:
-                        if msg.get_type() == 'MISSION_REQUEST':
-                            print(f"[DroneCommander] Got mission request for seq {msg.seq} (expected {expected_seq})")
-                            request_received = True
-                            
-                            if msg.seq < total_waypoints:
-                                wp_to_send = waypoints[msg.seq]
-                                
-                                x_int = int(wp_to_send['x'] * 1e7)
-                                y_int = int(wp_to_send['y'] * 1e7)
-                                z_float = float(wp_to_send['z'])
-                                
-                                self._drone.mav.mission_item_int_send(
-                                    self._drone.target_system, self._drone.target_component,
-                                    wp_to_send['seq'], wp_to_send['frame'], wp_to_send['command'], 
-                                    wp_to_send['current'], wp_to_send['autocontinue'],
-                                    wp_to_send['param1'], wp_to_send['param2'], wp_to_send['param3'], wp_to_send['param4'],
-                                    x_int, y_int, z_float
-                                )
-                                print(f"[DroneCommander] Sent waypoint {msg.seq}: cmd={wp_to_send['command']}, lat={wp_to_send['x']:.6f}, lon={wp_to_send['y']:.6f}, alt={wp_to_send['z']}")
-                                
-                                if msg.seq == expected_seq:
-                                    waypoints_sent += 1
-                                elif msg.seq >= waypoints_sent:
-                                    waypoints_sent = msg.seq + 1
-                                    
-                            break
-                            
-                        elif msg.get_type() == 'MISSION_ACK':
-                            print(f"[DroneCommander] Received early mission ACK: {msg.type}")
-                            if msg.type == mavutil.mavlink.MAV_MISSION_ACCEPTED:
-                                print("[DroneCommander] Mission completed successfully (early ACK)")
-                                self.commandFeedback.emit("Mission upload successful!")
-                                self._speak("Mission upload successful.")
-                                return True
-                            else:
-                                error_msg = f"Mission rejected during upload: {msg.type}"
-                                print(f"[DroneCommander] {error_msg}")
-                                self.commandFeedback.emit(error_msg)
-                                self._speak("Mission rejected during upload.")
-                                return False
-                
-                if not request_received:
-                    error_msg = f"Timeout waiting for mission request {expected_seq}"
-                    print(f"[DroneCommander ERROR] {error_msg}")
-                    self.commandFeedback.emit(error_msg)
-                    self._speak("Timeout waiting for mission request.")
-                    return False
-            
-            print("[DroneCommander] All waypoints sent successfully")
+    @pyqtSlot('QVariantList', result=bool)
+    def updateMission(self, waypoints):
+        """
+        Send only the waypoints that changed since the last confirmed upload.
+        Falls back to a full upload when the waypoint count changed or no
+        mission has been confirmed yet. Like uploadMission, the result is
+        reported through missionUploadSuccess / missionUploadFailed.
+        """
+        if not self._is_drone_ready():
+            return False
+        if not waypoints:
+            return self.uploadMission(waypoints)
+
+        items = self._build_mission_items(waypoints)
+        confirmed = self.mission_transfer.confirmed_items(MISSION_TYPE_MISSION)
+        if confirmed:
+            # Keep the uploaded takeoff item; it is built from the position at upload time
+            items[0] = confirmed[0]
+
+        plan, dirty = self.mission_transfer.plan_update(MISSION_TYPE_MISSION, items)
+        if plan == "full":
+            return self.uploadMission(waypoints)
+        if plan == "none":
+            self.commandFeedback.emit("Mission unchanged - nothing to upload")
+            self.missionUploadSuccess.emit(len(waypoints))
+            return True
+
+        start, end = dirty
+        print(f"[DroneCommander] Partial mission update: items {start}-{end} of {len(items)}")
+        self.commandFeedback.emit(f"Updating waypoints {start}-{end}...")
+        self._mission_upload = {'waypoints': list(waypoints), 'partial': True}
+        if not self.mission_transfer.upload_partial(MISSION_TYPE_MISSION, items, start, end):
+            self._mission_upload = None
+            return self.uploadMission(waypoints)
+        return True
+
+    @pyqtSlot(bool, str)
+    def _on_mission_transfer_completed(self, success, message):
+        """End of a mission transfer; fence, rally and downloads are not ours"""
+        upload, self._mission_upload = self._mission_upload, None
+        if upload is None:
+            return
+        count = len(upload['waypoints'])
+        if upload['partial']:
+            if success:
+                self.commandFeedback.emit("Mission updated!")
+                self._speak("Mission updated.")
+                self.missionUploadSuccess.emit(count)
+                return
+            print(f"[DroneCommander] ⚠️ Partial update failed ({message}), falling back to full upload")
+            if not self.uploadMission(upload['waypoints']):
+                self.missionUploadFailed.emit(message)
+            return
+
+        if success:
             self.commandFeedback.emit("Mission upload successful!")
             self._speak("Mission upload successful.")
-            return True
-            
-        except Exception as e:
-            print(f"[DroneCommander ERROR] Waypoint sending failed: {e}")
-            import traceback
-            traceback.print_exc()
-            self.commandFeedback.emit(f"Mission upload error: {str(e)}")
-            self._speak("Mission upload error.")
+            self.missionUploadSuccess.emit(count)
+        else:
+            self.commandFeedback.emit(f"Mission upload failed: {message}")
+            self._speak("Mission upload failed.")
+            self.missionUploadFailed.emit(message)
+
+    def _build_mission_items(self, waypoints):
+        """Takeoff at the current position followed by one NAV_WAYPOINT per waypoint"""
+        current_lat = self.drone_model.telemetry.get('lat', 0.0) or 0.0
+        current_lon = self.drone_model.telemetry.get('lon', 0.0) or 0.0
+        takeoff_alt = waypoints[0].get('z', 10.0) if waypoints else 10.0
+
+        print(f"[DroneCommander] Current position: {current_lat:.6f}, {current_lon:.6f}")
+
+        mission_waypoints = [{
+            'seq': 0,
+            'frame': mavutil.mavlink.MAV_FRAME_GLOBAL_RELATIVE_ALT_INT,
+            'command': mavutil.mavlink.MAV_CMD_NAV_TAKEOFF,
+            'current': 1,
+            'autocontinue': 1,
+            'param1': 0, 'param2': 0, 'param3': 0, 'param4': 0,
+            'x': current_lat, 'y': current_lon, 'z': takeoff_alt
+        }]
+
+        for i, wp in enumerate(waypoints):
+            mission_waypoints.append({
+                'seq': i + 1,
+                'frame': mavutil.mavlink.MAV_FRAME_GLOBAL_RELATIVE_ALT_INT,
+                'command': mavutil.mavlink.MAV_CMD_NAV_WAYPOINT,
+                'current': 0,
+                'autocontinue': 1,
+                'param1': 0, 'param2': 0, 'param3': 0, 'param4': 0,
+                'x': wp.get('x', 0), 'y': wp.get('y', 0), 'z': wp.get('z', 10)
+            })
+        return mission_waypoints
+
+    @pyqtSlot(result=bool)
+    def downloadMission(self):
+        """Read the vehicle's mission in the background; result via missionTransfer.itemsDownloaded"""
+        if not self._is_drone_ready():
+            return False
+        return self.mission_transfer.download(MISSION_TYPE_MISSION)
+
+    @pyqtSlot('QVariantList', result=bool)
+    def uploadFence(self, items):
+        if not self._is_drone_ready():
             return False
+        return self.mission_transfer.upload(MISSION_TYPE_FENCE, items)
+
+    @pyqtSlot('QVariantList', result=bool)
+    def uploadRallyPoints(self, items):
+        if not self._is_drone_ready():
+            return False
+        return self.mission_transfer.upload(MISSION_TYPE_RALLY, items)
 
     @pyqtSlot(result=bool)
     def requestAllParameters(self):
@@ -1253,9 +1156,7 @@ class DroneCommander(QObject):
                             "count": param_count,
                             "synced": True,
                             "default": "0",
-                            "units": "",
-                            "range": "",
-                            "description": ""
+                            **self._param_metadata.fields(param_id)
                         }
                         
                         # Progress update every 50 params
@@ -1284,6 +1185,9 @@ class DroneCommander(QObject):
         if final_count > 0:
             with self._param_lock:
                 self._parameters = collected_params
+            self._param_index.rebuild(collected_params)
+            if self._journal:
+                self._journal.snapshot(self._vehicle_key(), collected_params, "download")
             
             print(f"[DroneCommander] 📤 Emitting parametersUpdated signal...")
             self.parametersUpdated.emit()
@@ -1398,9 +1302,7 @@ class DroneCommander(QObject):
                             "count": param_count,
                             "synced": True,
                             "default": "0",
-                            "units": "",
-                            "range": "",
-                            "description": ""
+                            **self._param_metadata.fields(param_id)
                         }
                         
                         # Progress update every 25 params
@@ -1609,10 +1511,10 @@ class DroneCommander(QObject):
                         "count": param_count,
                         "synced": True,
                         "default": "0",
-                        "units": "",
-                        "range": "",
-                        "description": ""
+                        **self._param_metadata.fields(param_id)
                     }
+                    description = self._parameters[param_id]["description"]
+                self._param_index.add(param_id, description)
                 
                 # Emit individual parameter update
                 self.parameterReceived.emit(param_id, param_value)
@@ -1628,6 +1530,24 @@ class DroneCommander(QObject):
     
      print(f"[DroneCommander] 📤 Returning {len(result)} parameters to QML")
      return result
+
+    @pyqtProperty(int, notify=parametersUpdated)
+    def indexedParameterCount(self):
+        """Number of parameters in the search index (0 until a fetch completes)"""
+        return len(self._param_index)
+
+    @pyqtSlot(str, int, result='QVariant')
+    def searchParameters(self, query, limit):
+        """
+        Ranked parameter name search for the Parameters window filter.
+        Exact and prefix name matches come first, then name segments,
+        substrings, description words and finally near-miss spellings.
+        """
+        try:
+            return self._param_index.search(query, limit)
+        except Exception as e:
+            print(f"[DroneCommander] ⚠️ Parameter search failed: {e}")
+            return []
     
     @pyqtSlot(str, float, result=bool)
     def setParameter(self, param_id, param_value):
@@ -1645,12 +1565,18 @@ class DroneCommander(QObject):
             
             # Determine parameter type
             param_type = mavutil.mavlink.MAV_PARAM_TYPE_REAL32
+            old_value = None
             if param_id in self._parameters:
+                old_value = self._parameters[param_id].get('value')
                 stored_type = self._parameters[param_id].get('type', 'FLOAT')
                 if stored_type == 'INT32':
                     param_type = mavutil.mavlink.MAV_PARAM_TYPE_INT32
                     param_value = int(param_value)
             
+            # Register for the echo - the MAVLink reader thread may see it first
+            with self._pending_write_lock:
+                self._pending_param_writes[param_id] = {'received': None}
+            
             # Send parameter set command
             self._drone.mav.param_set_send(
                 self._drone.target_system,
@@ -1660,35 +1586,43 @@ class DroneCommander(QObject):
                 param_type
             )
             
-            # Wait for acknowledgment
+            # Wait for the echo; the PARAM_VALUE listener fills in 'received'
             start_time = time.time()
             timeout = 3
             
             while time.time() - start_time < timeout:
-                msg = self._drone.recv_match(type='PARAM_VALUE', blocking=False, timeout=0.1)
+                with self._pending_write_lock:
+                    received_value = self._pending_param_writes.get(param_id, {}).get('received')
                 
-                if msg:
-                    received_id = msg.param_id.decode('utf-8').strip('\x00')
-                    if received_id == param_id:
-                        received_value = float(msg.param_value)
-                        
-                        # Update local cache
-                        with self._param_lock:
-                            if param_id in self._parameters:
-                                self._parameters[param_id]['value'] = str(received_value)
-                        
-                        # Check if value matches
-                        if abs(received_value - param_value) < 0.001:
-                            self.commandFeedback.emit(f"✅ Parameter '{param_id}' set to {received_value}")
-                            self.parametersUpdated.emit()
-                            return True
-                        else:
-                            self.commandFeedback.emit(f"⚠️ Value mismatch: expected {param_value}, got {received_value}")
-                            self.parametersUpdated.emit()
-                            return False
+                if received_value is not None:
+                    with self._pending_write_lock:
+                        self._pending_param_writes.pop(param_id, None)
+                    
+                    # Update local cache
+                    with self._param_lock:
+                        if param_id in self._parameters:
+                            self._parameters[param_id]['value'] = str(received_value)
+                    
+                    if self._journal:
+                        self._journal.record_change(
+                            self._vehicle_key(), param_id, old_value, received_value,
+                            "INT32" if param_type == mavutil.mavlink.MAV_PARAM_TYPE_INT32 else "FLOAT",
+                            "setParameter")
+                    
+                    # Check if value matches
+                    if abs(received_value - param_value) < 0.001:
+                        self.commandFeedback.emit(f"✅ Parameter '{param_id}' set to {received_value}")
+                        self.parametersUpdated.emit()
+                        return True
+                    else:
+                        self.commandFeedback.emit(f"⚠️ Value mismatch: expected {param_value}, got {received_value}")
+                        self.parametersUpdated.emit()
+                        return False
                 
                 time.sleep(0.05)
             
+            with self._pending_write_lock:
+                self._pending_param_writes.pop(param_id, None)
             self.commandFeedback.emit(f"⏱️ Timeout setting parameter '{param_id}'")
             return False
         
@@ -1697,3 +1631,333 @@ class DroneCommander(QObject):
             print(f"[DroneCommander] ❌ {error_msg}")
             self.commandFeedback.emit(error_msg)
             return False
+
+    # ------------------------------------------------------------------
+    # Batched parameter writes and .param files
+    # ------------------------------------------------------------------
+
+    def _vehicle_key(self):
+        """Journal key for the connected vehicle (its board identity once known)"""
+        try:
+            return vehicle_key(self._drone.target_system or 1)
+        except Exception:
+            return vehicle_key(1)
+
+    def _on_autopilot_version(self, msg):
+        key = board_key(msg)
+        if key:
+            set_board_identity(msg.get_srcSystem(), key)
+
+    def _request_board_identity(self, sysid):
+        now = time.time()
+        if now - self._identity_requested.get(sysid, 0) < IDENTITY_RETRY:
+            return
+        self._identity_requested[sysid] = now
+        try:
+            self._drone.mav.command_long_send(
+                sysid, mavutil.mavlink.MAV_COMP_ID_AUTOPILOT1,
+                mavutil.mavlink.MAV_CMD_REQUEST_MESSAGE, 0,
+                mavutil.mavlink.MAVLINK_MSG_ID_AUTOPILOT_VERSION, 0, 0, 0, 0, 0, 0)
+        except Exception as e:
+            print(f"[DroneCommander] AUTOPILOT_VERSION request failed: {e}")
+
+    def _forget_board_identities(self):
+        # Reconnecting may bring a different board with the same sysid
+        self._identity_requested.clear()
+        clear_board_identities()
+
+    def _on_param_value(self, msg):
+        """PARAM_VALUE listener - runs on the MAVLink reader thread"""
+        self.add_parameter_to_queue(msg)
+        if self._pending_param_writes and self._ack_param_write(msg):
+            return
+        if not self._param_request_active:
+            self._track_external_change(msg)
+
+    def _track_external_change(self, msg):
+        """Journal values that changed without a write of ours waiting on them"""
+        try:
+            param_id = msg.param_id
+            if isinstance(param_id, bytes):
+                param_id = param_id.decode('utf-8')
+            param_id = param_id.strip('\x00')
+            value = float(msg.param_value)
+        except Exception:
+            return
+
+        with self._param_lock:
+            current = self._parameters.get(param_id)
+            if current is None:
+                return
+            param_type = current.get('type', 'FLOAT')
+            old_value = float(current.get('value', 0))
+            if parameter_files.values_equal(old_value, value, param_type):
+                return
+            current['value'] = str(value)
+
+        if self._journal:
+            vehicle = vehicle_key(msg.get_srcSystem())
+            source = self._journal.pop_expected_source(vehicle, param_id)
+            self._journal.record_change(vehicle, param_id, old_value, value, param_type, source)
+        self.parametersUpdated.emit()
+
+    def _on_heartbeat_for_journal(self, msg):
+        """Track arm/disarm so the journal can answer what changed since the last flight"""
+        if not self._journal or msg.type == mavutil.mavlink.MAV_TYPE_GCS:
+            return
+        sysid = msg.get_srcSystem()
+        if msg.get_srcComponent() == mavutil.mavlink.MAV_COMP_ID_AUTOPILOT1 and not has_board_identity(sysid):
+            self._request_board_identity(sysid)
+        armed = bool(msg.base_mode & mavutil.mavlink.MAV_MODE_FLAG_SAFETY_ARMED)
+        self._journal.note_armed(vehicle_key(sysid), armed)
+
+    def _ack_param_write(self, msg):
+        try:
+            param_id = msg.param_id
+            if isinstance(param_id, bytes):
+                param_id = param_id.decode('utf-8')
+            param_id = param_id.strip('\x00')
+        except Exception:
+            return
+        with self._pending_write_lock:
+            pending = self._pending_param_writes.get(param_id)
+            if pending is not None:
+                pending['received'] = float(msg.param_value)
+                return True
+        return False
+
+    def write_parameters_batch(self, changes, source="batch", window=8, timeout=1.0, retries=3):
+        """
+        Write a list of {name, value, type} changes in the background.
+        Up to `window` PARAM_SETs are kept in flight; each is confirmed by its
+        PARAM_VALUE echo and resent on timeout. Progress is reported through
+        parameterBatchProgress and the result through parameterBatchCompleted.
+        Confirmed changes are journaled under `source`.
+        """
+        if not self._is_drone_ready():
+            return False
+        if not changes:
+            self.parameterBatchCompleted.emit(True, "No parameter changes to write")
+            return True
+        with self._pending_write_lock:
+            if self._batch_write_active:
+                self.commandFeedback.emit("Parameter write already in progress...")
+                return False
+            self._batch_write_active = True
+
+        worker = threading.Thread(
+            target=self._write_parameters_worker,
+            args=(list(changes), source, window, timeout, retries),
+            daemon=True
+        )
+        worker.start()
+        return True
+
+    def _write_parameters_worker(self, changes, source, window, timeout, retries):
+        total = len(changes)
+        todo = list(changes)
+        in_flight = {}
+        written = []
+        failed = []
+        print(f"[DroneCommander] 📤 Batch writing {total} parameters (window {window})")
+        self.commandFeedback.emit(f"Writing {total} parameters...")
+
+        try:
+            while todo or in_flight:
+                # Keep the window full
+                while todo and len(in_flight) < window:
+                    change = todo.pop(0)
+                    entry = {'change': change, 'attempts': 0, 'sent': 0.0}
+                    in_flight[change['name']] = entry
+                    with self._pending_write_lock:
+                        self._pending_param_writes[change['name']] = {'received': None}
+                    self._send_param_set(entry)
+
+                # Echoes arrive through the PARAM_VALUE listener (_ack_param_write)
+                now = time.time()
+                for name in list(in_flight):
+                    entry = in_flight[name]
+                    change = entry['change']
+                    with self._pending_write_lock:
+                        received = self._pending_param_writes[name]['received']
+
+                    if received is not None and parameter_files.values_equal(
+                            received, change['value'], change.get('type')):
+                        written.append((name, received, change))
+                    elif now - entry['sent'] < timeout:
+                        continue
+                    elif entry['attempts'] < retries:
+                        with self._pending_write_lock:
+                            self._pending_param_writes[name]['received'] = None
+                        self._send_param_set(entry)
+                        continue
+                    else:
+                        print(f"[DroneCommander] ⚠️ No confirmation for {name} after {retries} attempts")
+                        failed.append(name)
+
+                    del in_flight[name]
+                    with self._pending_write_lock:
+                        self._pending_param_writes.pop(name, None)
+                    self.parameterBatchProgress.emit(len(written) + len(failed), total)
+
+                time.sleep(0.01)
+
+        except Exception as e:
+            print(f"[DroneCommander] ❌ Batch parameter write error: {e}")
+            failed.extend(in_flight.keys())
+            failed.extend(c['name'] for c in todo)
+
+        finally:
+            with self._pending_write_lock:
+                for change in changes:
+                    self._pending_param_writes.pop(change['name'], None)
+                self._batch_write_active = False
+
+        with self._param_lock:
+            for name, value, _ in written:
+                if name in self._parameters:
+                    self._parameters[name]['value'] = str(value)
+                    self._parameters[name]['synced'] = True
+        if written:
+            if self._journal:
+                self._journal.record_changes(
+                    self._vehicle_key(),
+                    [(name, change.get('current'), value, change.get('type')) for name, value, change in written],
+                    source)
+            self.parametersUpdated.emit()
+
+        if failed:
+            message = f"⚠️ Wrote {len(written)}/{total} parameters, {len(failed)} not confirmed"
+        else:
+            message = f"✅ Wrote {len(written)} parameters"
+        print(f"[DroneCommander] {message}")
+        self.commandFeedback.emit(message)
+        self.parameterBatchCompleted.emit(not failed, message)
+
+    def _send_param_set(self, entry):
+        change = entry['change']
+        if parameter_files.is_float_type(change.get('type', 'FLOAT')):
+            param_type = mavutil.mavlink.MAV_PARAM_TYPE_REAL32
+        else:
+            param_type = mavutil.mavlink.MAV_PARAM_TYPE_INT32
+        self._drone.mav.param_set_send(
+            self._drone.target_system,
+            self._drone.target_component,
+            change['name'].encode('utf-8'),
+            float(change['value']),
+            param_type
+        )
+        entry['attempts'] += 1
+        entry['sent'] = time.time()
+
+    def parameter_values(self):
+        """Copy of the loaded parameters as {name: (value, param_type)}"""
+        with self._param_lock:
+            return {name: (float(p["value"]), p.get("type", "FLOAT")) for name, p in self._parameters.items()}
+
+    def diff_against_vehicle(self, target):
+        """Diff {name: (value, param_type)} against the loaded parameters"""
+        with self._param_lock:
+            live = dict(self._parameters)
+        return parameter_files.diff_parameters(target, live)
+
+    @pyqtSlot(str, str, result=bool)
+    def exportParameterFile(self, path, fmt):
+        """Save the current parameter store as a Mission Planner or QGC .param file"""
+        with self._param_lock:
+            snapshot = {name: dict(p) for name, p in self._parameters.items()}
+        if not snapshot:
+            self.commandFeedback.emit("No parameters loaded to export")
+            return False
+        try:
+            system_id = self._drone.target_system if self._drone else 1
+            component_id = self._drone.target_component if self._drone else 1
+            count = parameter_files.write_param_file(path, snapshot, fmt or parameter_files.FORMAT_MISSION_PLANNER,
+                                                     system_id, component_id)
+            self.commandFeedback.emit(f"✅ Saved {count} parameters to {path}")
+            return True
+        except Exception as e:
+            print(f"[DroneCommander] ❌ Parameter export failed: {e}")
+            self.commandFeedback.emit(f"Error saving parameters: {e}")
+            return False
+
+    @pyqtSlot(str, result='QVariant')
+    def previewParameterFile(self, path):
+        """Parse a .param file and report what applying it would change"""
+        try:
+            target, errors = parameter_files.load_param_file(path)
+        except Exception as e:
+            print(f"[DroneCommander] ❌ Cannot read parameter file: {e}")
+            return {"changed": [], "missing": [], "unchanged": 0, "errors": [str(e)]}
+        diff = self.diff_against_vehicle(target)
+        diff["errors"] = errors
+        return diff
+
+    @pyqtSlot(str, result=bool)
+    def applyParameterFile(self, path):
+        """Write only the parameters in a .param file that differ from the vehicle"""
+        diff = self.previewParameterFile(path)
+        for error in diff["errors"]:
+            print(f"[DroneCommander] ⚠️ {path}: {error}")
+        if diff["missing"]:
+            print(f"[DroneCommander] ⚠️ {len(diff['missing'])} parameters not on vehicle: {diff['missing'][:10]}")
+        print(f"[DroneCommander] 📊 {len(diff['changed'])} changed, {diff['unchanged']} unchanged")
+        return self.write_parameters_batch(diff["changed"], source="file")
+
+    @pyqtSlot('QVariantList', result=bool)
+    def writeParameters(self, params):
+        """Write a list of {name, value} entries, skipping any already on the vehicle"""
+        target = {}
+        for p in params:
+            try:
+                target[str(p["name"])] = (float(p["value"]), None)
+            except (KeyError, TypeError, ValueError):
+                continue
+        diff = self.diff_against_vehicle(target)
+        return self.write_parameters_batch(diff["changed"], source="parameters_ui")
+
+    # ------------------------------------------------------------------
+    # Parameter journal
+    # ------------------------------------------------------------------
+
+    @pyqtSlot(result='QVariant')
+    def parameterSnapshots(self):
+        """Recent journal snapshots for the connected vehicle, newest first"""
+        if not self._journal:
+            return []
+        snapshots = self._journal.snapshots(self._vehicle_key())
+        for snap in snapshots:
+            snap["time"] = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(snap["ts"]))
+        return snapshots
+
+    @pyqtSlot(result='QVariant')
+    def changesSinceLastFlight(self):
+        """Journaled parameter changes since the vehicle last disarmed"""
+        if not self._journal:
+            return []
+        return self._journal.changes_since_last_flight(self._vehicle_key())
+
+    @pyqtSlot(str, result=int)
+    def takeParameterSnapshot(self, label):
+        """Snapshot the current parameter store into the journal"""
+        if not self._journal:
+            return -1
+        with self._param_lock:
+            snapshot = {name: dict(p) for name, p in self._parameters.items()}
+        if not snapshot:
+            self.commandFeedback.emit("No parameters loaded to snapshot")
+            return -1
+        return self._journal.snapshot(self._vehicle_key(), snapshot, label or "manual")
+
+    @pyqtSlot(int, result=bool)
+    def rollbackToSnapshot(self, snapshot_id):
+        """Restore a journal snapshot, writing only the parameters that differ"""
+        if not self._journal:
+            return False
+        target = self._journal.state_at(self._vehicle_key(), snapshot_id=snapshot_id)
+        if not target:
+            self.commandFeedback.emit(f"Snapshot {snapshot_id} not found")
+            return False
+        diff = self.diff_against_vehicle(target)
+        print(f"[DroneCommander] ⏪ Rollback to snapshot {snapshot_id}: {len(diff['changed'])} changes")
+        return self.write_parameters_batch(diff["changed"], source=f"rollback:{snapshot_id}")
@@ -0,0 +1,261 @@
+"""
+EKF health from EKF_STATUS_REPORT.
+
+Every report is written by the MAVLink reader thread into a short
+time-series ring of the five variances. The GUI side works at a fixed
+low rate: it publishes the latest values to vehicleOverview (EKFMonitor
+gauges), fits a least-squares slope to the last few seconds of each
+series, and decodes the flags bitfield.
+
+Alerts follow ArduPilot's own checks. A variance of 0.5 is where the
+monitor turns orange. The EKF failsafe fires when two of velocity,
+horizontal position and compass exceed FS_EKF_THRESH (0.8 by default).
+A variance that is still below the threshold but rising fast enough to
+cross it within PREDICT_SECONDS is reported early. On the ground the
+missing solution flags are reported as what would block arming in a GPS
+mode. In flight, constant-position mode and GPS glitching are reported.
+"""
+
+import time
+import threading
+import numpy as np
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal, pyqtSlot, pyqtProperty
+
+from modules.mavlink_thread import MAVLinkThread
+
+VARIANCES = ["velocity", "pos_horiz", "pos_vert", "compass", "terrain_alt"]
+VARIANCE_LABELS = {"velocity": "velocity", "pos_horiz": "horizontal position",
+                   "pos_vert": "vertical position", "compass": "compass", "terrain_alt": "terrain altitude"}
+FAILSAFE_VARIANCES = ("velocity", "pos_horiz", "compass")
+
+# EKF_STATUS_FLAGS (plus ArduPilot's GPS glitch bit)
+EKF_FLAGS = [
+    (1, "attitude"),
+    (2, "velocity_horiz"),
+    (4, "velocity_vert"),
+    (8, "pos_horiz_rel"),
+    (16, "pos_horiz_abs"),
+    (32, "pos_vert_abs"),
+    (64, "pos_vert_agl"),
+    (128, "const_pos_mode"),
+    (256, "pred_pos_horiz_rel"),
+    (512, "pred_pos_horiz_abs"),
+    (1024, "uninitialized"),
+    (32768, "gps_glitching"),
+]
+EKF_CONST_POS_MODE = 128
+EKF_UNINITIALIZED = 1024
+EKF_GPS_GLITCHING = 32768
+# What a GPS flight mode needs before it will arm
+EKF_GPS_READY = 1 | 2 | 16 | 32
+
+SERIES_CAPACITY = 1200
+UPDATE_INTERVAL_MS = 500
+SLOPE_SECONDS = 10.0
+PREDICT_SECONDS = 5.0
+VARIANCE_WARN = 0.5
+FAILSAFE_THRESHOLD = 0.8        # FS_EKF_THRESH default
+WARNING_INTERVAL = 10.0
+
+
+def decode_flags(flags):
+    return [name for bit, name in EKF_FLAGS if flags & bit]
+
+
+class EkfSeries:
+    """Time series of the five variances; appended from the reader thread"""
+
+    def __init__(self, capacity=SERIES_CAPACITY):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._time = np.zeros(capacity)
+        self._values = np.zeros((capacity, len(VARIANCES)))
+        self._flags = 0
+        self._written = 0
+
+    def append(self, timestamp, values, flags):
+        with self._lock:
+            index = self._written % self.capacity
+            self._time[index] = timestamp
+            self._values[index] = values
+            self._flags = flags
+            self._written += 1
+
+    @property
+    def written(self):
+        return self._written
+
+    def window(self, seconds):
+        """(times, values, flags) for the last seconds, oldest first"""
+        with self._lock:
+            count = min(self._written, self.capacity)
+            rows = (self._written - count + np.arange(count)) % self.capacity
+            times = self._time[rows]
+            values = self._values[rows]
+            flags = self._flags
+        if count:
+            keep = times >= times[-1] - seconds
+            times, values = times[keep], values[keep]
+        return times, values, flags
+
+    def slopes(self, seconds=SLOPE_SECONDS):
+        """Least-squares slope of each variance over the last seconds (per second)"""
+        times, values, _ = self.window(seconds)
+        if len(times) < 3:
+            return np.zeros(len(VARIANCES))
+        t = times - times.mean()
+        denominator = float((t * t).sum())
+        if denominator <= 0:
+            return np.zeros(len(VARIANCES))
+        return t @ (values - values.mean(axis=0)) / denominator
+
+
+class EkfHealthService(QObject):
+    statusChanged = pyqtSignal()
+    alertsChanged = pyqtSignal()
+    ekfAlert = pyqtSignal(str, str)         # message, severity
+
+    def __init__(self, vehicle_overview, drone_model=None, message_logger=None, parent=None):
+        super().__init__(parent)
+        self.vehicle_overview = vehicle_overview
+        self.drone_model = drone_model
+        self.message_logger = message_logger
+        self._series = EkfSeries()
+        self._published = 0
+        self._flags = 0
+        self._slopes = {name: 0.0 for name in VARIANCES}
+        self._alerts = []
+        self._last_warning = {}
+
+        MAVLinkThread.add_message_listener('EKF_STATUS_REPORT', self._on_ekf_status)
+        self.ekfAlert.connect(self._announce)
+
+        self._update_timer = QTimer(self)
+        self._update_timer.timeout.connect(self._update)
+        self._update_timer.start(UPDATE_INTERVAL_MS)
+        print("[EKF] Health monitor initialized")
+
+    # ------------------------------------------------------------------
+    # QML interface
+    # ------------------------------------------------------------------
+
+    @pyqtProperty(int, notify=statusChanged)
+    def flags(self):
+        return self._flags
+
+    @pyqtProperty('QVariantList', notify=statusChanged)
+    def flagNames(self):
+        return decode_flags(self._flags)
+
+    @pyqtProperty('QVariantMap', notify=statusChanged)
+    def slopes(self):
+        """Variance change per second over the last SLOPE_SECONDS"""
+        return self._slopes
+
+    @pyqtProperty('QVariantList', notify=alertsChanged)
+    def alerts(self):
+        """[{kind, severity, message}] currently active"""
+        return self._alerts
+
+    @pyqtSlot(float, result='QVariantMap')
+    def history(self, seconds):
+        """Raw series for graphs: {"t": [s relative to the latest report], "<variance>": [...]}"""
+        times, values, _ = self._series.window(seconds)
+        result = {"t": (times - times[-1]).tolist() if len(times) else []}
+        for i, name in enumerate(VARIANCES):
+            result[name] = values[:, i].tolist()
+        return result
+
+    # ------------------------------------------------------------------
+    # MAVLink reader thread
+    # ------------------------------------------------------------------
+
+    def _on_ekf_status(self, msg):
+        self._series.append(time.time(), (msg.velocity_variance, msg.pos_horiz_variance,
+                                          msg.pos_vert_variance, msg.compass_variance,
+                                          msg.terrain_alt_variance), msg.flags)
+
+    # ------------------------------------------------------------------
+    # GUI thread
+    # ------------------------------------------------------------------
+
+    def _update(self):
+        if self._series.written == self._published:
+            return
+        self._published = self._series.written
+        times, values, flags = self._series.window(SLOPE_SECONDS)
+        latest = values[-1]
+        slopes = self._series.slopes()
+
+        self.vehicle_overview.update_ekf(latest, flags)
+        self._flags = flags
+        self._slopes = {name: round(float(s), 4) for name, s in zip(VARIANCES, slopes)}
+        self.statusChanged.emit()
+
+        alerts = self._evaluate(dict(zip(VARIANCES, latest)), dict(zip(VARIANCES, slopes)), flags)
+        if alerts != self._alerts:
+            active = {alert["kind"] for alert in self._alerts}
+            self._alerts = alerts
+            self.alertsChanged.emit()
+            # Announce when an alert becomes active, not on every update while it stays active
+            for alert in alerts:
+                if alert["kind"] not in active:
+                    self._warn(alert["kind"], alert["message"], alert["severity"])
+
+    def _evaluate(self, variances, slopes, flags):
+        telemetry = getattr(self.drone_model, 'telemetry', {}) or {}
+        armed = bool(telemetry.get('armed', False))
+        alerts = []
+
+        over = [name for name in FAILSAFE_VARIANCES if variances[name] >= FAILSAFE_THRESHOLD]
+        if len(over) >= 2:
+            alerts.append({"kind": "failsafe", "severity": "error",
+                           "message": "🚨 EKF variance over failsafe threshold: "
+                                      + ", ".join(VARIANCE_LABELS[n] for n in over)})
+
+        for name in VARIANCES:
+            value, slope = variances[name], slopes[name]
+            if value >= FAILSAFE_THRESHOLD:
+                continue
+            if slope > 0 and value + slope * PREDICT_SECONDS >= FAILSAFE_THRESHOLD:
+                eta = (FAILSAFE_THRESHOLD - value) / slope
+                alerts.append({"kind": f"rising_{name}", "severity": "warning",
+                               "message": f"⚠️ EKF {VARIANCE_LABELS[name]} variance rising, "
+                                          f"threshold in {eta:.0f} s"})
+            elif value >= VARIANCE_WARN:
+                alerts.append({"kind": f"high_{name}", "severity": "warning",
+                               "message": f"⚠️ EKF {VARIANCE_LABELS[name]} variance high ({value:.2f})"})
+
+        if armed:
+            if flags & EKF_CONST_POS_MODE:
+                alerts.append({"kind": "const_pos", "severity": "error",
+                               "message": "🚨 EKF lost position (constant position mode)"})
+            if flags & EKF_GPS_GLITCHING:
+                alerts.append({"kind": "gps_glitch", "severity": "warning",
+                               "message": "⚠️ GPS glitch detected by EKF"})
+        elif flags & EKF_UNINITIALIZED:
+            alerts.append({"kind": "uninitialized", "severity": "warning",
+                           "message": "⚠️ EKF not initialised"})
+        elif (flags & EKF_GPS_READY) != EKF_GPS_READY:
+            missing = decode_flags(EKF_GPS_READY & ~flags)
+            alerts.append({"kind": "prearm", "severity": "info",
+                           "message": "EKF not ready for GPS modes: missing " + ", ".join(missing)})
+        return alerts
+
+    def _warn(self, kind, message, severity):
+        now = time.time()
+        if now - self._last_warning.get(kind, 0) < WARNING_INTERVAL:
+            return
+        self._last_warning[kind] = now
+        self.ekfAlert.emit(message, severity)
+
+    @pyqtSlot(str, str)
+    def _announce(self, message, severity):
+        print(f"[EKF] {message}")
+        if self.message_logger:
+            self.message_logger.logMessage(message, severity)
+
+    def cleanup(self):
+        self._update_timer.stop()
+        MAVLinkThread.remove_message_listener('EKF_STATUS_REPORT', self._on_ekf_status)
+        print("[EKF] Cleanup completed")
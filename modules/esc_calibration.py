@@ -2,6 +2,7 @@ import time
 from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot, pyqtProperty, QTimer
 from pymavlink import mavutil
 from pymavlink.dialects.v20 import ardupilotmega as mavlink_dialect
+from modules.parameter_journal import get_parameter_journal, vehicle_key
 
 class ESCCalibrationModel(QObject):
     # Signals
@@ -219,6 +220,7 @@ class ESCCalibrationModel(QObject):
             # Send parameter set command
             param_name = "ESC_CALIBRATION"
             param_name_bytes = param_name.encode('utf-8')[:16].ljust(16, b'\x00')
+            self._journal_expect(param_name)
             
             self._drone.mav.param_set_send(
                 self._drone.target_system,
@@ -234,6 +236,12 @@ class ESCCalibrationModel(QObject):
             print(f"[ESCCalibrationModel] Error setting parameter: {e}")
             raise Exception(f"Failed to set ESC_CALIBRATION parameter: {e}")
 
+    def _journal_expect(self, param_name):
+        """Attribute the PARAM_VALUE echo for param_name to ESC calibration in the journal"""
+        journal = get_parameter_journal()
+        if journal and self._drone:
+            journal.expect(vehicle_key(self._drone.target_system), param_name, "esc_calibration")
+
     def _execute_current_step(self):
         """Execute the current calibration step"""
         self._step_timer.stop()
@@ -386,6 +394,7 @@ class ESCCalibrationModel(QObject):
             if self._drone:
                 param_name = "ESC_CALIBRATION"
                 param_name_bytes = param_name.encode('utf-8')[:16].ljust(16, b'\x00')
+                self._journal_expect(param_name)
                 
                 self._drone.mav.param_set_send(
                     self._drone.target_system,
@@ -460,6 +469,7 @@ class ESCCalibrationModel(QObject):
             if self._drone:
                 param_name = "ESC_CALIBRATION"
                 param_name_bytes = param_name.encode('utf-8')[:16].ljust(16, b'\x00')
+                self._journal_expect(param_name)
                 
                 self._drone.mav.param_set_send(
                     self._drone.target_system,
@@ -524,6 +534,7 @@ class ESCCalibrationModel(QObject):
                 # Reset ESC_CALIBRATION parameter to 0
                 param_name = "ESC_CALIBRATION"
                 param_name_bytes = param_name.encode('utf-8')[:16].ljust(16, b'\x00')
+                self._journal_expect(param_name)
                 
                 self._drone.mav.param_set_send(
                     self._drone.target_system,
@@ -0,0 +1,261 @@
+"""
+ESC telemetry aggregation (RPM, temperature, current per motor).
+
+ESC_TELEMETRY_1_TO_4 / 5_TO_8 (ArduPilot) and ESC_STATUS / ESC_INFO
+(common) each carry four ESCs as arrays. The MAVLink reader thread writes
+them straight into fixed (window x 8) NumPy rings, one fancy-indexed
+assignment per field, so nothing is allocated per message and the cost
+does not grow with the number of motors. The GUI side reduces the rings
+to per-motor mean/max at a low fixed rate and compares the motors with
+each other: an ESC whose mean RPM is far from the median of the others
+usually means a damaged prop, a failing motor or an off-centre load.
+"""
+
+import time
+import threading
+import numpy as np
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal, pyqtSlot, pyqtProperty
+
+from modules.mavlink_thread import MAVLinkThread
+
+MAX_ESCS = 8
+DEFAULT_WINDOW = 50             # samples per ESC, 5 s at 10 Hz
+UPDATE_INTERVAL_MS = 250
+STALE_SECONDS = 2.0             # no telemetry for this long = ESC not reporting
+MIN_RPM = 500                   # motors slower than this are not compared
+IMBALANCE_THRESHOLD = 0.15      # fraction away from the median of the other motors
+HIGH_TEMPERATURE_C = 90.0
+INT16_MAX = 32767               # ESC_INFO temperature not reported
+WARNING_INTERVAL = 10.0
+
+ESC_MESSAGES = ('ESC_TELEMETRY_1_TO_4', 'ESC_TELEMETRY_5_TO_8', 'ESC_STATUS', 'ESC_INFO')
+
+
+class _EscChannel:
+    """One quantity for every ESC: a (window x MAX_ESCS) ring with a head per ESC"""
+
+    def __init__(self, window):
+        self.window = window
+        self.values = np.full((window, MAX_ESCS), np.nan)
+        self.heads = np.zeros(MAX_ESCS, dtype=np.intp)
+
+    def write(self, first, values, scale=1.0, count=4):
+        last = first + count
+        columns = np.arange(first, last)
+        self.values[self.heads[first:last], columns] = values[:count]
+        if scale != 1.0:
+            self.values[self.heads[first:last], columns] *= scale
+        self.heads[first:last] = (self.heads[first:last] + 1) % self.window
+
+    def latest(self):
+        return self.values[(self.heads - 1) % self.window, np.arange(MAX_ESCS)]
+
+    def mean_max(self):
+        valid = ~np.isnan(self.values)
+        count = valid.sum(axis=0)
+        filled = np.where(valid, self.values, 0.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(count > 0, filled.sum(axis=0) / count, np.nan)
+        peak = np.where(count > 0, np.where(valid, self.values, -np.inf).max(axis=0), np.nan)
+        return mean, peak
+
+
+class EscTelemetryAggregator:
+    """Thread-safe per-ESC rolling statistics in fixed arrays"""
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._rpm = _EscChannel(self.window)
+            self._current = _EscChannel(self.window)
+            self._temperature = _EscChannel(self.window)
+            self._voltage = _EscChannel(self.window)
+            self._errors = np.zeros(MAX_ESCS, dtype=np.int64)
+            self._error_base = np.full(MAX_ESCS, -1, dtype=np.int64)
+            self._last_seen = np.zeros(MAX_ESCS)
+            self.sample_count = 0
+
+    def add_message(self, msg):
+        """Any of ESC_MESSAGES; called on the MAVLink reader thread"""
+        msg_type = msg.get_type()
+        now = time.time()
+        count = 4
+        with self._lock:
+            if msg_type == 'ESC_TELEMETRY_1_TO_4' or msg_type == 'ESC_TELEMETRY_5_TO_8':
+                first = 4 if msg_type == 'ESC_TELEMETRY_5_TO_8' else 0
+                self._rpm.write(first, msg.rpm)
+                self._current.write(first, msg.current, 0.01)        # cA
+                self._voltage.write(first, msg.voltage, 0.01)        # cV
+                self._temperature.write(first, msg.temperature)      # degC
+            elif msg_type == 'ESC_STATUS':
+                first = msg.index
+                if first > MAX_ESCS - 4:
+                    return
+                self._rpm.write(first, msg.rpm)
+                self._current.write(first, msg.current)
+                self._voltage.write(first, msg.voltage)
+            elif msg_type == 'ESC_INFO':
+                first = msg.index
+                if first > MAX_ESCS - 4:
+                    return
+                # Slots past the vehicle's ESC count carry no data
+                count = min(4, msg.count - first)
+                if count <= 0:
+                    return
+                temperature = np.asarray(msg.temperature, dtype=np.float64)
+                temperature[temperature == INT16_MAX] = np.nan
+                self._temperature.write(first, temperature, 0.01, count)  # cdegC
+                counts = np.asarray(msg.error_count, dtype=np.int64)[:count]
+                base = self._error_base[first:first + count]
+                base[base < 0] = counts[base < 0]
+                self._errors[first:first + count] = counts - base
+            else:
+                return
+            self._last_seen[first:first + count] = now
+            self.sample_count += 1
+
+    def snapshot(self):
+        """Per-ESC arrays of MAX_ESCS (NaN where an ESC has not reported)"""
+        with self._lock:
+            rpm_mean, rpm_max = self._rpm.mean_max()
+            current_mean, current_max = self._current.mean_max()
+            temperature_mean, temperature_max = self._temperature.mean_max()
+            voltage = self._voltage.latest()
+            errors = self._errors.copy()
+            active = (time.time() - self._last_seen) < STALE_SECONDS
+            samples = self.sample_count
+
+        deviation = np.full(MAX_ESCS, np.nan)
+        spinning = active & (rpm_mean > MIN_RPM)
+        if np.count_nonzero(spinning) >= 3:
+            median = np.median(rpm_mean[spinning])
+            deviation[spinning] = (rpm_mean[spinning] - median) / median
+
+        return {"active": active, "rpm": rpm_mean, "rpmMax": rpm_max,
+                "current": current_mean, "currentMax": current_max,
+                "temperature": temperature_mean, "temperatureMax": temperature_max,
+                "voltage": voltage, "errors": errors, "deviation": deviation,
+                "samples": samples}
+
+
+def _value(array, index, digits=1):
+    value = float(array[index])
+    return None if np.isnan(value) else round(value, digits)
+
+
+class EscTelemetryService(QObject):
+    escsChanged = pyqtSignal()
+    imbalanceChanged = pyqtSignal()
+    escWarning = pyqtSignal(str, str)       # message, severity
+
+    def __init__(self, message_logger=None, parent=None):
+        super().__init__(parent)
+        self.message_logger = message_logger
+        self._aggregator = EscTelemetryAggregator()
+        self._escs = []
+        self._imbalance = 0.0
+        self._imbalance_esc = 0
+        self._last_samples = 0
+        self._last_warning = {}
+
+        for msg_type in ESC_MESSAGES:
+            MAVLinkThread.add_message_listener(msg_type, self._aggregator.add_message)
+
+        self._update_timer = QTimer(self)
+        self._update_timer.timeout.connect(self._update)
+        self._update_timer.start(UPDATE_INTERVAL_MS)
+        self.escWarning.connect(self._announce)
+        print("[EscTelemetry] Initialized")
+
+    @property
+    def aggregator(self):
+        return self._aggregator
+
+    @pyqtProperty('QVariantList', notify=escsChanged)
+    def escs(self):
+        """Reporting ESCs: [{esc, rpm, rpmMax, current, currentMax, temperature, temperatureMax, voltage, errors, deviation}]"""
+        return self._escs
+
+    @pyqtProperty(float, notify=imbalanceChanged)
+    def imbalance(self):
+        """Largest RPM deviation from the median of the spinning motors, percent"""
+        return self._imbalance
+
+    @pyqtProperty(int, notify=imbalanceChanged)
+    def imbalanceEsc(self):
+        """1-based ESC with the largest deviation, 0 if none"""
+        return self._imbalance_esc
+
+    @pyqtSlot()
+    def reset(self):
+        self._aggregator.reset()
+        self._last_samples = 0
+        self._escs = []
+        self.escsChanged.emit()
+
+    def _update(self):
+        if self._aggregator.sample_count == self._last_samples:
+            if self._escs and not self._aggregator.snapshot()["active"].any():
+                self._escs = []
+                self.escsChanged.emit()
+            return
+        self._last_samples = self._aggregator.sample_count
+        snap = self._aggregator.snapshot()
+
+        escs = []
+        for i in np.flatnonzero(snap["active"]):
+            escs.append({
+                "esc": int(i) + 1,
+                "rpm": _value(snap["rpm"], i, 0),
+                "rpmMax": _value(snap["rpmMax"], i, 0),
+                "current": _value(snap["current"], i, 2),
+                "currentMax": _value(snap["currentMax"], i, 2),
+                "temperature": _value(snap["temperature"], i),
+                "temperatureMax": _value(snap["temperatureMax"], i),
+                "voltage": _value(snap["voltage"], i, 2),
+                "errors": int(snap["errors"][i]),
+                "deviation": _value(snap["deviation"] * 100.0, i),
+            })
+        self._escs = escs
+        self.escsChanged.emit()
+
+        deviation = np.abs(snap["deviation"])
+        if np.isnan(deviation).all():
+            imbalance, worst = 0.0, 0
+        else:
+            worst = int(np.nanargmax(deviation))
+            imbalance = round(float(deviation[worst]) * 100.0, 1)
+            worst += 1
+        if imbalance != self._imbalance or worst != self._imbalance_esc:
+            self._imbalance, self._imbalance_esc = imbalance, worst
+            self.imbalanceChanged.emit()
+
+        if imbalance >= IMBALANCE_THRESHOLD * 100.0:
+            self._warn("imbalance", f"⚠️ ESC {worst} RPM {imbalance:.0f}% off the other motors", "warning")
+        hot = snap["active"] & (snap["temperatureMax"] >= HIGH_TEMPERATURE_C)
+        if hot.any():
+            esc = int(np.flatnonzero(hot)[0])
+            self._warn("temperature", f"🔥 ESC {esc + 1} temperature {snap['temperatureMax'][esc]:.0f}°C", "error")
+
+    def _warn(self, kind, message, severity):
+        now = time.time()
+        if now - self._last_warning.get(kind, 0) < WARNING_INTERVAL:
+            return
+        self._last_warning[kind] = now
+        self.escWarning.emit(message, severity)
+
+    @pyqtSlot(str, str)
+    def _announce(self, message, severity):
+        print(f"[EscTelemetry] {message}")
+        if self.message_logger:
+            self.message_logger.logMessage(message, severity)
+
+    def cleanup(self):
+        self._update_timer.stop()
+        for msg_type in ESC_MESSAGES:
+            MAVLinkThread.remove_message_listener(msg_type, self._aggregator.add_message)
+        print("[EscTelemetry] Cleanup completed")
@@ -0,0 +1,415 @@
+"""
+Ground-side geofence engine.
+
+Inclusion/exclusion polygons and circles are uploaded to the autopilot as
+FENCE items through the mission transfer engine, and evaluated locally on
+every GLOBAL_POSITION_INT so the operator is warned before the onboard
+fence triggers.
+
+Zones are projected once into a local metric frame and their edges
+bucketed into a uniform grid:
+
+  * cells      - (cx, cy) -> edge ids whose bounding box touches the cell,
+                 used to walk a velocity ray and test only nearby edges
+  * slabs      - per polygon, horizontal bands -> edges spanning the band,
+                 so point-in-polygon ray casting only sees a handful of edges
+
+A sample costs a slab lookup per polygon plus the edges in the cells the
+predicted track crosses, independent of how many vertices the fence has.
+"""
+
+import math
+import threading
+import time
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot, pyqtProperty
+
+from modules.mavlink_thread import MAVLinkThread
+from modules.mission_transfer import MISSION_TYPE_FENCE
+
+EARTH_RADIUS_M = 6371000.0
+
+# MAV_CMD fence item ids
+MAV_CMD_NAV_FENCE_RETURN_POINT = 5000
+MAV_CMD_NAV_FENCE_POLYGON_VERTEX_INCLUSION = 5001
+MAV_CMD_NAV_FENCE_POLYGON_VERTEX_EXCLUSION = 5002
+MAV_CMD_NAV_FENCE_CIRCLE_INCLUSION = 5003
+MAV_CMD_NAV_FENCE_CIRCLE_EXCLUSION = 5004
+MAV_FRAME_GLOBAL = 0
+
+DEFAULT_CELL_SIZE = 50.0        # metres
+DEFAULT_HORIZON = 30.0          # seconds of track to look ahead
+DEFAULT_WARN_SECONDS = 10.0
+WARNING_INTERVAL = 5.0          # minimum seconds between repeated warnings
+MIN_GROUNDSPEED = 0.5
+
+
+class _LocalFrame:
+    """Equirectangular projection around the fence origin"""
+
+    def __init__(self, lat0, lon0):
+        self.lat0 = lat0
+        self.lon0 = lon0
+        self.k_lat = math.radians(1.0) * EARTH_RADIUS_M
+        self.k_lon = self.k_lat * math.cos(math.radians(lat0))
+
+    def to_local(self, lat, lon):
+        return (lon - self.lon0) * self.k_lon, (lat - self.lat0) * self.k_lat
+
+
+class FenceIndex:
+    """
+    Spatial index over fence zones in local metres.
+    zones: list of dicts {kind: "polygon"|"circle", inclusion: bool,
+    points: [(x, y)] or center: (x, y), radius: r}.
+    """
+
+    def __init__(self, zones, cell_size=DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        self.zones = zones
+        self.edges = []         # (x1, y1, x2, y2, zone index)
+        self.cells = {}         # (cx, cy) -> [edge id]
+        self.slabs = []         # per zone: {band -> [edge id]} (polygons only)
+        self.circles = []       # (zone index, cx, cy, r)
+
+        for zi, zone in enumerate(zones):
+            slabs = {}
+            self.slabs.append(slabs)
+            if zone["kind"] == "circle":
+                cx, cy = zone["center"]
+                self.circles.append((zi, cx, cy, zone["radius"]))
+                continue
+            points = zone["points"]
+            for i in range(len(points)):
+                x1, y1 = points[i]
+                x2, y2 = points[(i + 1) % len(points)]
+                edge_id = len(self.edges)
+                self.edges.append((x1, y1, x2, y2, zi))
+                for cell in self._cells_for_box(min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)):
+                    self.cells.setdefault(cell, []).append(edge_id)
+                for band in range(self._band(min(y1, y2)), self._band(max(y1, y2)) + 1):
+                    slabs.setdefault(band, []).append(edge_id)
+
+    def _band(self, y):
+        return int(math.floor(y / self.cell_size))
+
+    def _cells_for_box(self, x0, y0, x1, y1):
+        s = self.cell_size
+        for cx in range(int(math.floor(x0 / s)), int(math.floor(x1 / s)) + 1):
+            for cy in range(int(math.floor(y0 / s)), int(math.floor(y1 / s)) + 1):
+                yield cx, cy
+
+    def contains(self, zone_index, x, y):
+        zone = self.zones[zone_index]
+        if zone["kind"] == "circle":
+            cx, cy = zone["center"]
+            return (x - cx) ** 2 + (y - cy) ** 2 <= zone["radius"] ** 2
+        inside = False
+        for edge_id in self.slabs[zone_index].get(self._band(y), ()):
+            x1, y1, x2, y2, _ = self.edges[edge_id]
+            if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+                inside = not inside
+        return inside
+
+    def breached_zones(self, x, y):
+        """Indices of zones the point violates (outside an inclusion or inside an exclusion)"""
+        return [zi for zi, zone in enumerate(self.zones)
+                if self.contains(zi, x, y) != zone["inclusion"]]
+
+    def first_crossing(self, x, y, dx, dy, max_distance):
+        """
+        Distance along the unit direction (dx, dy) to the first fence
+        boundary within max_distance, and the zone it belongs to.
+        Returns (distance, zone index) or (None, None).
+        """
+        best, best_zone = None, None
+
+        for edge_id in self._edges_along(x, y, dx, dy, max_distance):
+            x1, y1, x2, y2, zi = self.edges[edge_id]
+            ex, ey = x2 - x1, y2 - y1
+            denom = dx * ey - dy * ex
+            if abs(denom) < 1e-12:
+                continue
+            qx, qy = x1 - x, y1 - y
+            t = (qx * ey - qy * ex) / denom          # along the ray
+            u = (qx * dy - qy * dx) / denom          # along the edge
+            if 0.0 <= t <= max_distance and 0.0 <= u <= 1.0 and (best is None or t < best):
+                best, best_zone = t, zi
+
+        for zi, cx, cy, r in self.circles:
+            fx, fy = x - cx, y - cy
+            b = fx * dx + fy * dy
+            c = fx * fx + fy * fy - r * r
+            disc = b * b - c
+            if disc < 0:
+                continue
+            root = math.sqrt(disc)
+            for t in (-b - root, -b + root):
+                if 0.0 <= t <= max_distance and (best is None or t < best):
+                    best, best_zone = t, zi
+                    break
+
+        return best, best_zone
+
+    def _edges_along(self, x, y, dx, dy, max_distance):
+        """Edge ids in the grid cells the ray passes through (Amanatides-Woo walk)"""
+        s = self.cell_size
+        cx, cy = int(math.floor(x / s)), int(math.floor(y / s))
+        step_x = 1 if dx > 0 else -1
+        step_y = 1 if dy > 0 else -1
+        t_max_x = (((cx + (step_x > 0)) * s - x) / dx) if dx else math.inf
+        t_max_y = (((cy + (step_y > 0)) * s - y) / dy) if dy else math.inf
+        t_dx = abs(s / dx) if dx else math.inf
+        t_dy = abs(s / dy) if dy else math.inf
+
+        seen = set()
+        t = 0.0
+        while t <= max_distance:
+            for edge_id in self.cells.get((cx, cy), ()):
+                if edge_id not in seen:
+                    seen.add(edge_id)
+                    yield edge_id
+            if t_max_x < t_max_y:
+                t = t_max_x
+                t_max_x += t_dx
+                cx += step_x
+            else:
+                t = t_max_y
+                t_max_y += t_dy
+                cy += step_y
+
+
+class GeofenceManager(QObject):
+    """
+    Fence zones for QML: edit, upload as FENCE items and watch live
+    position for breaches. Position/VFR_HUD arrive on the MAVLink reader
+    thread; warnings are re-emitted so logging and speech happen on the GUI
+    thread.
+    """
+
+    zonesChanged = pyqtSignal()
+    fenceStatusChanged = pyqtSignal()
+    fenceWarning = pyqtSignal(str, str)     # message, severity
+
+    def __init__(self, drone_commander, message_logger=None,
+                 warn_seconds=DEFAULT_WARN_SECONDS, horizon=DEFAULT_HORIZON):
+        super().__init__()
+        self.drone_commander = drone_commander
+        self.message_logger = message_logger
+        self.warn_seconds = warn_seconds
+        self.horizon = horizon
+
+        self._zones = []            # geographic zones as defined by the user
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self._fence = None          # (frame, index), replaced as a whole on every rebuild
+        self._generation = 0
+
+        self._groundspeed = 0.0
+        self._heading = 0.0
+        self._breached = False
+        self._time_to_breach = -1.0
+        self._last_warning = {}     # kind -> time
+
+        self.fenceWarning.connect(self._announce)
+        MAVLinkThread.add_message_listener('GLOBAL_POSITION_INT', self._on_position)
+        MAVLinkThread.add_message_listener('VFR_HUD', self._on_vfr_hud)
+        print("[Geofence] Initialized")
+
+    # ------------------------------------------------------------------
+    # Zone editing
+    # ------------------------------------------------------------------
+
+    @pyqtSlot('QVariantList', bool, result=int)
+    def addPolygon(self, vertices, inclusion):
+        """vertices: list of {lat, lng}; at least three"""
+        points = [(float(v.get('lat', 0)), float(v.get('lng', v.get('lon', 0)))) for v in vertices]
+        if len(points) < 3:
+            print("[Geofence] ❌ A fence polygon needs at least three vertices")
+            return -1
+        return self._add_zone({"kind": "polygon", "inclusion": bool(inclusion), "vertices": points})
+
+    @pyqtSlot(float, float, float, bool, result=int)
+    def addCircle(self, lat, lng, radius, inclusion):
+        if radius <= 0:
+            return -1
+        return self._add_zone({"kind": "circle", "inclusion": bool(inclusion),
+                               "center": (lat, lng), "radius": float(radius)})
+
+    @pyqtSlot(int, result=bool)
+    def removeZone(self, zone_id):
+        with self._lock:
+            before = len(self._zones)
+            self._zones = [z for z in self._zones if z["id"] != zone_id]
+            removed = len(self._zones) != before
+        if removed:
+            self._rebuild()
+        return removed
+
+    @pyqtSlot()
+    def clearZones(self):
+        with self._lock:
+            self._zones = []
+        self._rebuild()
+
+    @pyqtSlot(result='QVariantList')
+    def zones(self):
+        with self._lock:
+            return [{
+                "id": z["id"], "kind": z["kind"], "inclusion": z["inclusion"],
+                "vertices": [{"lat": p[0], "lng": p[1]} for p in z.get("vertices", [])],
+                "center": {"lat": z["center"][0], "lng": z["center"][1]} if "center" in z else None,
+                "radius": z.get("radius", 0.0),
+            } for z in self._zones]
+
+    def _add_zone(self, zone):
+        with self._lock:
+            zone["id"] = self._next_id
+            self._next_id += 1
+            self._zones.append(zone)
+        self._rebuild()
+        return zone["id"]
+
+    def _rebuild(self):
+        """
+        Project zones into a local frame and rebuild the spatial index.
+        The index is built outside the lock and swapped in as one tuple, so
+        the reader thread never sees a frame from one build and an index
+        from another; an older rebuild finishing late is discarded.
+        """
+        with self._lock:
+            zones = list(self._zones)
+            self._generation += 1
+            generation = self._generation
+
+        fence = None
+        if zones:
+            first = zones[0]
+            origin = first["vertices"][0] if first["kind"] == "polygon" else first["center"]
+            frame = _LocalFrame(*origin)
+            local = []
+            for z in zones:
+                if z["kind"] == "polygon":
+                    local.append({"kind": "polygon", "inclusion": z["inclusion"],
+                                  "points": [frame.to_local(lat, lon) for lat, lon in z["vertices"]]})
+                else:
+                    local.append({"kind": "circle", "inclusion": z["inclusion"],
+                                  "center": frame.to_local(*z["center"]), "radius": z["radius"]})
+            fence = (frame, FenceIndex(local))
+
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._fence = fence
+        self.zonesChanged.emit()
+
+    # ------------------------------------------------------------------
+    # Upload
+    # ------------------------------------------------------------------
+
+    def fence_items(self):
+        """Zones as FENCE mission items (MISSION_ITEM_INT layout)"""
+        items = []
+        with self._lock:
+            for z in self._zones:
+                if z["kind"] == "polygon":
+                    command = (MAV_CMD_NAV_FENCE_POLYGON_VERTEX_INCLUSION if z["inclusion"]
+                               else MAV_CMD_NAV_FENCE_POLYGON_VERTEX_EXCLUSION)
+                    for lat, lon in z["vertices"]:
+                        items.append(self._item(command, len(z["vertices"]), lat, lon))
+                else:
+                    command = (MAV_CMD_NAV_FENCE_CIRCLE_INCLUSION if z["inclusion"]
+                               else MAV_CMD_NAV_FENCE_CIRCLE_EXCLUSION)
+                    items.append(self._item(command, z["radius"], *z["center"]))
+        for seq, item in enumerate(items):
+            item['seq'] = seq
+        return items
+
+    @staticmethod
+    def _item(command, param1, lat, lon):
+        return {'frame': MAV_FRAME_GLOBAL, 'command': command, 'current': 0, 'autocontinue': 0,
+                'param1': param1, 'param2': 0, 'param3': 0, 'param4': 0,
+                'x': lat, 'y': lon, 'z': 0}
+
+    @pyqtSlot(result=bool)
+    def uploadFence(self):
+        items = self.fence_items()
+        print(f"[Geofence] Uploading {len(items)} fence items")
+        if not items:
+            return self.drone_commander.mission_transfer.clear(MISSION_TYPE_FENCE)
+        return self.drone_commander.uploadFence(items)
+
+    # ------------------------------------------------------------------
+    # Live evaluation (MAVLink reader thread)
+    # ------------------------------------------------------------------
+
+    @pyqtProperty(bool, notify=fenceStatusChanged)
+    def breached(self):
+        return self._breached
+
+    @pyqtProperty(float, notify=fenceStatusChanged)
+    def timeToBreach(self):
+        """Seconds until the predicted track leaves the fence, -1 if not within the horizon"""
+        return self._time_to_breach
+
+    def _on_vfr_hud(self, msg):
+        self._groundspeed = msg.groundspeed
+        self._heading = msg.heading
+
+    def _on_position(self, msg):
+        with self._lock:
+            fence = self._fence
+        if fence is None:
+            return
+        frame, index = fence
+        x, y = frame.to_local(msg.lat / 1e7, msg.lon / 1e7)
+
+        breached = bool(index.breached_zones(x, y))
+        time_to_breach = -1.0
+        # Project along the ground track (vx north, vy east, cm/s), not the yaw a
+        # multirotor may be crabbing at; VFR_HUD heading only when there is no velocity
+        east, north = msg.vy / 100.0, msg.vx / 100.0
+        speed = math.hypot(east, north)
+        if speed >= MIN_GROUNDSPEED:
+            direction = (east / speed, north / speed)
+        else:
+            speed = self._groundspeed
+            heading = math.radians(self._heading)
+            direction = (math.sin(heading), math.cos(heading))
+        if not breached and speed >= MIN_GROUNDSPEED:
+            distance, _ = index.first_crossing(x, y, direction[0], direction[1],
+                                               speed * self.horizon)
+            if distance is not None:
+                time_to_breach = distance / speed
+
+        changed = (breached != self._breached
+                   or (time_to_breach < 0) != (self._time_to_breach < 0)
+                   or abs(time_to_breach - self._time_to_breach) >= 0.5)
+        self._breached = breached
+        self._time_to_breach = time_to_breach
+        if changed:
+            self.fenceStatusChanged.emit()
+
+        if breached:
+            self._warn("breach", "🚧 GEOFENCE BREACHED", "error")
+        elif 0 <= time_to_breach <= self.warn_seconds:
+            self._warn("predicted", f"⚠️ Geofence breach in {time_to_breach:.0f} seconds", "warning")
+
+    def _warn(self, kind, message, severity):
+        now = time.time()
+        if now - self._last_warning.get(kind, 0) < WARNING_INTERVAL:
+            return
+        self._last_warning[kind] = now
+        self.fenceWarning.emit(message, severity)
+
+    @pyqtSlot(str, str)
+    def _announce(self, message, severity):
+        print(f"[Geofence] {message}")
+        if self.message_logger:
+            self.message_logger.logMessage(message, severity)
+        spoken = message.lstrip("🚧⚠️ ").capitalize()
+        self.drone_commander._speak(spoken)
+
+    def cleanup(self):
+        MAVLinkThread.remove_message_listener('GLOBAL_POSITION_INT', self._on_position)
+        MAVLinkThread.remove_message_listener('VFR_HUD', self._on_vfr_hud)
+        print("[Geofence] Cleanup completed")
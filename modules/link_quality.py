@@ -0,0 +1,453 @@
+"""
+Link quality estimation.
+
+Three independent measurements of the telemetry link are combined:
+
+- RADIO_STATUS from a SiK radio: local and remote fade margin (RSSI above
+  the noise floor), free transmit buffer, and receive errors.
+- TIMESYNC round trips. A probe goes out every second and the vehicle
+  echoes it back, so the round-trip time is smoothed (TCP style, with a
+  variance term). A probe that is never answered counts as a round trip
+  of PROBE_TIMEOUT. The same exchanges feed the vehicle clock model in
+  clock_sync. Only echoes from the target vehicle's autopilot count.
+- Sequence gaps. Every MAVLink message carries a per-sender 8-bit
+  sequence number. Gaps are counted per (sysid, compid) and reported per
+  sysid.
+
+Each measurement is mapped to a 0..1 score. The raw quality is the worst
+of the scores that are available, and it is smoothed into the published
+quality.
+
+The recommended outbound rate follows the local radio's free transmit
+buffer, the way ArduPilot throttles its own streams: it halves below 20 %
+free, backs off below 50 % and creeps back up above 90 %. Without a radio
+it backs off on loss or long round trips instead. Senders scale their
+pipelining window or stream-rate requests with scale_window()/scale_rate().
+"""
+
+import time
+import threading
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal, pyqtSlot, pyqtProperty
+
+from modules.mavlink_thread import MAVLinkThread
+from modules.clock_sync import get_clock_sync
+
+UPDATE_INTERVAL_MS = 1000
+PROBE_TIMEOUT = 3.0
+SILENT_SECONDS = 3.0            # nothing received for this long = no link
+RADIO_STALE_SECONDS = 5.0
+RADIO_SYSID = 51                # SiK radios report as sysid 51 ("3D")
+AUTOPILOT_COMPID = 1            # MAV_COMP_ID_AUTOPILOT1, the only TIMESYNC echo trusted
+
+# Scoring (0..1 between the bad and good limits)
+FADE_MARGIN_GOOD_DB = 20.0
+FADE_MARGIN_BAD_DB = 5.0
+RTT_GOOD = 0.15
+RTT_BAD = 1.5
+LOSS_BAD = 0.2
+RX_ERRORS_BAD = 10.0            # per second
+QUALITY_SMOOTHING = 0.3
+LOSS_SMOOTHING = 0.3
+QUALITY_WARN = 40
+
+# Outbound rate (messages per second the GCS should send)
+MAX_OUTBOUND_RATE = 50.0
+MIN_OUTBOUND_RATE = 2.0
+OUTBOUND_STEP = 5.0
+TXBUF_CRITICAL = 20
+TXBUF_LOW = 50
+TXBUF_HIGH = 90
+LOSS_BACKOFF = 0.05
+WARNING_INTERVAL = 10.0
+
+
+def _score(value, bad, good):
+    if good > bad:
+        return min(1.0, max(0.0, (value - bad) / (good - bad)))
+    return min(1.0, max(0.0, (bad - value) / (bad - good)))
+
+
+def sik_db(value):
+    """SiK RSSI/noise units to dBm"""
+    return value / 1.9 - 127.0
+
+
+class LinkQualityEstimator:
+    """Thread-safe link statistics; fed by MAVLink reader thread listeners"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_seq = {}         # (sysid, compid) -> last sequence number
+        self._received = {}         # sysid -> messages received
+        self._lost = {}             # sysid -> messages missed
+        self._last_message = 0.0
+        self._radio = None
+        self._radio_time = 0.0
+        self._radio_errors = None   # (rxerrors, time) at the previous update
+        self._probes = {}           # ts1 sent -> monotonic send time
+        self._rtt = None
+        self._rtt_var = 0.0
+
+        self._interval_counts = {}  # sysid -> (received, lost) at the previous update
+        self._loss = {}             # sysid -> smoothed loss fraction
+        self._quality = 1.0
+        self._outbound_rate = MAX_OUTBOUND_RATE
+        self._scores = {}
+        self._reset_listeners = []
+        self._target = None         # (sysid, compid) of the vehicle's autopilot
+
+        MAVLinkThread.add_message_listener('*', self._on_message)
+        MAVLinkThread.add_message_listener('RADIO_STATUS', self._on_radio_status)
+        MAVLinkThread.add_message_listener('TIMESYNC', self._on_timesync)
+
+    # ------------------------------------------------------------------
+    # Senders
+    # ------------------------------------------------------------------
+
+    @property
+    def outbound_rate(self):
+        return self._outbound_rate
+
+    @property
+    def outbound_factor(self):
+        return self._outbound_rate / MAX_OUTBOUND_RATE
+
+    def scale_window(self, window):
+        """Messages a pipelined sender may keep in flight"""
+        return max(1, int(round(window * self.outbound_factor)))
+
+    def scale_rate(self, rate_hz, minimum=1.0):
+        """Stream rate to request instead of rate_hz"""
+        return max(minimum, rate_hz * self.outbound_factor)
+
+    def send_probe(self, connection):
+        """Send one TIMESYNC request; the echo gives the round-trip time"""
+        now = time.monotonic()
+        ts1 = time.monotonic_ns()
+        with self._lock:
+            self._probes[ts1] = now
+        try:
+            connection.mav.timesync_send(0, ts1)
+        except Exception as e:
+            with self._lock:
+                self._probes.pop(ts1, None)
+            print(f"[LinkQuality] TIMESYNC probe failed: {e}")
+
+    def set_target(self, sysid):
+        """Vehicle whose autopilot answers the probes and clocks the messages; None when disconnected"""
+        self._target = (sysid, AUTOPILOT_COMPID) if sysid else None
+        get_clock_sync().set_target(sysid, AUTOPILOT_COMPID)
+
+    def add_reset_listener(self, callback):
+        """callback() runs on every reset: connect, disconnect or a new target vehicle"""
+        with self._lock:
+            if callback not in self._reset_listeners:
+                self._reset_listeners.append(callback)
+
+    def remove_reset_listener(self, callback):
+        with self._lock:
+            if callback in self._reset_listeners:
+                self._reset_listeners.remove(callback)
+
+    def reset(self):
+        with self._lock:
+            self._last_seq.clear()
+            self._received.clear()
+            self._lost.clear()
+            self._interval_counts.clear()
+            self._loss.clear()
+            self._probes.clear()
+            self._last_message = time.monotonic()
+            self._radio = None
+            self._radio_errors = None
+            self._rtt = None
+            self._rtt_var = 0.0
+            self._quality = 1.0
+            self._outbound_rate = MAX_OUTBOUND_RATE
+            listeners = list(self._reset_listeners)
+        get_clock_sync().reset()
+        for callback in listeners:
+            try:
+                callback()
+            except Exception as e:
+                print(f"[LinkQuality] Reset listener error: {e}")
+
+    # ------------------------------------------------------------------
+    # MAVLink reader thread
+    # ------------------------------------------------------------------
+
+    def _on_message(self, msg):
+        if msg.get_type() == 'BAD_DATA':
+            return
+        sysid = msg.get_srcSystem()
+        key = (sysid, msg.get_srcComponent())
+        seq = msg.get_seq()
+        with self._lock:
+            self._last_message = time.monotonic()
+            last = self._last_seq.get(key)
+            self._last_seq[key] = seq
+            self._received[sysid] = self._received.get(sysid, 0) + 1
+            if last is not None:
+                gap = (seq - last - 1) & 0xFF
+                # A gap of more than half the sequence space is a restart or reordering, not loss
+                if 0 < gap < 128:
+                    self._lost[sysid] = self._lost.get(sysid, 0) + gap
+
+    def _on_radio_status(self, msg):
+        with self._lock:
+            self._radio = msg
+            self._radio_time = time.monotonic()
+
+    def _on_timesync(self, msg):
+        if msg.tc1 == 0:
+            return      # a request from the vehicle, not an echo of ours
+        if (msg.get_srcSystem(), msg.get_srcComponent()) != self._target:
+            return      # a companion computer or another vehicle echoing the broadcast probe
+        now = time.monotonic()
+        with self._lock:
+            sent = self._probes.pop(msg.ts1, None)
+            if sent is not None:
+                self._add_rtt(now - sent)
+        if sent is not None:
+            get_clock_sync().add_exchange(sent, now, msg.tc1 / 1e9)
+
+    def _add_rtt(self, sample):
+        if self._rtt is None:
+            self._rtt, self._rtt_var = sample, sample / 2.0
+        else:
+            self._rtt_var += 0.25 * (abs(sample - self._rtt) - self._rtt_var)
+            self._rtt += 0.125 * (sample - self._rtt)
+
+    # ------------------------------------------------------------------
+    # Periodic evaluation
+    # ------------------------------------------------------------------
+
+    def update(self, vehicle_sysid=None):
+        """Fold the latest measurements into the quality score and outbound rate"""
+        now = time.monotonic()
+        with self._lock:
+            for ts1, sent in list(self._probes.items()):
+                if now - sent > PROBE_TIMEOUT:
+                    del self._probes[ts1]
+                    self._add_rtt(PROBE_TIMEOUT)
+
+            for sysid, received in self._received.items():
+                lost = self._lost.get(sysid, 0)
+                previous = self._interval_counts.get(sysid, (0, 0))
+                d_received, d_lost = received - previous[0], lost - previous[1]
+                self._interval_counts[sysid] = (received, lost)
+                if d_received + d_lost:
+                    sample = d_lost / float(d_received + d_lost)
+                    smoothed = self._loss.get(sysid, sample)
+                    self._loss[sysid] = smoothed + LOSS_SMOOTHING * (sample - smoothed)
+
+            radio = self._radio if now - self._radio_time < RADIO_STALE_SECONDS else None
+            silent = now - self._last_message > SILENT_SECONDS
+            rtt = self._rtt
+            loss = self._loss.get(vehicle_sysid)
+            if loss is None:
+                others = [v for s, v in self._loss.items() if s != RADIO_SYSID]
+                loss = max(others) if others else None
+
+        scores = {}
+        rx_error_rate = 0.0
+        if radio is not None:
+            margin = min(radio.rssi - radio.noise, radio.remrssi - radio.remnoise) / 1.9
+            scores["radio"] = _score(margin, FADE_MARGIN_BAD_DB, FADE_MARGIN_GOOD_DB)
+            if self._radio_errors is not None:
+                errors, when = self._radio_errors
+                if now > when:
+                    rx_error_rate = max(0, radio.rxerrors - errors) / (now - when)
+                scores["errors"] = _score(rx_error_rate, RX_ERRORS_BAD, 0.0)
+            self._radio_errors = (radio.rxerrors, now)
+        if rtt is not None:
+            scores["rtt"] = _score(rtt, RTT_BAD, RTT_GOOD)
+        if loss is not None:
+            scores["loss"] = _score(loss, LOSS_BAD, 0.0)
+
+        raw = 0.0 if silent else min(scores.values(), default=1.0)
+        self._quality += QUALITY_SMOOTHING * (raw - self._quality)
+        self._scores = scores
+
+        rate = self._outbound_rate
+        if radio is not None:
+            if radio.txbuf < TXBUF_CRITICAL:
+                rate *= 0.5
+            elif radio.txbuf < TXBUF_LOW:
+                rate *= 0.8
+            elif radio.txbuf > TXBUF_HIGH:
+                rate += OUTBOUND_STEP
+        elif silent or (loss is not None and loss > LOSS_BACKOFF) or (rtt is not None and rtt > RTT_BAD):
+            rate *= 0.7
+        else:
+            rate += OUTBOUND_STEP
+        self._outbound_rate = min(MAX_OUTBOUND_RATE, max(MIN_OUTBOUND_RATE, rate))
+
+        return {
+            "quality": self._quality,
+            "scores": dict(scores),
+            "rtt": rtt,
+            "rttVariance": self._rtt_var if rtt is not None else None,
+            "loss": loss,
+            "lossBySystem": dict(self._loss),
+            "radio": radio,
+            "rxErrorRate": rx_error_rate,
+            "silent": silent,
+            "outboundRate": self._outbound_rate,
+        }
+
+
+_estimator = None
+_estimator_lock = threading.Lock()
+
+
+def get_link_quality():
+    """Shared estimator; pipelined senders ask it how hard they may push the link"""
+    global _estimator
+    with _estimator_lock:
+        if _estimator is None:
+            _estimator = LinkQualityEstimator()
+        return _estimator
+
+
+class LinkQualityService(QObject):
+    statusChanged = pyqtSignal()
+    linkWarning = pyqtSignal(str, str)      # message, severity
+
+    def __init__(self, drone_model=None, message_logger=None, parent=None):
+        super().__init__(parent)
+        self.drone_model = drone_model
+        self.message_logger = message_logger
+        self._estimator = get_link_quality()
+        self._status = {}
+        self._connected = False
+        self._link = None           # (connection, target system) the statistics belong to
+        self._last_warning = {}
+
+        self.linkWarning.connect(self._announce)
+        self._update_timer = QTimer(self)
+        self._update_timer.timeout.connect(self._update)
+        self._update_timer.start(UPDATE_INTERVAL_MS)
+        print("[LinkQuality] Initialized")
+
+    @property
+    def estimator(self):
+        return self._estimator
+
+    # ------------------------------------------------------------------
+    # QML interface
+    # ------------------------------------------------------------------
+
+    @pyqtProperty(int, notify=statusChanged)
+    def quality(self):
+        """Smoothed link quality, 0-100"""
+        return int(round(self._status.get("quality", 0.0) * 100)) if self._connected else 0
+
+    @pyqtProperty(float, notify=statusChanged)
+    def rtt(self):
+        """Smoothed TIMESYNC round trip, ms (-1 until measured)"""
+        rtt = self._status.get("rtt")
+        return round(rtt * 1000.0, 1) if rtt is not None else -1.0
+
+    @pyqtProperty(float, notify=statusChanged)
+    def loss(self):
+        """Vehicle message loss, percent"""
+        return round((self._status.get("loss") or 0.0) * 100.0, 1)
+
+    @pyqtProperty('QVariantMap', notify=statusChanged)
+    def lossBySystem(self):
+        return {str(sysid): round(v * 100.0, 1) for sysid, v in self._status.get("lossBySystem", {}).items()}
+
+    @pyqtProperty('QVariantMap', notify=statusChanged)
+    def radio(self):
+        """{rssi, remrssi, noise, remnoise (dBm), txbuf (% free), rxerrors, fixed}; empty without a SiK radio"""
+        radio = self._status.get("radio")
+        if radio is None:
+            return {}
+        return {"rssi": round(sik_db(radio.rssi), 1), "remrssi": round(sik_db(radio.remrssi), 1),
+                "noise": round(sik_db(radio.noise), 1), "remnoise": round(sik_db(radio.remnoise), 1),
+                "txbuf": radio.txbuf, "rxerrors": radio.rxerrors, "fixed": radio.fixed}
+
+    @pyqtProperty('QVariantMap', notify=statusChanged)
+    def scores(self):
+        """Per-measurement scores, 0-1"""
+        return {name: round(v, 2) for name, v in self._status.get("scores", {}).items()}
+
+    @pyqtProperty(bool, notify=statusChanged)
+    def clockSynced(self):
+        return get_clock_sync().synced
+
+    @pyqtProperty(bool, notify=statusChanged)
+    def clockDriftKnown(self):
+        """True once the exchanges span long enough to measure drift"""
+        return get_clock_sync().drift_ppm is not None
+
+    @pyqtProperty(float, notify=statusChanged)
+    def clockDrift(self):
+        """Vehicle clock drift against the GCS, ppm (0 until clockDriftKnown)"""
+        drift = get_clock_sync().drift_ppm
+        return round(drift, 1) if drift is not None else 0.0
+
+    @pyqtProperty(float, notify=statusChanged)
+    def clockUncertainty(self):
+        """Half the fastest TIMESYNC round trip, ms (-1 until synced)"""
+        uncertainty = get_clock_sync().uncertainty
+        return round(uncertainty * 1000.0, 1) if uncertainty is not None else -1.0
+
+    @pyqtProperty(float, notify=statusChanged)
+    def outboundRate(self):
+        """Recommended messages per second from the GCS"""
+        return round(self._estimator.outbound_rate, 1)
+
+    # ------------------------------------------------------------------
+    # GUI thread
+    # ------------------------------------------------------------------
+
+    def _update(self):
+        connected = bool(getattr(self.drone_model, 'isConnected', False))
+        connection = getattr(self.drone_model, 'drone_connection', None)
+        link = (id(connection), getattr(connection, 'target_system', None)) \
+            if connected and connection is not None else None
+        self._connected = connected
+        if link != self._link:
+            # Connect, disconnect, reconnect or a different vehicle
+            self._link = link
+            self._estimator.reset()
+            self._estimator.set_target(link[1] if link else None)
+        if not connected or connection is None:
+            if self._status:
+                self._status = {}
+                self.statusChanged.emit()
+            return
+
+        self._estimator.send_probe(connection)
+        status = self._estimator.update(getattr(connection, 'target_system', None))
+        self._status = status
+        self.statusChanged.emit()
+
+        quality = int(round(status["quality"] * 100))
+        if status["silent"]:
+            self._warn("silent", "📡 No telemetry received for 3 s", "error")
+        elif quality < QUALITY_WARN:
+            self._warn("quality", f"📡 Link quality low ({quality}%)", "warning")
+        radio = status["radio"]
+        if radio is not None and radio.txbuf < TXBUF_CRITICAL:
+            self._warn("txbuf", f"📡 Radio buffer {radio.txbuf}% free, slowing uplink to "
+                                f"{status['outboundRate']:.0f} msg/s", "warning")
+
+    def _warn(self, kind, message, severity):
+        now = time.time()
+        if now - self._last_warning.get(kind, 0) < WARNING_INTERVAL:
+            return
+        self._last_warning[kind] = now
+        self.linkWarning.emit(message, severity)
+
+    @pyqtSlot(str, str)
+    def _announce(self, message, severity):
+        print(f"[LinkQuality] {message}")
+        if self.message_logger:
+            self.message_logger.logMessage(message, severity)
+
+    def cleanup(self):
+        self._update_timer.stop()
+        print("[LinkQuality] Cleanup completed")
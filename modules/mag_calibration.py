@@ -0,0 +1,370 @@
+"""
+Ground-side magnetometer calibration.
+
+Magnetometer samples (RAW_IMU/SCALED_IMU for compass 1, SCALED_IMU2 and
+SCALED_IMU3 for compasses 2 and 3) are pushed by the MAVLink reader thread
+into a preallocated NumPy ring per compass. Each accepted sample updates the
+normal equations of two least-squares fits in place, and the sample it
+evicts from the ring is subtracted again, so a fit is always over the
+current window and never re-reads it:
+
+    sphere     x^2 + y^2 + z^2 = 2ax + 2by + 2cz + e
+    ellipsoid  Ax^2 + By^2 + Cz^2 + 2Dxy + 2Exz + 2Fyz + 2Gx + 2Hy + 2Iz = 1
+
+Solving is a 4x4 and a 9x9 system. The ellipsoid gives the hard-iron
+offsets (minus its centre) and a symmetric soft-iron matrix whose diagonal
+and off-diagonal terms map onto COMPASS_DIA / COMPASS_ODI. Fitness is the
+RMS of the corrected field length around the fitted radius in mGauss, the
+same figure ArduPilot reports in COMPASS_CAL_REPORT, so onboard results can
+be cross-checked while the vehicle is still being rotated.
+
+Alongside the fit, each sample is binned by direction from the fit centre
+(see mag_coverage) to show how much of the sphere has been covered and
+which way to rotate next.
+"""
+
+import threading
+import numpy as np
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal, pyqtSlot, pyqtProperty
+
+from modules.mavlink_thread import MAVLinkThread
+from modules.mag_coverage import SphericalCoverage
+
+MAX_COMPASSES = 3
+DEFAULT_RING_SIZE = 600
+MIN_SAMPLE_SEPARATION = 10.0    # mGauss between accepted samples
+MIN_SPHERE_SAMPLES = 20
+MIN_ELLIPSOID_SAMPLES = 50
+MAX_SOFT_IRON_RATIO = 2.0       # reject ellipsoids stretched further than this
+FIT_UPDATE_INTERVAL_MS = 250
+REBIN_CENTRE_SHIFT = 0.1        # re-project coverage when the centre moves 10% of the radius
+_SCALE = 1e-3                   # fit in Gauss for better conditioning
+
+# Message type -> compass index. RAW_IMU and SCALED_IMU both carry compass 1;
+# whichever arrives first is used so samples are not counted twice.
+MAG_MESSAGES = {
+    'RAW_IMU': 0,
+    'SCALED_IMU': 0,
+    'SCALED_IMU2': 1,
+    'SCALED_IMU3': 2,
+}
+
+
+def _sphere_row(p):
+    return np.array([2.0 * p[0], 2.0 * p[1], 2.0 * p[2], 1.0])
+
+
+def _ellipsoid_row(p):
+    x, y, z = p
+    return np.array([x * x, y * y, z * z, 2 * x * y, 2 * x * z, 2 * y * z, 2 * x, 2 * y, 2 * z])
+
+
+class EllipsoidFit:
+    """Sliding-window sphere and ellipsoid fit for one compass"""
+
+    def __init__(self, ring_size=DEFAULT_RING_SIZE):
+        self.ring_size = ring_size
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._ring = np.zeros((self.ring_size, 3))
+            self._count = 0
+            self._head = 0
+            self._evictions = 0
+            self._last = None
+            self._sphere_ata = np.zeros((4, 4))
+            self._sphere_atb = np.zeros(4)
+            self._ell_ata = np.zeros((9, 9))
+            self._ell_atb = np.zeros(9)
+            self.total_samples = 0
+
+    def __len__(self):
+        return self._count
+
+    def add(self, x, y, z):
+        """Add a sample in mGauss; returns False if it was too close to the previous one"""
+        sample = np.array((x, y, z), dtype=np.float64)
+        with self._lock:
+            if self._last is not None and np.linalg.norm(sample - self._last) < MIN_SAMPLE_SEPARATION:
+                return False
+            self._last = sample
+
+            if self._count == self.ring_size:
+                self._accumulate(self._ring[self._head] * _SCALE, -1.0)
+                self._evictions += 1
+            self._ring[self._head] = sample
+            self._accumulate(sample * _SCALE, 1.0)
+            self._head = (self._head + 1) % self.ring_size
+            self._count = min(self._count + 1, self.ring_size)
+            self.total_samples += 1
+
+            # Rank-one downdates slowly lose precision; rebuild once per ring
+            if self._evictions >= self.ring_size:
+                self._rebuild()
+        return True
+
+    def _accumulate(self, p, sign):
+        s = _sphere_row(p)
+        self._sphere_ata += sign * np.outer(s, s)
+        self._sphere_atb += sign * s * float(p @ p)
+        e = _ellipsoid_row(p)
+        self._ell_ata += sign * np.outer(e, e)
+        self._ell_atb += sign * e
+
+    def _rebuild(self):
+        p = self._ring[:self._count] * _SCALE
+        x, y, z = p[:, 0], p[:, 1], p[:, 2]
+        S = np.column_stack((2 * x, 2 * y, 2 * z, np.ones(len(p))))
+        E = np.column_stack((x * x, y * y, z * z, 2 * x * y, 2 * x * z, 2 * y * z, 2 * x, 2 * y, 2 * z))
+        self._sphere_ata = S.T @ S
+        self._sphere_atb = S.T @ (p * p).sum(axis=1)
+        self._ell_ata = E.T @ E
+        self._ell_atb = E.sum(axis=0)
+        self._evictions = 0
+
+    def samples(self):
+        with self._lock:
+            return self._ring[:self._count].copy()
+
+    def latest(self):
+        with self._lock:
+            return None if self._last is None else tuple(self._last)
+
+    def solve(self):
+        """
+        Returns a dict with model ("none", "sphere" or "ellipsoid"), offsets,
+        diagonal, offDiagonal, radius and fitness (mGauss), plus sample counts.
+        """
+        with self._lock:
+            count = self._count
+            sphere_ata, sphere_atb = self._sphere_ata.copy(), self._sphere_atb.copy()
+            ell_ata, ell_atb = self._ell_ata.copy(), self._ell_atb.copy()
+            samples = self._ring[:count].copy()
+
+        result = {"model": "none", "samples": count, "totalSamples": self.total_samples,
+                  "offsets": [0.0, 0.0, 0.0], "diagonal": [1.0, 1.0, 1.0],
+                  "offDiagonal": [0.0, 0.0, 0.0], "radius": 0.0, "fitness": -1.0}
+        if count < MIN_SPHERE_SAMPLES:
+            return result
+
+        try:
+            a, b, c, e = np.linalg.solve(sphere_ata, sphere_atb)
+        except np.linalg.LinAlgError:
+            return result
+        center = np.array([a, b, c])
+        radius_sq = e + center @ center
+        if radius_sq <= 0:
+            return result
+        radius = float(np.sqrt(radius_sq))
+        soft_iron = np.eye(3)
+        model = "sphere"
+
+        if count >= MIN_ELLIPSOID_SAMPLES:
+            fitted = self._solve_ellipsoid(ell_ata, ell_atb)
+            if fitted is not None:
+                center, soft_iron, radius = fitted
+                model = "ellipsoid"
+
+        # Everything below is back in mGauss
+        center = center / _SCALE
+        radius = radius / _SCALE
+        corrected = (samples - center) @ soft_iron.T
+        fitness = float(np.sqrt(np.mean((np.linalg.norm(corrected, axis=1) - radius) ** 2)))
+
+        result.update({
+            "model": model,
+            "offsets": (-center).tolist(),
+            "diagonal": np.diag(soft_iron).tolist(),
+            "offDiagonal": [float(soft_iron[0, 1]), float(soft_iron[0, 2]), float(soft_iron[1, 2])],
+            "radius": radius,
+            "fitness": fitness,
+        })
+        return result
+
+    @staticmethod
+    def _solve_ellipsoid(ata, atb):
+        try:
+            v = np.linalg.solve(ata, atb)
+        except np.linalg.LinAlgError:
+            return None
+        M = np.array([[v[0], v[3], v[4]],
+                      [v[3], v[1], v[5]],
+                      [v[4], v[5], v[2]]])
+        g = v[6:9]
+        try:
+            center = -np.linalg.solve(M, g)
+        except np.linalg.LinAlgError:
+            return None
+        k = 1.0 + center @ M @ center
+        if k <= 0:
+            return None
+        eigenvalues, eigenvectors = np.linalg.eigh(M / k)
+        if eigenvalues.min() <= 0 or eigenvalues.max() / eigenvalues.min() > MAX_SOFT_IRON_RATIO ** 2:
+            return None
+        # Volume-preserving correction: maps the ellipsoid onto a sphere of
+        # the ellipsoid's geometric-mean radius
+        radius = float(np.prod(eigenvalues) ** (-1.0 / 6.0))
+        soft_iron = radius * (eigenvectors * np.sqrt(eigenvalues)) @ eigenvectors.T
+        return center, soft_iron, radius
+
+
+class MagCalibrationEngine(QObject):
+    """
+    Streams magnetometer samples into one EllipsoidFit per compass while
+    active, and re-solves the fits on a GUI-thread timer.
+    """
+
+    fitUpdated = pyqtSignal()
+    sampleAdded = pyqtSignal(int, float, float, float)     # compass, x, y, z (mGauss)
+
+    def __init__(self, ring_size=DEFAULT_RING_SIZE, parent=None):
+        super().__init__(parent)
+        self._fits = [EllipsoidFit(ring_size) for _ in range(MAX_COMPASSES)]
+        self._coverage = [SphericalCoverage() for _ in range(MAX_COMPASSES)]
+        self._centres = [None] * MAX_COMPASSES
+        self._results = [fit.solve() for fit in self._fits]
+        self._primary_source = None
+        self._dirty = False
+        self._active = False
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(FIT_UPDATE_INTERVAL_MS)
+        self._timer.timeout.connect(self._refresh)
+
+    @pyqtProperty(bool, notify=fitUpdated)
+    def active(self):
+        return self._active
+
+    @pyqtSlot()
+    def start(self):
+        """Clear the rings and start collecting samples"""
+        self.reset()
+        if not self._active:
+            for msg_type in MAG_MESSAGES:
+                MAVLinkThread.add_message_listener(msg_type, self._on_imu_message)
+            self._active = True
+        self._timer.start()
+        print("[MagCalibration] Collecting magnetometer samples")
+
+    @pyqtSlot()
+    def stop(self):
+        if self._active:
+            for msg_type in MAG_MESSAGES:
+                MAVLinkThread.remove_message_listener(msg_type, self._on_imu_message)
+            self._active = False
+        self._timer.stop()
+        self._refresh(force=True)
+
+    @pyqtSlot()
+    def reset(self):
+        for fit, coverage in zip(self._fits, self._coverage):
+            fit.reset()
+            coverage.reset()
+        self._centres = [None] * MAX_COMPASSES
+        self._primary_source = None
+        self._refresh(force=True)
+
+    def _on_imu_message(self, msg):
+        """MAVLink reader thread"""
+        msg_type = msg.get_type()
+        compass = MAG_MESSAGES.get(msg_type)
+        if compass is None:
+            return
+        if compass == 0:
+            if self._primary_source is None:
+                self._primary_source = msg_type
+            elif msg_type != self._primary_source:
+                return
+        x, y, z = msg.xmag, msg.ymag, msg.zmag
+        if x == 0 and y == 0 and z == 0:
+            return      # compass not fitted on this instance
+        if self._fits[compass].add(x, y, z):
+            self._coverage[compass].add(x, y, z)
+            self._dirty = True
+            self.sampleAdded.emit(compass, float(x), float(y), float(z))
+
+    def _refresh(self, force=False):
+        if not (self._dirty or force):
+            return
+        self._dirty = False
+        results = [fit.solve() for fit in self._fits]
+        for compass, result in enumerate(results):
+            self._update_centre(compass, result)
+            result["coverage"] = self._coverage[compass].coverage
+        self._results = results
+        self.fitUpdated.emit()
+
+    def _update_centre(self, compass, result):
+        """Move coverage binning onto the fitted centre once it is known"""
+        if result["model"] == "none":
+            return
+        centre = -np.asarray(result["offsets"])
+        previous = self._centres[compass]
+        if previous is not None and np.linalg.norm(centre - previous) < REBIN_CENTRE_SHIFT * result["radius"]:
+            return
+        self._centres[compass] = centre
+        self._coverage[compass].recentre(centre, self._fits[compass].samples())
+
+    def fit(self, compass):
+        return self._fits[compass]
+
+    def latest_sample(self, compass):
+        return self._fits[compass].latest()
+
+    @pyqtProperty('QVariantList', notify=fitUpdated)
+    def results(self):
+        return [dict(r) for r in self._results]
+
+    @pyqtProperty(float, notify=fitUpdated)
+    def coverage(self):
+        """Sphere coverage of the first compass, in percent"""
+        return self._coverage[0].coverage
+
+    @pyqtProperty(str, notify=fitUpdated)
+    def coverageBitmap(self):
+        return self._coverage[0].bitmap()
+
+    @pyqtProperty(int, constant=True)
+    def coverageRows(self):
+        return self._coverage[0].bands
+
+    @pyqtProperty(int, constant=True)
+    def coverageColumns(self):
+        return self._coverage[0].sectors
+
+    @pyqtProperty(int, notify=fitUpdated)
+    def suggestedOrientation(self):
+        """Orientation prompt index to fill the emptiest region, -1 when covered"""
+        return self._coverage[0].suggest()[1]
+
+    def coverage_for(self, compass):
+        return self._coverage[compass]
+
+    @pyqtSlot(int, result='QVariant')
+    def fitResult(self, compass):
+        if not 0 <= compass < MAX_COMPASSES:
+            return None
+        return dict(self._results[compass])
+
+    def compare_report(self, compass, offsets, diagonal, off_diagonal, fitness):
+        """
+        Compare an onboard COMPASS_CAL_REPORT with the ground fit.
+        Returns None if there is no ground fit yet, else the differences.
+        """
+        ground = self._fits[compass].solve()
+        if ground["model"] == "none":
+            return None
+        return {
+            "offsetError": float(np.linalg.norm(np.subtract(offsets, ground["offsets"]))),
+            "diagonalError": float(np.abs(np.subtract(diagonal, ground["diagonal"])).max()),
+            "offDiagonalError": float(np.abs(np.subtract(off_diagonal, ground["offDiagonal"])).max()),
+            "onboardFitness": float(fitness),
+            "groundFitness": ground["fitness"],
+            "ground": ground,
+        }
+
+    def cleanup(self):
+        self.stop()
+        print("[MagCalibration] Cleanup completed")
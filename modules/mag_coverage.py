@@ -0,0 +1,160 @@
+"""
+Spherical coverage of magnetometer samples during compass calibration.
+
+Each sample, taken relative to the current fit centre, is normalised and
+dropped into an equal-area grid on the unit sphere: the sphere is cut into
+bands of equal height in z (Archimedes: equal height means equal area) and
+every band into the same number of longitude sectors, so every bin covers
+the same solid angle and the bin index is two floor() calls, O(1) per
+sample.
+
+Each bin also keeps the sum of the raw samples in it. When the fit centre
+moves, every occupied bin is re-projected through its mean raw sample, so
+coverage gathered early in the calibration survives the move instead of
+being recounted from the samples still in the fit window.
+
+Coverage is the fraction of bins that hold at least one sample. The
+suggested next move comes from the empty bin with the fewest covered bins
+around it (one matrix-vector product over a precomputed neighbour matrix),
+mapped to the body axis the operator should point down, since the Earth's
+field is mostly vertical away from the equator.
+"""
+
+import math
+import threading
+import numpy as np
+
+DEFAULT_BANDS = 8
+DEFAULT_SECTORS = 16
+NEIGHBOUR_ANGLE = 45.0          # degrees; how wide an "empty region" is
+
+# Body-frame axis (FRD) -> index into the calibration orientation prompts:
+# FRONT, BACK, LEFT, RIGHT, TOP, BOTTOM points down
+_AXES = np.array([
+    [1.0, 0.0, 0.0],
+    [-1.0, 0.0, 0.0],
+    [0.0, -1.0, 0.0],
+    [0.0, 1.0, 0.0],
+    [0.0, 0.0, -1.0],
+    [0.0, 0.0, 1.0],
+])
+
+
+class SphericalCoverage:
+    """Equal-area bin counts for one compass; samples may come from any thread"""
+
+    def __init__(self, bands=DEFAULT_BANDS, sectors=DEFAULT_SECTORS):
+        self.bands = bands
+        self.sectors = sectors
+        self.size = bands * sectors
+        self._lock = threading.Lock()
+        self._counts = np.zeros(self.size, dtype=np.int32)
+        self._sums = np.zeros((self.size, 3))       # raw samples per bin, summed
+        self._centre = np.zeros(3)
+
+        band = np.repeat(np.arange(bands), sectors)
+        sector = np.tile(np.arange(sectors), bands)
+        z = -1.0 + (band + 0.5) * 2.0 / bands
+        phi = (sector + 0.5) * 2.0 * math.pi / sectors - math.pi
+        r = np.sqrt(1.0 - z * z)
+        self.centres = np.column_stack((r * np.cos(phi), r * np.sin(phi), z))
+        self._neighbours = (self.centres @ self.centres.T
+                            >= math.cos(math.radians(NEIGHBOUR_ANGLE))).astype(np.float64)
+
+    def reset(self):
+        with self._lock:
+            self._counts[:] = 0
+            self._sums[:] = 0.0
+            self._centre = np.zeros(3)
+
+    @property
+    def centre(self):
+        return self._centre.copy()
+
+    def bin_index(self, x, y, z):
+        norm = math.sqrt(x * x + y * y + z * z)
+        if norm == 0.0:
+            return -1
+        band = min(int((z / norm + 1.0) * 0.5 * self.bands), self.bands - 1)
+        sector = min(int((math.atan2(y, x) + math.pi) / (2.0 * math.pi) * self.sectors), self.sectors - 1)
+        return band * self.sectors + sector
+
+    def _bin_indices(self, vectors):
+        """bin_index for an (n, 3) array; -1 for zero vectors"""
+        norms = np.linalg.norm(vectors, axis=1)
+        safe = np.where(norms > 0, norms, 1.0)
+        unit = vectors / safe[:, None]
+        band = np.minimum(((unit[:, 2] + 1.0) * 0.5 * self.bands).astype(int), self.bands - 1)
+        sector = np.minimum(((np.arctan2(unit[:, 1], unit[:, 0]) + math.pi)
+                             / (2.0 * math.pi) * self.sectors).astype(int), self.sectors - 1)
+        return np.where(norms > 0, band * self.sectors + sector, -1)
+
+    def add(self, x, y, z):
+        """Add a raw sample, binned by its direction from the current centre"""
+        with self._lock:
+            cx, cy, cz = self._centre
+            index = self.bin_index(x - cx, y - cy, z - cz)
+            if index < 0:
+                return False
+            new_bin = self._counts[index] == 0
+            self._counts[index] += 1
+            self._sums[index] += (x, y, z)
+        return new_bin
+
+    def recentre(self, centre, recent=None):
+        """
+        Re-project the accumulated bins around a new fit centre. recent
+        (raw samples, e.g. the fit window) fills bins the re-projection
+        left empty, since a bin's mean stands for samples that may now
+        straddle several bins.
+        """
+        centre = np.asarray(centre, dtype=np.float64)
+        with self._lock:
+            counts = np.zeros(self.size, dtype=np.int32)
+            sums = np.zeros((self.size, 3))
+            occupied = np.flatnonzero(self._counts)
+            if len(occupied):
+                index = self._bin_indices(self._sums[occupied] / self._counts[occupied, None] - centre)
+                valid = index >= 0
+                np.add.at(counts, index[valid], self._counts[occupied][valid])
+                np.add.at(sums, index[valid], self._sums[occupied][valid])
+
+            if recent is not None and len(recent):
+                recent = np.asarray(recent, dtype=np.float64)
+                index = self._bin_indices(recent - centre)
+                fill = index >= 0
+                fill[fill] = counts[index[fill]] == 0
+                np.add.at(counts, index[fill], 1)
+                np.add.at(sums, index[fill], recent[fill])
+
+            self._counts, self._sums, self._centre = counts, sums, centre
+
+    def counts(self):
+        with self._lock:
+            return self._counts.copy()
+
+    @property
+    def coverage(self):
+        """Percentage of bins with at least one sample"""
+        with self._lock:
+            return 100.0 * np.count_nonzero(self._counts) / self.size
+
+    def bitmap(self):
+        """One character per bin, band-major from z=-1: '1' covered, '0' empty"""
+        with self._lock:
+            return "".join("1" if c else "0" for c in self._counts.tolist())
+
+    def suggest(self):
+        """
+        Centre of the emptiest region and the index of the body axis to
+        point down to fill it, or (None, -1) when every bin is covered.
+        """
+        counts = self.counts()
+        filled = (counts > 0).astype(np.float64)
+        empty = filled == 0
+        if not empty.any():
+            return None, -1
+        score = (self._neighbours @ filled) / self._neighbours.sum(axis=1)
+        score[~empty] = np.inf
+        direction = self.centres[int(np.argmin(score))]
+        return direction, int(np.argmax(_AXES @ direction))
@@ -4,16 +4,51 @@
 
 import math
 import time
+import threading
 from PyQt5.QtCore import pyqtSignal, QThread
 from pymavlink import mavutil
 from pymavlink.dialects.v20 import ardupilotmega as mavlink_dialect
 from pymavlink.dialects.v20 import common as mavlink_common
 from pymavlink.dialects.v20 import ardupilotmega as mavutil_ardupilot
 
+from modules.clock_sync import get_clock_sync
+
 class MAVLinkThread(QThread):
     telemetryUpdated = pyqtSignal(dict)
     statusTextChanged = pyqtSignal(str)
 
+    # Message listeners shared by every reader thread: msg_type -> [callback]
+    # ('*' receives every message). Callbacks run on the reader thread and
+    # must not block; emit a signal to get back onto the GUI thread.
+    _message_listeners = {}
+    _listener_lock = threading.Lock()
+
+    @classmethod
+    def add_message_listener(cls, msg_type, callback):
+        """Receive every message of msg_type seen by the reader thread"""
+        with cls._listener_lock:
+            callbacks = cls._message_listeners.setdefault(msg_type, [])
+            if callback not in callbacks:
+                callbacks.append(callback)
+
+    @classmethod
+    def remove_message_listener(cls, msg_type, callback):
+        with cls._listener_lock:
+            callbacks = cls._message_listeners.get(msg_type, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+
+    def _dispatch_to_listeners(self, msg_type, msg):
+        for key in (msg_type, '*'):
+            callbacks = self._message_listeners.get(key)
+            if not callbacks:
+                continue
+            for callback in tuple(callbacks):
+                try:
+                    callback(msg)
+                except Exception as e:
+                    print(f"[MAVLinkThread] ⚠️ Listener error for {msg_type}: {e}")
+
     def __init__(self, drone):
         super().__init__()
         self.drone = drone
@@ -37,6 +72,7 @@ class MAVLinkThread(QThread):
         self.last_mode_enforcement_time = 0
         self.mode_enforcement_interval = 0.5
         self.last_mode_change_time = 0
+        self._clock = get_clock_sync()
         
         print("[MAVLinkThread] ✅ Initialized with GCS mode priority ENABLED by default")
         print("[MAVLinkThread] 🔒 RC mode switch will be IGNORED (RC flight controls still work)")
@@ -124,7 +160,10 @@ class MAVLinkThread(QThread):
                 msg = self.drone.recv_match(blocking=False, timeout=0.01)
 
                 if msg:
+                    # Vehicle-time-corrected timestamp (msg.gcs_time / msg.vehicle_time)
+                    self._clock.stamp(msg, time.monotonic())
                     msg_type = msg.get_type()
+                    self._dispatch_to_listeners(msg_type, msg)
                     msg_dict = msg.to_dict()
                     telemetry_component_changed = False
 
@@ -150,7 +189,7 @@ class MAVLinkThread(QThread):
                             telemetry_component_changed = True
                             
                             print(f"[MAVLinkThread] ✅ Mode changed: {old_mode} -> {new_mode}")
-                            self.last_mode_change_time = time.time()
+                            self.last_mode_change_time = self._clock.to_wall(msg.gcs_time)
                             
                             if new_mode == self.gcs_commanded_mode:
                                 print(f"[MAVLinkThread] ✅ GCS mode confirmed: {new_mode}")
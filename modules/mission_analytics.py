@@ -0,0 +1,276 @@
+"""
+Mission analytics: per-leg distance, time, climb and energy.
+
+Waypoints are held as NumPy columns (lat, lon, alt, speed) and every leg
+quantity is computed for the whole mission in one vectorized pass. Moving
+a single waypoint only touches the two legs that share it and adjusts the
+totals by the difference, so the numbers can be refreshed on every drag
+event even for missions with thousands of points.
+
+The energy figure is a planning estimate, not a battery model:
+
+    E_leg = P_hover * t_leg + m * g * climb / eta        (descents are free)
+"""
+
+import threading
+import numpy as np
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot, pyqtProperty
+
+EARTH_RADIUS_M = 6371000.0
+GRAVITY = 9.80665
+
+DEFAULT_SPEED = 5.0             # m/s when a waypoint has no speed
+DEFAULT_CLIMB_RATE = 2.5        # m/s, WPNAV_SPEED_UP default
+DEFAULT_DESCENT_RATE = 1.5      # m/s, WPNAV_SPEED_DN default
+DEFAULT_MASS_KG = 2.5
+DEFAULT_HOVER_POWER_W = 350.0
+DEFAULT_CLIMB_EFFICIENCY = 0.6
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Great-circle distance in metres; accepts scalars or arrays in degrees"""
+    lat1, lon1, lat2, lon2 = (np.radians(v) for v in (lat1, lon1, lat2, lon2))
+    a = (np.sin((lat2 - lat1) * 0.5) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) * 0.5) ** 2)
+    return 2.0 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class MissionAnalyzer:
+    """
+    Column store of waypoints plus derived leg arrays. Leg i runs from
+    waypoint i to waypoint i+1 and is flown at waypoint i's speed.
+    """
+
+    def __init__(self, mass_kg=DEFAULT_MASS_KG, hover_power_w=DEFAULT_HOVER_POWER_W,
+                 climb_efficiency=DEFAULT_CLIMB_EFFICIENCY, climb_rate=DEFAULT_CLIMB_RATE,
+                 descent_rate=DEFAULT_DESCENT_RATE):
+        self.mass_kg = mass_kg
+        self.hover_power_w = hover_power_w
+        self.climb_efficiency = climb_efficiency
+        self.climb_rate = climb_rate
+        self.descent_rate = descent_rate
+        self.set_waypoints([], [], [], [])
+
+    def __len__(self):
+        return len(self.lat)
+
+    # ------------------------------------------------------------------
+    # Loading and editing
+    # ------------------------------------------------------------------
+
+    def set_waypoints(self, lat, lon, alt, speed=None):
+        """Replace the mission and recompute everything"""
+        self.lat = np.asarray(lat, dtype=np.float64).copy()
+        self.lon = np.asarray(lon, dtype=np.float64).copy()
+        self.alt = np.asarray(alt, dtype=np.float64).copy()
+        if speed is None:
+            speed = np.full(len(self.lat), DEFAULT_SPEED)
+        self.speed = np.asarray(speed, dtype=np.float64).copy()
+        self.recompute()
+
+    def append(self, lat, lon, alt, speed=DEFAULT_SPEED):
+        self.set_waypoints(np.append(self.lat, lat), np.append(self.lon, lon),
+                           np.append(self.alt, alt), np.append(self.speed, speed))
+
+    def delete(self, index):
+        if not 0 <= index < len(self.lat):
+            return
+        self.set_waypoints(np.delete(self.lat, index), np.delete(self.lon, index),
+                           np.delete(self.alt, index), np.delete(self.speed, index))
+
+    def move(self, index, lat, lon, alt=None, speed=None):
+        """Move one waypoint; only the legs touching it are recomputed"""
+        n = len(self.lat)
+        if not 0 <= index < n:
+            return
+        self.lat[index] = lat
+        self.lon[index] = lon
+        if alt is not None:
+            self.alt[index] = alt
+        if speed is not None:
+            self.speed[index] = speed
+
+        lo = max(index - 1, 0)
+        hi = min(index + 1, n - 1)     # legs lo .. hi-1
+        if hi <= lo:
+            return
+        legs = slice(lo, hi)
+        old = self._leg_totals(legs)
+        self._compute_legs(legs)
+        new = self._leg_totals(legs)
+        self._totals += new - old
+        self._cumulative = None
+
+    # ------------------------------------------------------------------
+    # Computation
+    # ------------------------------------------------------------------
+
+    def recompute(self):
+        legs = max(len(self.lat) - 1, 0)
+        self.leg_distance = np.zeros(legs)
+        self.leg_time = np.zeros(legs)
+        self.leg_climb = np.zeros(legs)
+        self.leg_energy_wh = np.zeros(legs)
+        if legs:
+            self._compute_legs(slice(0, legs))
+        self._totals = self._leg_totals(slice(0, legs))
+        self._cumulative = None
+
+    def _compute_legs(self, legs):
+        start, stop = legs.start, legs.stop
+        distance = haversine(self.lat[start:stop], self.lon[start:stop],
+                             self.lat[start + 1:stop + 1], self.lon[start + 1:stop + 1])
+        climb = self.alt[start + 1:stop + 1] - self.alt[start:stop]
+        speed = self.speed[start:stop]
+        speed = np.where(speed > 0.1, speed, DEFAULT_SPEED)
+
+        # Horizontal and vertical motion overlap; the slower of the two sets the leg time
+        vertical_time = np.where(climb > 0, climb / self.climb_rate, -climb / self.descent_rate)
+        time_s = np.maximum(distance / speed, vertical_time)
+
+        energy_j = (self.hover_power_w * time_s
+                    + self.mass_kg * GRAVITY * np.maximum(climb, 0.0) / self.climb_efficiency)
+
+        self.leg_distance[legs] = distance
+        self.leg_time[legs] = time_s
+        self.leg_climb[legs] = climb
+        self.leg_energy_wh[legs] = energy_j / 3600.0
+
+    def _leg_totals(self, legs):
+        climb = self.leg_climb[legs]
+        return np.array([
+            self.leg_distance[legs].sum(),
+            self.leg_time[legs].sum(),
+            climb[climb > 0].sum(),
+            -climb[climb < 0].sum(),
+            self.leg_energy_wh[legs].sum(),
+        ])
+
+    @property
+    def cumulative_distance(self):
+        """Distance flown on arrival at each waypoint (0 at the first)"""
+        if self._cumulative is None:
+            self._cumulative = np.concatenate(([0.0], np.cumsum(self.leg_distance)))
+        return self._cumulative
+
+    def summary(self):
+        distance, time_s, climb, descent, energy = self._totals
+        return {
+            "waypoints": len(self.lat),
+            "distance": float(distance),
+            "time": float(time_s),
+            "climb": float(climb),
+            "descent": float(descent),
+            "energyWh": float(energy),
+        }
+
+    def legs(self):
+        cumulative = self.cumulative_distance
+        elapsed = np.concatenate(([0.0], np.cumsum(self.leg_time)))
+        return [{
+            "index": i,
+            "distance": float(self.leg_distance[i]),
+            "cumulative": float(cumulative[i + 1]),
+            "time": float(self.leg_time[i]),
+            "eta": float(elapsed[i + 1]),
+            "climb": float(self.leg_climb[i]),
+            "energyWh": float(self.leg_energy_wh[i]),
+        } for i in range(len(self.leg_distance))]
+
+
+class MissionAnalyticsModel(QObject):
+    """
+    QML-facing wrapper. NavigationControls pushes its waypoint list with
+    setWaypoints and calls moveWaypoint while dragging; MapCommunicationBridge
+    forwards its own marker edits the same way.
+    """
+
+    analyticsChanged = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._analyzer = MissionAnalyzer()
+        self._lock = threading.Lock()
+        self._summary = self._analyzer.summary()
+
+    @property
+    def analyzer(self):
+        return self._analyzer
+
+    def _changed(self):
+        self._summary = self._analyzer.summary()
+        self.analyticsChanged.emit()
+
+    @pyqtSlot('QVariantList')
+    def setWaypoints(self, waypoints):
+        """Accepts marker dicts (lat/lng/altitude/speed) or mission items (x/y/z)"""
+        with self._lock:
+            lat = [float(w.get('lat', w.get('x', 0)) or 0) for w in waypoints]
+            lon = [float(w.get('lng', w.get('lon', w.get('y', 0))) or 0) for w in waypoints]
+            alt = [float(w.get('altitude', w.get('z', 10)) or 0) for w in waypoints]
+            speed = [float(w.get('speed', DEFAULT_SPEED) or DEFAULT_SPEED) for w in waypoints]
+            self._analyzer.set_waypoints(lat, lon, alt, speed)
+        self._changed()
+
+    def set_arrays(self, lat, lon, alt, speed=None):
+        """Load typed columns directly (e.g. from a parsed waypoint file)"""
+        with self._lock:
+            self._analyzer.set_waypoints(lat, lon, alt, speed)
+        self._changed()
+
+    @pyqtSlot(int, float, float, float)
+    def moveWaypoint(self, index, lat, lng, altitude):
+        with self._lock:
+            self._analyzer.move(index, lat, lng, altitude)
+        self._changed()
+
+    def append(self, lat, lng, altitude, speed):
+        with self._lock:
+            self._analyzer.append(lat, lng, altitude, speed)
+        self._changed()
+
+    def delete(self, index):
+        with self._lock:
+            self._analyzer.delete(index)
+        self._changed()
+
+    @pyqtProperty(float, notify=analyticsChanged)
+    def totalDistance(self):
+        return self._summary["distance"]
+
+    @pyqtProperty(float, notify=analyticsChanged)
+    def totalTime(self):
+        return self._summary["time"]
+
+    @pyqtProperty(float, notify=analyticsChanged)
+    def totalClimb(self):
+        return self._summary["climb"]
+
+    @pyqtProperty(float, notify=analyticsChanged)
+    def totalDescent(self):
+        return self._summary["descent"]
+
+    @pyqtProperty(float, notify=analyticsChanged)
+    def energyWh(self):
+        return self._summary["energyWh"]
+
+    @pyqtSlot(result='QVariant')
+    def summary(self):
+        return dict(self._summary)
+
+    @pyqtSlot(result='QVariantList')
+    def legs(self):
+        with self._lock:
+            return self._analyzer.legs()
+
+    @pyqtSlot(float, float, float)
+    def setVehicleModel(self, mass_kg, hover_power_w, climb_efficiency):
+        with self._lock:
+            self._analyzer.mass_kg = mass_kg
+            self._analyzer.hover_power_w = hover_power_w
+            self._analyzer.climb_efficiency = max(climb_efficiency, 0.05)
+            self._analyzer.recompute()
+        self._changed()
+
+    def cleanup(self):
+        print("[MissionAnalytics] Cleanup completed")
@@ -0,0 +1,568 @@
+"""
+Mission transfer engine.
+
+Uploads, downloads and clears mission, fence and rally item lists with the
+MAVLink mission protocol (MISSION_ITEM_INT only). Messages arrive through
+the MAVLinkThread listener registry, so a MISSION_REQUEST(_INT) is answered
+from the reader thread the moment it is parsed instead of waiting for a
+polling loop to come round. A small worker thread only handles timeouts:
+each step has a deadline derived from the measured link round-trip time,
+and on expiry the last packet is resent (MISSION_COUNT, the item the vehicle
+asked for, MISSION_REQUEST_LIST or the next MISSION_REQUEST_INT). A
+transfer therefore takes roughly RTT x items rather than a fixed sleep per
+item.
+
+The last list confirmed on the vehicle is kept per mission type, so an
+edited list can be diffed against it and only the changed range rewritten
+with MISSION_WRITE_PARTIAL_LIST. The confirmed lists are dropped when the
+connection or target vehicle changes, and when MISSION_CURRENT or another
+GCS's MISSION_COUNT / MISSION_CLEAR_ALL shows the vehicle's lists changed.
+A partial write first reads the vehicle's item count and falls back to a
+full upload if it differs.
+"""
+
+import time
+import threading
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot, pyqtProperty
+from pymavlink import mavutil
+
+from modules.mavlink_thread import MAVLinkThread
+from modules.link_quality import get_link_quality
+
+MISSION_TYPE_MISSION = 0
+MISSION_TYPE_FENCE = 1
+MISSION_TYPE_RALLY = 2
+
+MISSION_TYPE_NAMES = {
+    MISSION_TYPE_MISSION: "mission",
+    MISSION_TYPE_FENCE: "fence",
+    MISSION_TYPE_RALLY: "rally",
+}
+
+# Per-step timeout is RTT_TIMEOUT_FACTOR x smoothed RTT, clamped to these
+MIN_STEP_TIMEOUT = 0.3
+MAX_STEP_TIMEOUT = 2.5
+RTT_TIMEOUT_FACTOR = 4.0
+INITIAL_RTT = 0.4
+MAX_RETRIES = 5
+# MISSION_CURRENT right after a transfer may still describe the old list
+CURRENT_GRACE = 2.0
+UINT16_MAX = 65535
+
+_MISSION_MESSAGES = ['MISSION_REQUEST', 'MISSION_REQUEST_INT', 'MISSION_ACK',
+                     'MISSION_COUNT', 'MISSION_ITEM_INT']
+# Messages that show a list on the vehicle changed outside our transfers
+_CHANGE_MESSAGES = ['MISSION_CURRENT', 'MISSION_COUNT', 'MISSION_CLEAR_ALL',
+                    'MISSION_WRITE_PARTIAL_LIST']
+
+# MAV_FRAME values whose x/y are latitude/longitude (sent as degE7)
+_GLOBAL_FRAMES = {0, 3, 5, 6, 10, 11}
+# Local frames carry x/y in metres, sent as m * 1e4
+_LOCAL_FRAMES = {1, 4, 7, 8, 9}
+
+
+def _xy_scale(frame):
+    if frame in _GLOBAL_FRAMES:
+        return 1e7
+    if frame in _LOCAL_FRAMES:
+        return 1e4
+    return 1.0
+
+
+def mission_type_name(mission_type):
+    return MISSION_TYPE_NAMES.get(mission_type, f"type {mission_type}")
+
+
+class _Transfer:
+    """State of the single transfer in progress"""
+
+    def __init__(self, op, mission_type, items=None, start=0, end=None):
+        self.op = op                    # "upload", "download" or "clear"
+        self.mission_type = mission_type
+        self.items = items or []
+        self.count = len(self.items) if op == "upload" else None
+        # upload: seq range the vehicle will ask for (a sub-range for partial writes)
+        self.partial = end is not None
+        self.checking_count = self.partial  # partial: vehicle count not verified yet
+        self.opaque_id = 0              # download: plan id from MISSION_COUNT
+        self.start = start
+        self.end = end if end is not None else len(self.items) - 1
+        self.received = {}              # download: seq -> item dict
+        self.next_seq = 0               # download: seq we are asking for
+        self.highest_sent = -1          # upload: highest seq sent
+        self.last_sent = None           # callable that resends the last packet
+        self.sent_at = 0.0
+        self.deadline = 0.0
+        self.retries = 0
+        self.started = time.time()
+        self.finished = threading.Event()
+        self.success = False
+        self.message = ""
+
+
+class MissionTransferEngine(QObject):
+    """
+    Event-driven mission protocol client. One transfer runs at a time;
+    start one with upload(), download() or clear() and either connect to
+    transferCompleted or block on wait().
+    """
+
+    transferProgress = pyqtSignal(str, int, int)          # op, done, total
+    transferCompleted = pyqtSignal(bool, str)
+    itemsDownloaded = pyqtSignal(int, 'QVariantList')     # mission_type, items
+    busyChanged = pyqtSignal()
+
+    def __init__(self, drone_model):
+        super().__init__()
+        self.drone_model = drone_model
+        self._lock = threading.RLock()
+        self._wakeup = threading.Condition(self._lock)
+        self._transfer = None
+        self._last_transfer = None
+        self._srtt = INITIAL_RTT
+        self._confirmed = {}            # mission_type -> items known to be on the vehicle
+        self._plan_ids = {}             # mission_type -> opaque plan id of the confirmed list (0 unknown)
+        self._finished_at = 0.0
+        for msg_type in _MISSION_MESSAGES:
+            MAVLinkThread.add_message_listener(msg_type, self._on_mission_message)
+        for msg_type in _CHANGE_MESSAGES:
+            MAVLinkThread.add_message_listener(msg_type, self._on_list_change)
+        get_link_quality().add_reset_listener(self.forget)
+        print("[MissionTransfer] Initialized")
+
+    @property
+    def _drone(self):
+        return self.drone_model.drone_connection
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    @pyqtProperty(bool, notify=busyChanged)
+    def busy(self):
+        return self._transfer is not None
+
+    @pyqtProperty(float, notify=busyChanged)
+    def roundTripTime(self):
+        return self._srtt
+
+    def upload(self, mission_type, items):
+        """
+        Start uploading items (dicts with seq, frame, command, current,
+        autocontinue, param1-4, x, y, z; x/y in degrees for global frames).
+        """
+        items = [self._normalise_item(i, item) for i, item in enumerate(items)]
+        return self._start(_Transfer("upload", mission_type, items))
+
+    def upload_partial(self, mission_type, items, start, end):
+        """
+        Rewrite items[start..end] in place with MISSION_WRITE_PARTIAL_LIST.
+        items is the whole list; the vehicle only requests the given range.
+        """
+        items = [self._normalise_item(i, item) for i, item in enumerate(items)]
+        if not 0 <= start <= end < len(items):
+            print(f"[MissionTransfer] ❌ Invalid partial range {start}-{end} for {len(items)} items")
+            return False
+        return self._start(_Transfer("upload", mission_type, items, start, end))
+
+    def plan_update(self, mission_type, items):
+        """
+        Compare items with the last list confirmed on the vehicle.
+        Returns ("none", None), ("partial", (start, end)) or ("full", None);
+        a full upload is needed when nothing is confirmed or the count changed.
+        """
+        confirmed = self._confirmed.get(mission_type)
+        if confirmed is None or len(confirmed) != len(items):
+            return "full", None
+        dirty = [seq for seq, item in enumerate(items)
+                 if not self._same_item(self._normalise_item(seq, item), confirmed[seq])]
+        if not dirty:
+            return "none", None
+        return "partial", (dirty[0], dirty[-1])
+
+    def download(self, mission_type):
+        return self._start(_Transfer("download", mission_type))
+
+    def clear(self, mission_type):
+        return self._start(_Transfer("clear", mission_type))
+
+    def wait(self, timeout=None):
+        """Block until the most recent transfer ends; returns (success, message)"""
+        transfer = self._last_transfer
+        if transfer is None:
+            return False, "No transfer started"
+        if not transfer.finished.wait(timeout):
+            return False, "Timed out waiting for transfer"
+        return transfer.success, transfer.message
+
+    def cancel(self):
+        with self._lock:
+            if self._transfer is not None:
+                self._finish(False, "Transfer cancelled")
+
+    def confirmed_items(self, mission_type):
+        """Items last uploaded to or downloaded from the vehicle"""
+        return list(self._confirmed.get(mission_type, []))
+
+    def forget(self, mission_type=None):
+        """Drop the confirmed list(s); the next update is a full upload"""
+        with self._lock:
+            types = list(self._confirmed) if mission_type is None else [mission_type]
+            for t in types:
+                if self._confirmed.pop(t, None) is not None:
+                    print(f"[MissionTransfer] Confirmed {mission_type_name(t)} dropped")
+                self._plan_ids.pop(t, None)
+
+    @pyqtSlot(int, 'QVariantList', result=bool)
+    def uploadItems(self, mission_type, items):
+        return self.upload(mission_type, items)
+
+    @pyqtSlot(int, result=bool)
+    def downloadItems(self, mission_type):
+        return self.download(mission_type)
+
+    @pyqtSlot(int, result=bool)
+    def clearItems(self, mission_type):
+        return self.clear(mission_type)
+
+    @pyqtSlot(int, result='QVariantList')
+    def confirmedItems(self, mission_type):
+        return self.confirmed_items(mission_type)
+
+    # ------------------------------------------------------------------
+    # Transfer control
+    # ------------------------------------------------------------------
+
+    def _start(self, transfer):
+        drone = self._drone
+        if not drone or not getattr(self.drone_model, 'isConnected', False):
+            print("[MissionTransfer] ❌ Drone not connected")
+            return False
+        with self._lock:
+            if self._transfer is not None:
+                print(f"[MissionTransfer] ⚠️ {self._transfer.op} already in progress")
+                return False
+            self._transfer = transfer
+            self._last_transfer = transfer
+
+        print(f"[MissionTransfer] ▶️ {transfer.op} {mission_type_name(transfer.mission_type)}"
+              + (f" (items {transfer.start}-{transfer.end} of {transfer.count})" if transfer.partial
+                 else f" ({transfer.count} items)" if transfer.op == "upload" else ""))
+        self.busyChanged.emit()
+        threading.Thread(target=self._run, args=(transfer,), daemon=True).start()
+        return True
+
+    def _run(self, transfer):
+        try:
+            with self._lock:
+                if transfer.op == "upload" and transfer.partial:
+                    # Read the vehicle's count first; MISSION_WRITE_PARTIAL_LIST follows
+                    self._send(transfer, self._send_request_list)
+                elif transfer.op == "upload":
+                    self._send(transfer, self._send_count)
+                elif transfer.op == "download":
+                    self._send(transfer, self._send_request_list)
+                else:
+                    self._send(transfer, self._send_clear_all)
+
+            while not transfer.finished.is_set():
+                with self._lock:
+                    if transfer.finished.is_set():
+                        break
+                    remaining = transfer.deadline - time.time()
+                    if remaining <= 0:
+                        self._on_timeout(transfer)
+                        continue
+                    self._wakeup.wait(remaining)
+
+        except Exception as e:
+            print(f"[MissionTransfer] ❌ Transfer error: {e}")
+            with self._lock:
+                if not transfer.finished.is_set():
+                    self._finish(False, f"Transfer error: {e}")
+
+    def _step_timeout(self):
+        return min(MAX_STEP_TIMEOUT, max(MIN_STEP_TIMEOUT, self._srtt * RTT_TIMEOUT_FACTOR))
+
+    def _send(self, transfer, sender, *args):
+        """Send a packet, remember it for resends and arm the step deadline"""
+        transfer.last_sent = (sender, args)
+        sender(transfer, *args)
+        transfer.sent_at = time.time()
+        transfer.deadline = transfer.sent_at + self._step_timeout()
+
+    def _on_response(self, transfer):
+        """A packet answered our last send: update the RTT estimate and reset retries"""
+        if transfer.retries == 0 and transfer.sent_at:
+            sample = time.time() - transfer.sent_at
+            self._srtt = 0.875 * self._srtt + 0.125 * sample
+        transfer.retries = 0
+
+    def _on_timeout(self, transfer):
+        if transfer.retries >= MAX_RETRIES:
+            self._finish(False, f"No response from vehicle during {transfer.op} "
+                                f"({mission_type_name(transfer.mission_type)})")
+            return
+        transfer.retries += 1
+        sender, args = transfer.last_sent
+        print(f"[MissionTransfer] ⏱️ Timeout, resending {sender.__name__.replace('_send_', '')} "
+              f"(attempt {transfer.retries}/{MAX_RETRIES})")
+        self._send(transfer, sender, *args)
+
+    def _finish(self, success, message):
+        transfer = self._transfer
+        if transfer is None:
+            return
+        transfer.success = success
+        transfer.message = message
+        self._transfer = None
+        self._finished_at = time.monotonic()
+        elapsed = time.time() - transfer.started
+        print(f"[MissionTransfer] {'✅' if success else '❌'} {message} "
+              f"({elapsed:.2f}s, rtt {self._srtt * 1000:.0f}ms)")
+        transfer.finished.set()
+        self._wakeup.notify_all()
+        self.busyChanged.emit()
+        self.transferCompleted.emit(success, message)
+
+    # ------------------------------------------------------------------
+    # Incoming messages
+    # ------------------------------------------------------------------
+
+    def _on_mission_message(self, msg):
+        """Listener for mission protocol messages - runs on the MAVLink reader thread"""
+        if self._transfer is None:
+            return
+        self._handle(msg)
+
+    def _handle(self, msg):
+        with self._lock:
+            transfer = self._transfer
+            if transfer is None:
+                return
+            drone = self._drone
+            if drone and drone.target_system and msg.get_srcSystem() != drone.target_system:
+                return
+            if getattr(msg, 'mission_type', 0) != transfer.mission_type:
+                return
+
+            msg_type = msg.get_type()
+            if transfer.checking_count:
+                if msg_type == 'MISSION_COUNT':
+                    self._handle_partial_count(transfer, msg)
+            elif msg_type == 'MISSION_ACK':
+                self._handle_ack(transfer, msg)
+            elif transfer.op == "upload" and msg_type in ('MISSION_REQUEST', 'MISSION_REQUEST_INT'):
+                self._handle_request(transfer, msg)
+            elif transfer.op == "download" and msg_type == 'MISSION_COUNT':
+                self._handle_count(transfer, msg)
+            elif transfer.op == "download" and msg_type == 'MISSION_ITEM_INT':
+                self._handle_item(transfer, msg)
+            self._wakeup.notify_all()
+
+    def _on_list_change(self, msg):
+        """Listener for changes made outside our transfers - runs on the MAVLink reader thread"""
+        drone = self._drone
+        if not drone or not drone.target_system or not self._confirmed:
+            return
+        vehicle = drone.target_system
+        if msg.get_type() == 'MISSION_CURRENT':
+            if msg.get_srcSystem() == vehicle:
+                self._check_current(msg)
+        elif msg.get_srcSystem() != vehicle and getattr(msg, 'target_system', 0) == vehicle:
+            # Another GCS is writing or clearing a list on our vehicle
+            mission_type = getattr(msg, 'mission_type', MISSION_TYPE_MISSION)
+            if mission_type in self._confirmed:
+                print(f"[MissionTransfer] ⚠️ {msg.get_type()} from system {msg.get_srcSystem()}, "
+                      f"{mission_type_name(mission_type)} changed on the vehicle")
+                self.forget(mission_type)
+
+    def _check_current(self, msg):
+        with self._lock:
+            confirmed = self._confirmed.get(MISSION_TYPE_MISSION)
+            if (confirmed is None or self._transfer is not None
+                    or time.monotonic() - self._finished_at < CURRENT_GRACE):
+                return
+            plan_id = getattr(msg, 'mission_id', 0)
+            known_id = self._plan_ids.get(MISSION_TYPE_MISSION, 0)
+            if plan_id and known_id:
+                changed = plan_id != known_id
+            else:
+                # total excludes the home item on autopilots that store it in the mission
+                total = getattr(msg, 'total', 0)
+                if total == UINT16_MAX:
+                    total = 0           # no mission on the vehicle
+                elif total == 0:
+                    return              # not supported
+                changed = total not in (len(confirmed), len(confirmed) - 1)
+            if changed:
+                print("[MissionTransfer] ⚠️ MISSION_CURRENT shows the vehicle's mission changed")
+                self.forget(MISSION_TYPE_MISSION)
+
+    def _handle_partial_count(self, transfer, msg):
+        self._on_response(transfer)
+        self._send_ack(transfer)
+        transfer.checking_count = False
+        if msg.count != transfer.count:
+            self.forget(transfer.mission_type)
+            self._finish(False, f"Vehicle has {msg.count} {mission_type_name(transfer.mission_type)} "
+                                f"items, expected {transfer.count}")
+            return
+        self._send(transfer, self._send_write_partial)
+
+    def _handle_request(self, transfer, msg):
+        seq = msg.seq
+        if not transfer.start <= seq <= transfer.end:
+            print(f"[MissionTransfer] ⚠️ Vehicle requested seq {seq}, expected {transfer.start}-{transfer.end}")
+            return
+        self._on_response(transfer)
+        self._send(transfer, self._send_item, seq)
+        if seq > transfer.highest_sent:
+            transfer.highest_sent = seq
+            self.transferProgress.emit(transfer.op, seq - transfer.start + 1, transfer.end - transfer.start + 1)
+
+    def _handle_ack(self, transfer, msg):
+        accepted = msg.type == mavutil.mavlink.MAV_MISSION_ACCEPTED
+        name = mission_type_name(transfer.mission_type)
+        if transfer.op == "upload":
+            if accepted and transfer.highest_sent < transfer.end:
+                # Stale ACK from an earlier transaction
+                return
+            if accepted and transfer.partial:
+                confirmed = self._confirmed.get(transfer.mission_type)
+                if confirmed is not None and len(confirmed) == transfer.count:
+                    confirmed[transfer.start:transfer.end + 1] = transfer.items[transfer.start:transfer.end + 1]
+                    self._plan_ids[transfer.mission_type] = getattr(msg, 'opaque_id', 0)
+                self._finish(True, f"Updated {name} items {transfer.start}-{transfer.end}")
+            elif accepted:
+                self._confirmed[transfer.mission_type] = list(transfer.items)
+                self._plan_ids[transfer.mission_type] = getattr(msg, 'opaque_id', 0)
+                self._finish(True, f"Uploaded {transfer.count} {name} items")
+            else:
+                self._finish(False, f"Vehicle rejected {name} upload (MAV_MISSION_RESULT {msg.type})")
+        elif transfer.op == "clear":
+            self._on_response(transfer)
+            if accepted:
+                self._confirmed[transfer.mission_type] = []
+                self._plan_ids[transfer.mission_type] = getattr(msg, 'opaque_id', 0)
+                self._finish(True, f"Cleared {name}")
+            else:
+                self._finish(False, f"Vehicle rejected {name} clear (MAV_MISSION_RESULT {msg.type})")
+        elif not accepted:
+            self._finish(False, f"Vehicle aborted {name} download (MAV_MISSION_RESULT {msg.type})")
+
+    def _handle_count(self, transfer, msg):
+        if transfer.count is not None:
+            return
+        self._on_response(transfer)
+        transfer.count = msg.count
+        transfer.opaque_id = getattr(msg, 'opaque_id', 0)
+        self.transferProgress.emit(transfer.op, 0, transfer.count)
+        if transfer.count == 0:
+            self._send_ack(transfer)
+            self._complete_download(transfer)
+        else:
+            self._send(transfer, self._send_request_item)
+
+    def _handle_item(self, transfer, msg):
+        if transfer.count is None or msg.seq != transfer.next_seq:
+            return
+        self._on_response(transfer)
+        scale = _xy_scale(msg.frame)
+        transfer.received[msg.seq] = {
+            'seq': msg.seq,
+            'frame': msg.frame,
+            'command': msg.command,
+            'current': msg.current,
+            'autocontinue': msg.autocontinue,
+            'param1': msg.param1, 'param2': msg.param2,
+            'param3': msg.param3, 'param4': msg.param4,
+            'x': msg.x / scale, 'y': msg.y / scale, 'z': msg.z,
+        }
+        transfer.next_seq += 1
+        self.transferProgress.emit(transfer.op, transfer.next_seq, transfer.count)
+        if transfer.next_seq >= transfer.count:
+            self._send_ack(transfer)
+            self._complete_download(transfer)
+        else:
+            self._send(transfer, self._send_request_item)
+
+    def _complete_download(self, transfer):
+        items = [transfer.received[seq] for seq in range(transfer.count)]
+        self._confirmed[transfer.mission_type] = list(items)
+        self._plan_ids[transfer.mission_type] = transfer.opaque_id
+        self.itemsDownloaded.emit(transfer.mission_type, items)
+        self._finish(True, f"Downloaded {len(items)} {mission_type_name(transfer.mission_type)} items")
+
+    # ------------------------------------------------------------------
+    # Outgoing packets
+    # ------------------------------------------------------------------
+
+    def _target(self):
+        drone = self._drone
+        return drone.target_system or 1, drone.target_component or 1
+
+    def _send_count(self, transfer):
+        self._drone.mav.mission_count_send(*self._target(), transfer.count, transfer.mission_type)
+
+    def _send_write_partial(self, transfer):
+        self._drone.mav.mission_write_partial_list_send(*self._target(), transfer.start, transfer.end,
+                                                        transfer.mission_type)
+
+    def _send_item(self, transfer, seq):
+        item = transfer.items[seq]
+        scale = _xy_scale(item['frame'])
+        self._drone.mav.mission_item_int_send(
+            *self._target(),
+            seq, item['frame'], item['command'], item['current'], item['autocontinue'],
+            item['param1'], item['param2'], item['param3'], item['param4'],
+            int(round(item['x'] * scale)), int(round(item['y'] * scale)), float(item['z']),
+            transfer.mission_type
+        )
+
+    def _send_request_list(self, transfer):
+        self._drone.mav.mission_request_list_send(*self._target(), transfer.mission_type)
+
+    def _send_request_item(self, transfer):
+        self._drone.mav.mission_request_int_send(*self._target(), transfer.next_seq, transfer.mission_type)
+
+    def _send_clear_all(self, transfer):
+        self._drone.mav.mission_clear_all_send(*self._target(), transfer.mission_type)
+
+    def _send_ack(self, transfer):
+        self._drone.mav.mission_ack_send(*self._target(), mavutil.mavlink.MAV_MISSION_ACCEPTED,
+                                         transfer.mission_type)
+
+    @staticmethod
+    def _normalise_item(seq, item):
+        get = item.get
+        return {
+            'seq': seq,
+            'frame': int(get('frame', mavutil.mavlink.MAV_FRAME_GLOBAL_RELATIVE_ALT_INT)),
+            'command': int(get('command', mavutil.mavlink.MAV_CMD_NAV_WAYPOINT)),
+            'current': int(get('current', 0)),
+            'autocontinue': int(get('autocontinue', 1)),
+            'param1': float(get('param1', 0) or 0), 'param2': float(get('param2', 0) or 0),
+            'param3': float(get('param3', 0) or 0), 'param4': float(get('param4', 0) or 0),
+            'x': float(get('x', 0) or 0), 'y': float(get('y', 0) or 0), 'z': float(get('z', 0) or 0),
+        }
+
+    @staticmethod
+    def _same_item(a, b):
+        """Equal as the vehicle would store them (x/y compared in wire units)"""
+        for key in ('frame', 'command', 'autocontinue', 'param1', 'param2', 'param3', 'param4'):
+            if abs(a[key] - b[key]) > 1e-6:
+                return False
+        scale = _xy_scale(a['frame'])
+        return (int(round(a['x'] * scale)) == int(round(b['x'] * scale))
+                and int(round(a['y'] * scale)) == int(round(b['y'] * scale))
+                and abs(a['z'] - b['z']) < 1e-3)
+
+    def cleanup(self):
+        self.cancel()
+        for msg_type in _MISSION_MESSAGES:
+            MAVLinkThread.remove_message_listener(msg_type, self._on_mission_message)
+        for msg_type in _CHANGE_MESSAGES:
+            MAVLinkThread.remove_message_listener(msg_type, self._on_list_change)
+        get_link_quality().remove_reset_listener(self.forget)
+        print("[MissionTransfer] Cleanup completed")
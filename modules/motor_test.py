@@ -0,0 +1,429 @@
+"""
+Scripted motor test sweep with synchronized capture.
+
+Each motor is spun on its own with MAV_CMD_DO_MOTOR_TEST at a series of
+throttle steps. While the sweep runs, VIBRATION, RAW_IMU, ESC telemetry
+and SYS_STATUS are written by the MAVLink reader thread into time-stamped
+CaptureBuffers, so every step can be summarised afterwards by slicing the
+buffers to the step's time window (after a short spin-up settle).
+
+Motors are numbered in ArduPilot's motor test order (1 = A, clockwise from
+the front), which is what DO_MOTOR_TEST param1 means. ESC telemetry is
+indexed by output instead, so the ESC that belongs to a motor is taken to
+be the one with the highest RPM while only that motor is spinning - which
+also shows up a motor plugged into the wrong output.
+
+With the defaults (3 throttle steps, 2 s each, 0.5 s spin-down) a quad is
+checked in 30 s.
+"""
+
+import time
+import threading
+import numpy as np
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal, pyqtSlot, pyqtProperty
+from pymavlink import mavutil
+
+from modules.mavlink_thread import MAVLinkThread
+
+DEFAULT_THROTTLES = (5, 10, 15)     # percent
+DEFAULT_STEP_SECONDS = 2.0
+SETTLE_SECONDS = 0.5                # spin-up time excluded from the summary
+SPIN_DOWN_SECONDS = 0.5
+CAPTURE_CAPACITY = 8192
+MAX_MOTORS = 8
+
+# Outlier flags, relative to the median of the other motors at the same throttle
+VIBRATION_OUTLIER_RATIO = 1.5
+RPM_OUTLIER_FRACTION = 0.15
+
+CAPTURE_RATES_HZ = {
+    'VIBRATION': 20,
+    'RAW_IMU': 50,
+    'ESC_TELEMETRY_1_TO_4': 10,
+    'ESC_TELEMETRY_5_TO_8': 10,
+    'SYS_STATUS': 10,
+}
+
+MG_TO_MS2 = 9.80665 / 1000.0
+
+
+class CaptureBuffer:
+    """Time-stamped fixed-width rows; appended from the reader thread, sliced by time"""
+
+    def __init__(self, columns, capacity=CAPTURE_CAPACITY):
+        self.columns = columns
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._time = np.zeros(self.capacity)
+            self._data = np.full((self.capacity, len(self.columns)), np.nan)
+            self._written = 0
+
+    def append(self, timestamp, row):
+        with self._lock:
+            index = self._written % self.capacity
+            self._time[index] = timestamp
+            self._data[index] = row
+            self._written += 1
+
+    def between(self, start, end):
+        """Rows with start <= t < end, oldest first"""
+        with self._lock:
+            count = min(self._written, self.capacity)
+            rows = (self._written - count + np.arange(count)) % self.capacity
+            times = self._time[rows]
+            keep = (times >= start) & (times < end)
+            return self._data[rows[keep]]
+
+
+def _mean_or_none(values):
+    values = values[~np.isnan(values)]
+    return round(float(values.mean()), 2) if len(values) else None
+
+
+class MotorTestEngine(QObject):
+    runningChanged = pyqtSignal()
+    stepChanged = pyqtSignal(int, int)          # motor number, throttle %
+    progressChanged = pyqtSignal(int)
+    resultsChanged = pyqtSignal()
+    testFinished = pyqtSignal(bool, str)
+
+    _ackReceived = pyqtSignal(int)              # reader thread -> GUI thread
+
+    def __init__(self, drone_model, servo_model=None, parent=None):
+        super().__init__(parent)
+        self.drone_model = drone_model
+        self.servo_model = servo_model
+        self._running = False
+        self._steps = []
+        self._step_index = -1
+        self._step_started = 0.0
+        self._step_seconds = DEFAULT_STEP_SECONDS
+        self._windows = []          # (motor, throttle, capture start, capture end)
+        self._results = []
+        self._progress = 0
+
+        self._vibration = CaptureBuffer(['x', 'y', 'z', 'clip0', 'clip1', 'clip2'])
+        self._imu = CaptureBuffer(['ax', 'ay', 'az'])
+        self._esc = CaptureBuffer(['esc', 'rpm', 'current', 'temperature', 'voltage'])
+        self._battery = CaptureBuffer(['current'])
+
+        self._step_timer = QTimer(self)
+        self._step_timer.setSingleShot(True)
+        self._step_timer.timeout.connect(self._next_step)
+        self._ackReceived.connect(self._on_ack)
+
+        print("[MotorTest] Initialized")
+
+    @property
+    def _drone(self):
+        return getattr(self.drone_model, 'drone_connection', None)
+
+    # ------------------------------------------------------------------
+    # QML interface
+    # ------------------------------------------------------------------
+
+    @pyqtProperty(bool, notify=runningChanged)
+    def running(self):
+        return self._running
+
+    @pyqtProperty(int, notify=progressChanged)
+    def progress(self):
+        return self._progress
+
+    @pyqtProperty('QVariantList', notify=resultsChanged)
+    def results(self):
+        return self._results
+
+    @pyqtSlot(result=bool)
+    def startFullCheck(self):
+        """Every motor at the default throttle steps"""
+        return self.startTest(0, list(DEFAULT_THROTTLES), DEFAULT_STEP_SECONDS)
+
+    @pyqtSlot(int, 'QVariantList', float, result=bool)
+    def startTest(self, motor_count, throttles, step_seconds):
+        """
+        Spin motors 1..motor_count (0 = as detected by servo calibration)
+        through the given throttle percentages for step_seconds each.
+        """
+        if self._running:
+            return False
+        drone = self._drone
+        if not drone or not getattr(self.drone_model, 'isConnected', False):
+            self.testFinished.emit(False, "Drone not connected")
+            return False
+        telemetry = getattr(self.drone_model, 'telemetry', {}) or {}
+        if telemetry.get('armed', False):
+            self.testFinished.emit(False, "Disarm before running a motor test")
+            return False
+
+        if motor_count <= 0 and self.servo_model is not None:
+            motor_count = getattr(self.servo_model, 'motorCount', 0)
+        motor_count = min(int(motor_count), MAX_MOTORS)
+        throttles = [float(t) for t in throttles if 0 < float(t) <= 100]
+        if motor_count <= 0 or not throttles:
+            self.testFinished.emit(False, "No motors detected - run motor detection first")
+            return False
+
+        self._step_seconds = max(float(step_seconds), SETTLE_SECONDS + 0.5)
+        self._steps = [(motor, throttle) for motor in range(1, motor_count + 1) for throttle in sorted(throttles)]
+        self._step_index = -1
+        self._windows = []
+        self._results = []
+        for buffer in (self._vibration, self._imu, self._esc, self._battery):
+            buffer.reset()
+
+        self._set_capture(True)
+        self._running = True
+        self._set_progress(0)
+        self.runningChanged.emit()
+        self.resultsChanged.emit()
+        total = len(self._steps) * (self._step_seconds + SPIN_DOWN_SECONDS)
+        print(f"[MotorTest] Starting sweep: {motor_count} motors x {len(throttles)} steps, ~{total:.0f} s")
+        self._next_step()
+        return True
+
+    @pyqtSlot()
+    def stopTest(self):
+        if not self._running:
+            return
+        self._step_timer.stop()
+        self._send_motor_test(self._current_motor(), 0, 0)
+        self._finish(False, "Motor test stopped")
+
+    # ------------------------------------------------------------------
+    # Sequencing
+    # ------------------------------------------------------------------
+
+    def _current_motor(self):
+        if 0 <= self._step_index < len(self._steps):
+            return self._steps[self._step_index][0]
+        return 1
+
+    def _next_step(self):
+        if not self._running:
+            return
+        if self._step_index >= 0:
+            motor, throttle = self._steps[self._step_index]
+            self._windows.append((motor, throttle, self._step_started + SETTLE_SECONDS,
+                                  self._step_started + self._step_seconds))
+
+        self._step_index += 1
+        self._set_progress(int(100 * self._step_index / len(self._steps)))
+        if self._step_index >= len(self._steps):
+            self._finish(True, "Motor test complete")
+            return
+
+        motor, throttle = self._steps[self._step_index]
+        if not self._send_motor_test(motor, throttle, self._step_seconds):
+            self._finish(False, "Could not send motor test command")
+            return
+        self._step_started = time.time()
+        self.stepChanged.emit(motor, int(throttle))
+        print(f"[MotorTest] Motor {chr(64 + motor)} at {throttle:.0f}%")
+        self._step_timer.start(int((self._step_seconds + SPIN_DOWN_SECONDS) * 1000))
+
+    def _send_motor_test(self, motor, throttle, timeout):
+        drone = self._drone
+        if not drone:
+            return False
+        try:
+            drone.mav.command_long_send(
+                drone.target_system,
+                drone.target_component,
+                mavutil.mavlink.MAV_CMD_DO_MOTOR_TEST,
+                0,
+                motor,
+                mavutil.mavlink.MOTOR_TEST_THROTTLE_PERCENT,
+                throttle,
+                timeout,
+                0,          # motor count: this motor only
+                mavutil.mavlink.MOTOR_TEST_ORDER_DEFAULT,
+                0
+            )
+            return True
+        except Exception as e:
+            print(f"[MotorTest] ❌ Error sending motor test: {e}")
+            return False
+
+    def _on_ack(self, result):
+        if self._running and result != mavutil.mavlink.MAV_RESULT_ACCEPTED:
+            self._step_timer.stop()
+            self._finish(False, f"Motor test rejected by autopilot (result {result})")
+
+    def _finish(self, success, message):
+        self._running = False
+        self._set_capture(False)
+        if self._windows:
+            self._results = self._summarise()
+            self.resultsChanged.emit()
+        self._set_progress(100 if success else self._progress)
+        self.runningChanged.emit()
+        print(f"[MotorTest] {'✅' if success else '⚠️'} {message}")
+        self.testFinished.emit(success, message)
+
+    def _set_progress(self, value):
+        if value != self._progress:
+            self._progress = value
+            self.progressChanged.emit(value)
+
+    # ------------------------------------------------------------------
+    # Capture (MAVLink reader thread)
+    # ------------------------------------------------------------------
+
+    def _set_capture(self, enabled):
+        handlers = {
+            'VIBRATION': self._on_vibration,
+            'RAW_IMU': self._on_raw_imu,
+            'ESC_TELEMETRY_1_TO_4': self._on_esc_telemetry,
+            'ESC_TELEMETRY_5_TO_8': self._on_esc_telemetry,
+            'SYS_STATUS': self._on_sys_status,
+            'COMMAND_ACK': self._on_command_ack,
+        }
+        for msg_type, handler in handlers.items():
+            if enabled:
+                MAVLinkThread.add_message_listener(msg_type, handler)
+            else:
+                MAVLinkThread.remove_message_listener(msg_type, handler)
+        for msg_type, rate in CAPTURE_RATES_HZ.items():
+            # 0 puts the message back on its default rate
+            self._set_message_interval(msg_type, int(1e6 / rate) if enabled else 0)
+
+    def _set_message_interval(self, msg_type, interval_us):
+        drone = self._drone
+        if not drone:
+            return
+        try:
+            drone.mav.command_long_send(
+                drone.target_system,
+                drone.target_component,
+                mavutil.mavlink.MAV_CMD_SET_MESSAGE_INTERVAL,
+                0,
+                getattr(mavutil.mavlink, f"MAVLINK_MSG_ID_{msg_type}"),
+                interval_us,
+                0, 0, 0, 0, 0
+            )
+        except Exception as e:
+            print(f"[MotorTest] Could not set {msg_type} rate: {e}")
+
+    def _on_vibration(self, msg):
+        self._vibration.append(time.time(), (msg.vibration_x, msg.vibration_y, msg.vibration_z,
+                                             msg.clipping_0, msg.clipping_1, msg.clipping_2))
+
+    def _on_raw_imu(self, msg):
+        self._imu.append(time.time(), (msg.xacc, msg.yacc, msg.zacc))
+
+    def _on_esc_telemetry(self, msg):
+        now = time.time()
+        first = 4 if msg.get_type() == 'ESC_TELEMETRY_5_TO_8' else 0
+        for i in range(4):
+            self._esc.append(now, (first + i, msg.rpm[i], msg.current[i] / 100.0,
+                                   msg.temperature[i], msg.voltage[i] / 100.0))
+
+    def _on_sys_status(self, msg):
+        if msg.current_battery >= 0:
+            self._battery.append(time.time(), (msg.current_battery / 100.0,))
+
+    def _on_command_ack(self, msg):
+        if msg.command == mavutil.mavlink.MAV_CMD_DO_MOTOR_TEST:
+            self._ackReceived.emit(msg.result)
+
+    # ------------------------------------------------------------------
+    # Summary
+    # ------------------------------------------------------------------
+
+    def _summarise_step(self, motor, throttle, start, end):
+        step = {"motor": motor, "label": chr(64 + motor), "throttle": throttle}
+
+        vibration = self._vibration.between(start, end)
+        if len(vibration):
+            levels = vibration[:, :3]
+            step["vibration"] = [round(float(v), 2) for v in levels.mean(axis=0)]
+            step["vibrationRms"] = round(float(np.sqrt((levels ** 2).sum(axis=1).mean())), 2)
+            clipping = vibration[:, 3:]
+            step["clipping"] = int((clipping.max(axis=0) - clipping.min(axis=0)).sum())
+        else:
+            step["vibration"], step["vibrationRms"], step["clipping"] = None, None, None
+
+        imu = self._imu.between(start, end)
+        if len(imu) > 1:
+            deviation = imu - imu.mean(axis=0)
+            step["accelRms"] = round(float(np.sqrt((deviation ** 2).sum(axis=1).mean()) * MG_TO_MS2), 3)
+        else:
+            step["accelRms"] = None
+
+        step["rpm"], step["current"], step["temperature"], step["esc"] = None, None, None, None
+        esc = self._esc.between(start, end)
+        if len(esc):
+            index = esc[:, 0].astype(int)
+            rpm_by_esc = np.bincount(index, weights=esc[:, 1], minlength=MAX_MOTORS)
+            count_by_esc = np.maximum(np.bincount(index, minlength=MAX_MOTORS), 1)
+            spinning = int(np.argmax(rpm_by_esc / count_by_esc))
+            if rpm_by_esc[spinning] > 0:
+                rows = esc[index == spinning]
+                step["esc"] = spinning + 1
+                step["rpm"] = _mean_or_none(rows[:, 1])
+                step["current"] = _mean_or_none(rows[:, 2])
+                step["temperature"] = _mean_or_none(rows[:, 3])
+        if step["current"] is None:
+            step["current"] = _mean_or_none(self._battery.between(start, end)[:, 0])
+        return step
+
+    def _summarise(self):
+        steps = [self._summarise_step(*window) for window in self._windows]
+        motors = {}
+        for step in steps:
+            motors.setdefault(step["motor"], []).append(step)
+
+        results = []
+        for motor, motor_steps in sorted(motors.items()):
+            top = motor_steps[-1]
+            results.append({
+                "motor": motor,
+                "label": chr(64 + motor),
+                "esc": top["esc"],
+                "throttle": top["throttle"],
+                "vibrationRms": top["vibrationRms"],
+                "accelRms": top["accelRms"],
+                "rpm": top["rpm"],
+                "current": top["current"],
+                "clipping": sum(s["clipping"] or 0 for s in motor_steps),
+                "steps": motor_steps,
+                "warnings": [],
+            })
+        self._flag_outliers(results)
+        return results
+
+    def _flag_outliers(self, results):
+        """Compare each motor's top step against the others"""
+        def check(key, flag):
+            values = {r["motor"]: r[key] for r in results if r[key] is not None}
+            if len(values) < 3:
+                return
+            for result in results:
+                value = values.get(result["motor"])
+                if value is None:
+                    continue
+                others = [v for m, v in values.items() if m != result["motor"]]
+                median = float(np.median(others))
+                if median > 0 and flag(value, median):
+                    result["warnings"].append(key)
+
+        check("vibrationRms", lambda v, m: v > VIBRATION_OUTLIER_RATIO * m)
+        check("accelRms", lambda v, m: v > VIBRATION_OUTLIER_RATIO * m)
+        check("rpm", lambda v, m: abs(v - m) > RPM_OUTLIER_FRACTION * m)
+        escs = [r["esc"] for r in results if r["esc"] is not None]
+        for result in results:
+            if result["clipping"]:
+                result["warnings"].append("clipping")
+            if result["esc"] is not None and escs.count(result["esc"]) > 1:
+                # Two motors answered on the same ESC: outputs/test order are miswired
+                result["warnings"].append("escShared")
+
+    def cleanup(self):
+        if self._running:
+            self.stopTest()
+        print("[MotorTest] Cleanup completed")
@@ -0,0 +1,114 @@
+"""
+Vehicle orientation from the raw accelerometer, for accelerometer calibration.
+
+ATTITUDE comes from the EKF, which is exactly what is uncalibrated while the
+accelerometers are being calibrated, so the six calibration positions are
+classified from RAW_IMU/SCALED_IMU instead. At rest the accelerometer
+measures the reaction to gravity, so the normalised mean of a short window
+of samples points "up" in the body frame (FRD):
+
+    Level      ( 0,  0, -1)        Nose Down  (-1,  0,  0)
+    Left       ( 0, +1,  0)        Nose Up    (+1,  0,  0)
+    Right      ( 0, -1,  0)        Back       ( 0,  0, +1)
+
+The window lives in a small NumPy ring buffer. Each update takes its mean
+and standard deviation in one pass: the nearest canonical vector gives the
+orientation and the spread relative to 1 g decides whether the vehicle is
+still. Hysteresis (a tighter angle to enter an orientation than to leave
+it) stops the result flickering at the boundary.
+"""
+
+import math
+import threading
+import numpy as np
+
+ORIENTATIONS = ["Level", "Left", "Right", "Nose Down", "Nose Up", "Back"]
+
+UP_VECTORS = np.array([
+    [0.0, 0.0, -1.0],
+    [0.0, 1.0, 0.0],
+    [0.0, -1.0, 0.0],
+    [-1.0, 0.0, 0.0],
+    [1.0, 0.0, 0.0],
+    [0.0, 0.0, 1.0],
+])
+
+DEFAULT_WINDOW = 10             # samples (1 s at the default 10 Hz RAW_SENS rate)
+DEFAULT_ENTER_ANGLE = 20.0      # degrees from canonical to enter an orientation
+DEFAULT_EXIT_ANGLE = 30.0       # degrees from canonical to leave it
+DEFAULT_STILL_THRESHOLD = 0.03  # max per-axis std dev, as a fraction of 1 g
+
+
+class OrientationClassifier:
+    """Thread-safe: samples may be added from the MAVLink reader thread"""
+
+    def __init__(self, window=DEFAULT_WINDOW, enter_angle=DEFAULT_ENTER_ANGLE,
+                 exit_angle=DEFAULT_EXIT_ANGLE, still_threshold=DEFAULT_STILL_THRESHOLD):
+        self.window = window
+        self.enter_cos = math.cos(math.radians(enter_angle))
+        self.exit_cos = math.cos(math.radians(exit_angle))
+        self.still_threshold = still_threshold
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._ring = np.zeros((self.window, 3))
+            self._count = 0
+            self._head = 0
+            self._new_samples = 0
+        self.orientation = None     # index into ORIENTATIONS, with hysteresis
+        self.angle = 180.0          # degrees from the current/nearest orientation
+        self.still = False
+        self.gravity = np.zeros(3)
+        self.mean = np.zeros(3)         # raw window mean, in the sample units
+
+    def add_sample(self, x, y, z):
+        with self._lock:
+            self._ring[self._head] = (x, y, z)
+            self._head = (self._head + 1) % self.window
+            self._count = min(self._count + 1, self.window)
+            self._new_samples += 1
+
+    def update(self):
+        """
+        Classify the current window. Returns True if new samples arrived
+        since the last call (otherwise the previous result stands).
+        """
+        with self._lock:
+            if not self._new_samples:
+                return False
+            self._new_samples = 0
+            samples = self._ring[:self._count].copy()
+
+        mean = samples.mean(axis=0)
+        self.mean = mean
+        norm = float(np.linalg.norm(mean))
+        if norm < 1e-6:
+            self.still = False
+            return True
+        self.gravity = mean / norm
+        self.still = (len(samples) == self.window
+                      and float(samples.std(axis=0).max()) / norm <= self.still_threshold)
+
+        cosines = UP_VECTORS @ self.gravity
+        nearest = int(np.argmax(cosines))
+        if self.orientation is not None and cosines[self.orientation] >= self.exit_cos:
+            # Stay put until the vehicle is clearly out of the current orientation
+            current = self.orientation
+        elif cosines[nearest] >= self.enter_cos:
+            current = nearest
+        else:
+            current = None
+        self.orientation = current
+        shown = nearest if current is None else current
+        self.angle = math.degrees(math.acos(max(-1.0, min(1.0, float(cosines[shown])))))
+        return True
+
+    @property
+    def orientation_name(self):
+        return ORIENTATIONS[self.orientation] if self.orientation is not None else None
+
+    def is_confirmed(self, name):
+        """The vehicle is steady in the named orientation"""
+        return self.still and self.orientation_name == name
@@ -0,0 +1,234 @@
+"""
+Parameter file import/export and diff engine.
+
+Reads and writes the two .param layouts we see in the field:
+
+    Mission Planner:  NAME,VALUE          (also "NAME VALUE" / "NAME<TAB>VALUE")
+    QGroundControl:   SYS<TAB>COMP<TAB>NAME<TAB>VALUE<TAB>TYPE
+
+The parser is a generator so large files never have to be held in memory
+twice, and the diff compares values the way the autopilot stores them
+(INT32 as integers, REAL32 at float32 precision) so a file saved from the
+same vehicle produces an empty diff.
+"""
+
+import math
+import struct
+import time
+
+# MAV_PARAM_TYPE values (pymavlink constants, kept local so the parser has no
+# MAVLink dependency)
+MAV_PARAM_TYPE_UINT8 = 1
+MAV_PARAM_TYPE_INT8 = 2
+MAV_PARAM_TYPE_UINT16 = 3
+MAV_PARAM_TYPE_INT16 = 4
+MAV_PARAM_TYPE_UINT32 = 5
+MAV_PARAM_TYPE_INT32 = 6
+MAV_PARAM_TYPE_REAL32 = 9
+MAV_PARAM_TYPE_REAL64 = 10
+
+FLOAT_TYPES = (MAV_PARAM_TYPE_REAL32, MAV_PARAM_TYPE_REAL64)
+
+FORMAT_MISSION_PLANNER = "mission_planner"
+FORMAT_QGC = "qgc"
+
+DEFAULT_ABS_TOLERANCE = 1e-6
+DEFAULT_REL_TOLERANCE = 1e-5
+
+_MAX_NAME_LENGTH = 16
+
+
+class ParamFileError(ValueError):
+    """Raised for malformed parameter files when parsing in strict mode"""
+
+    def __init__(self, line_number, message):
+        super().__init__(f"line {line_number}: {message}")
+        self.line_number = line_number
+
+
+def is_float_type(param_type):
+    """True for REAL32/REAL64, accepting MAV_PARAM_TYPE ints or 'FLOAT'/'INT32' strings"""
+    if isinstance(param_type, str):
+        return param_type.upper() in ("FLOAT", "REAL32", "REAL64")
+    return param_type in FLOAT_TYPES
+
+
+def _to_float32(value):
+    return struct.unpack("<f", struct.pack("<f", value))[0]
+
+
+def values_equal(a, b, param_type=None, abs_tol=DEFAULT_ABS_TOLERANCE,
+                 rel_tol=DEFAULT_REL_TOLERANCE):
+    """
+    Compare two parameter values as the autopilot would store them.
+    Integer parameters compare after rounding; float parameters compare at
+    float32 precision and then within abs/rel tolerance.
+    """
+    a = float(a)
+    b = float(b)
+    if math.isnan(a) or math.isnan(b):
+        return math.isnan(a) and math.isnan(b)
+
+    if param_type is not None and not is_float_type(param_type):
+        return int(round(a)) == int(round(b))
+
+    fa, fb = _to_float32(a), _to_float32(b)
+    if fa == fb:
+        return True
+    return abs(fa - fb) <= max(abs_tol, rel_tol * max(abs(fa), abs(fb)))
+
+
+def format_value(value, param_type=None):
+    """Format a value for a .param file without losing float32 precision"""
+    value = float(value)
+    if param_type is not None and not is_float_type(param_type):
+        return str(int(round(value)))
+    if value.is_integer() and abs(value) < 1e9:
+        return str(int(value))
+    # Shortest text that reads back as the same float32 (9 digits always do)
+    stored = _to_float32(value)
+    for digits in range(6, 10):
+        text = f"{stored:.{digits}g}"
+        if _to_float32(float(text)) == stored:
+            return text
+    return text
+
+
+def iter_param_file(path, strict=False, errors=None):
+    """
+    Stream (name, value, param_type, line_number) tuples from a .param file.
+
+    param_type is a MAV_PARAM_TYPE int for QGC files and None for Mission
+    Planner files (the vehicle's own type is used when diffing). Malformed
+    lines raise ParamFileError when strict, otherwise they are skipped and
+    appended to the optional errors list.
+    """
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line_number, raw in enumerate(f, 1):
+            line = raw.strip()
+            if not line or line.startswith("#"):
+                continue
+
+            try:
+                entry = _parse_line(line)
+            except ValueError as e:
+                if strict:
+                    raise ParamFileError(line_number, str(e))
+                if errors is not None:
+                    errors.append(f"line {line_number}: {e}")
+                continue
+
+            yield entry[0], entry[1], entry[2], line_number
+
+
+def _parse_line(line):
+    fields = line.split("\t")
+    if len(fields) >= 5:
+        # QGC: sys, comp, name, value, type
+        name = fields[2].strip()
+        value = float(fields[3])
+        param_type = int(fields[4])
+    else:
+        if "," in line:
+            fields = line.split(",")
+        else:
+            fields = line.split()
+        if len(fields) < 2:
+            raise ValueError(f"expected NAME,VALUE but got '{line}'")
+        name = fields[0].strip()
+        value = float(fields[1])
+        param_type = None
+
+    if not name or len(name) > _MAX_NAME_LENGTH:
+        raise ValueError(f"invalid parameter name '{name}'")
+    return name, value, param_type
+
+
+def load_param_file(path, strict=False):
+    """
+    Read a whole .param file into {name: (value, param_type)}.
+    Returns (params, errors). Later duplicates win, matching Mission Planner.
+    """
+    errors = []
+    params = {}
+    for name, value, param_type, _ in iter_param_file(path, strict=strict, errors=errors):
+        params[name] = (value, param_type)
+    return params, errors
+
+
+def write_param_file(path, params, fmt=FORMAT_MISSION_PLANNER, system_id=1, component_id=1):
+    """
+    Write parameters to a .param file.
+
+    params is an iterable of (name, value, param_type) tuples or a
+    {name: param_dict} mapping in the DroneCommander store layout. Entries
+    are written sorted by name. Returns the number of parameters written.
+    """
+    if isinstance(params, dict):
+        entries = [(name, p.get("value", 0), p.get("type", "FLOAT")) for name, p in params.items()]
+    else:
+        entries = list(params)
+    entries.sort(key=lambda e: e[0])
+
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        if fmt == FORMAT_QGC:
+            f.write("# Onboard parameters for Vehicle %d\n" % system_id)
+            f.write("#\n# Stack: ArduPilot\n#\n")
+            f.write("# Vehicle-Id Component-Id Name Value Type\n")
+            for name, value, param_type in entries:
+                type_id = MAV_PARAM_TYPE_REAL32 if is_float_type(param_type) else MAV_PARAM_TYPE_INT32
+                f.write(f"{system_id}\t{component_id}\t{name}\t"
+                        f"{format_value(value, param_type)}\t{type_id}\n")
+        else:
+            f.write(f"# Saved {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
+            for name, value, param_type in entries:
+                f.write(f"{name},{format_value(value, param_type)}\n")
+
+    return len(entries)
+
+
+def diff_parameters(target, live, abs_tol=DEFAULT_ABS_TOLERANCE, rel_tol=DEFAULT_REL_TOLERANCE):
+    """
+    Compare target parameters against the live vehicle store.
+
+    target: {name: (value, param_type_or_None)} as returned by load_param_file
+    live:   {name: param_dict} as held in DroneCommander._parameters
+
+    Returns a dict with:
+        changed   - list of {name, current, value, type} that need writing
+        missing   - names in target that the vehicle does not have
+        unchanged - count of entries already matching
+    The vehicle's own type wins over the file's, since that is what
+    PARAM_SET has to use.
+    """
+    changed = []
+    missing = []
+    unchanged = 0
+
+    for name in sorted(target):
+        value, file_type = target[name]
+        current = live.get(name)
+        if current is None:
+            missing.append(name)
+            continue
+
+        param_type = current.get("type") or file_type
+        try:
+            current_value = float(current.get("value", 0))
+        except (TypeError, ValueError):
+            current_value = float("nan")
+
+        if values_equal(value, current_value, param_type, abs_tol, rel_tol):
+            unchanged += 1
+            continue
+
+        if not is_float_type(param_type):
+            value = int(round(value))
+        changed.append({
+            "name": name,
+            "current": current_value,
+            "value": float(value),
+            "type": "FLOAT" if is_float_type(param_type) else "INT32",
+        })
+
+    return {"changed": changed, "missing": missing, "unchanged": unchanged}
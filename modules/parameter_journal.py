@@ -0,0 +1,340 @@
+"""
+Append-only parameter change journal.
+
+Every confirmed parameter change (single sets, bulk applies, calibration
+writes, changes seen from other GCSes) is appended with its timestamp, old
+and new value and source. Full snapshots are taken after each parameter
+download and every SNAPSHOT_INTERVAL changes, so the state at any moment is
+"nearest snapshot + the changes after it" rather than a replay of the
+whole history. Arm/disarm transitions are journaled as events so "what
+changed since the last flight" is a single indexed range query.
+
+Nearly every ArduPilot vehicle is system id 1, so history is keyed by the
+board's unique ID from AUTOPILOT_VERSION (vehicle_key). Until a board has
+reported its ID, the system id is used instead. The system id is stored
+with each snapshot for display only.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+from modules import parameter_files
+
+SNAPSHOT_INTERVAL = 500
+EXPECTATION_TIMEOUT = 10.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS changes (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    vehicle TEXT NOT NULL,
+    name TEXT NOT NULL,
+    old_value REAL,
+    new_value REAL NOT NULL,
+    param_type TEXT,
+    source TEXT
+);
+CREATE INDEX IF NOT EXISTS changes_vehicle_ts ON changes (vehicle, ts);
+CREATE INDEX IF NOT EXISTS changes_vehicle_name ON changes (vehicle, name, id);
+
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    vehicle TEXT NOT NULL,
+    label TEXT,
+    last_change_id INTEGER NOT NULL,
+    param_count INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_vehicle_ts ON snapshots (vehicle, ts);
+
+CREATE TABLE IF NOT EXISTS snapshot_values (
+    snapshot_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    value REAL NOT NULL,
+    param_type TEXT,
+    PRIMARY KEY (snapshot_id, name)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    vehicle TEXT NOT NULL,
+    kind TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_vehicle_kind ON events (vehicle, kind, ts);
+"""
+
+_identities = {}                # sysid -> board key from AUTOPILOT_VERSION
+_identities_lock = threading.Lock()
+
+
+def board_key(msg):
+    """Board identity from an AUTOPILOT_VERSION message, or None if the board reports none"""
+    uid2 = bytes(getattr(msg, 'uid2', None) or b'')
+    if any(uid2):
+        return "board:" + uid2.hex()
+    if getattr(msg, 'uid', 0):
+        return f"board:{msg.uid:016x}"
+    return None
+
+
+def set_board_identity(sysid, key):
+    with _identities_lock:
+        _identities[int(sysid)] = key
+
+
+def has_board_identity(sysid):
+    with _identities_lock:
+        return int(sysid) in _identities
+
+
+def clear_board_identities():
+    """Forget every board; called when the link changes, since a new board may reuse a sysid"""
+    with _identities_lock:
+        _identities.clear()
+
+
+def vehicle_key(sysid):
+    """Journal key for a system id: its board identity once known, else the sysid"""
+    with _identities_lock:
+        return _identities.get(int(sysid)) or str(sysid)
+
+
+def _sysid_for(vehicle):
+    with _identities_lock:
+        for sysid, key in _identities.items():
+            if key == vehicle:
+                return sysid
+    return int(vehicle) if vehicle.isdigit() else None
+
+
+def _default_journal_path():
+    return os.path.join(os.path.expanduser("~"), ".tihanfly", "parameter_journal.db")
+
+
+class ParameterJournal:
+    """SQLite-backed journal; safe to call from any thread"""
+
+    def __init__(self, path=None):
+        self._path = path or _default_journal_path()
+        os.makedirs(os.path.dirname(self._path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self._path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(snapshots)")]
+        if "sysid" not in columns:
+            self._db.execute("ALTER TABLE snapshots ADD COLUMN sysid INTEGER")
+        self._db.commit()
+
+        self._last_values = {}      # (vehicle, name) -> last journaled value
+        self._changes_since_snapshot = {}
+        self._armed = {}            # vehicle -> last armed state
+        self._expected = {}         # (vehicle, name) -> (source, deadline)
+        print(f"[ParameterJournal] Journal at {self._path}")
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+
+    def expect(self, vehicle, name, source):
+        """
+        Attribute the next PARAM_VALUE echo for name to source. Used by
+        writers that don't wait for the echo themselves.
+        """
+        with self._lock:
+            self._expected[(vehicle, name)] = (source, time.time() + EXPECTATION_TIMEOUT)
+
+    def pop_expected_source(self, vehicle, name, default="vehicle"):
+        with self._lock:
+            entry = self._expected.pop((vehicle, name), None)
+        if entry and entry[1] >= time.time():
+            return entry[0]
+        return default
+
+    def record_change(self, vehicle, name, old_value, new_value, param_type=None, source=""):
+        """Append one confirmed change; repeats of the last journaled value are ignored"""
+        return self.record_changes(vehicle, [(name, old_value, new_value, param_type)], source) > 0
+
+    def record_changes(self, vehicle, changes, source=""):
+        """
+        Append several confirmed changes in one transaction.
+        changes is an iterable of (name, old_value, new_value, param_type).
+        Returns the number of rows written.
+        """
+        now = time.time()
+        with self._lock:
+            rows = []
+            for name, old_value, new_value, param_type in changes:
+                new_value = float(new_value)
+                key = (vehicle, name)
+                last = self._last_values.get(key)
+                if last is None:
+                    row = self._db.execute(
+                        "SELECT new_value FROM changes WHERE vehicle=? AND name=? ORDER BY id DESC LIMIT 1",
+                        (vehicle, name)).fetchone()
+                    last = row[0] if row else None
+                self._last_values[key] = new_value
+                if last is not None and parameter_files.values_equal(last, new_value, param_type):
+                    continue
+                rows.append((now, vehicle, name, None if old_value is None else float(old_value),
+                             new_value, param_type, source))
+
+            if not rows:
+                return 0
+            self._db.executemany(
+                "INSERT INTO changes (ts, vehicle, name, old_value, new_value, param_type, source) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            self._db.commit()
+            pending = self._changes_since_snapshot.get(vehicle, 0) + len(rows)
+            self._changes_since_snapshot[vehicle] = pending
+
+        if pending >= SNAPSHOT_INTERVAL:
+            self.snapshot(vehicle, self.state_at(vehicle), "auto", force=True)
+        return len(rows)
+
+    def note_armed(self, vehicle, armed):
+        """Journal arm/disarm transitions from HEARTBEAT"""
+        with self._lock:
+            if self._armed.get(vehicle) == armed:
+                return
+            first = vehicle not in self._armed
+            self._armed[vehicle] = armed
+            if first and not armed:
+                return
+            self._db.execute("INSERT INTO events (ts, vehicle, kind) VALUES (?, ?, ?)",
+                             (time.time(), vehicle, "arm" if armed else "disarm"))
+            self._db.commit()
+
+    def snapshot(self, vehicle, params, label="", force=False):
+        """
+        Store a full snapshot from {name: param_dict} or {name: (value, type)}.
+        Unless forced, skipped when identical to the current reconstructed state.
+        Returns the snapshot id, or the latest id when nothing changed.
+        """
+        values = {}
+        for name, p in params.items():
+            if isinstance(p, dict):
+                values[name] = (float(p.get("value", 0)), p.get("type"))
+            else:
+                values[name] = (float(p[0]), p[1])
+
+        current = {} if force else self.state_at(vehicle)
+        if current and len(current) == len(values) and all(
+                name in current and parameter_files.values_equal(current[name][0], v[0], v[1])
+                for name, v in values.items()):
+            latest = self.snapshots(vehicle, 1)
+            if latest:
+                return latest[0]["id"]
+
+        with self._lock:
+            row = self._db.execute("SELECT COALESCE(MAX(id), 0) FROM changes").fetchone()
+            cursor = self._db.execute(
+                "INSERT INTO snapshots (ts, vehicle, label, last_change_id, param_count, sysid) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (time.time(), vehicle, label, row[0], len(values), _sysid_for(vehicle)))
+            snapshot_id = cursor.lastrowid
+            self._db.executemany(
+                "INSERT INTO snapshot_values (snapshot_id, name, value, param_type) VALUES (?, ?, ?, ?)",
+                ((snapshot_id, name, v[0], v[1]) for name, v in values.items()))
+            self._db.commit()
+            self._changes_since_snapshot[vehicle] = 0
+            for name, v in values.items():
+                self._last_values[(vehicle, name)] = v[0]
+
+        print(f"[ParameterJournal] Snapshot {snapshot_id} ({label}) - {len(values)} parameters")
+        return snapshot_id
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def snapshots(self, vehicle, limit=50):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, ts, label, param_count, sysid FROM snapshots WHERE vehicle=? ORDER BY id DESC LIMIT ?",
+                (vehicle, limit)).fetchall()
+        return [{"id": r[0], "ts": r[1], "label": r[2] or "", "count": r[3], "sysid": r[4]} for r in rows]
+
+    def changes_since(self, vehicle, since_ts, limit=1000):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT ts, name, old_value, new_value, param_type, source FROM changes "
+                "WHERE vehicle=? AND ts>? ORDER BY id LIMIT ?",
+                (vehicle, since_ts, limit)).fetchall()
+        return [{"ts": r[0], "name": r[1], "old": r[2], "new": r[3], "type": r[4], "source": r[5]}
+                for r in rows]
+
+    def last_flight_end(self, vehicle):
+        """Timestamp of the most recent disarm, or 0 if the vehicle has never flown"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT MAX(ts) FROM events WHERE vehicle=? AND kind='disarm'", (vehicle,)).fetchone()
+        return row[0] or 0.0
+
+    def changes_since_last_flight(self, vehicle, limit=1000):
+        return self.changes_since(vehicle, self.last_flight_end(vehicle), limit)
+
+    def state_at(self, vehicle, snapshot_id=None, at_ts=None):
+        """
+        Reconstruct {name: (value, type)} from a snapshot plus later changes.
+        snapshot_id selects a specific snapshot (no later changes applied);
+        otherwise the latest snapshot at or before at_ts (default now) is
+        used and changes up to at_ts are replayed on top.
+        """
+        with self._lock:
+            if snapshot_id is not None:
+                row = self._db.execute(
+                    "SELECT id, last_change_id FROM snapshots WHERE id=? AND vehicle=?",
+                    (snapshot_id, vehicle)).fetchone()
+            else:
+                row = self._db.execute(
+                    "SELECT id, last_change_id FROM snapshots WHERE vehicle=? AND ts<=? "
+                    "ORDER BY ts DESC LIMIT 1",
+                    (vehicle, at_ts if at_ts is not None else time.time())).fetchone()
+
+            state = {}
+            last_change_id = 0
+            if row:
+                last_change_id = row[1]
+                for name, value, param_type in self._db.execute(
+                        "SELECT name, value, param_type FROM snapshot_values WHERE snapshot_id=?", (row[0],)):
+                    state[name] = (value, param_type)
+            elif snapshot_id is not None:
+                return {}
+
+            if snapshot_id is None:
+                for name, value, param_type in self._db.execute(
+                        "SELECT name, new_value, param_type FROM changes "
+                        "WHERE vehicle=? AND id>? AND ts<=? ORDER BY id",
+                        (vehicle, last_change_id, at_ts if at_ts is not None else time.time())):
+                    state[name] = (value, param_type)
+
+        return state
+
+    def close(self):
+        with self._lock:
+            try:
+                self._db.close()
+            except Exception as e:
+                print(f"[ParameterJournal] Error closing journal: {e}")
+
+
+_journal = None
+_journal_lock = threading.Lock()
+
+
+def get_parameter_journal():
+    """Shared journal used by DroneCommander and the calibration models"""
+    global _journal
+    with _journal_lock:
+        if _journal is None:
+            try:
+                _journal = ParameterJournal()
+            except Exception as e:
+                print(f"[ParameterJournal] ⚠️ Journal unavailable: {e}")
+                return None
+        return _journal
@@ -0,0 +1,202 @@
+"""
+Parameter descriptions for the Parameters window and its search index.
+
+ArduPilot publishes its parameter documentation as apm.pdef.xml (the file
+Mission Planner downloads). If a copy is installed in ~/.tihanfly, every
+parameter gets its documented name, description, units and range from
+it. Without one, a description is made from the parameter's group prefix
+and suffix, as the Parameters window did.
+"""
+
+import os
+import threading
+import xml.etree.ElementTree as ElementTree
+
+# Fallbacks when no metadata file is installed (same text the Parameters window used)
+GROUP_DESCRIPTIONS = {
+    "ACRO": "Acrobatic flight mode",
+    "STAB": "Stabilize mode",
+    "ALT": "Altitude hold mode",
+    "AUTO": "Autonomous flight mode",
+    "GUIDED": "Guided flight mode",
+    "LOITER": "Loiter mode",
+    "RTL": "Return to launch mode",
+    "CIRCLE": "Circle navigation",
+    "LAND": "Landing mode",
+    "DRIFT": "Drift flight mode",
+    "SPORT": "Sport flight mode",
+    "FLIP": "Flip mode",
+    "BRAKE": "Brake mode",
+    "THROW": "Throw mode",
+    "AVOID": "Object avoidance",
+    "FOLLOW": "Follow me mode",
+    "ZIGZAG": "Zigzag mode",
+    "SYSID": "System identification mode",
+    "HELI": "Helicopter specific",
+    "AUTOTUNE": "Auto-tuning mode",
+    "ATC": "Attitude controller",
+    "PSC": "Position controller",
+    "VEL": "Velocity controller",
+    "WPNAV": "Waypoint navigation",
+    "FENCE": "Geofencing system",
+    "RALLY": "Rally points",
+    "AHRS": "Attitude heading reference system",
+    "INS": "Inertial navigation system",
+    "EK2": "Extended Kalman Filter 2",
+    "EK3": "Extended Kalman Filter 3",
+    "COMPASS": "Magnetometer/compass",
+    "GPS": "Global positioning system",
+    "BARO": "Barometric pressure sensor",
+    "RNGFND": "Range finder/sonar",
+    "FLOW": "Optical flow sensor",
+    "VISO": "Visual odometry",
+    "BCN": "Beacon positioning system",
+    "ARSPD": "Airspeed sensor",
+    "MOT": "Motor control",
+    "SERVO": "Servo output",
+    "ESC": "Electronic speed controller",
+    "RC": "Radio control input",
+    "RSSI": "Received signal strength",
+    "TELEM": "Telemetry system",
+    "SR0": "Serial port 0 stream rate",
+    "SR1": "Serial port 1 stream rate",
+    "SR2": "Serial port 2 stream rate",
+    "SR3": "Serial port 3 stream rate",
+    "BATT": "Battery monitoring",
+    "VOLT": "Voltage monitoring",
+    "CURR": "Current monitoring",
+    "LOG": "Data logging system",
+    "NTF": "Notification system",
+    "STAT": "Status reporting",
+    "ARMING": "Arming safety checks",
+    "FS": "Failsafe system",
+    "CAM": "Camera control",
+    "MNT": "Mount/gimbal control",
+    "GIMBAL": "Gimbal control",
+    "TERRAIN": "Terrain following",
+    "MIS": "Mission planning",
+    "ADSB": "ADS-B traffic system",
+    "PRX": "Proximity sensors",
+    "GRIP": "Gripper control",
+    "WINCH": "Winch control",
+    "SPRAY": "Crop spraying",
+    "TEMP": "Temperature monitoring",
+    "RCON": "Remote control",
+    "CAN": "CAN bus communication",
+    "SERIAL": "Serial communication",
+    "NET": "Network settings",
+    "SCHED": "Scheduler settings",
+    "SIM": "Simulation parameters",
+}
+
+# The first suffix contained in the name is appended to the group description
+SUFFIX_DESCRIPTIONS = (
+    ("_ENABLE", "Enable/disable this feature"),
+    ("_TYPE", "Type selection for this feature"),
+    ("_OPTIONS", "Option flags bitmask"),
+    ("_RATE", "Update rate or maximum rate"),
+    ("_FILT", "Filter cutoff frequency"),
+    ("_TC", "Time constant"),
+    ("_P", "Proportional gain"),
+    ("_I", "Integral gain"),
+    ("_D", "Derivative gain"),
+    ("_IMAX", "Integral maximum"),
+    ("_FF", "Feed forward gain"),
+    ("_FLTT", "Target filter frequency"),
+    ("_FLTE", "Error filter frequency"),
+    ("_FLTD", "Derivative filter frequency"),
+    ("_MIN", "Minimum value"),
+    ("_MAX", "Maximum value"),
+    ("_TRIM", "Trim/offset value"),
+    ("_EXPO", "Exponential curve"),
+    ("_THR", "Throttle related"),
+    ("_PWM", "PWM output value"),
+    ("_REVERSED", "Reverse direction flag"),
+    ("_OFFSET", "Offset/calibration value"),
+    ("_SCALE", "Scaling factor"),
+    ("_ORIENT", "Orientation/rotation"),
+    ("_X", "X-axis parameter"),
+    ("_Y", "Y-axis parameter"),
+    ("_Z", "Z-axis parameter"),
+    ("_ROLL", "Roll axis parameter"),
+    ("_PITCH", "Pitch axis parameter"),
+    ("_YAW", "Yaw axis parameter"),
+    ("_LAT", "Latitude coordinate"),
+    ("_LNG", "Longitude coordinate"),
+    ("_ALT", "Altitude parameter"),
+    ("_RADIUS", "Radius parameter"),
+    ("_SPEED", "Speed parameter"),
+    ("_ACCEL", "Acceleration parameter"),
+    ("_JERK", "Jerk parameter"),
+)
+
+
+def _default_pdef_path():
+    return os.path.join(os.path.expanduser("~"), ".tihanfly", "apm.pdef.xml")
+
+
+def load_pdef(path):
+    """{name: {description, units, range}} from an ArduPilot apm.pdef.xml"""
+    metadata = {}
+    for param in ElementTree.parse(path).getroot().iter("param"):
+        name = param.get("name", "").split(":")[-1]
+        if not name:
+            continue
+        human = param.get("humanName", "")
+        documentation = param.get("documentation", "")
+        fields = {"description": f"{human}: {documentation}" if human and documentation else human or documentation,
+                  "units": "", "range": ""}
+        for field in param.iter("field"):
+            if field.get("name") == "Units":
+                fields["units"] = (field.text or "").strip()
+            elif field.get("name") == "Range":
+                fields["range"] = "-".join((field.text or "").split())
+        metadata[name] = fields
+    return metadata
+
+
+def describe_from_name(name):
+    """Group + suffix description, e.g. 'Attitude controller - Proportional gain'"""
+    group = name.split("_")[0]
+    description = GROUP_DESCRIPTIONS.get(group, "")
+    for suffix, text in SUFFIX_DESCRIPTIONS:
+        if suffix in name:
+            description += (" - " if description else "") + text
+            break
+    return description or f"{group} system parameter"
+
+
+class ParameterMetadata:
+    """Description, units and range for parameter names"""
+
+    def __init__(self, pdef_path=None):
+        self._metadata = {}
+        path = pdef_path or _default_pdef_path()
+        if os.path.exists(path):
+            try:
+                self._metadata = load_pdef(path)
+                print(f"[ParameterMetadata] {len(self._metadata)} parameter descriptions from {path}")
+            except Exception as e:
+                print(f"[ParameterMetadata] ⚠️ Cannot read {path}: {e}")
+
+    def fields(self, name):
+        """{description, units, range} for the parameter store; units/range empty when unknown"""
+        entry = self._metadata.get(name)
+        if entry is not None and entry["description"]:
+            return dict(entry)
+        return {"description": describe_from_name(name),
+                "units": entry["units"] if entry else "",
+                "range": entry["range"] if entry else ""}
+
+
+_metadata = None
+_metadata_lock = threading.Lock()
+
+
+def get_parameter_metadata():
+    """Shared metadata, loaded once"""
+    global _metadata
+    with _metadata_lock:
+        if _metadata is None:
+            _metadata = ParameterMetadata()
+        return _metadata
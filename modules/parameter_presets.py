@@ -0,0 +1,326 @@
+"""
+Per-airframe parameter preset library.
+
+Presets are keyed by the same (drone_name, cube_type) pair the firmware
+flasher uses, so a freshly flashed board can be commissioned in one step:
+diff the stored tuning against the vehicle and bulk-write only the changes.
+
+Each airframe has one .tpreset file holding every saved version:
+
+    header    b"TPRS", u16 format, u16 name count, u16 version count
+    names     sorted parameter names, u8 length + ASCII each
+    versions  u16 number, u32 created, u16 param count, u32 offset,
+              u8 label length + UTF-8 label
+    records   u16 name index, u8 MAV_PARAM_TYPE, f32 value  (7 bytes each)
+
+Names are shared between versions, so a 1000-parameter set costs about
+7 KB per version and a single parameter can be found by bisecting the
+name table.
+
+Parameters that belong to one physical board rather than the airframe
+(sensor calibration, sensor device IDs, RC calibration, statistics,
+SYSID_THISMAV) are never stored in a preset and never applied from one,
+so commissioning a second airframe does not inherit the first one's
+accelerometer or compass calibration.
+"""
+
+import os
+import re
+import struct
+import time
+import threading
+from bisect import bisect_left
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot, pyqtProperty
+
+from modules import parameter_files
+
+AIRFRAMES = ["Shadow", "Spider", "Kala", "Palyanka", "Chakravyuh"]
+
+# Firmware files use short cube tags (Kala_CO.apj); the flasher UI uses long names
+CUBE_TAGS = {
+    "cubeorange": "CO",
+    "co": "CO",
+    "cubeorangeplus": "COP",
+    "cubeorange+": "COP",
+    "cop": "COP",
+}
+
+# Calibration and identity of one board; never copied between vehicles
+BOARD_SPECIFIC = re.compile(
+    r"^(INS_(ACC|GYR)\d?(OFFS|SCAL)"
+    r"|INS_\w*_ID$"
+    r"|INS_TCAL"
+    r"|COMPASS_(OFS|DIA|ODI|MOT|SCALE|DEV_ID|PRIO\d_ID)"
+    r"|BARO\d?_DEVID"
+    r"|RC\d+_(MIN|MAX|TRIM)$"
+    r"|STAT_"
+    r"|SYSID_THISMAV$"
+    r"|FORMAT_VERSION$)")
+
+_MAGIC = b"TPRS"
+_FORMAT = 1
+_HEADER = struct.Struct("<4sHHH")
+_VERSION = struct.Struct("<HIHIB")
+_RECORD = struct.Struct("<HBf")
+
+
+def cube_tag(cube_type):
+    """Normalise 'CubeOrangePlus' / 'COP' style names to the firmware file tag"""
+    key = str(cube_type).replace(" ", "").replace("_", "").lower()
+    return CUBE_TAGS.get(key, str(cube_type))
+
+
+def is_board_specific(name):
+    return BOARD_SPECIFIC.match(name) is not None
+
+
+def airframe_params(params):
+    """params without the board-specific entries"""
+    return {name: entry for name, entry in params.items() if not is_board_specific(name)}
+
+
+def _truncate_label(label, limit=255):
+    """UTF-8 label of at most limit bytes, cut on a character boundary"""
+    return label.encode("utf-8")[:limit].decode("utf-8", "ignore").encode("utf-8")
+
+
+def _default_preset_dir():
+    # Next to the parameter journal; the install directory may be read-only or temporary
+    return os.path.join(os.path.expanduser("~"), ".tihanfly", "presets")
+
+
+class PresetFile:
+    """One airframe's versioned presets, loaded from / saved to a .tpreset file"""
+
+    def __init__(self):
+        self.names = []      # sorted, shared by all versions
+        self.versions = []   # dicts: number, created, label, records [(name_idx, type, value)]
+
+    @classmethod
+    def load(cls, path):
+        preset = cls()
+        with open(path, "rb") as f:
+            data = f.read()
+
+        magic, fmt, name_count, version_count = _HEADER.unpack_from(data, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a preset file")
+        if fmt != _FORMAT:
+            raise ValueError(f"{path}: unsupported preset format {fmt}")
+
+        pos = _HEADER.size
+        for _ in range(name_count):
+            length = data[pos]
+            preset.names.append(data[pos + 1:pos + 1 + length].decode("ascii"))
+            pos += 1 + length
+
+        for _ in range(version_count):
+            number, created, count, offset, label_len = _VERSION.unpack_from(data, pos)
+            pos += _VERSION.size
+            label = data[pos:pos + label_len].decode("utf-8")
+            pos += label_len
+            records = [_RECORD.unpack_from(data, offset + i * _RECORD.size) for i in range(count)]
+            preset.versions.append({
+                "number": number, "created": created, "label": label, "records": records
+            })
+
+        return preset
+
+    def save(self, path):
+        names = self.names
+        blob = bytearray(_HEADER.pack(_MAGIC, _FORMAT, len(names), len(self.versions)))
+        for name in names:
+            encoded = name.encode("ascii")
+            blob += bytes([len(encoded)]) + encoded
+
+        labels = [_truncate_label(v["label"]) for v in self.versions]
+        table_size = sum(_VERSION.size + len(label) for label in labels)
+        offset = len(blob) + table_size
+        for version, label in zip(self.versions, labels):
+            blob += _VERSION.pack(version["number"], int(version["created"]),
+                                  len(version["records"]), offset, len(label))
+            blob += label
+            offset += len(version["records"]) * _RECORD.size
+
+        for version in self.versions:
+            for record in version["records"]:
+                blob += _RECORD.pack(*record)
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(blob)
+        os.replace(tmp_path, path)
+
+    def add_version(self, params, label=""):
+        """
+        Append a new version from {name: (value, param_type)}.
+        Existing records are re-indexed if new names extend the name table.
+        """
+        merged = sorted(set(self.names) | set(params))
+        if merged != self.names:
+            remap = {i: bisect_left(merged, name) for i, name in enumerate(self.names)}
+            for version in self.versions:
+                version["records"] = [(remap[i], t, v) for i, t, v in version["records"]]
+            self.names = merged
+
+        records = []
+        for name in sorted(params):
+            value, param_type = params[name]
+            type_id = (parameter_files.MAV_PARAM_TYPE_REAL32
+                       if parameter_files.is_float_type(param_type if param_type is not None else "FLOAT")
+                       else parameter_files.MAV_PARAM_TYPE_INT32)
+            records.append((bisect_left(self.names, name), type_id, float(value)))
+
+        number = (self.versions[-1]["number"] + 1) if self.versions else 1
+        self.versions.append({
+            "number": number, "created": int(time.time()), "label": label, "records": records
+        })
+        return number
+
+    def get_version(self, number=-1):
+        if not self.versions:
+            return None
+        if number is None or number < 0:
+            return self.versions[-1]
+        for version in self.versions:
+            if version["number"] == number:
+                return version
+        return None
+
+    def params_for(self, version):
+        """{name: (value, param_type)} for a version, in the diff engine's layout"""
+        return {self.names[i]: (value, param_type) for i, param_type, value in version["records"]}
+
+
+class ParameterPresetManager(QObject):
+    """
+    QML-facing preset library. Saving snapshots the vehicle's current
+    parameters as a new version; applying diffs a version against the
+    vehicle and hands only the changes to DroneCommander's batched writer.
+    """
+
+    presetsChanged = pyqtSignal()
+    presetStatus = pyqtSignal(str)
+
+    def __init__(self, drone_commander, preset_dir=None):
+        super().__init__()
+        self.drone_commander = drone_commander
+        self._preset_dir = preset_dir or _default_preset_dir()
+        self._cache = {}
+        self._lock = threading.Lock()
+        print(f"[PresetManager] Preset library: {self._preset_dir}")
+
+    def _path_for(self, drone_name, cube_type):
+        return os.path.join(self._preset_dir, f"{drone_name}_{cube_tag(cube_type)}.tpreset")
+
+    def _load(self, drone_name, cube_type):
+        path = self._path_for(drone_name, cube_type)
+        with self._lock:
+            cached = self._cache.get(path)
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                return PresetFile()
+            if cached and cached[0] == mtime:
+                return cached[1]
+            preset = PresetFile.load(path)
+            self._cache[path] = (mtime, preset)
+            return preset
+
+    def _store(self, drone_name, cube_type, preset):
+        os.makedirs(self._preset_dir, exist_ok=True)
+        path = self._path_for(drone_name, cube_type)
+        with self._lock:
+            preset.save(path)
+            self._cache[path] = (os.path.getmtime(path), preset)
+        self.presetsChanged.emit()
+
+    def _status(self, message):
+        print(f"[PresetManager] {message}")
+        self.presetStatus.emit(message)
+
+    @pyqtProperty('QVariant', constant=True)
+    def airframes(self):
+        return list(AIRFRAMES)
+
+    @pyqtSlot(str, str, result='QVariant')
+    def presetVersions(self, drone_name, cube_type):
+        """List saved versions for an airframe, newest last"""
+        try:
+            preset = self._load(drone_name, cube_type)
+        except Exception as e:
+            self._status(f"❌ Cannot read preset for {drone_name} {cube_type}: {e}")
+            return []
+        return [{
+            "number": v["number"],
+            "label": v["label"],
+            "created": time.strftime("%Y-%m-%d %H:%M", time.localtime(v["created"])),
+            "count": len(v["records"]),
+        } for v in preset.versions]
+
+    @pyqtSlot(str, str, str, result=int)
+    def savePresetFromVehicle(self, drone_name, cube_type, label):
+        """Store the vehicle's current parameters as a new preset version"""
+        live = self.drone_commander.parameter_values()
+        if not live:
+            self._status("❌ No parameters loaded - refresh parameters first")
+            return -1
+        return self._add_version(drone_name, cube_type, live, label)
+
+    @pyqtSlot(str, str, str, str, result=int)
+    def importPresetFile(self, drone_name, cube_type, path, label):
+        """Store a .param file as a new preset version"""
+        try:
+            params, errors = parameter_files.load_param_file(path)
+        except Exception as e:
+            self._status(f"❌ Cannot read {path}: {e}")
+            return -1
+        for error in errors:
+            print(f"[PresetManager] ⚠️ {path}: {error}")
+        return self._add_version(drone_name, cube_type, params, label or os.path.basename(path))
+
+    def _add_version(self, drone_name, cube_type, params, label):
+        params = airframe_params(params)
+        try:
+            preset = self._load(drone_name, cube_type)
+            number = preset.add_version(params, label)
+            self._store(drone_name, cube_type, preset)
+            self._status(f"✅ Saved {drone_name} {cube_tag(cube_type)} preset v{number} ({len(params)} parameters)")
+            return number
+        except Exception as e:
+            self._status(f"❌ Failed to save preset: {e}")
+            return -1
+
+    @pyqtSlot(str, str, int, result='QVariant')
+    def previewPreset(self, drone_name, cube_type, version):
+        """Diff a preset version (-1 for latest) against the vehicle"""
+        try:
+            preset = self._load(drone_name, cube_type)
+        except Exception as e:
+            return {"changed": [], "missing": [], "unchanged": 0, "error": str(e)}
+        selected = preset.get_version(version)
+        if selected is None:
+            return {"changed": [], "missing": [], "unchanged": 0,
+                    "error": f"No preset for {drone_name} {cube_tag(cube_type)}"}
+        # Older versions may still hold board calibration; never apply it
+        diff = self.drone_commander.diff_against_vehicle(airframe_params(preset.params_for(selected)))
+        diff["version"] = selected["number"]
+        diff["error"] = ""
+        return diff
+
+    @pyqtSlot(str, str, int, result=bool)
+    def applyPreset(self, drone_name, cube_type, version):
+        """Write the parameters that differ from a preset version in one batch"""
+        diff = self.previewPreset(drone_name, cube_type, version)
+        if diff["error"]:
+            self._status(f"❌ {diff['error']}")
+            return False
+        if diff["missing"]:
+            print(f"[PresetManager] ⚠️ {len(diff['missing'])} preset parameters not on vehicle: {diff['missing'][:10]}")
+        self._status(f"Applying {drone_name} {cube_tag(cube_type)} v{diff['version']}: "
+                     f"{len(diff['changed'])} changes, {diff['unchanged']} already set")
+        source = f"preset:{drone_name}_{cube_tag(cube_type)}_v{diff['version']}"
+        return self.drone_commander.write_parameters_batch(diff["changed"], source=source)
+
+    def cleanup(self):
+        print("[PresetManager] Cleanup completed")
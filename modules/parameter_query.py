@@ -0,0 +1,249 @@
+"""
+Targeted parameter reads.
+
+Components that only need a few parameters (compass detection, the servo
+outputs, FLTMODE_CH) should not have to send PARAM_REQUEST_LIST, or a
+burst of reads, and then filter the PARAM_VALUE flood with recv_match
+loops for several seconds. ParameterQuery keeps the last value of every
+parameter seen in any PARAM_VALUE: full downloads, reads, write echoes
+and changes made by other GCSes. fetch(names) returns a Future. Names
+that are already known resolve at once. The rest are read by name with
+PARAM_REQUEST_READ. At most WINDOW reads are in flight, scaled down by
+the link quality estimator when the radio's transmit buffer fills.
+
+A read that gets no reply within the timeout is sent again. After
+MAX_ATTEMPTS the name is left out of the result, because ArduPilot does
+not reply to reads for parameters it does not have. The timeout follows
+a smoothed round-trip time taken from first-attempt replies, so on a
+healthy link a query completes in about one round trip.
+
+The store is cleared whenever the link quality estimator resets (connect,
+disconnect or a different vehicle), so values from the previous vehicle
+or session are never served as cached.
+"""
+
+import time
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+from modules.mavlink_thread import MAVLinkThread
+from modules.link_quality import get_link_quality
+
+WINDOW = 10
+MAX_ATTEMPTS = 3
+INITIAL_RTT = 0.3               # seconds, until the first reply is timed
+RTT_SMOOTHING = 0.2
+RTT_MULTIPLIER = 4.0
+MIN_TIMEOUT = 0.2
+MAX_TIMEOUT = 2.0
+
+
+class _Request:
+    __slots__ = ("connection", "sent", "attempts", "queries")
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.sent = None
+        self.attempts = 0
+        self.queries = []
+
+
+class _Query:
+    __slots__ = ("future", "values", "pending")
+
+    def __init__(self):
+        self.future = Future()
+        self.values = {}
+        self.pending = set()
+
+
+class ParameterQuery:
+    """Parameter value store with pipelined reads of missing names"""
+
+    def __init__(self, window=WINDOW, max_attempts=MAX_ATTEMPTS):
+        self.window = window
+        self.max_attempts = max_attempts
+        self._cond = threading.Condition()
+        self._values = {}           # (sysid, name) -> (value, time received)
+        self._requests = {}         # (sysid, name) -> _Request
+        self._queued = deque()      # keys not sent yet
+        self._rtt = INITIAL_RTT
+        self._worker = None
+        MAVLinkThread.add_message_listener('PARAM_VALUE', self._on_param_value)
+        get_link_quality().add_reset_listener(self.reset)
+
+    @property
+    def rtt(self):
+        return self._rtt
+
+    @property
+    def timeout(self):
+        return min(MAX_TIMEOUT, max(MIN_TIMEOUT, RTT_MULTIPLIER * self._rtt))
+
+    def reset(self):
+        """Forget every value; reads still pending resolve without them"""
+        done = []
+        with self._cond:
+            self._values.clear()
+            for key, request in self._requests.items():
+                done += self._resolve(request, key[1], None)
+            self._requests.clear()
+            self._queued.clear()
+            self._rtt = INITIAL_RTT
+            self._cond.notify()
+        for query in done:
+            query.future.set_result(query.values)
+
+    def cached(self, connection, name):
+        """Last known value of name, or None"""
+        with self._cond:
+            entry = self._values.get((connection.target_system, name))
+        return entry[0] if entry else None
+
+    def fetch(self, connection, names, max_age=None):
+        """
+        Future resolving to {name: float} for the names the vehicle has.
+        max_age (seconds) re-reads cached values older than that.
+        """
+        sysid = connection.target_system
+        now = time.monotonic()
+        query = _Query()
+        with self._cond:
+            for name in dict.fromkeys(names):
+                key = (sysid, name)
+                entry = self._values.get(key)
+                if entry is not None and (max_age is None or now - entry[1] <= max_age):
+                    query.values[name] = entry[0]
+                    continue
+                query.pending.add(name)
+                request = self._requests.get(key)
+                if request is None:
+                    request = self._requests[key] = _Request(connection)
+                    self._queued.append(key)
+                request.queries.append(query)
+            done = not query.pending
+            if not done:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="ParameterQuery", daemon=True)
+                    self._worker.start()
+                self._cond.notify()
+        if done:
+            query.future.set_result(query.values)
+        else:
+            print(f"[ParameterQuery] {len(query.values)} cached, reading {len(query.pending)}")
+        return query.future
+
+    # ------------------------------------------------------------------
+    # MAVLink reader thread
+    # ------------------------------------------------------------------
+
+    def _on_param_value(self, msg):
+        try:
+            name = msg.param_id
+            if isinstance(name, bytes):
+                name = name.decode('utf-8')
+            name = name.strip('\x00')
+            value = float(msg.param_value)
+        except Exception:
+            return
+        key = (msg.get_srcSystem(), name)
+        now = time.monotonic()
+        with self._cond:
+            self._values[key] = (value, now)
+            request = self._requests.pop(key, None)
+            if request is None:
+                return
+            if request.sent is None:
+                # Answered by someone else's read or a full download before ours went out
+                self._queued.remove(key)
+            elif request.attempts == 1:
+                self._rtt += RTT_SMOOTHING * ((now - request.sent) - self._rtt)
+            done = self._resolve(request, name, value)
+            self._cond.notify()
+        for query in done:
+            query.future.set_result(query.values)
+
+    # ------------------------------------------------------------------
+    # Scheduler thread
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _resolve(request, name, value):
+        """Hand one result to the waiting queries; returns the queries now complete"""
+        done = []
+        for query in request.queries:
+            if value is not None:
+                query.values[name] = value
+            query.pending.discard(name)
+            if not query.pending:
+                done.append(query)
+        return done
+
+    def _run(self):
+        while True:
+            sends, done = [], []
+            finished = False
+            with self._cond:
+                now = time.monotonic()
+                timeout = self.timeout
+                window = get_link_quality().scale_window(self.window)
+                in_flight = 0
+                for key, request in list(self._requests.items()):
+                    if request.sent is None:
+                        continue
+                    if now - request.sent >= timeout:
+                        if request.attempts >= self.max_attempts:
+                            del self._requests[key]
+                            print(f"[ParameterQuery] ⚠️ No reply for {key[1]}")
+                            done += self._resolve(request, key[1], None)
+                            continue
+                        request.sent = now
+                        request.attempts += 1
+                        sends.append((key[1], request.connection))
+                    in_flight += 1
+                while self._queued and in_flight < window:
+                    key = self._queued.popleft()
+                    request = self._requests[key]
+                    request.sent = now
+                    request.attempts = 1
+                    sends.append((key[1], request.connection))
+                    in_flight += 1
+
+                if not self._requests:
+                    self._worker = None
+                    finished = True
+                elif not sends and not done:
+                    oldest = min((r.sent for r in self._requests.values() if r.sent is not None), default=None)
+                    # Nothing in flight yet: wait for a reply, a new fetch or the window to open
+                    wait = timeout if oldest is None else oldest + timeout - now
+                    self._cond.wait(max(0.005, wait))
+                    continue
+
+            for name, connection in sends:
+                try:
+                    connection.mav.param_request_read_send(
+                        connection.target_system,
+                        connection.target_component,
+                        name.encode('utf-8'),
+                        -1
+                    )
+                except Exception as e:
+                    print(f"[ParameterQuery] Read of {name} failed: {e}")
+            for query in done:
+                query.future.set_result(query.values)
+            if finished:
+                return
+
+
+_query = None
+_query_lock = threading.Lock()
+
+
+def get_parameter_query():
+    """Shared parameter store used by DroneCommander and the calibration models"""
+    global _query
+    with _query_lock:
+        if _query is None:
+            _query = ParameterQuery()
+        return _query
@@ -0,0 +1,307 @@
+"""
+Parameter search index for the Parameters window.
+
+Builds a prefix trie over parameter names and an inverted token index over
+name segments and metadata descriptions, with a bounded edit-distance
+matcher as the last resort. Lookups return parameter names ranked by match
+quality so QML only has to render the rows that actually match.
+
+The edit-distance matcher only scores tokens within the length band that
+share enough bigrams with the word: one edit destroys at most two
+bigrams, so a token within k edits of an n-letter word shares at least
+n - 1 - 2k of them (and at least one is required). Per-word rankings are
+cached until the index changes, so retyping or deleting a character
+costs a dictionary lookup.
+"""
+
+import re
+import heapq
+import threading
+from bisect import bisect_left
+from collections import Counter
+
+
+# Rank buckets - lower is better
+RANK_EXACT = 0
+RANK_PREFIX = 1
+RANK_TOKEN_PREFIX = 2
+RANK_SUBSTRING = 3
+RANK_DESCRIPTION = 4
+RANK_FUZZY = 5
+
+RANK_CACHE_SIZE = 64
+
+_TOKEN_RE = re.compile(r"[A-Z0-9]+")
+
+
+def _tokenize(text):
+    """Split a name or description into upper-case alphanumeric tokens"""
+    if not text:
+        return []
+    return _TOKEN_RE.findall(str(text).upper())
+
+
+def _bigrams(token):
+    return {token[i:i + 2] for i in range(len(token) - 1)}
+
+
+def _bounded_distance(a, b, limit):
+    """
+    Levenshtein distance between a and b, giving up once it exceeds limit.
+    Only a diagonal band of width 2*limit+1 is evaluated, so the cost is
+    O(len(a) * limit) instead of O(len(a) * len(b)).
+    """
+    la, lb = len(a), len(b)
+    if abs(la - lb) > limit:
+        return limit + 1
+
+    big = limit + 1
+    previous = [j if j <= limit else big for j in range(lb + 1)]
+
+    for i in range(1, la + 1):
+        lo = max(1, i - limit)
+        hi = min(lb, i + limit)
+        current = [big] * (lb + 1)
+        if i <= limit:
+            current[0] = i
+        row_min = current[0]
+        ca = a[i - 1]
+        for j in range(lo, hi + 1):
+            cost = 0 if ca == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > limit:
+            return big
+        previous = current
+
+    return previous[lb] if previous[lb] <= limit else big
+
+
+class _TrieNode:
+    __slots__ = ("children", "names")
+
+    def __init__(self):
+        self.children = {}
+        self.names = []
+
+
+class ParameterSearchIndex:
+    """
+    Ranked search over parameter names and descriptions.
+
+    The index is rebuilt wholesale when a full parameter list arrives and
+    updated in place when single parameters are added. All public methods
+    are thread-safe; the parameter fetch thread builds while the GUI thread
+    queries.
+    """
+
+    def __init__(self, max_fuzzy_distance=2, min_fuzzy_length=3):
+        self._lock = threading.Lock()
+        self._max_fuzzy_distance = max_fuzzy_distance
+        self._min_fuzzy_length = min_fuzzy_length
+        self._clear()
+
+    def _clear(self):
+        self._root = _TrieNode()
+        self._names = set()
+        self._display_names = {}      # upper-case key -> name as reported
+        self._token_names = {}        # name segment -> set(names)
+        self._description_names = {}  # description token -> set(names)
+        self._descriptions = {}       # upper-case key -> description indexed
+        self._token_chars = {}        # token -> frozenset of its characters
+        self._token_bigrams = {}      # bigram -> set(tokens) for the fuzzy prefilter
+        self._sorted_name_tokens = None
+        self._sorted_description_tokens = None
+        self._order = None            # key -> position by (length, name), for sorting results
+        self._rank_cache = {}         # word -> {key: rank}, until the index changes
+
+    def __len__(self):
+        return len(self._names)
+
+    # ------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------
+
+    def rebuild(self, parameters):
+        """Replace the index contents from a {name: param_dict} mapping"""
+        with self._lock:
+            self._clear()
+            for name, param in parameters.items():
+                description = param.get("description", "") if isinstance(param, dict) else ""
+                self._add_locked(name, description)
+
+    def add(self, name, description=""):
+        """Add or refresh a single parameter; an empty description keeps the indexed one"""
+        with self._lock:
+            self._add_locked(name, description)
+
+    def _add_locked(self, name, description):
+        key = name.upper()
+        if key in self._names:
+            self._refresh_locked(key, name, description)
+            return
+        self._names.add(key)
+        self._display_names[key] = name
+
+        node = self._root
+        for ch in key:
+            node = node.children.setdefault(ch, _TrieNode())
+            node.names.append(key)
+
+        for token in _tokenize(key):
+            self._token_names.setdefault(token, set()).add(key)
+            self._register_token(token)
+
+        self._index_description(key, description)
+        self._sorted_name_tokens = None
+        self._sorted_description_tokens = None
+        self._order = None
+        self._rank_cache.clear()
+
+    def _refresh_locked(self, key, name, description):
+        """Existing parameter: keep its name tokens, replace the description if a new one is given"""
+        self._display_names[key] = name
+        if not description or description == self._descriptions.get(key, ""):
+            return
+        for token in _tokenize(self._descriptions.get(key, "")):
+            names = self._description_names.get(token)
+            if names is not None:
+                names.discard(key)
+        self._index_description(key, description)
+        self._sorted_description_tokens = None
+        self._rank_cache.clear()
+
+    def _index_description(self, key, description):
+        self._descriptions[key] = description
+        for token in _tokenize(description):
+            self._description_names.setdefault(token, set()).add(key)
+            self._register_token(token)
+
+    def _register_token(self, token):
+        if token not in self._token_chars:
+            self._token_chars[token] = frozenset(token)
+            for bigram in _bigrams(token):
+                self._token_bigrams.setdefault(bigram, set()).add(token)
+
+    # ------------------------------------------------------------------
+    # Querying
+    # ------------------------------------------------------------------
+
+    def _prefix_names(self, prefix):
+        node = self._root
+        for ch in prefix:
+            node = node.children.get(ch)
+            if node is None:
+                return []
+        return node.names
+
+    @staticmethod
+    def _tokens_with_prefix(sorted_tokens, prefix):
+        """Yield tokens starting with prefix from a sorted token list"""
+        i = bisect_left(sorted_tokens, prefix)
+        while i < len(sorted_tokens) and sorted_tokens[i].startswith(prefix):
+            yield sorted_tokens[i]
+            i += 1
+
+    def search(self, query, limit=0):
+        """
+        Return parameter names matching query, best matches first.
+
+        A query of several words must match every word (AND). Within a
+        rank bucket shorter names sort first, then alphabetically.
+        """
+        words = _tokenize(query)
+        if not words:
+            return []
+
+        with self._lock:
+            if not self._names:
+                return []
+            if self._sorted_name_tokens is None:
+                self._sorted_name_tokens = sorted(self._token_names)
+            if self._sorted_description_tokens is None:
+                self._sorted_description_tokens = sorted(self._description_names)
+            if self._order is None:
+                self._order = {name: i for i, name in enumerate(sorted(self._names, key=lambda n: (len(n), n)))}
+            order = self._order
+            display = self._display_names
+
+            best = None
+            for word in words:
+                ranks = self._rank_cache.get(word)
+                if ranks is None:
+                    ranks = self._rank_word(word)
+                    if len(self._rank_cache) >= RANK_CACHE_SIZE:
+                        self._rank_cache.pop(next(iter(self._rank_cache)))
+                    self._rank_cache[word] = ranks
+                if best is None:
+                    best = ranks
+                else:
+                    best = {name: max(rank, ranks[name])
+                            for name, rank in best.items() if name in ranks}
+                if not best:
+                    return []
+
+        # One integer key per name: rank bucket, then length, then alphabetical
+        scale = len(order)
+        key = {name: rank * scale + order[name] for name, rank in best.items()}.__getitem__
+        if limit and 0 < limit < len(best):
+            ordered = heapq.nsmallest(limit, best, key=key)
+        else:
+            ordered = sorted(best, key=key)
+        return [display.get(name, name) for name in ordered]
+
+    def _rank_word(self, word):
+        # Buckets are visited best first, so a name keeps the first rank it is given
+        ranks = {}
+        if word in self._names:
+            ranks[word] = RANK_EXACT
+
+        for name in self._prefix_names(word):
+            ranks.setdefault(name, RANK_PREFIX)
+
+        for token in self._tokens_with_prefix(self._sorted_name_tokens, word):
+            for name in self._token_names[token]:
+                ranks.setdefault(name, RANK_TOKEN_PREFIX)
+
+        if len(word) > 1:
+            for name in self._names:
+                if word in name:
+                    ranks.setdefault(name, RANK_SUBSTRING)
+
+        for token in self._tokens_with_prefix(self._sorted_description_tokens, word):
+            for name in self._description_names[token]:
+                ranks.setdefault(name, RANK_DESCRIPTION)
+
+        if not ranks and len(word) >= self._min_fuzzy_length:
+            def offer(name, rank):
+                current = ranks.get(name)
+                if current is None or rank < current:
+                    ranks[name] = rank
+            self._fuzzy(word, offer)
+
+        return ranks
+
+    def _fuzzy(self, word, offer):
+        limit = 1 if len(word) < 5 else self._max_fuzzy_distance
+        word_chars = frozenset(word)
+        shared = Counter()
+        for bigram in _bigrams(word):
+            shared.update(self._token_bigrams.get(bigram, ()))
+        required = max(1, len(word) - 1 - 2 * limit)
+        for token, count in shared.items():
+            if count < required or abs(len(token) - len(word)) > limit:
+                continue
+            # Every character missing from the token costs at least one edit
+            if len(word_chars - self._token_chars[token]) > limit:
+                continue
+            distance = _bounded_distance(word, token, limit)
+            if distance > limit:
+                continue
+            rank = RANK_FUZZY + distance
+            for name in self._token_names.get(token, ()):
+                offer(name, rank)
+            for name in self._description_names.get(token, ()):
+                offer(name, rank + 1)
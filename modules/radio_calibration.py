@@ -2,11 +2,19 @@ from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot, pyqtProperty, QTimer
 from pymavlink import mavutil
 import time
 import math
+import numpy as np
+from modules.parameter_journal import get_parameter_journal, vehicle_key
+from modules.mavlink_thread import MAVLinkThread
+from modules.rc_capture import RCCaptureEngine, RC_CHANNEL_COUNT, STATE_AT_MIN, STATE_CENTRED, STATE_NAMES
+
+# UI refresh cap; RC_CHANNELS itself arrives at up to 50 Hz during calibration
+UI_UPDATE_INTERVAL_MS = 50
 
 class RadioCalibrationModel(QObject):
     calibrationStatusChanged = pyqtSignal()
     calibrationProgressChanged = pyqtSignal()
     radioChannelsChanged = pyqtSignal()
+    radioChannelChanged = pyqtSignal(int, int)     # channel index, PWM
     statusMessageChanged = pyqtSignal()
     
     def __init__(self, drone_model):
@@ -56,6 +64,13 @@ class RadioCalibrationModel(QObject):
             "Channel 17", "Channel 18"
         ]
         
+        # RC_CHANNELS samples are captured on the MAVLink reader thread; the
+        # update timer only reads snapshots at UI_UPDATE_INTERVAL_MS
+        self._capture = RCCaptureEngine()
+        self._last_snapshot_samples = 0
+        self._channel_states = [0] * RC_CHANNEL_COUNT
+        MAVLinkThread.add_message_listener('RC_CHANNELS', self._capture.add_message)
+        
         # Timer for updating radio channel data
         self._update_timer = QTimer()
         self._update_timer.timeout.connect(self._update_radio_channels)
@@ -126,8 +141,10 @@ class RadioCalibrationModel(QObject):
         self._step1_samples = 0
         self._step2_samples = 0
         
-        # Initialize calibration values from current readings
+        # Initialize calibration values from current readings, then start a fresh capture
         current_values = self._get_current_radio_values()
+        self._capture.reset()
+        self._last_snapshot_samples = 0
         for i in range(18):
             current_value = current_values[i] if current_values[i] > 0 else (1000 if i == 2 else 1500)
             self._channel_min[i] = current_value
@@ -146,7 +163,7 @@ class RadioCalibrationModel(QObject):
         self._start_rc_calibration_mavlink()
         
         # Start timers
-        self._update_timer.start(20)  # Update every 20ms for responsive UI
+        self._update_timer.start(UI_UPDATE_INTERVAL_MS)
         self._calibration_timer.start(self._calibration_timeout * 1000)
         self._step_timer.start(100)  # Check step completion every 100ms
         
@@ -206,16 +223,19 @@ class RadioCalibrationModel(QObject):
             # Step 2 complete: Center positions captured
             print("[RadioCalibration] Step 2 complete - captured center positions")
             
-            # Calculate trim values from center positions
+            # Calculate trim values from center positions: the mean of the
+            # last still window where there is one, else the current value
+            trims = self._capture.snapshot()["trim"]
             for i in range(18):
                 # For throttle channel (channel 3, index 2), trim should be at minimum
                 if i == 2:  # Throttle channel
                     self._channel_trim[i] = self._channel_min[i]
                     print(f"[RadioCalibration] Throttle trim set to minimum: {self._channel_trim[i]}")
                 else:
-                    # For other channels, trim is current center position
-                    self._channel_trim[i] = self._radio_channels[i]
-                    print(f"[RadioCalibration] {self._channel_names[i]} trim set to: {self._channel_trim[i]}")
+                    # For other channels, trim is the held center position
+                    self._channel_trim[i] = int(trims[i]) if not np.isnan(trims[i]) else self._radio_channels[i]
+                    if i < 8:
+                        print(f"[RadioCalibration] {self._channel_names[i]} trim set to: {self._channel_trim[i]}")
             
             # Complete calibration
             self._calibration_step = 3
@@ -226,32 +246,11 @@ class RadioCalibrationModel(QObject):
         self.calibrationStatusChanged.emit()
     
     def _get_current_radio_values(self):
-        """Get current radio channel values from drone"""
-        current_values = [0] * 18
-        
-        if not self._drone_model.drone_connection:
-            return current_values
-        
-        try:
-            connection = self._drone_model.drone_connection
-            
-            # Try to get latest RC_CHANNELS message
-            msg = connection.recv_match(type='RC_CHANNELS', blocking=False, timeout=0.1)
-            
-            if msg:
-                current_values = [
-                    msg.chan1_raw, msg.chan2_raw, msg.chan3_raw, msg.chan4_raw,
-                    msg.chan5_raw, msg.chan6_raw, msg.chan7_raw, msg.chan8_raw,
-                    msg.chan9_raw, msg.chan10_raw, msg.chan11_raw, msg.chan12_raw,
-                    msg.chan13_raw, msg.chan14_raw, msg.chan15_raw, msg.chan16_raw,
-                    msg.chan17_raw, msg.chan18_raw
-                ]
-                
-                print(f"[RadioCalibration] Current values - Ch1:{current_values[0]}, Ch2:{current_values[1]}, Ch3:{current_values[2]}, Ch4:{current_values[3]}")
-        
-        except Exception as e:
-            print(f"[RadioCalibration] Could not get current radio values: {e}")
-        
+        """Latest captured radio channel values (0 where a channel has no signal)"""
+        values = self._capture.snapshot()["values"]
+        current_values = [0 if np.isnan(v) else int(v) for v in values]
+        if any(current_values):
+            print(f"[RadioCalibration] Current values - Ch1:{current_values[0]}, Ch2:{current_values[1]}, Ch3:{current_values[2]}, Ch4:{current_values[3]}")
         return current_values
     
     @pyqtSlot()
@@ -364,12 +363,12 @@ class RadioCalibrationModel(QObject):
                 self._set_status_message(f"Step 1: {ranges_detected}/4 channels have good range - Continue moving sticks!")
             
         elif self._calibration_step == 2:
-            # Step 2: Just collect samples for center positions
-            self._step2_samples += 1
-            if self._step2_samples >= self._required_samples:
-                # Enough center samples collected
-                progress = 66 + min(33, (self._step2_samples / self._required_samples) * 33)
-                self._set_calibration_progress(int(progress))
+            # Step 2: sticks held centred (throttle held at minimum) on the main channels
+            held = sum(1 for i in range(4)
+                       if self._channel_states[i] == (STATE_AT_MIN if i == 2 else STATE_CENTRED))
+            self._set_calibration_progress(66 + int(held / 4.0 * 33))
+            if held == 4:
+                self._set_status_message("Step 2: All sticks centred - click Done to finish")
     
     def _start_rc_calibration_mavlink(self):
         """Start RC calibration using MAVLink commands"""
@@ -420,70 +419,41 @@ class RadioCalibrationModel(QObject):
             print(f"[RadioCalibration ERROR] Failed to stop RC calibration: {e}")
     
     def _update_radio_channels(self):
-        """Update radio channel values from drone with proper channel mapping"""
-        if not self._calibration_active or not self._drone_model.drone_connection:
+        """Apply the latest capture snapshot; only channels that changed are signalled"""
+        if not self._calibration_active:
             return
         
-        try:
-            connection = self._drone_model.drone_connection
-            
-            # Get latest RC_CHANNELS message
-            msg = connection.recv_match(type='RC_CHANNELS', blocking=False, timeout=0.01)
-            
-            if msg:
-                # Extract channel values in correct order
-                # IMPORTANT: These correspond directly to RC channels 1-18
-                new_channels = [
-                    msg.chan1_raw,   # Channel 1: Roll
-                    msg.chan2_raw,   # Channel 2: Pitch  
-                    msg.chan3_raw,   # Channel 3: Throttle
-                    msg.chan4_raw,   # Channel 4: Yaw
-                    msg.chan5_raw,   # Channel 5
-                    msg.chan6_raw,   # Channel 6
-                    msg.chan7_raw,   # Channel 7
-                    msg.chan8_raw,   # Channel 8
-                    msg.chan9_raw,   # Channel 9
-                    msg.chan10_raw,  # Channel 10
-                    msg.chan11_raw,  # Channel 11
-                    msg.chan12_raw,  # Channel 12
-                    msg.chan13_raw,  # Channel 13
-                    msg.chan14_raw,  # Channel 14
-                    msg.chan15_raw,  # Channel 15
-                    msg.chan16_raw,  # Channel 16
-                    msg.chan17_raw,  # Channel 17
-                    msg.chan18_raw   # Channel 18
-                ]
-                
-                # Update channel values and calibration data
-                channels_updated = 0
-                for i, value in enumerate(new_channels):
-                    if value > 0 and value != 65535:  # Valid channel data (65535 = no signal)
-                        self._radio_channels[i] = value
-                        channels_updated += 1
-                        print(i,value)
-                        # Update calibration data based on current step
-                        if self._calibration_step == 1:
-                            # Step 1: Track extreme positions
-                            if value < self._step1_min[i]:
-                                self._step1_min[i] = value
-                                print(f"[RadioCalibration] {self._channel_names[i]} new minimum: {value}")
-                            if value > self._step1_max[i]:
-                                self._step1_max[i] = value
-                                print(f"[RadioCalibration] {self._channel_names[i]} new maximum: {value}")
-                
-                # Only count as valid update if we got reasonable number of channels
-                if channels_updated >= 4:
-                    self._samples_collected += 1
-                    if self._calibration_step == 1:
-                        self._step1_samples += 1
-                    elif self._calibration_step == 2:
-                        self._step2_samples += 1
-                    
-                    # Emit signal to update UI
-                    self.radioChannelsChanged.emit()
-                
-        except Exception as e:
-            print(f"[RadioCalibration ERROR] Failed to update radio channels: {e}")
+        snapshot = self._capture.snapshot()
+        new_samples = snapshot["samples"] - self._last_snapshot_samples
+        if new_samples <= 0:
+            return
+        self._last_snapshot_samples = snapshot["samples"]
+        
+        values = snapshot["values"]
+        valid = ~np.isnan(values)
+        if np.count_nonzero(valid) < 4:
+            return
+        
+        current = np.array(self._radio_channels)
+        changed = np.flatnonzero(valid & (np.nan_to_num(values) != current))
+        for i in changed.tolist():
+            self._radio_channels[i] = int(values[i])
+            self.radioChannelChanged.emit(i, self._radio_channels[i])
+        
+        self._channel_states = snapshot["state"].tolist()
+        self._samples_collected += new_samples
+        if self._calibration_step == 1:
+            self._step1_samples += new_samples
+            # Step 1: extremes tracked by the capture engine (glitch-filtered)
+            seen = ~np.isnan(snapshot["min"])
+            for i in np.flatnonzero(seen).tolist():
+                self._step1_min[i] = min(self._step1_min[i], int(snapshot["min"][i]))
+                self._step1_max[i] = max(self._step1_max[i], int(snapshot["max"][i]))
+        elif self._calibration_step == 2:
+            self._step2_samples += new_samples
+        
+        if len(changed):
+            self.radioChannelsChanged.emit()
     
     def _complete_calibration(self):
         """Complete the calibration process"""
@@ -528,10 +498,15 @@ class RadioCalibrationModel(QObject):
             rc_params[f'RC{channel_num}_TRIM'] = self._channel_trim[i]
         
         # Send parameter set commands
+        # Echoes are journaled by DroneCommander's PARAM_VALUE listener
+        journal = get_parameter_journal()
         saved_count = 0
         for param_name, param_value in rc_params.items():
             if param_value > 0:  # Only set valid parameters
                 try:
+                    if journal:
+                        journal.expect(vehicle_key(connection.target_system), param_name, "radio_calibration")
+                    
                     # Send parameter set command
                     connection.mav.param_set_send(
                         connection.target_system,
@@ -636,6 +611,7 @@ class RadioCalibrationModel(QObject):
                 'min': min_val,
                 'max': max_val,
                 'trim': self._channel_trim[i],
+                'state': STATE_NAMES.get(self._channel_states[i], "moving"),
                 'active': self._radio_channels[i] > 900 and self._radio_channels[i] < 2200  # Active if reasonable PWM signal
             }
             channel_info.append(info)
@@ -649,6 +625,8 @@ class RadioCalibrationModel(QObject):
         if self._calibration_active:
             self.stopCalibration()
         
+        MAVLinkThread.remove_message_listener('RC_CHANNELS', self._capture.add_message)
+        
         # Stop all timers
         for timer in [self._update_timer, self._calibration_timer, self._step_timer]:
             if timer:
@@ -0,0 +1,126 @@
+"""
+RC channel capture for radio calibration.
+
+Every RC_CHANNELS message is written by the MAVLink reader thread into a
+preallocated (N x 18) NumPy ring. Running min/max are updated with one
+vectorized minimum/maximum per sample, taken over the median of the last
+three samples so a single glitched frame cannot widen the range. The GUI
+side only reads snapshots at its own rate.
+
+Stick states come from the recent window (default 10 samples, 200 ms at
+the 50 Hz requested during calibration):
+
+    still      per-channel standard deviation below STILL_US
+    at min/max still, and within EXTREME_MARGIN of the captured range end
+    centred    still, and away from both ends
+
+Trims are the mean of the still window rather than a single sample, which
+takes out receiver jitter.
+"""
+
+import threading
+import numpy as np
+
+RC_CHANNEL_COUNT = 18
+RC_NO_SIGNAL = 65535
+DEFAULT_CAPACITY = 512
+DEFAULT_WINDOW = 10
+STILL_US = 4.0                  # std dev below which a channel counts as held
+EXTREME_MARGIN = 0.05           # fraction of the range that counts as "at the end"
+
+STATE_MOVING = 0
+STATE_AT_MIN = 1
+STATE_AT_MAX = 2
+STATE_CENTRED = 3
+STATE_NAMES = {STATE_MOVING: "moving", STATE_AT_MIN: "min", STATE_AT_MAX: "max", STATE_CENTRED: "centred"}
+
+_CHANNEL_FIELDS = [f"chan{i}_raw" for i in range(1, RC_CHANNEL_COUNT + 1)]
+
+
+def channels_from_message(msg):
+    """RC_CHANNELS -> array of 18 PWM values, NaN where there is no signal"""
+    values = np.array([getattr(msg, field, 0) for field in _CHANNEL_FIELDS], dtype=np.float64)
+    values[(values <= 0) | (values == RC_NO_SIGNAL)] = np.nan
+    return values
+
+
+class RCCaptureEngine:
+    """Thread-safe ring of RC samples with running extremes"""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, window=DEFAULT_WINDOW):
+        self.capacity = capacity
+        self.window = window
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._ring = np.full((self.capacity, RC_CHANNEL_COUNT), np.nan)
+            self._head = 0
+            self._count = 0
+            self._min = np.full(RC_CHANNEL_COUNT, np.nan)
+            self._max = np.full(RC_CHANNEL_COUNT, np.nan)
+            self.sample_count = 0
+
+    def add(self, values):
+        """values: 18 PWM values (NaN for missing channels)"""
+        with self._lock:
+            self._ring[self._head] = values
+            self._head = (self._head + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+            self.sample_count += 1
+
+            recent = self._last(3)
+            if len(recent) == 3:
+                a, b, c = recent
+                filtered = np.maximum(np.minimum(a, b), np.minimum(np.maximum(a, b), c))
+            else:
+                filtered = recent[-1]
+            valid = ~np.isnan(filtered)
+            self._min[valid] = np.fmin(self._min[valid], filtered[valid])
+            self._max[valid] = np.fmax(self._max[valid], filtered[valid])
+
+    def add_message(self, msg):
+        self.add(channels_from_message(msg))
+
+    def _last(self, n):
+        """Most recent n rows in time order (caller holds the lock)"""
+        n = min(n, self._count)
+        idx = (self._head - n + np.arange(n)) % self.capacity
+        return self._ring[idx]
+
+    def snapshot(self):
+        """
+        Current values, min, max, trim estimate and per-channel state, all
+        as arrays of 18 (NaN where a channel has no signal).
+        """
+        with self._lock:
+            if self._count == 0:
+                empty = np.full(RC_CHANNEL_COUNT, np.nan)
+                return {"values": empty, "min": empty, "max": empty, "trim": empty,
+                        "state": np.zeros(RC_CHANNEL_COUNT, dtype=int), "samples": 0}
+            window = self._last(self.window)
+            channel_min = self._min.copy()
+            channel_max = self._max.copy()
+            samples = self.sample_count
+
+        # Channels that dropped out anywhere in the window come out NaN and are never still
+        current = window[-1]
+        mean = window.mean(axis=0)
+        with np.errstate(invalid="ignore"):
+            still = (len(window) == self.window) & (window.std(axis=0) < STILL_US)
+
+        span = np.maximum(channel_max - channel_min, 1.0)
+        margin = EXTREME_MARGIN * span
+        state = np.full(RC_CHANNEL_COUNT, STATE_MOVING)
+        at_min = still & (mean - channel_min <= margin)
+        at_max = still & (channel_max - mean <= margin)
+        state[still] = STATE_CENTRED
+        state[at_min] = STATE_AT_MIN
+        state[at_max] = STATE_AT_MAX
+        # A channel that has not moved yet is both "at min" and "at max"
+        state[at_min & at_max] = STATE_CENTRED
+
+        return {"values": current, "min": channel_min, "max": channel_max,
+                "trim": np.where(still, np.round(mean), np.nan),
+                "state": state, "samples": samples}
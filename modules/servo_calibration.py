@@ -1,7 +1,12 @@
 from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot, pyqtProperty, QTimer
 from pymavlink import mavutil
 import time
-import threading
+from modules.parameter_journal import get_parameter_journal, vehicle_key
+from modules.parameter_query import get_parameter_query
+from modules.servo_stream import ServoOutputStream
+
+SERVO_CHANGE_THRESHOLD_US = 5
+
 
 class ServoCalibrationModel(QObject):
     # Signals for QML UI updates
@@ -10,9 +15,11 @@ class ServoCalibrationModel(QObject):
     servoValueChanged = pyqtSignal(int, int)  # servo_num, value
     connectionStatusChanged = pyqtSignal(bool)
     errorOccurred = pyqtSignal(str)
-    realTimeServoUpdate = pyqtSignal(int, int)  # servo_num, current_pwm_value
+    servoFrameUpdate = pyqtSignal('QVariantList')  # [{servo, output, value, min, max}] per display frame
     servoConfigurationLoaded = pyqtSignal()  # Emitted when configuration is loaded
     servoParameterUpdated = pyqtSignal(int, str, 'QVariant')  # servo_num, param_type, value
+    _servoParametersFetched = pyqtSignal(object)  # {name: value}, from the parameter query thread
+    _motorFunctionsFetched = pyqtSignal(object)
     
     def __init__(self, drone_model=None):
         super().__init__()
@@ -73,9 +80,14 @@ class ServoCalibrationModel(QObject):
         self._status_timer.timeout.connect(self._update_connection_status)
         self._status_timer.start(1000)  # Check every second
         
-        # Real-time servo monitoring timer
-        self._servo_monitor_timer = QTimer()
-        self._servo_monitor_timer.timeout.connect(self._request_servo_outputs)
+        # Real-time servo outputs, decimated to one batched update per frame
+        self._last_frame_values = [0] * 16
+        self._servo_stream = ServoOutputStream(parent=self)
+        self._servo_stream.frameReady.connect(self._on_servo_frame)
+        
+        # Parameter reads complete off the GUI thread
+        self._servoParametersFetched.connect(self._apply_servo_parameters)
+        self._motorFunctionsFetched.connect(self._detect_motors_from_parameters)
         
         print("[ServoCalibration] Model initialized with real-time servo monitoring")
         
@@ -100,162 +112,105 @@ class ServoCalibrationModel(QObject):
     def _start_servo_monitoring(self):
         """Start real-time servo output monitoring"""
         if self._is_connected and self._drone_connection:
-            # Start monitoring servo outputs at 2Hz (reduced frequency)
-            self._servo_monitor_timer.start(500)  # Every 500ms
-            
-            # Start background thread for receiving servo output data
-            self._monitoring_active = True
-            threading.Thread(target=self._monitor_servo_outputs, daemon=True).start()
-            print("[ServoCalibration] Real-time servo monitoring started at 2Hz")
+            self._last_frame_values = [0] * 16
+            self._servo_stream.start(self._drone_connection)
+            print("[ServoCalibration] Real-time servo monitoring started")
     
     def _stop_servo_monitoring(self):
         """Stop real-time servo monitoring"""
-        self._monitoring_active = False
-        self._servo_monitor_timer.stop()
+        self._servo_stream.stop()
         print("[ServoCalibration] Real-time servo monitoring stopped")
     
-    def _request_servo_outputs(self):
-        """Request current servo output values from flight controller"""
-        if not self._is_connected or not self._drone_connection:
-            return
-            
-        try:
-            # Request SERVO_OUTPUT_RAW message for real-time servo positions
-            # Use a lower rate to prevent spam
-            self._drone_connection.mav.request_data_stream_send(
-                self._drone_connection.target_system,
-                self._drone_connection.target_component,
-                mavutil.mavlink.MAV_DATA_STREAM_RC_CHANNELS,
-                2,  # 2Hz rate (reduced from 10Hz)
-                1   # start streaming
-            )
-            
-        except Exception as e:
-            print(f"[ServoCalibration] Error requesting servo outputs: {e}")
-    
-    def _monitor_servo_outputs(self):
-     """Background thread to monitor real-time servo output values with motor mapping"""
-     last_values = [0] * 16
-    
-     while self._monitoring_active and self._is_connected and self._drone_connection:
-        try:
-            msg = self._drone_connection.recv_match(
-                type=['SERVO_OUTPUT_RAW', 'RC_CHANNELS'], 
-                blocking=True, 
-                timeout=1
-            )
-            
-            if msg:
-                servo_values = None
-                
-                if msg.get_type() == 'SERVO_OUTPUT_RAW':
-                    servo_values = [
-                        msg.servo1_raw, msg.servo2_raw, msg.servo3_raw, msg.servo4_raw,
-                        msg.servo5_raw, msg.servo6_raw, msg.servo7_raw, msg.servo8_raw,
-                        msg.servo9_raw, msg.servo10_raw, msg.servo11_raw, msg.servo12_raw,
-                        msg.servo13_raw, msg.servo14_raw, msg.servo15_raw, msg.servo16_raw
-                    ]
-                elif msg.get_type() == 'RC_CHANNELS':
-                    servo_values = [
-                        msg.chan1_raw, msg.chan2_raw, msg.chan3_raw, msg.chan4_raw,
-                        msg.chan5_raw, msg.chan6_raw, msg.chan7_raw, msg.chan8_raw,
-                        msg.chan9_raw, msg.chan10_raw, msg.chan11_raw, msg.chan12_raw,
-                        msg.chan13_raw, msg.chan14_raw, msg.chan15_raw, msg.chan16_raw
-                    ]
-                
-                if servo_values:
-                    for i, value in enumerate(servo_values):
-                        if i < 16 and value > 0:
-                            physical_output = i + 1  # Physical servo number (1-16)
-                            
-                            # Only process if value changed significantly
-                            if abs(value - last_values[i]) > 5:
-                                self._real_servo_values[i] = value
-                                last_values[i] = value
-                                
-                                # Check if this is a detected motor
-                                if physical_output in self._motor_display_mapping:
-                                    # This is a motor - map to sequential display number
-                                    display_number = self._motor_display_mapping[physical_output]
-                                    self.realTimeServoUpdate.emit(display_number, value)
-                                    
-                                    # Log only significant changes
-                                    if abs(value - 1500) > 50:
-                                        print(f"[ServoCalibration] Motor {display_number} (physical output {physical_output}): {value}us")
-                                
-                                # For non-motor servos, show with original numbering but offset after motors
-                                elif value > 800 and value < 2200 and abs(value - 1500) > 50:
-                                    # Show other active servos after the motors
-                                    display_number = self._motor_count + physical_output
-                                    self.realTimeServoUpdate.emit(display_number, value)
-                                    
-                                    print(f"[ServoCalibration] Servo {display_number} (physical output {physical_output}): {value}us")
-                            
-        except Exception as e:
-            if self._monitoring_active:
-                print(f"[ServoCalibration] Monitoring error: {e}")
-                time.sleep(0.5)
- 
-    
+    def _on_servo_frame(self, frame):
+        """One decimated frame from the servo stream -> one batched update for QML"""
+        updates = []
+        for i, value in enumerate(frame["last"]):
+            if value <= 0:
+                continue
+            physical_output = i + 1
+            low, high = frame["min"][i], frame["max"][i]
+            # Skip outputs that neither moved since the last frame nor spiked within it
+            if abs(value - self._last_frame_values[i]) <= SERVO_CHANGE_THRESHOLD_US and high - low <= SERVO_CHANGE_THRESHOLD_US:
+                continue
+            self._real_servo_values[i] = value
+            self._last_frame_values[i] = value
+
+            if physical_output in self._motor_display_mapping:
+                display_number = self._motor_display_mapping[physical_output]
+            elif 800 < value < 2200 and abs(value - 1500) > 50:
+                # Show other active servos after the motors
+                display_number = self._motor_count + physical_output
+            else:
+                continue
+            updates.append({"servo": display_number, "output": physical_output,
+                            "value": value, "min": low, "max": high})
+
+        if updates:
+            self.servoFrameUpdate.emit(updates)
+
+    @pyqtSlot(int, float, int, result='QVariantMap')
+    def getServoHistory(self, servo_num, seconds, points):
+        """Min/max history of one physical output for plotting during bench tests"""
+        return self._servo_stream.history([servo_num], seconds, points)
+
+    @pyqtProperty(QObject, constant=True)
+    def servoStream(self):
+        return self._servo_stream
+
     def _receive_parameters(self):
-        """Receive and process parameter values"""
-        timeout = time.time() + 15  # 15 second timeout for more parameters
+        """Fetch FRAME_TYPE and the SERVOn_* parameters; applied on the GUI thread when they arrive"""
+        names = ['FRAME_TYPE'] + [template.format(i) for i in range(1, 17) for template in self._param_names.values()]
+        future = get_parameter_query().fetch(self._drone_connection, names)
+        future.add_done_callback(lambda f: self._servoParametersFetched.emit(f.result()))
+
+    def _apply_servo_parameters(self, values):
+        """Process fetched parameter values"""
         received_params = set()
-        frame_type = None
         
-        while time.time() < timeout and self._drone_connection:
-            try:
-                msg = self._drone_connection.recv_match(type='PARAM_VALUE', blocking=True, timeout=1)
-                if msg:
-                    param_name = msg.param_id.decode('utf-8').rstrip('\x00')
-                    param_value = msg.param_value
+        for param_name, param_value in values.items():
+            # Parse servo parameters
+            if param_name.startswith('SERVO') and '_' in param_name:
+                try:
+                    parts = param_name.split('_')
+                    servo_num = int(parts[0][5:])  # Extract number from SERVO1, SERVO2, etc.
+                    param_type = parts[1]
                     
-                    # Detect frame type for automatic configuration
-                    if param_name == 'FRAME_TYPE':
-                        frame_type = int(param_value)
-                        print(f"[ServoCalibration] Detected frame type: {frame_type}")
-                        self._configure_for_frame_type(frame_type)
-                    
-                    # Parse servo parameters
-                    if param_name.startswith('SERVO') and '_' in param_name:
-                        try:
-                            parts = param_name.split('_')
-                            servo_num = int(parts[0][5:])  # Extract number from SERVO1, SERVO2, etc.
-                            param_type = parts[1]
-                            
-                            if 1 <= servo_num <= 16:
-                                index = servo_num - 1
-                                
-                                if param_type == 'FUNCTION':
-                                    func_name = self._function_map.get(int(param_value), f"Unknown({int(param_value)})")
-                                    self._servo_functions[index] = func_name
-                                    print(f"[ServoCalibration] Servo {servo_num} function: {func_name}")
-                                elif param_type == 'MIN':
-                                    self._servo_min[index] = int(param_value)
-                                elif param_type == 'MAX':
-                                    self._servo_max[index] = int(param_value)
-                                elif param_type == 'TRIM':
-                                    self._servo_trim[index] = int(param_value)
-                                    # Don't set position to trim, let real-time monitoring handle it
-                                elif param_type == 'REVERSED':
-                                    self._servo_reversed[index] = bool(int(param_value))
-                                
-                                received_params.add(param_name)
-                                
-                        except (ValueError, IndexError) as e:
-                            print(f"[ServoCalibration] Error parsing parameter {param_name}: {e}")
-                            
-            except Exception as e:
-                print(f"[ServoCalibration] Parameter reception error: {e}")
-                break
+                    if 1 <= servo_num <= 16:
+                        index = servo_num - 1
+                        
+                        if param_type == 'FUNCTION':
+                            func_name = self._function_map.get(int(param_value), f"Unknown({int(param_value)})")
+                            self._servo_functions[index] = func_name
+                            print(f"[ServoCalibration] Servo {servo_num} function: {func_name}")
+                        elif param_type == 'MIN':
+                            self._servo_min[index] = int(param_value)
+                        elif param_type == 'MAX':
+                            self._servo_max[index] = int(param_value)
+                        elif param_type == 'TRIM':
+                            self._servo_trim[index] = int(param_value)
+                            # Don't set position to trim, let real-time monitoring handle it
+                        elif param_type == 'REVERSED':
+                            self._servo_reversed[index] = bool(int(param_value))
+                        
+                        received_params.add(param_name)
+                        
+                except (ValueError, IndexError) as e:
+                    print(f"[ServoCalibration] Error parsing parameter {param_name}: {e}")
         
         print(f"[ServoCalibration] Loaded {len(received_params)} servo parameters")
         
+        # Detect frame type for automatic configuration
+        if 'FRAME_TYPE' in values:
+            frame_type = int(values['FRAME_TYPE'])
+            print(f"[ServoCalibration] Detected frame type: {frame_type}")
+            self._configure_for_frame_type(frame_type)
+        
         # After loading parameters, request initial servo values
         self._request_initial_servo_values()
         
         # Emit configuration loaded signal
         self.servoConfigurationLoaded.emit()
+
     def _configure_for_frame_type(self, frame_type):
      """Configure default servo functions based on frame type and detect motors"""
     # Reset detection
@@ -291,53 +246,25 @@ class ServoCalibrationModel(QObject):
      self._detection_complete = False
      self._detected_motors = []
     
-    # Request motor/servo function parameters to identify motors
-     for i in range(1, 17):  # Check all 16 possible outputs
-        param_name = f"SERVO{i}_FUNCTION"
-        self._drone_connection.mav.param_request_read_send(
-            self._drone_connection.target_system,
-            self._drone_connection.target_component,
-            param_name.encode('utf-8'),
-            -1
-        )
-    
-    # Start detection monitoring thread
-     threading.Thread(target=self._detect_motors_from_parameters, daemon=True).start()
-
+    # Read the SERVOn_FUNCTION parameters (usually already in the parameter store)
+     names = [self._param_names['function'].format(i) for i in range(1, 17)]
+     future = get_parameter_query().fetch(self._drone_connection, names)
+     future.add_done_callback(lambda f: self._motorFunctionsFetched.emit(f.result()))
 
-    def _detect_motors_from_parameters(self):
-     """Detect which outputs are configured as motors by reading SERVO_FUNCTION parameters"""
-     timeout = time.time() + 10  # 10 second timeout
+    def _detect_motors_from_parameters(self, values):
+     """Detect which outputs are configured as motors from the SERVOn_FUNCTION values"""
      motor_functions = set(range(33, 41))  # Motor functions 33-40 (Motor1-Motor8)
      detected_outputs = {}
     
-     while time.time() < timeout and not self._detection_complete:
-        try:
-            msg = self._drone_connection.recv_match(type='PARAM_VALUE', blocking=True, timeout=1)
-            if msg:
-                param_name = msg.param_id
-                if isinstance(param_name, bytes):
-                    param_name = param_name.decode('utf-8').rstrip('\x00')
-                elif isinstance(param_name, str):
-                    param_name = param_name.rstrip('\x00')
-                
-                # Check if this is a servo function parameter
-                if param_name.startswith('SERVO') and param_name.endswith('_FUNCTION'):
-                    try:
-                        servo_num = int(param_name.split('_')[0][5:])  # Extract number from SERVO1_FUNCTION
-                        function_value = int(msg.param_value)
-                        
-                        # Check if this output is configured as a motor
-                        if function_value in motor_functions:
-                            detected_outputs[servo_num] = function_value
-                            print(f"[ServoCalibration] Detected motor on output {servo_num} (function {function_value})")
-                    
-                    except (ValueError, IndexError):
-                        continue
+     for servo_num in range(1, 17):
+        function_value = values.get(self._param_names['function'].format(servo_num))
+        if function_value is None:
+            continue
         
-        except Exception as e:
-            print(f"[ServoCalibration] Motor detection error: {e}")
-            break
+        # Check if this output is configured as a motor
+        if int(function_value) in motor_functions:
+            detected_outputs[servo_num] = int(function_value)
+            print(f"[ServoCalibration] Detected motor on output {servo_num} (function {int(function_value)})")
     
     # Process detected motors and create sequential mapping
      self._detected_motors = sorted(detected_outputs.keys())
@@ -505,6 +432,10 @@ class ServoCalibrationModel(QObject):
                 if received_param == param_name_str:
                     if abs(msg.param_value - param_value) < 0.01:
                         print(f"[ServoCalibration] Parameter {param_name_str} set successfully to {param_value}")
+                        journal = get_parameter_journal()
+                        if journal:
+                            journal.record_change(vehicle_key(self._drone_connection.target_system), param_name_str,
+                                                  None, msg.param_value, "FLOAT", "servo_calibration")
                         return True
                     else:
                         print(f"[ServoCalibration] Parameter {param_name_str} set but value mismatch: expected {param_value}, got {msg.param_value}")
@@ -613,4 +544,5 @@ class ServoCalibrationModel(QObject):
         """Clean up resources"""
         print("[ServoCalibration] Cleaning up servo calibration model...")
         self._stop_servo_monitoring()
+        self._servo_stream.cleanup()
         self._status_timer.stop()
\ No newline at end of file
@@ -0,0 +1,182 @@
+"""
+Real-time servo/motor output stream.
+
+SERVO_OUTPUT_RAW is pushed by the MAVLink reader thread into a columnar
+ring (a timestamp column plus one PWM column per output). A GUI-thread
+timer takes whatever arrived since the previous frame and reduces it per
+output to min/max/last, so a burst of messages becomes one batched update
+per frame and a short spike is never lost to decimation.
+
+history() returns the last few seconds bucketed the same way (min/max per
+bucket) for plotting motor outputs during bench tests.
+"""
+
+import time
+import threading
+import numpy as np
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal, pyqtSlot
+from pymavlink import mavutil
+
+from modules.mavlink_thread import MAVLinkThread
+from modules.link_quality import get_link_quality
+
+SERVO_OUTPUT_COUNT = 16
+DEFAULT_CAPACITY = 4096         # ~80 s at 50 Hz
+FRAME_INTERVAL_MS = 33          # ~30 frames per second
+STREAM_RATE_HZ = 25
+
+_SERVO_FIELDS = [f"servo{i}_raw" for i in range(1, SERVO_OUTPUT_COUNT + 1)]
+
+
+class ServoOutputRing:
+    """Columnar ring of PWM samples; written by one thread, read by another"""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._time = np.zeros(capacity)
+        self._pwm = np.zeros((capacity, SERVO_OUTPUT_COUNT), dtype=np.uint16)
+        self._written = 0           # total rows ever written
+
+    def append(self, timestamp, values):
+        with self._lock:
+            row = self._written % self.capacity
+            self._time[row] = timestamp
+            self._pwm[row] = values
+            self._written += 1
+
+    @property
+    def written(self):
+        return self._written
+
+    def since(self, start):
+        """Rows written after total count start (oldest first), clipped to the ring"""
+        with self._lock:
+            end = self._written
+            start = max(start, end - self.capacity)
+            rows = np.arange(start, end) % self.capacity
+            return end, self._time[rows], self._pwm[rows].astype(np.int32)
+
+    def window(self, seconds):
+        """Rows from the last seconds of data"""
+        _, times, pwm = self.since(0)
+        if not len(times):
+            return times, pwm
+        keep = times >= times[-1] - seconds
+        return times[keep], pwm[keep]
+
+
+def decimate(times, pwm, buckets):
+    """
+    Min/max per output over equal time buckets.
+    Returns (bucket start times, min (B x 16), max (B x 16)); empty buckets dropped.
+    """
+    if not len(times):
+        empty = np.zeros((0, SERVO_OUTPUT_COUNT), dtype=np.int32)
+        return np.zeros(0), empty, empty
+    t0, t1 = times[0], times[-1]
+    width = max((t1 - t0) / buckets, 1e-9)
+    index = np.minimum(((times - t0) / width).astype(int), buckets - 1)
+    starts = np.flatnonzero(np.r_[True, index[1:] != index[:-1]])
+    return (t0 + index[starts] * width,
+            np.minimum.reduceat(pwm, starts, axis=0),
+            np.maximum.reduceat(pwm, starts, axis=0))
+
+
+class ServoOutputStream(QObject):
+    """
+    Streams SERVO_OUTPUT_RAW into a ServoOutputRing and emits one frame per
+    FRAME_INTERVAL_MS: {"last", "min", "max"} lists of 16 PWM values, with
+    min/max covering every sample since the previous frame.
+    """
+
+    frameReady = pyqtSignal('QVariantMap')
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, parent=None):
+        super().__init__(parent)
+        self._ring = ServoOutputRing(capacity)
+        self._frame_start = 0
+        self._active = False
+        self._connection = None
+
+        self._frame_timer = QTimer(self)
+        self._frame_timer.setInterval(FRAME_INTERVAL_MS)
+        self._frame_timer.timeout.connect(self._emit_frame)
+
+    @property
+    def ring(self):
+        return self._ring
+
+    def start(self, connection=None):
+        if not self._active:
+            MAVLinkThread.add_message_listener('SERVO_OUTPUT_RAW', self._on_servo_output)
+            self._active = True
+        self._connection = connection
+        rate = get_link_quality().scale_rate(STREAM_RATE_HZ)
+        self._request_rate(rate)
+        self._frame_start = self._ring.written
+        self._frame_timer.start()
+        print(f"[ServoStream] Streaming servo outputs at {rate:.0f} Hz, "
+              f"{1000 // FRAME_INTERVAL_MS} frames/s")
+
+    def stop(self):
+        if self._active:
+            MAVLinkThread.remove_message_listener('SERVO_OUTPUT_RAW', self._on_servo_output)
+            self._active = False
+        self._frame_timer.stop()
+        self._connection = None
+
+    def _request_rate(self, rate_hz):
+        connection = self._connection
+        if not connection:
+            return
+        try:
+            connection.mav.command_long_send(
+                connection.target_system,
+                connection.target_component,
+                mavutil.mavlink.MAV_CMD_SET_MESSAGE_INTERVAL,
+                0,
+                mavutil.mavlink.MAVLINK_MSG_ID_SERVO_OUTPUT_RAW,
+                int(1e6 / rate_hz),
+                0, 0, 0, 0, 0
+            )
+        except Exception as e:
+            print(f"[ServoStream] Could not set SERVO_OUTPUT_RAW rate: {e}")
+
+    def _on_servo_output(self, msg):
+        """MAVLink reader thread"""
+        if getattr(msg, 'port', 0):
+            return      # MAVLink1 port 1 repeats outputs 9-16 in the 1-8 fields
+        self._ring.append(time.time(), [getattr(msg, field, 0) or 0 for field in _SERVO_FIELDS])
+
+    def _emit_frame(self):
+        end, _, pwm = self._ring.since(self._frame_start)
+        if not len(pwm):
+            return
+        self._frame_start = end
+        self.frameReady.emit({
+            "last": pwm[-1].tolist(),
+            "min": pwm.min(axis=0).tolist(),
+            "max": pwm.max(axis=0).tolist(),
+            "samples": int(len(pwm)),
+        })
+
+    @pyqtSlot('QVariantList', float, int, result='QVariantMap')
+    def history(self, outputs, seconds, points):
+        """
+        Min/max history of the given 1-based outputs over the last seconds,
+        in at most points buckets: {"t": [s relative to now], "min": {n: [...]}, "max": {n: [...]}}
+        """
+        times, pwm = self._ring.window(seconds)
+        starts, low, high = decimate(times, pwm, max(int(points), 1))
+        now = time.time()
+        columns = [int(n) - 1 for n in outputs if 1 <= int(n) <= SERVO_OUTPUT_COUNT]
+        return {
+            "t": (starts - now).tolist(),
+            "min": {str(c + 1): low[:, c].tolist() for c in columns},
+            "max": {str(c + 1): high[:, c].tolist() for c in columns},
+        }
+
+    def cleanup(self):
+        self.stop()
+        print("[ServoStream] Cleanup completed")
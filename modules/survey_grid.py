@@ -0,0 +1,288 @@
+"""
+Survey (lawnmower) grid generator.
+
+Turns a polygon into parallel survey lines and an ordered waypoint list for
+uploadMission. The polygon is projected to a local metric plane and rotated
+so the survey lines run along the x axis. Every scan line is then
+intersected with every polygon edge in one broadcast (lines x edges), and
+the sorted crossings are paired even-odd into segments, so concave outlines
+come out correctly.
+
+Segments are flown boustrophedon: each line is flown opposite to the one
+before it, so every turn is a short hop to the adjacent line instead of a
+transit back across the area. Of the four possible entry corners, the one
+nearest the vehicle is chosen. The ordered path can then be split into
+sorties that each fit the battery endurance, including the transit from
+and back to home.
+"""
+
+import math
+import numpy as np
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot, pyqtProperty
+
+EARTH_RADIUS_M = 6371000.0
+DEFAULT_TRANSIT_SPEED = 10.0
+MIN_LINE_SPACING = 0.5
+
+
+class SurveyError(ValueError):
+    """Raised for polygons or settings a grid cannot be built from"""
+
+
+class _LocalFrame:
+    """Equirectangular projection around a reference point (fine for survey-sized areas)"""
+
+    def __init__(self, lat0, lon0):
+        self.lat0 = lat0
+        self.lon0 = lon0
+        self._k_lat = math.radians(1.0) * EARTH_RADIUS_M
+        self._k_lon = self._k_lat * math.cos(math.radians(lat0))
+
+    def to_local(self, lat, lon):
+        return ((np.asarray(lon, dtype=np.float64) - self.lon0) * self._k_lon,
+                (np.asarray(lat, dtype=np.float64) - self.lat0) * self._k_lat)
+
+    def to_geo(self, east, north):
+        return (self.lat0 + np.asarray(north) / self._k_lat,
+                self.lon0 + np.asarray(east) / self._k_lon)
+
+
+def _rotation(heading_deg):
+    """
+    Matrix that maps east/north into a frame whose +x axis points along
+    heading (degrees clockwise from north).
+    """
+    h = math.radians(heading_deg)
+    # Unit vector of the heading in east/north, and its left normal
+    ux, uy = math.sin(h), math.cos(h)
+    return np.array([[ux, uy], [-uy, ux]])
+
+
+def scan_segments(x, y, spacing):
+    """
+    Intersect horizontal scan lines with the closed polygon (x, y).
+    Returns (line_index, y_line, x_start, x_end) arrays, one row per segment,
+    sorted by line then x.
+    """
+    x1, y1 = x, y
+    x2, y2 = np.roll(x, -1), np.roll(y, -1)
+
+    y_min, y_max = y.min(), y.max()
+    count = int(math.floor((y_max - y_min) / spacing))
+    # Centre the lines in the polygon's extent
+    offset = ((y_max - y_min) - count * spacing) / 2.0
+    lines = y_min + offset + spacing * np.arange(count + 1)
+
+    Y = lines[:, None]
+    crosses = (y1[None, :] <= Y) != (y2[None, :] <= Y)
+    dy = np.where(y2 - y1 == 0, 1.0, y2 - y1)
+    xs = x1[None, :] + (Y - y1[None, :]) * ((x2 - x1) / dy)[None, :]
+    xs = np.where(crosses, xs, np.inf)
+    xs.sort(axis=1)
+
+    hits = crosses.sum(axis=1)
+    pairs = hits // 2
+    max_pairs = int(pairs.max()) if len(pairs) else 0
+    if max_pairs == 0:
+        empty = np.zeros(0)
+        return empty.astype(int), empty, empty, empty
+
+    k = np.arange(max_pairs)
+    valid = k[None, :] < pairs[:, None]
+    starts = xs[:, 0:2 * max_pairs:2]
+    ends = xs[:, 1:2 * max_pairs:2]
+    line_index = np.broadcast_to(np.arange(len(lines))[:, None], valid.shape)
+
+    seg_line = line_index[valid]
+    keep = ends[valid] - starts[valid] > 1e-6
+    return (seg_line[keep], lines[seg_line[keep]],
+            starts[valid][keep], ends[valid][keep])
+
+
+def order_segments(seg_line, y_line, x_start, x_end, entry=None):
+    """
+    Boustrophedon order: segments sorted by line, direction alternating.
+    entry (x, y) in the rotated frame picks the nearest of the four corners.
+    Returns an (N, 2) array of path points, two per segment.
+    """
+    n = len(seg_line)
+    if n == 0:
+        return np.zeros((0, 2))
+
+    # Rank of each segment's line in flying order decides its direction
+    _, rank = np.unique(seg_line, return_inverse=True)
+    candidates = []
+    for reverse_lines in (False, True):
+        line_rank = rank.max() - rank if reverse_lines else rank
+        for first_reversed in (False, True):
+            flip = (line_rank % 2 == 1) != first_reversed
+            # Segments sharing a (concave) line are flown in that line's direction
+            order = np.lexsort((np.where(flip, -x_start, x_start), line_rank))
+            f = flip[order]
+            path = np.empty((2 * n, 2))
+            path[0::2, 0] = np.where(f, x_end[order], x_start[order])
+            path[1::2, 0] = np.where(f, x_start[order], x_end[order])
+            path[0::2, 1] = y_line[order]
+            path[1::2, 1] = y_line[order]
+            candidates.append(path)
+
+    if entry is None:
+        return candidates[0]
+    ex, ey = entry
+    return min(candidates, key=lambda p: math.hypot(p[0, 0] - ex, p[0, 1] - ey))
+
+
+def split_by_endurance(path, home, speed, endurance_s, reserve=0.2):
+    """
+    Split an ordered path (N, 2) into sorties that each fit endurance_s
+    (minus reserve) at speed, counting transit from and back to home.
+    Segments (point pairs) are never split. Returns a list of index arrays.
+    """
+    n = len(path)
+    if n == 0 or not endurance_s or endurance_s <= 0:
+        return [np.arange(n)]
+
+    budget = endurance_s * (1.0 - reserve) * speed   # metres per sortie
+    hx, hy = home
+    step = np.hypot(np.diff(path[:, 0]), np.diff(path[:, 1]))
+    cumulative = np.concatenate(([0.0], np.cumsum(step)))
+    to_home = np.hypot(path[:, 0] - hx, path[:, 1] - hy)
+
+    sorties = []
+    start = 0
+    while start < n:
+        # Flying start..end costs out + path + back; the path part is a cumulative difference
+        ends = np.arange(start + 1, n, 2)
+        cost = to_home[start] + (cumulative[ends] - cumulative[start]) + to_home[ends]
+        fits = ends[cost <= budget]
+        if len(fits) == 0:
+            raise SurveyError(f"Survey line {start // 2 + 1} cannot be flown within the battery endurance")
+        end = int(fits[-1])
+        sorties.append(np.arange(start, end + 1))
+        start = end + 1
+    return sorties
+
+
+def generate_survey(polygon, spacing, heading=0.0, overlap=0.0, altitude=30.0,
+                    entry=None, speed=DEFAULT_TRANSIT_SPEED, endurance_s=0.0,
+                    reserve=0.2):
+    """
+    Build survey sorties for a polygon of (lat, lon) vertices.
+
+    spacing is the sensor swath width in metres and overlap the side overlap
+    (0-1, or a percentage); the distance between lines is spacing x (1 - overlap).
+    entry is an optional (lat, lon) for the vehicle/home position: the grid
+    starts at the corner nearest to it and endurance splits count transit
+    from there. Returns a dict with sorties (lists of {x, y, z} waypoints in
+    the uploadMission layout), line count and path length.
+    """
+    if len(polygon) < 3:
+        raise SurveyError("A survey polygon needs at least three vertices")
+    if overlap > 1.0:
+        overlap /= 100.0
+    if not 0.0 <= overlap < 1.0:
+        raise SurveyError("Overlap must be between 0 and 100%")
+    line_spacing = spacing * (1.0 - overlap)
+    if line_spacing < MIN_LINE_SPACING:
+        raise SurveyError(f"Line spacing {line_spacing:.2f} m is too small")
+
+    lat = np.array([p[0] for p in polygon], dtype=np.float64)
+    lon = np.array([p[1] for p in polygon], dtype=np.float64)
+    frame = _LocalFrame(lat.mean(), lon.mean())
+    east, north = frame.to_local(lat, lon)
+
+    rot = _rotation(heading)
+    x, y = rot @ np.vstack((east, north))
+
+    seg_line, y_line, x_start, x_end = scan_segments(x, y, line_spacing)
+    if len(seg_line) == 0:
+        raise SurveyError("Polygon is narrower than one line spacing")
+
+    entry_local = None
+    if entry is not None:
+        ee, en = frame.to_local(entry[0], entry[1])
+        entry_local = tuple(rot @ np.array([float(ee), float(en)]))
+
+    path = order_segments(seg_line, y_line, x_start, x_end, entry_local)
+    length = float(np.hypot(np.diff(path[:, 0]), np.diff(path[:, 1])).sum())
+
+    home = entry_local if entry_local is not None else tuple(path[0])
+    sorties_idx = split_by_endurance(path, home, speed, endurance_s, reserve)
+
+    # Back to east/north (rotation is orthonormal) and then to lat/lon
+    en = rot.T @ path.T
+    wp_lat, wp_lon = frame.to_geo(en[0], en[1])
+
+    sorties = [[{'x': float(wp_lat[i]), 'y': float(wp_lon[i]), 'z': float(altitude)} for i in idx]
+               for idx in sorties_idx]
+    return {
+        "sorties": sorties,
+        "lines": int(len(np.unique(seg_line))),
+        "segments": int(len(seg_line)),
+        "lineSpacing": line_spacing,
+        "length": length,
+        "waypoints": int(len(path)),
+    }
+
+
+class SurveyPlanner(QObject):
+    """
+    QML front end for the grid generator. generate() keeps the last result
+    so each sortie can be handed to DroneCommander.uploadMission in turn.
+    """
+
+    surveyGenerated = pyqtSignal('QVariant')
+    surveyError = pyqtSignal(str)
+
+    def __init__(self, drone_commander):
+        super().__init__()
+        self.drone_commander = drone_commander
+        self._result = None
+
+    @pyqtProperty(int, notify=surveyGenerated)
+    def sortieCount(self):
+        return len(self._result["sorties"]) if self._result else 0
+
+    @pyqtSlot('QVariantList', float, float, float, float, 'QVariantMap', result='QVariant')
+    def generate(self, polygon, spacing, heading, overlap, altitude, options):
+        """
+        polygon: list of {lat, lng} (e.g. markers from the map).
+        options: entryNearVehicle (bool), speed (m/s), enduranceMinutes, reserve (0-1).
+        """
+        try:
+            vertices = [(float(p.get('lat', p.get('x', 0))), float(p.get('lng', p.get('lon', p.get('y', 0)))))
+                        for p in polygon]
+            entry = None
+            if options.get('entryNearVehicle', True):
+                telemetry = self.drone_commander.drone_model.telemetry
+                if telemetry.get('lat') and telemetry.get('lon'):
+                    entry = (telemetry['lat'], telemetry['lon'])
+
+            self._result = generate_survey(
+                vertices, spacing, heading, overlap, altitude,
+                entry=entry,
+                speed=float(options.get('speed', DEFAULT_TRANSIT_SPEED)),
+                endurance_s=float(options.get('enduranceMinutes', 0)) * 60.0,
+                reserve=float(options.get('reserve', 0.2)))
+        except Exception as e:
+            self._result = None
+            message = f"Survey generation failed: {e}"
+            print(f"[SurveyPlanner] ❌ {message}")
+            self.surveyError.emit(message)
+            return None
+
+        print(f"[SurveyPlanner] ✅ {self._result['lines']} lines, {self._result['waypoints']} waypoints, "
+              f"{self._result['length']:.0f} m in {len(self._result['sorties'])} sortie(s)")
+        self.surveyGenerated.emit(self._result)
+        return self._result
+
+    @pyqtSlot(int, result=bool)
+    def uploadSortie(self, index):
+        if not self._result or not 0 <= index < len(self._result["sorties"]):
+            self.surveyError.emit("No survey sortie to upload")
+            return False
+        return self.drone_commander.uploadMission(self._result["sorties"][index])
+
+    def cleanup(self):
+        self._result = None
+        print("[SurveyPlanner] Cleanup completed")
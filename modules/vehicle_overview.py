@@ -0,0 +1,97 @@
+"""
+vehicleOverview: the flat set of vehicle health values the monitor widgets
+(VibrationMonitor.qml, EKFMonitor.qml, StatusPanel.qml) bind to.
+
+It holds no logic of its own. The services that decode the underlying
+messages push their already rate-limited results in here, and each group
+of values has its own notify signal so a vibration update does not
+re-evaluate every other binding.
+"""
+
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtProperty
+
+
+class VehicleOverview(QObject):
+    vibrationChanged = pyqtSignal()
+    ekfChanged = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._vibration = [0.0, 0.0, 0.0]
+        self._clipping = [0, 0, 0]
+        self._ekf_variances = [0.0] * 5
+        self._ekf_flags = 0
+
+    def update_vibration(self, levels, clipping):
+        levels = [round(float(v), 2) for v in levels]
+        clipping = [int(c) for c in clipping]
+        if levels != self._vibration or clipping != self._clipping:
+            self._vibration = levels
+            self._clipping = clipping
+            self.vibrationChanged.emit()
+
+    @pyqtProperty(float, notify=vibrationChanged)
+    def vibration_x(self):
+        return self._vibration[0]
+
+    @pyqtProperty(float, notify=vibrationChanged)
+    def vibration_y(self):
+        return self._vibration[1]
+
+    @pyqtProperty(float, notify=vibrationChanged)
+    def vibration_z(self):
+        return self._vibration[2]
+
+    @pyqtProperty(float, notify=vibrationChanged)
+    def vibration(self):
+        """Worst axis, m/s/s"""
+        return max(self._vibration)
+
+    @pyqtProperty(int, notify=vibrationChanged)
+    def clipping_0(self):
+        return self._clipping[0]
+
+    @pyqtProperty(int, notify=vibrationChanged)
+    def clipping_1(self):
+        return self._clipping[1]
+
+    @pyqtProperty(int, notify=vibrationChanged)
+    def clipping_2(self):
+        return self._clipping[2]
+
+    def update_ekf(self, variances, flags):
+        """variances: velocity, pos horiz, pos vert, compass, terrain alt"""
+        variances = [round(float(v), 3) for v in variances]
+        if variances != self._ekf_variances or flags != self._ekf_flags:
+            self._ekf_variances = variances
+            self._ekf_flags = int(flags)
+            self.ekfChanged.emit()
+
+    @pyqtProperty(float, notify=ekfChanged)
+    def ekf_velocity_variance(self):
+        return self._ekf_variances[0]
+
+    @pyqtProperty(float, notify=ekfChanged)
+    def ekf_pos_horiz_variance(self):
+        return self._ekf_variances[1]
+
+    @pyqtProperty(float, notify=ekfChanged)
+    def ekf_pos_vert_variance(self):
+        return self._ekf_variances[2]
+
+    @pyqtProperty(float, notify=ekfChanged)
+    def ekf_compass_variance(self):
+        return self._ekf_variances[3]
+
+    @pyqtProperty(float, notify=ekfChanged)
+    def ekf_terrain_alt_variance(self):
+        return self._ekf_variances[4]
+
+    @pyqtProperty(float, notify=ekfChanged)
+    def ekf(self):
+        """Worst of the five variances"""
+        return max(self._ekf_variances)
+
+    @pyqtProperty(int, notify=ekfChanged)
+    def ekf_flags(self):
+        return self._ekf_flags
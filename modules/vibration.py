@@ -0,0 +1,327 @@
+"""
+Vibration monitoring and accelerometer spectrum analysis.
+
+VIBRATION (per-axis vibration levels and the three clipping counters) is
+always consumed and published to vehicleOverview at a low fixed rate.
+
+On request, RAW_IMU is streamed at a high rate into a ring buffer and a
+worker thread runs a Hann-windowed NumPy FFT over the latest block every
+second. Sample spacing comes from the vehicle's time_usec, not arrival
+time, so link jitter does not smear the spectrum. The strongest peaks give
+the dominant frequencies, and the harmonic structure between them gives a
+starting point for the harmonic notch (INS_HNTCH_*). The suggestion is only
+meaningful when the spectrum was captured in a hover: INS_HNTCH_FREQ is
+the hover frequency and INS_HNTCH_REF should be the hover throttle.
+
+The usable range is limited to half the rate the link actually delivers.
+A peak near that limit is probably aliased, and it is flagged instead of
+being trusted.
+"""
+
+import time
+import threading
+import numpy as np
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal, pyqtSlot, pyqtProperty
+from pymavlink import mavutil
+
+from modules.mavlink_thread import MAVLinkThread
+
+UPDATE_INTERVAL_MS = 500
+SPECTRUM_RATE_HZ = 200          # requested RAW_IMU rate; what arrives depends on the link
+FFT_SIZE = 512
+RING_SIZE = 4096
+ANALYSIS_INTERVAL = 1.0         # seconds between FFTs in the worker
+MIN_FREQUENCY_HZ = 5.0
+PEAK_COUNT = 4
+PEAK_SNR = 8.0                  # peak power over the median of the band
+HARMONIC_MIN_RATIO = 0.25       # sub-harmonic strength, relative to the strongest peak
+ALIAS_FRACTION = 0.4            # peaks above this fraction of the sample rate are suspect
+SPECTRUM_POINTS = 128           # points sent to QML for plotting
+
+VIBRATION_WARN = 30.0           # m/s/s, ArduPilot guidance
+VIBRATION_FAIL = 60.0
+WARNING_INTERVAL = 10.0
+
+MG_TO_MS2 = 9.80665 / 1000.0
+
+
+def analyse_spectrum(times_us, accel, min_frequency=MIN_FREQUENCY_HZ, peak_count=PEAK_COUNT):
+    """
+    times_us: (N,) vehicle timestamps, accel: (N x 3) m/s/s.
+    Returns None when the block is too short or has gaps, otherwise
+    {sampleRate, resolution, peaks: [{frequency, amplitude, axis}], frequencies, amplitude}.
+    """
+    n = len(times_us)
+    if n < 64:
+        return None
+    dt = np.diff(times_us.astype(np.float64)) * 1e-6
+    step = float(np.median(dt))
+    if step <= 0 or dt.max() > 3.0 * step or dt.min() <= 0:
+        return None     # dropped samples or a reset clock: not uniformly sampled
+    sample_rate = 1.0 / step
+
+    window = np.hanning(n)
+    signal = (accel - accel.mean(axis=0)) * window[:, None]
+    amplitude = np.abs(np.fft.rfft(signal, axis=0)) * (2.0 / window.sum())
+    frequencies = np.fft.rfftfreq(n, step)
+    power = (amplitude ** 2).sum(axis=1)
+
+    band = frequencies >= min_frequency
+    peaks = []
+    if band.any():
+        inner = np.flatnonzero((power[1:-1] > power[:-2]) & (power[1:-1] >= power[2:])) + 1
+        inner = inner[band[inner]]
+        floor = float(np.median(power[band])) or 1e-12
+        inner = inner[power[inner] > PEAK_SNR * floor]
+        for i in inner[np.argsort(power[inner])[::-1][:peak_count]]:
+            # Parabolic interpolation between bins
+            a, b, c = power[i - 1], power[i], power[i + 1]
+            denominator = a - 2.0 * b + c
+            offset = 0.5 * (a - c) / denominator if denominator else 0.0
+            peaks.append({
+                "frequency": round(float(frequencies[i] + offset * (frequencies[1] - frequencies[0])), 1),
+                "amplitude": round(float(np.sqrt(b)), 3),
+                "axis": "XYZ"[int(np.argmax(amplitude[i]))],
+            })
+
+    total = amplitude.sum(axis=1)
+    if len(total) > SPECTRUM_POINTS:
+        edges = np.linspace(0, len(total), SPECTRUM_POINTS + 1).astype(int)[:-1]
+        plot_frequencies = frequencies[edges]
+        plot_amplitude = np.maximum.reduceat(total, edges)
+    else:
+        plot_frequencies, plot_amplitude = frequencies, total
+
+    return {
+        "sampleRate": round(sample_rate, 1),
+        "resolution": round(float(frequencies[1]), 2),
+        "peaks": peaks,
+        "frequencies": [round(float(f), 1) for f in plot_frequencies],
+        "amplitude": [round(float(a), 4) for a in plot_amplitude],
+    }
+
+
+def suggest_notch(analysis):
+    """Harmonic notch settings from the peaks of one analysis, or {} if there is nothing to notch"""
+    if not analysis or not analysis["peaks"]:
+        return {}
+    peaks = analysis["peaks"]
+    tolerance = max(1.5 * analysis["resolution"], 2.0)
+    strongest = peaks[0]
+    fundamental = strongest["frequency"]
+    # A real peak at half or a third of the strongest one is the fundamental
+    for divisor in (3, 2):
+        for peak in peaks[1:]:
+            if peak["amplitude"] >= HARMONIC_MIN_RATIO * strongest["amplitude"] and \
+                    abs(peak["frequency"] - strongest["frequency"] / divisor) <= tolerance:
+                fundamental = min(fundamental, peak["frequency"])
+
+    harmonics = 0
+    for peak in peaks:
+        order = int(round(peak["frequency"] / fundamental))
+        if 1 <= order <= 8 and abs(peak["frequency"] - order * fundamental) <= tolerance * order:
+            harmonics |= 1 << (order - 1)
+
+    return {
+        "INS_HNTCH_ENABLE": 1,
+        "INS_HNTCH_MODE": 1,
+        "INS_HNTCH_FREQ": int(round(fundamental)),
+        "INS_HNTCH_BW": int(round(fundamental / 2.0)),
+        "INS_HNTCH_ATT": 40,
+        "INS_HNTCH_HMNCS": harmonics or 1,
+        "aliased": fundamental > ALIAS_FRACTION * analysis["sampleRate"],
+    }
+
+
+class VibrationService(QObject):
+    spectrumChanged = pyqtSignal()
+    spectrumActiveChanged = pyqtSignal()
+    levelChanged = pyqtSignal()
+    vibrationWarning = pyqtSignal(str, str)     # message, severity
+
+    def __init__(self, vehicle_overview, drone_model=None, message_logger=None, parent=None):
+        super().__init__(parent)
+        self.vehicle_overview = vehicle_overview
+        self.drone_model = drone_model
+        self.message_logger = message_logger
+
+        self._lock = threading.Lock()
+        self._latest = None                     # (x, y, z, clip0, clip1, clip2)
+        self._clipping_seen = None
+        self._level = "good"
+        self._last_warning = {}
+
+        self._ring = np.zeros((RING_SIZE, 4))   # time_usec, x, y, z
+        self._written = 0
+        self._spectrum_active = False
+        self._worker = None
+        self._stop_event = threading.Event()
+        self._analysis = None
+        self._analysis_pending = None          # written by the worker, picked up by _publish
+        self._analysis_seq = 0
+        self._published_seq = 0
+        self._notch = {}
+
+        MAVLinkThread.add_message_listener('VIBRATION', self._on_vibration)
+        self.vibrationWarning.connect(self._announce)
+
+        self._update_timer = QTimer(self)
+        self._update_timer.timeout.connect(self._publish)
+        self._update_timer.start(UPDATE_INTERVAL_MS)
+        print("[Vibration] Initialized")
+
+    @property
+    def _drone(self):
+        return getattr(self.drone_model, 'drone_connection', None)
+
+    # ------------------------------------------------------------------
+    # QML interface
+    # ------------------------------------------------------------------
+
+    @pyqtProperty(str, notify=levelChanged)
+    def level(self):
+        """good / warning / bad, from the worst axis"""
+        return self._level
+
+    @pyqtProperty(bool, notify=spectrumActiveChanged)
+    def spectrumActive(self):
+        return self._spectrum_active
+
+    @pyqtProperty('QVariantMap', notify=spectrumChanged)
+    def spectrum(self):
+        return self._analysis or {}
+
+    @pyqtProperty(float, notify=spectrumChanged)
+    def dominantFrequency(self):
+        if self._analysis and self._analysis["peaks"]:
+            return self._analysis["peaks"][0]["frequency"]
+        return 0.0
+
+    @pyqtProperty('QVariantMap', notify=spectrumChanged)
+    def notchSuggestion(self):
+        return self._notch
+
+    @pyqtSlot()
+    def startSpectrum(self):
+        if self._spectrum_active:
+            return
+        with self._lock:
+            self._written = 0
+        self._analysis = None
+        MAVLinkThread.add_message_listener('RAW_IMU', self._on_raw_imu)
+        self._set_message_interval(mavutil.mavlink.MAVLINK_MSG_ID_RAW_IMU, int(1e6 / SPECTRUM_RATE_HZ))
+        self._stop_event.clear()
+        self._worker = threading.Thread(target=self._analysis_worker, daemon=True)
+        self._worker.start()
+        self._spectrum_active = True
+        self.spectrumActiveChanged.emit()
+        print(f"[Vibration] Spectrum capture started (RAW_IMU requested at {SPECTRUM_RATE_HZ} Hz)")
+
+    @pyqtSlot()
+    def stopSpectrum(self):
+        if not self._spectrum_active:
+            return
+        MAVLinkThread.remove_message_listener('RAW_IMU', self._on_raw_imu)
+        self._set_message_interval(mavutil.mavlink.MAVLINK_MSG_ID_RAW_IMU, 0)
+        self._stop_event.set()
+        self._spectrum_active = False
+        self.spectrumActiveChanged.emit()
+        print("[Vibration] Spectrum capture stopped")
+
+    def _set_message_interval(self, message_id, interval_us):
+        drone = self._drone
+        if not drone:
+            return
+        try:
+            drone.mav.command_long_send(
+                drone.target_system,
+                drone.target_component,
+                mavutil.mavlink.MAV_CMD_SET_MESSAGE_INTERVAL,
+                0,
+                message_id,
+                interval_us,
+                0, 0, 0, 0, 0
+            )
+        except Exception as e:
+            print(f"[Vibration] Could not set message interval: {e}")
+
+    # ------------------------------------------------------------------
+    # MAVLink reader thread
+    # ------------------------------------------------------------------
+
+    def _on_vibration(self, msg):
+        self._latest = (msg.vibration_x, msg.vibration_y, msg.vibration_z,
+                        msg.clipping_0, msg.clipping_1, msg.clipping_2)
+
+    def _on_raw_imu(self, msg):
+        with self._lock:
+            self._ring[self._written % RING_SIZE] = (msg.time_usec, msg.xacc, msg.yacc, msg.zacc)
+            self._written += 1
+
+    # ------------------------------------------------------------------
+    # Worker thread
+    # ------------------------------------------------------------------
+
+    def _analysis_worker(self):
+        while not self._stop_event.wait(ANALYSIS_INTERVAL):
+            with self._lock:
+                count = min(self._written, FFT_SIZE)
+                rows = (self._written - count + np.arange(count)) % RING_SIZE
+                block = self._ring[rows]
+            if count < FFT_SIZE:
+                continue
+            try:
+                analysis = analyse_spectrum(block[:, 0], block[:, 1:] * MG_TO_MS2)
+            except Exception as e:
+                print(f"[Vibration] Spectrum analysis error: {e}")
+                continue
+            if analysis is not None:
+                self._analysis_pending = analysis
+                self._analysis_seq += 1
+
+    # ------------------------------------------------------------------
+    # GUI thread
+    # ------------------------------------------------------------------
+
+    def _publish(self):
+        latest = self._latest
+        if latest is not None:
+            levels, clipping = latest[:3], latest[3:]
+            self.vehicle_overview.update_vibration(levels, clipping)
+
+            worst = max(levels)
+            level = "bad" if worst >= VIBRATION_FAIL else "warning" if worst >= VIBRATION_WARN else "good"
+            if level != self._level:
+                self._level = level
+                self.levelChanged.emit()
+                if level != "good":
+                    self._warn("level", f"⚠️ High vibration: {worst:.0f} m/s/s", "warning")
+
+            if self._clipping_seen is not None and any(c > s for c, s in zip(clipping, self._clipping_seen)):
+                self._warn("clipping", "⚠️ Accelerometer clipping detected", "error")
+            self._clipping_seen = clipping
+
+        if self._analysis_seq != self._published_seq:
+            self._published_seq = self._analysis_seq
+            self._analysis = self._analysis_pending
+            self._notch = suggest_notch(self._analysis)
+            self.spectrumChanged.emit()
+
+    def _warn(self, kind, message, severity):
+        now = time.time()
+        if now - self._last_warning.get(kind, 0) < WARNING_INTERVAL:
+            return
+        self._last_warning[kind] = now
+        self.vibrationWarning.emit(message, severity)
+
+    @pyqtSlot(str, str)
+    def _announce(self, message, severity):
+        print(f"[Vibration] {message}")
+        if self.message_logger:
+            self.message_logger.logMessage(message, severity)
+
+    def cleanup(self):
+        self.stopSpectrum()
+        self._update_timer.stop()
+        MAVLinkThread.remove_message_listener('VIBRATION', self._on_vibration)
+        print("[Vibration] Cleanup completed")
@@ -0,0 +1,260 @@
+"""
+Waypoint file loader.
+
+Reads QGC WPL 110 files (.waypoints / .mission as written by Mission
+Planner and QGroundControl) and the JSON layout NavigationControls saves.
+Rows are streamed and validated one line at a time (field count, frame,
+command, coordinate ranges, sequence) and collected into a NumPy structured
+array, so the mission model gets typed columns instead of a string for QML
+to parse.
+
+Parsed arrays are cached as .npy files named by the SHA-256 of the source
+file, so reopening a large survey skips parsing entirely. A changed file
+hashes differently and is parsed again.
+
+    QGC WPL 110
+    <seq> <current> <frame> <command> <p1> <p2> <p3> <p4> <x/lat> <y/lon> <z/alt> <autocontinue>
+"""
+
+import os
+import json
+import math
+import hashlib
+import numpy as np
+
+WPL_HEADER = "QGC WPL 110"
+
+WAYPOINT_DTYPE = np.dtype([
+    ('seq', '<u4'),
+    ('current', 'u1'),
+    ('frame', 'u1'),
+    ('command', '<u2'),
+    ('param1', '<f4'),
+    ('param2', '<f4'),
+    ('param3', '<f4'),
+    ('param4', '<f4'),
+    ('x', '<f8'),
+    ('y', '<f8'),
+    ('z', '<f4'),
+    ('autocontinue', 'u1'),
+])
+
+# MAV_FRAME values accepted in mission files
+GLOBAL_FRAMES = {0, 3, 5, 6, 10, 11}
+VALID_FRAMES = GLOBAL_FRAMES | {1, 2, 4, 7, 8, 9}
+
+# Mission commands ArduPilot accepts in a stored mission
+VALID_COMMANDS = {
+    16, 17, 18, 19, 20, 21, 22, 30, 31, 82, 83, 84, 85, 92, 93, 94,
+    112, 113, 114, 115,
+    177, 178, 179, 180, 181, 182, 183, 184, 189, 191, 192, 194, 197, 200,
+    201, 202, 203, 205, 206, 207, 208, 211, 212, 213, 214, 215, 216, 217,
+    218, 220, 222, 223, 2000, 2001, 2003, 2004, 2005, 3000, 42600,
+}
+
+# Commands whose x/y must be a real position
+POSITION_COMMANDS = {16, 17, 18, 19, 21, 31, 82, 85}
+
+# NavigationControls commandType <-> MAV_CMD
+COMMAND_TYPES = {
+    "waypoint": 16, "loiter": 17, "circle": 18, "follow": 19,
+    "return": 20, "land": 21, "takeoff": 22,
+}
+COMMAND_NAMES = {v: k for k, v in COMMAND_TYPES.items()}
+
+_WPL_FIELDS = 12
+_HASH_CHUNK = 1 << 20
+
+
+class WaypointFileError(ValueError):
+    """Raised for malformed waypoint files when parsing in strict mode"""
+
+    def __init__(self, line_number, message):
+        super().__init__(f"line {line_number}: {message}")
+        self.line_number = line_number
+
+
+def _default_cache_dir():
+    return os.path.join(os.path.expanduser("~"), ".tihanfly", "waypoint_cache")
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _validate_row(seq, current, frame, command, params, x, y, z, autocontinue):
+    if current not in (0, 1) or autocontinue not in (0, 1):
+        raise ValueError("current/autocontinue must be 0 or 1")
+    if frame not in VALID_FRAMES:
+        raise ValueError(f"unsupported frame {frame}")
+    if command not in VALID_COMMANDS:
+        raise ValueError(f"unknown command {command}")
+    if not all(math.isfinite(v) for v in (*params, x, y, z)):
+        raise ValueError("non-finite value")
+    if frame in GLOBAL_FRAMES and command in POSITION_COMMANDS and seq > 0:
+        if not -90.0 <= x <= 90.0:
+            raise ValueError(f"latitude {x} out of range")
+        if not -180.0 <= y <= 180.0:
+            raise ValueError(f"longitude {y} out of range")
+        if x == 0.0 and y == 0.0 and command != 21:
+            # NAV_LAND at 0,0 means "land where you are"
+            raise ValueError("position is 0,0")
+
+
+def iter_wpl(path, strict=False, errors=None):
+    """
+    Stream validated rows from a QGC WPL 110 file as tuples in
+    WAYPOINT_DTYPE field order. Malformed rows raise WaypointFileError
+    when strict, otherwise they are skipped and described in errors.
+    A sequence gap is an error only when strict; otherwise the row is
+    kept and the expected sequence continues from it.
+    """
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        header = f.readline().strip()
+        if not header.startswith("QGC WPL"):
+            raise WaypointFileError(1, f"expected '{WPL_HEADER}' header, got '{header[:40]}'")
+        if header != WPL_HEADER:
+            message = f"line 1: version '{header}' read as {WPL_HEADER}"
+            if strict:
+                raise WaypointFileError(1, message)
+            if errors is not None:
+                errors.append(message)
+
+        expected_seq = 0
+        for line_number, raw in enumerate(f, 2):
+            line = raw.strip()
+            if not line or line.startswith("#"):
+                continue
+            fields = line.split("\t")
+            if len(fields) != _WPL_FIELDS:
+                fields = line.split()
+            seq = None
+            try:
+                if len(fields) != _WPL_FIELDS:
+                    raise ValueError(f"expected {_WPL_FIELDS} fields, got {len(fields)}")
+                seq, current, frame, command = (int(v) for v in fields[0:4])
+                params = tuple(float(v) for v in fields[4:8])
+                x, y, z = float(fields[8]), float(fields[9]), float(fields[10])
+                autocontinue = int(float(fields[11]))
+                if seq != expected_seq and strict:
+                    raise ValueError(f"sequence {seq} out of order (expected {expected_seq})")
+                _validate_row(seq, current, frame, command, params, x, y, z, autocontinue)
+            except ValueError as e:
+                if strict:
+                    raise WaypointFileError(line_number, str(e))
+                if errors is not None:
+                    errors.append(f"line {line_number}: {e}")
+                if seq is not None:
+                    # A bad row still uses up its sequence number
+                    expected_seq = seq + 1
+                continue
+
+            if seq != expected_seq:
+                print(f"[WaypointFiles] ⚠️ line {line_number}: sequence {seq}, expected {expected_seq}")
+            expected_seq = seq + 1
+            yield (seq, current, frame, command, *params, x, y, z, autocontinue)
+
+
+def _load_json(path, errors):
+    """NavigationControls' own JSON export: {waypoints: [{lat, lng, altitude, ...}]}"""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    waypoints = data.get("waypoints") if isinstance(data, dict) else data
+    if not isinstance(waypoints, list):
+        raise WaypointFileError(1, "JSON file has no waypoints list")
+
+    rows = []
+    for i, wp in enumerate(waypoints):
+        try:
+            command = COMMAND_TYPES.get(wp.get("commandType", "waypoint"), 16)
+            row = (i + 1, 0, 3, command, float(wp.get("holdTime", 0) or 0), 0.0, 0.0, 0.0,
+                   float(wp["lat"]), float(wp["lng"]), float(wp.get("altitude", 10) or 10), 1)
+            _validate_row(row[0], row[1], row[2], row[3], row[4:8], row[8], row[9], row[10], row[11])
+            rows.append(row)
+        except (KeyError, TypeError, ValueError) as e:
+            errors.append(f"waypoint {i + 1}: {e}")
+    return rows
+
+
+def _is_json(path):
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            stripped = line.strip()
+            if stripped:
+                return stripped[0] in "{["
+    return False
+
+
+def load_waypoint_file(path, strict=False, cache_dir=None, use_cache=True):
+    """
+    Load a waypoint file into a WAYPOINT_DTYPE array.
+    Returns (array, errors, cached). Only error-free loads are cached.
+    """
+    cache_path = None
+    if use_cache:
+        cache_dir = cache_dir or _default_cache_dir()
+        cache_path = os.path.join(cache_dir, file_hash(path) + ".npy")
+        if os.path.exists(cache_path):
+            try:
+                array = np.load(cache_path, allow_pickle=False)
+                if array.dtype == WAYPOINT_DTYPE:
+                    return array, [], True
+            except Exception as e:
+                print(f"[WaypointFiles] ⚠️ Ignoring unreadable cache {cache_path}: {e}")
+
+    errors = []
+    if _is_json(path):
+        rows = _load_json(path, errors)
+        if strict and errors:
+            raise WaypointFileError(0, errors[0])
+    else:
+        rows = list(iter_wpl(path, strict=strict, errors=errors))
+    array = np.array(rows, dtype=WAYPOINT_DTYPE)
+
+    if cache_path and not errors:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_path = cache_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, array, allow_pickle=False)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print(f"[WaypointFiles] ⚠️ Could not write cache: {e}")
+
+    return array, errors, False
+
+
+def to_markers(array, skip_home=True):
+    """
+    Convert a WAYPOINT_DTYPE array into NavigationControls marker dicts.
+    QGC files carry home at seq 0, which is dropped. Every command
+    NavigationControls has a commandType for is kept; other commands (DO_*
+    and the like) have no marker. Takeoff and return items often have no
+    position of their own, so they are placed on the nearest positioned
+    item before them, or after them when they come first.
+    """
+    if skip_home and len(array) > 1 and array['seq'][0] == 0:
+        array = array[1:]
+    array = array[np.isin(array['command'], list(COMMAND_NAMES))]
+    if len(array) == 0:
+        return []
+
+    lat, lng = array['x'].copy(), array['y'].copy()
+    located = ~((lat == 0.0) & (lng == 0.0))
+    if not located.any():
+        return []
+    # Index of the last located row at or before each row (forward fill)
+    previous = np.maximum.accumulate(np.where(located, np.arange(len(array)), -1))
+    first = int(np.argmax(located))
+    source = np.where(previous >= 0, previous, first)
+    lat, lng = lat[source], lng[source]
+
+    return [{
+        'lat': la, 'lng': lo, 'altitude': alt, 'speed': 5,
+        'commandType': COMMAND_NAMES[cmd], 'holdTime': hold,
+    } for la, lo, alt, cmd, hold in zip(lat.tolist(), lng.tolist(), array['z'].tolist(),
+                                        array['command'].tolist(), array['param1'].tolist())]